@@ -0,0 +1,150 @@
+# ════════════════════════════════════════════
+# 🃏 Card Collection Bot — SQLite Connection Backends
+# ════════════════════════════════════════════
+# `database` runs all of its SQL through `ConnectionPool`, and the pool
+# gets its SQLite connections from a backend. A backend decides where a
+# database named by a path actually lives and how its connections are set
+# up; that is all it does. The pool, the group-commit writer, migrations
+# and every query speak SQLite directly and are the same for all of them.
+# DB_BACKEND picks one:
+#
+#   "sqlite"  files on disk in WAL mode (the default, and the only one for
+#             production).
+#   "memory"  throwaway SQLite files in RAM (tmpfs where the OS has one),
+#             for tests and benchmarks: every run starts empty and leaves
+#             nothing behind. The data lives until `reset()` or the process
+#             exits.
+#
+# Both are SQLite in WAL mode underneath, so the SQL dialect, locking and
+# isolation are the same; tests/test_backends.py runs the same checks
+# through each.
+#
+# This is not a storage abstraction. There is no query-level backend
+# interface and no PostgreSQL backend: every query and migration is
+# written in SQLite's dialect (RETURNING, WITHOUT ROWID, FTS5, ATTACH,
+# PRAGMAs), and another database would need its own copy of all of them,
+# not just a different `connect`.
+import atexit
+import os
+import shutil
+import tempfile
+from typing import Dict, Optional, Protocol
+
+import aiosqlite
+
+from config import (
+    DB_BUSY_TIMEOUT_MS, DB_CACHE_SIZE_KB, DB_MMAP_SIZE,
+    DB_SYNCHRONOUS, DB_TEMP_STORE, DB_PAGE_SIZE,
+    DB_ATTACHED_SYNCHRONOUS, DB_ATTACHED_JOURNAL_LIMIT,
+)
+
+
+class Backend(Protocol):
+    name: str
+    # True when databases are files: backups can be restored over them and
+    # another process may open the same ones
+    persistent: bool
+
+    async def connect(self, path: str, attached: Dict[str, str],
+                      read_only: bool = False) -> aiosqlite.Connection:
+        """A connection to the database at `path`, with each `attached`
+        {schema: path} ATTACHed under its schema name and rows returned as
+        `aiosqlite.Row`."""
+        ...
+
+    def identity(self, path: str) -> Optional[int]:
+        """Something that changes when the database at `path` is replaced
+        underneath open connections, or None if it can't be."""
+        ...
+
+
+# ─────────────────────────────────────────────
+# SQLITE (FILES)
+# ─────────────────────────────────────────────
+class SQLiteBackend:
+    name = "sqlite"
+    persistent = True
+
+    async def connect(self, path: str, attached: Dict[str, str],
+                      read_only: bool = False) -> aiosqlite.Connection:
+        conn = await aiosqlite.connect(path)
+        conn.row_factory = aiosqlite.Row
+        # a no-op once the file has tables
+        await conn.execute(f"PRAGMA page_size={int(DB_PAGE_SIZE)}")
+        await conn.execute("PRAGMA journal_mode=WAL")
+        await conn.execute("PRAGMA foreign_keys=ON")
+        await conn.execute(f"PRAGMA busy_timeout={int(DB_BUSY_TIMEOUT_MS)}")
+        await conn.execute(f"PRAGMA cache_size=-{int(DB_CACHE_SIZE_KB)}")
+        await conn.execute(f"PRAGMA mmap_size={int(DB_MMAP_SIZE)}")
+        await conn.execute(f"PRAGMA synchronous={DB_SYNCHRONOUS}")
+        await conn.execute(f"PRAGMA temp_store={DB_TEMP_STORE}")
+        for schema, apath in attached.items():
+            await conn.execute(f"ATTACH DATABASE ? AS {schema}", (apath,))
+            await conn.execute(f"PRAGMA {schema}.page_size={int(DB_PAGE_SIZE)}")
+            await conn.execute(f"PRAGMA {schema}.journal_mode=WAL")
+            await conn.execute(f"PRAGMA {schema}.synchronous={DB_ATTACHED_SYNCHRONOUS}")
+            await conn.execute(f"PRAGMA {schema}.journal_size_limit={int(DB_ATTACHED_JOURNAL_LIMIT)}")
+        if read_only:
+            await conn.execute("PRAGMA query_only=ON")
+        return conn
+
+    def identity(self, path: str) -> Optional[int]:
+        try:
+            return os.stat(path).st_ino
+        except FileNotFoundError:
+            return None
+
+
+# ─────────────────────────────────────────────
+# MEMORY
+# ─────────────────────────────────────────────
+# Each path maps to a file in a private directory under /dev/shm (or the
+# temp directory where there is no tmpfs), opened exactly like the sqlite
+# backend's files. Sharing the WAL machinery matters more than avoiding a
+# filesystem: SQLite's own in-memory databases can only be shared between
+# connections through shared-cache mode, whose table locks would either
+# block readers behind every group-commit batch or, with read_uncommitted,
+# let them see a batch that may still roll back. Here readers see
+# committed data only, as in production.
+_RAM_DIR = "/dev/shm" if os.path.isdir("/dev/shm") else None
+
+
+class MemoryBackend(SQLiteBackend):
+    name = "memory"
+    persistent = False
+
+    def __init__(self):
+        self._dir: Optional[str] = None
+
+    def _file(self, path: str) -> str:
+        if self._dir is None:
+            self._dir = tempfile.mkdtemp(prefix="cardbot-", dir=_RAM_DIR)
+            atexit.register(shutil.rmtree, self._dir, True)
+        return os.path.join(self._dir, os.path.abspath(path).strip(os.sep).replace(os.sep, "_"))
+
+    async def connect(self, path: str, attached: Dict[str, str],
+                      read_only: bool = False) -> aiosqlite.Connection:
+        return await super().connect(
+            self._file(path), {schema: self._file(p) for schema, p in attached.items()}, read_only
+        )
+
+    def identity(self, path: str) -> Optional[int]:
+        return super().identity(self._file(path))
+
+    def reset(self):
+        """Drop every database. Pools must be closed first."""
+        if self._dir is not None:
+            shutil.rmtree(self._dir, ignore_errors=True)
+            self._dir = None
+
+
+BACKENDS = {"sqlite": SQLiteBackend, "memory": MemoryBackend}
+
+
+def make_backend(name: str) -> Backend:
+    try:
+        return BACKENDS[name]()
+    except KeyError:
+        raise ValueError(
+            f"Unknown DB_BACKEND {name!r} (available: {', '.join(BACKENDS)})"
+        ) from None
@@ -26,7 +26,7 @@ from telegram.ext import (
 try:
     import database as db
     from config import (
-        BOT_TOKEN, OWNER_ID, BACKUP_DIR, LOG_LEVEL,
+        BOT_TOKEN, OWNER_ID, BACKUP_DIR, LOG_LEVEL, DB_MAINT_INTERVAL_S,
         DEFAULT_SHOP_ITEMS, DAILY_MISSIONS, WEEKLY_MISSIONS,
         ACHIEVEMENTS, TITLES
     )
@@ -42,7 +42,7 @@ from handlers.card_handlers    import catch_cmd, set_cmd, removeset_cmd, invento
 from handlers.social_handlers  import givecoin_cmd, marry_cmd, divorce_cmd, friends_cmd
 from handlers.ranking_handlers import top_cmd, titles_cmd, missions_cmd, achievements_cmd
 from handlers.admin_handlers   import (
-    upload_cmd, uploadvd_cmd, edit_cmd, delete_cmd, confirmdelete_cmd,
+    upload_cmd, uploadvd_cmd, edit_cmd, delete_cmd, confirmdelete_cmd, cards_cmd,
     setdrop_cmd, stats_cmd, backup_cmd, restore_cmd, confirmrestore_cmd
 )
 from handlers.owner_handlers   import (
@@ -135,6 +135,7 @@ async def help_cmd(update: Update, ctx: ContextTypes.DEFAULT_TYPE):
             "/uploadvd — Upload video card\n"
             "/edit &lt;id&gt; &lt;name&gt;|&lt;movie&gt; — Edit card\n"
             "/delete &lt;id&gt; — Delete card\n"
+            "/cards [words] [rarity=] [movie=] [type=] — Browse cards\n"
             "/setdrop &lt;rate&gt; — Set drop rate\n"
             "/stats — Server statistics\n"
             "/backup — Create DB backup\n"
@@ -167,15 +168,12 @@ async def settitle_cmd(update: Update, ctx: ContextTypes.DEFAULT_TYPE):
         return
 
     title_key = ctx.args[0]
-    my_titles = await db.get_user_titles(u_obj.id)
-    earned    = {t["title_key"] for t in my_titles}
-
-    if title_key not in earned:
+    if title_key not in await db.earned_title_keys(user):
         await update.message.reply_text(f"❌ You haven't earned title <code>{title_key}</code> yet!", parse_mode="HTML")
         return
 
     await db.update_user(u_obj.id, active_title=title_key)
-    title_data = next((t for t in my_titles if t["title_key"] == title_key), None)
+    title_data = next((t for t in TITLES if t["id"] == title_key), None)
     if title_data:
         await update.message.reply_text(
             f"✅ Active title set to: <b>{title_data['emoji']} {title_data['name']}</b>",
@@ -351,6 +349,27 @@ async def on_startup(app: Application):
     log.info("✅ Bot startup complete!")
 
 
+async def on_shutdown(app: Application):
+    await db.close_db()
+    log.info("🗄️ Database connections closed")
+
+
+# ─────────────────────────────────────────────
+# DATABASE MAINTENANCE JOB
+# ─────────────────────────────────────────────
+async def db_maintenance_job(ctx: ContextTypes.DEFAULT_TYPE):
+    """Checkpoints, vacuums and re-analyses the database files."""
+    try:
+        m = await db.run_maintenance()
+    except Exception as e:
+        log.error(f"DB maintenance failed: {e}")
+        return
+    log.info(
+        f"🧹 DB maintenance: checkpoint {m['checkpoint']} ({m['busy']} busy), "
+        f"{m['pages_freed']} pages freed, WAL {m['wal_bytes'] // 1024} KB"
+    )
+
+
 # ─────────────────────────────────────────────
 # MAIN
 # ─────────────────────────────────────────────
@@ -369,6 +388,7 @@ def main():
         ApplicationBuilder()
         .token(BOT_TOKEN)
         .post_init(on_startup)
+        .post_shutdown(on_shutdown)
         .build()
     )
 
@@ -410,6 +430,7 @@ def main():
     app.add_handler(CommandHandler("edit",           edit_cmd))
     app.add_handler(CommandHandler("delete",         delete_cmd))
     app.add_handler(CommandHandler("confirmdelete",  confirmdelete_cmd))
+    app.add_handler(CommandHandler("cards",          cards_cmd))
     app.add_handler(CommandHandler("setdrop",        setdrop_cmd))
     app.add_handler(CommandHandler("stats",          stats_cmd))
     app.add_handler(CommandHandler("backup",         backup_cmd))
@@ -439,6 +460,9 @@ def main():
         # Weekly reset - schedule to run daily and the job itself checks for Monday
         job_queue.run_daily(weekly_reset_job, time=time(0, 0, 0))
         log.info("✅ Weekly reset job scheduled")
+        job_queue.run_repeating(db_maintenance_job, interval=DB_MAINT_INTERVAL_S,
+                                first=DB_MAINT_INTERVAL_S)
+        log.info("✅ DB maintenance job scheduled")
 
     log.info("🤖 Bot is running! Press Ctrl+C to stop.")
     app.run_polling(
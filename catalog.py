@@ -0,0 +1,485 @@
+# ════════════════════════════════════════════
+# 🃏 Card Collection Bot — In-Memory Card Catalog
+# ════════════════════════════════════════════
+# Every /catch and wheel card prize draws a random card. Rather than
+# `ORDER BY RANDOM()` over the whole `cards` table each time, `database`
+# keeps the catalog (every card plus the drop_settings multiplier) in a
+# `Catalog`. Draws use Walker alias tables, so one costs two array
+# lookups however many cards there are.
+#
+# Odds of a draw:
+#   * a rarity is picked by its RARITY_CONFIG `drop_weight`; only
+#     rarities with droppable cards take part;
+#   * every rarity above the first (Common) has its weight multiplied by
+#     the drop_settings rate, so a 2x event doubles the odds of anything
+#     rarer than Common;
+#   * within the rarity, a card is picked in proportion to its
+#     `cards.drop_rate`. A card with drop_rate 0 never drops.
+# A draw restricted to one rarity uses that rarity's table alone.
+#
+# Changes made through `database` update the catalog in place. The alias
+# tables are rebuilt (O(cards)) on the next draw after a change.
+#
+# /catch <name> resolves names through a trigram index over each card's
+# name and movie (see `NameIndex`). It is built on the first search and
+# then kept up to date card by card.
+#
+# Sets of cards (a player's collection, every card of a rarity) are
+# Python ints with one bit per card (see `Catalog.bitset`). The bit is
+# the card's slot, a dense index the catalog hands out, not its id: ids
+# come from an AUTOINCREMENT sequence and deleted ones are never reused,
+# so sets keyed by id would grow with every id ever issued. A deleted
+# card's slot goes to the next new card, and loading the catalog packs
+# the slots again. "Owns a Legendary" is
+# `owned & catalog.rarity_mask("Legendary")`.
+import random
+import re
+import time
+import unicodedata
+from collections import Counter
+from typing import Dict, Generic, Iterable, List, Optional, Sequence, Set, Tuple, TypeVar
+
+from models import Card
+
+T = TypeVar("T")
+
+
+class AliasTable(Generic[T]):
+    """Walker's alias method (Vose's construction): O(n) to build, O(1) per
+    draw. Items with weight <= 0 are never drawn."""
+    __slots__ = ("items", "prob", "alias")
+
+    def __init__(self, items: Sequence[T], weights: Sequence[float]):
+        pairs = [(item, w) for item, w in zip(items, weights) if w > 0]
+        n     = len(pairs)
+        total = sum(w for _, w in pairs)
+        self.items: List[T]       = [item for item, _ in pairs]
+        self.prob:  List[float]   = [1.0] * n
+        self.alias: List[int]     = list(range(n))
+        scaled = [w * n / total for _, w in pairs]
+        small = [i for i, p in enumerate(scaled) if p < 1.0]
+        large = [i for i, p in enumerate(scaled) if p >= 1.0]
+        while small and large:
+            s, l = small.pop(), large.pop()
+            self.prob[s]  = scaled[s]
+            self.alias[s] = l
+            scaled[l] -= 1.0 - scaled[s]
+            (small if scaled[l] < 1.0 else large).append(l)
+        # whatever is left is 1.0 up to rounding error and keeps prob 1.0
+
+    def __len__(self) -> int:
+        return len(self.items)
+
+    def draw(self, rng: random.Random = random) -> Optional[T]:
+        n = len(self.items)
+        if not n:
+            return None
+        u = rng.random() * n
+        i = int(u)
+        return self.items[i] if u - i < self.prob[i] else self.items[self.alias[i]]
+
+
+# ─────────────────────────────────────────────
+# NAME SEARCH
+# ─────────────────────────────────────────────
+_NON_WORD = re.compile(r"[^0-9a-z]+")
+
+
+def normalize(text: str) -> str:
+    """Lowercase ASCII words: accents stripped, punctuation to spaces."""
+    text = unicodedata.normalize("NFKD", text or "").encode("ascii", "ignore").decode()
+    return " ".join(_NON_WORD.split(text.casefold())).strip()
+
+
+def trigrams(text: str) -> Set[str]:
+    """Trigrams of each word padded as pg_trgm does ("  ab", " abc", "bc ")."""
+    grams: Set[str] = set()
+    for word in text.split():
+        padded = f"  {word} "
+        grams.update(padded[i:i + 3] for i in range(len(padded) - 2))
+    return grams
+
+
+def _deletes(text: str) -> Set[str]:
+    """`text` and every string one character shorter than it."""
+    return {text} | {text[:i] + text[i + 1:] for i in range(len(text))}
+
+
+def edit_distance(a: str, b: str) -> int:
+    """Damerau-Levenshtein distance (optimal string alignment): inserts,
+    deletes, substitutions and swaps of two adjacent characters."""
+    prev2: List[int] = []
+    prev = list(range(len(b) + 1))
+    for i in range(1, len(a) + 1):
+        cur = [i] + [0] * len(b)
+        for j in range(1, len(b) + 1):
+            cost = 0 if a[i - 1] == b[j - 1] else 1
+            cur[j] = min(prev[j] + 1, cur[j - 1] + 1, prev[j - 1] + cost)
+            if i > 1 and j > 1 and a[i - 1] == b[j - 2] and a[i - 2] == b[j - 1]:
+                cur[j] = min(cur[j], prev2[j - 2] + 1)
+        prev2, prev = prev, cur
+    return prev[-1]
+
+
+# Names scoring below MATCH_MIN are not offered at all. The best match is
+# taken without asking when it is exact and unique, or scores MATCH_SURE
+# and leads the runner-up by MATCH_MARGIN.
+MATCH_MIN    = 0.3
+MATCH_SURE   = 0.5
+MATCH_MARGIN = 0.15
+
+
+class NameIndex:
+    """Trigram postings over each card's name + movie.
+
+    A query's score against a text is the mean of the Jaccard similarity
+    of their trigram sets and the share of the query's trigrams the text
+    contains: 1.0 for an exact match, still high for a typo (most trigrams
+    survive one wrong letter) or a prefix ("pika" for "Pikachu"). A card
+    scores the better of its name and 0.9 x its name + movie, so adding
+    the movie disambiguates cards that share a name.
+
+    Only CANDIDATES cards are scored: those sharing the most of the query's
+    rarer trigrams. Postings are read rarest first until POSTINGS_BUDGET
+    ids have been counted, so a query costs the same on a huge catalog as
+    on a small one; the very common trigrams skipped (a word's first
+    letter, "er ") say little about which card was meant.
+
+    Short names have too few trigrams for that: one typo in "card1"
+    leaves it sharing almost none with the query. Names of up to
+    SHORT_NAME characters are also found by edit distance 1 (including a
+    swap of two letters, "crad1"), through postings keyed by each name
+    with and without each of its characters: a query that far away shares
+    one of those keys. Such a match scores 1 - 1 / length."""
+
+    MOVIE_FACTOR    = 0.9
+    CANDIDATES      = 64
+    POSTINGS_BUDGET = 4000
+    SHORT_NAME      = 12
+
+    def __init__(self):
+        self._post: Dict[str, Set[int]] = {}
+        self._grams: Dict[int, Tuple[Set[str], Set[str]]] = {}   # id -> (name, name + movie)
+        self._exact: Dict[str, Set[int]] = {}                     # normalized name -> ids
+        self._names: Dict[int, str] = {}
+        self._near: Dict[str, Set[int]] = {}                      # short name minus a char -> ids
+
+    @classmethod
+    def build(cls, cards: Iterable[Card]) -> "NameIndex":
+        index = cls()
+        for card in cards:
+            index.add(card)
+        return index
+
+    def __len__(self) -> int:
+        return len(self._grams)
+
+    def exact(self, query: str) -> Set[int]:
+        """Ids of the cards named exactly `query` (after normalizing)."""
+        return self._exact.get(normalize(query), set())
+
+    def add(self, card: Card):
+        self.remove(card.id)
+        name = normalize(card.name)
+        name_grams = trigrams(name)
+        full_grams = name_grams | trigrams(normalize(card.movie or ""))
+        self._grams[card.id] = (name_grams, full_grams)
+        self._names[card.id] = name
+        self._exact.setdefault(name, set()).add(card.id)
+        for g in full_grams:
+            self._post.setdefault(g, set()).add(card.id)
+        if len(name) <= self.SHORT_NAME:
+            for key in _deletes(name):
+                self._near.setdefault(key, set()).add(card.id)
+
+    def remove(self, card_id: int):
+        grams = self._grams.pop(card_id, None)
+        if grams is None:
+            return
+        name = self._names.pop(card_id)
+        self._discard(self._exact, name, card_id)
+        for g in grams[1]:
+            self._discard(self._post, g, card_id)
+        if len(name) <= self.SHORT_NAME:
+            for key in _deletes(name):
+                self._discard(self._near, key, card_id)
+
+    @staticmethod
+    def _discard(postings: Dict[str, Set[int]], key: str, card_id: int):
+        ids = postings.get(key)
+        if ids is not None:
+            ids.discard(card_id)
+            if not ids:
+                del postings[key]
+
+    def search(self, query: str, limit: int, min_score: float) -> List[Tuple[int, float]]:
+        """Best (card id, score) pairs, best first, scoring >= `min_score`."""
+        q = normalize(query)
+        grams = trigrams(q)
+        if not grams:
+            return []
+        hits: Counter = Counter()
+        counted = 0
+        for ids in sorted((self._post[g] for g in grams if g in self._post), key=len):
+            if counted and counted + len(ids) > self.POSTINGS_BUDGET:
+                break
+            hits.update(ids)
+            counted += len(ids)
+        candidates = {card_id for card_id, _ in hits.most_common(self.CANDIDATES)}
+        candidates.update(self._exact.get(q, ()))
+        nq = len(grams)
+
+        def similarity(other: Set[str]) -> float:
+            shared = len(grams & other)
+            return (shared / (nq + len(other) - shared) + shared / nq) / 2
+
+        scores: Dict[int, float] = {}
+        for card_id in candidates:
+            name_grams, full_grams = self._grams[card_id]
+            if self._names[card_id] == q:
+                scores[card_id] = 1.0
+            else:
+                score = max(similarity(name_grams), self.MOVIE_FACTOR * similarity(full_grams))
+                # only an exact name scores 1.0
+                scores[card_id] = min(score, 0.999)
+        if len(q) <= self.SHORT_NAME + 1:
+            near = set().union(*(self._near.get(key, ()) for key in _deletes(q)))
+            for card_id in near:
+                name = self._names[card_id]
+                if name != q and edit_distance(q, name) == 1:
+                    score = 1 - 1 / max(len(q), len(name))
+                    scores[card_id] = max(scores.get(card_id, 0.0), score)
+        scored = [(card_id, score) for card_id, score in scores.items() if score >= min_score]
+        scored.sort(key=lambda cs: -cs[1])
+        return scored[:limit]
+
+
+# ─────────────────────────────────────────────
+# CARD SETS
+# ─────────────────────────────────────────────
+def bitset(slots: Iterable[int]) -> int:
+    """An int with bit `slot` set for every slot in `slots`. Built as bytes
+    first: OR-ing bits into an int one by one copies it each time."""
+    slots = list(slots)
+    if not slots:
+        return 0
+    bits = bytearray(max(slots) // 8 + 1)
+    for i in slots:
+        bits[i >> 3] |= 1 << (i & 7)
+    return int.from_bytes(bits, "little")
+
+
+# ─────────────────────────────────────────────
+# CATALOG
+# ─────────────────────────────────────────────
+class Catalog:
+    def __init__(self, rarity_weights: Dict[str, float]):
+        # ordered; the first rarity is not scaled by the multiplier
+        self.rarity_weights = dict(rarity_weights)
+        self._base = next(iter(self.rarity_weights), None)
+        self._cards: Optional[Dict[int, Card]] = None     # None: not loaded
+        self.multiplier = 1.0
+        # bumped by every change, so an index or load that raced one is discarded
+        self.generation = 0
+        self._tables: Optional[Dict[Optional[str], AliasTable]] = None
+        self._names: Optional[NameIndex] = None                # built on first search
+        self._masks: Optional[Dict[str, int]] = None           # rarity -> bitset
+        self._slots: Dict[int, int] = {}                       # card id -> bit in card sets
+        self._free: List[int] = []                             # slots of deleted cards
+        # bumped when cards move to other slots: card sets built before are void
+        self.layout = 0
+        self._metrics = {"loads": 0, "builds": 0, "build_ms": 0.0, "draws": 0,
+                         "searches": 0, "search_us": 0.0}
+
+    @property
+    def loaded(self) -> bool:
+        return self._cards is not None
+
+    def load(self, cards: Iterable[Card], multiplier: float, generation: int) -> bool:
+        """Install a full copy read while `generation` was current. Returns
+        False (and keeps nothing) if the catalog changed meanwhile."""
+        if generation != self.generation:
+            return False
+        self._cards = {c.id: c for c in cards}
+        if self._free or self._slots.keys() != self._cards.keys():
+            self._slots = {card_id: i for i, card_id in enumerate(sorted(self._cards))}
+            self._free = []
+            self.layout += 1
+        self.multiplier = multiplier
+        self._tables = None
+        self._names = None
+        self._masks = None
+        self._metrics["loads"] += 1
+        return True
+
+    def invalidate(self):
+        """Forget everything; the next use reloads."""
+        self._cards = None
+        self._tables = None
+        self._names = None
+        self._masks = None
+        self.generation += 1
+
+    def _changed(self):
+        self._tables = None
+        self._masks = None
+        self.generation += 1
+
+    def put(self, card: Card):
+        if self._cards is not None:
+            self._cards[card.id] = card
+        self.slot(card.id)
+        if self._names is not None:
+            self._names.add(card)
+        self._changed()
+
+    def remove(self, card_id: int):
+        """Drop a deleted card. Its slot is handed to the next new card, so
+        the caller also drops any card set that may still hold it."""
+        if self._cards is not None:
+            self._cards.pop(card_id, None)
+        slot = self._slots.pop(card_id, None)
+        if slot is not None:
+            self._free.append(slot)
+        if self._names is not None:
+            self._names.remove(card_id)
+        self._changed()
+
+    def set_multiplier(self, multiplier: float):
+        self.multiplier = multiplier
+        self._changed()
+
+    def get(self, card_id: int) -> Optional[Card]:
+        return self._cards.get(card_id) if self._cards else None
+
+    def __len__(self) -> int:
+        return len(self._cards) if self._cards else 0
+
+    def __iter__(self):
+        return iter(self._cards.values() if self._cards else ())
+
+    # ── sampling ──────────────────────────────
+    def _rarity_weight(self, rarity: str) -> float:
+        weight = self.rarity_weights.get(rarity)
+        if weight is None:                       # a rarity missing from config
+            weight = min(self.rarity_weights.values(), default=1.0)
+        return weight if rarity == self._base else weight * self.multiplier
+
+    def _build(self) -> Dict[Optional[str], AliasTable]:
+        started = time.perf_counter()
+        by_rarity: Dict[str, List[Card]] = {}
+        for card in self._cards.values():
+            by_rarity.setdefault(card.rarity, []).append(card)
+        tables: Dict[Optional[str], AliasTable] = {}
+        items: List[Card] = []
+        weights: List[float] = []
+        for rarity, cards in by_rarity.items():
+            rates = [max(0.0, c.drop_rate if c.drop_rate is not None else 1.0) for c in cards]
+            tables[rarity] = AliasTable(cards, rates)
+            total = sum(rates)
+            if total <= 0:
+                continue
+            share = self._rarity_weight(rarity) / total
+            items   += cards
+            weights += [r * share for r in rates]
+        tables[None] = AliasTable(items, weights)
+        m = self._metrics
+        m["builds"]   += 1
+        m["build_ms"]  = (time.perf_counter() - started) * 1000
+        return tables
+
+    def draw(self, rarity: Optional[str] = None, rng: random.Random = random) -> Optional[Card]:
+        """A weighted random card (of `rarity`, if given), or None if there
+        is nothing to draw."""
+        if not self._cards:
+            return None
+        if self._tables is None:
+            self._tables = self._build()
+        table = self._tables.get(rarity)
+        self._metrics["draws"] += 1
+        return table.draw(rng) if table is not None else None
+
+    # ── card sets ─────────────────────────────
+    def slot(self, card_id: int) -> int:
+        """The bit that stands for `card_id` in card sets. An id the catalog
+        has not loaded yet (a card added by another process) gets one too."""
+        slot = self._slots.get(card_id)
+        if slot is None:
+            slot = self._free.pop() if self._free else len(self._slots)
+            self._slots[card_id] = slot
+        return slot
+
+    def bitset(self, card_ids: Iterable[int]) -> int:
+        """The card set holding `card_ids`."""
+        return bitset(self.slot(card_id) for card_id in card_ids)
+
+    def has_card(self, bits: int, card_id: int) -> bool:
+        slot = self._slots.get(card_id)
+        return slot is not None and (bits >> slot) & 1 == 1
+
+    def rarity_mask(self, rarity: str) -> int:
+        """Bitset of every card of `rarity` (0 if there are none)."""
+        if not self._cards:
+            return 0
+        if self._masks is None:
+            ids: Dict[str, List[int]] = {}
+            for card in self._cards.values():
+                ids.setdefault(card.rarity, []).append(card.id)
+            self._masks = {r: self.bitset(i) for r, i in ids.items()}
+        return self._masks.get(rarity, 0)
+
+    # ── name search ───────────────────────────
+    @property
+    def names_ready(self) -> bool:
+        return self._names is not None
+
+    def install_names(self, index: NameIndex, generation: int) -> bool:
+        """Use an index built (e.g. in a thread) from the cards of
+        `generation`. Returns False if the catalog changed meanwhile."""
+        if generation != self.generation or self._cards is None:
+            return False
+        self._names = index
+        return True
+
+    def _name_index(self) -> NameIndex:
+        if self._names is None:
+            self._names = NameIndex.build(self._cards.values())
+        return self._names
+
+    def search(self, query: str, limit: int = 5, min_score: float = MATCH_MIN) -> List[Tuple[Card, float]]:
+        """Cards whose name (or name + movie) best matches `query`, with
+        scores in (0, 1], best first."""
+        if not self._cards:
+            return []
+        started = time.perf_counter()
+        hits = self._name_index().search(query, limit, min_score)
+        m = self._metrics
+        m["searches"] += 1
+        m["search_us"] = (time.perf_counter() - started) * 1e6
+        return [(self._cards[card_id], score) for card_id, score in hits]
+
+    def resolve(self, query: str, limit: int = 5) -> Tuple[Optional[Card], List[Card]]:
+        """(the card `query` clearly means, or None; the candidates). With
+        no clear match, one candidate is a suggestion ("did you mean")
+        and several are a choice."""
+        if not self._cards:
+            return None, []
+        exact = self._name_index().exact(query)
+        if len(exact) == 1:
+            card = self._cards[next(iter(exact))]
+            return card, [card]
+        hits = self.search(query, limit)
+        if not hits:
+            return None, []
+        best, runner_up = hits[0][1], (hits[1][1] if len(hits) > 1 else 0.0)
+        if (best >= 1.0 and runner_up < 1.0) or (best >= MATCH_SURE and best - runner_up >= MATCH_MARGIN):
+            return hits[0][0], [c for c, _ in hits]
+        return None, [c for c, _ in hits]
+
+    def stats(self) -> Dict:
+        return {
+            "loaded":     self.loaded,
+            "cards":      len(self),
+            "multiplier": self.multiplier,
+            **self._metrics,
+        }
@@ -10,9 +10,69 @@ load_dotenv()
 BOT_TOKEN: str = os.getenv("BOT_TOKEN", "")
 OWNER_ID: int = int(os.getenv("OWNER_ID", "0"))
 DB_PATH: str = os.getenv("DB_PATH", "cardgame.db")
+# Append-only ledger and admin audit log live in their own files, ATTACHed
+# to every database connection.
+LEDGER_DB_PATH: str = os.getenv("LEDGER_DB_PATH", os.path.splitext(DB_PATH)[0] + "_ledger.db")
+AUDIT_DB_PATH: str = os.getenv("AUDIT_DB_PATH", os.path.splitext(DB_PATH)[0] + "_audit.db")
 BACKUP_DIR: str = os.getenv("BACKUP_DIR", "backups")
 LOG_LEVEL: str = os.getenv("LOG_LEVEL", "INFO")
 
+# ── Database Pool Settings ────────────────
+# Where SQLite keeps its files: "sqlite" (on disk, WAL) or "memory"
+# (throwaway, in RAM; for tests and benchmarks); see backends.py
+DB_BACKEND: str = os.getenv("DB_BACKEND", "sqlite")
+DB_POOL_READERS: int = int(os.getenv("DB_POOL_READERS", "4"))
+DB_POOL_TIMEOUT: float = float(os.getenv("DB_POOL_TIMEOUT", "10"))
+DB_BUSY_TIMEOUT_MS: int = int(os.getenv("DB_BUSY_TIMEOUT_MS", "5000"))
+DB_CACHE_SIZE_KB: int = int(os.getenv("DB_CACHE_SIZE_KB", "8192"))
+DB_MMAP_SIZE: int = int(os.getenv("DB_MMAP_SIZE", str(64 * 1024 * 1024)))
+DB_SYNCHRONOUS: str = os.getenv("DB_SYNCHRONOUS", "NORMAL")
+DB_TEMP_STORE: str = os.getenv("DB_TEMP_STORE", "DEFAULT")
+# Only takes effect for files created after it is set (see tools/tune_pragmas.py)
+DB_PAGE_SIZE: int = int(os.getenv("DB_PAGE_SIZE", "4096"))
+DB_WRITE_QUEUE_SIZE: int = int(os.getenv("DB_WRITE_QUEUE_SIZE", "1000"))
+DB_GROUP_COMMIT_MS: float = float(os.getenv("DB_GROUP_COMMIT_MS", "2"))
+DB_GROUP_COMMIT_MAX: int = int(os.getenv("DB_GROUP_COMMIT_MAX", "64"))
+USER_CACHE_SIZE: int = int(os.getenv("USER_CACHE_SIZE", "10000"))
+USER_CACHE_TTL: float = float(os.getenv("USER_CACHE_TTL", "300"))
+# Cached collection bitsets grow with the catalog (one bit per card), so
+# they are also capped by total size
+OWNED_CACHE_BYTES: int = int(os.getenv("OWNED_CACHE_BYTES", str(16 * 1024 * 1024)))
+CACHE_POLL_MS: float = float(os.getenv("CACHE_POLL_MS", "250"))
+CACHE_INVALIDATION_KEEP: int = int(os.getenv("CACHE_INVALIDATION_KEEP", "10000"))
+DB_ITER_CHUNK: int = int(os.getenv("DB_ITER_CHUNK", "500"))
+DB_ATTACHED_SYNCHRONOUS: str = os.getenv("DB_ATTACHED_SYNCHRONOUS", "NORMAL")
+DB_ATTACHED_JOURNAL_LIMIT: int = int(os.getenv("DB_ATTACHED_JOURNAL_LIMIT", str(4 * 1024 * 1024)))
+# Maintenance job (checkpoint, incremental vacuum, optimize): how often it
+# runs, how long a pool must go without writes before the WAL is truncated,
+# and how many free pages it hands back per file per run.
+DB_MAINT_INTERVAL_S: float = float(os.getenv("DB_MAINT_INTERVAL_S", "600"))
+DB_MAINT_QUIET_MS: float = float(os.getenv("DB_MAINT_QUIET_MS", "2000"))
+DB_MAINT_VACUUM_PAGES: int = int(os.getenv("DB_MAINT_VACUUM_PAGES", "2000"))
+# > 1 splits per-player tables across this many files by user_id, each with
+# its own writer; DB_PATH then holds the shared catalog.
+DB_SHARDS: int = int(os.getenv("DB_SHARDS", "1"))
+# Leaderboard counters (weekly coins) are added up in memory and written
+# every COUNTER_FLUSH_MS, or once COUNTER_FLUSH_MAX are waiting.
+COUNTER_FLUSH_MS: float = float(os.getenv("COUNTER_FLUSH_MS", "500"))
+COUNTER_FLUSH_MAX: int = int(os.getenv("COUNTER_FLUSH_MAX", "1000"))
+# Ledger rows are inserted in batches. "commit": with the group-commit
+# batch that earned them (callers return once they are durable). "async":
+# carried across batches and written every LEDGER_FLUSH_MS or once
+# LEDGER_BATCH_MAX are waiting; a crash can lose that window of rows.
+# Writers wait while LEDGER_BUFFER_MAX rows are unwritten.
+LEDGER_DURABILITY: str = os.getenv("LEDGER_DURABILITY", "commit")
+LEDGER_FLUSH_MS: float = float(os.getenv("LEDGER_FLUSH_MS", "250"))
+LEDGER_BATCH_MAX: int = int(os.getenv("LEDGER_BATCH_MAX", "500"))
+LEDGER_BUFFER_MAX: int = int(os.getenv("LEDGER_BUFFER_MAX", "5000"))
+# Peak-event mode: per-player counters are kept in memory, journaled to
+# HOT_STATE_JOURNAL.<n>.log and written to SQLite in the background.
+# Single bot process only.
+HOT_STATE: bool = os.getenv("HOT_STATE", "0") == "1"
+HOT_STATE_JOURNAL: str = os.getenv("HOT_STATE_JOURNAL", os.path.splitext(DB_PATH)[0] + "_journal")
+HOT_STATE_FSYNC_MS: float = float(os.getenv("HOT_STATE_FSYNC_MS", "5"))
+HOT_STATE_APPLY_MS: float = float(os.getenv("HOT_STATE_APPLY_MS", "1000"))
+
 # ── Economy Settings ──────────────────────
 STARTING_COINS: int = int(os.getenv("STARTING_COINS", "1000"))
 DAILY_BONUS_BASE: int = int(os.getenv("DAILY_BONUS_BASE", "200"))
@@ -35,12 +95,13 @@ WHEEL_PRIZES = [
 ]
 
 # ── Card Rarity Settings ─────────────────
+# drop_weight: relative odds of a random card being of that rarity
 RARITY_CONFIG = {
-    "Common":    {"emoji": "⚪", "catch_rate": 0.85, "color": "grey",   "xp_reward": 10},
-    "Uncommon":  {"emoji": "🟢", "catch_rate": 0.65, "color": "green",  "xp_reward": 20},
-    "Rare":      {"emoji": "🔵", "catch_rate": 0.40, "color": "blue",   "xp_reward": 40},
-    "Epic":      {"emoji": "🟣", "catch_rate": 0.20, "color": "purple", "xp_reward": 80},
-    "Legendary": {"emoji": "🟡", "catch_rate": 0.08, "color": "gold",   "xp_reward": 150},
+    "Common":    {"emoji": "⚪", "catch_rate": 0.85, "color": "grey",   "xp_reward": 10,  "drop_weight": 80},
+    "Uncommon":  {"emoji": "🟢", "catch_rate": 0.65, "color": "green",  "xp_reward": 20,  "drop_weight": 50},
+    "Rare":      {"emoji": "🔵", "catch_rate": 0.40, "color": "blue",   "xp_reward": 40,  "drop_weight": 25},
+    "Epic":      {"emoji": "🟣", "catch_rate": 0.20, "color": "purple", "xp_reward": 80,  "drop_weight": 10},
+    "Legendary": {"emoji": "🟡", "catch_rate": 0.08, "color": "gold",   "xp_reward": 150, "drop_weight": 3},
 }
 
 # ── Level System ─────────────────────────
@@ -0,0 +1,112 @@
+# ════════════════════════════════════════════
+# 🃏 Card Collection Bot — Write-Behind Counters
+# ════════════════════════════════════════════
+# Counters that only leaderboards read (today: weekly_board.weekly_coins)
+# don't need their own UPDATE inside every command's transaction. Their
+# increments are collected here as deltas per (table, key, column), and
+# `database` adds them to SQLite in one batched transaction per shard
+# every COUNTER_FLUSH_MS, as soon as COUNTER_FLUSH_MAX deltas are waiting,
+# and on shutdown. A busy player's hundred increments a minute become one
+# row write.
+#
+# Reads stay exact: a reader takes `lock` (held by a flush from taking the
+# batch until it has committed) and adds `pending()` to what SQLite
+# returned, so every delta is counted once — either in the row or here.
+#
+# Deltas are only added once the transaction that earned them has
+# committed. A crash loses at most one flush interval of counter updates;
+# balances and the ledger are not affected. Pending deltas belong to this
+# process, so another process sharing the database sees them only after
+# the flush.
+#
+# Other per-action counters deliberately stay out:
+#   * users.total_caught, slots_wins and jackpots ride in the one
+#     UPDATE users ... RETURNING a command's UnitOfWork flush makes anyway
+#     for coins and xp, so deferring them saves no write; and that flush's
+#     achievement checks and the cached users row need their exact value.
+#   * user_missions.progress is not a plain sum: it is capped at the
+#     mission's requirement, flips `completed` when it gets there and
+#     restarts when the period rolls over, so a delta can't be applied
+#     later without knowing which period earned it.
+# With HOT_STATE on, all of them live in memory (see hotstate.py).
+import asyncio
+from typing import Dict, Set, Tuple
+
+Row = Tuple[str, int]           # (table, row key)
+
+
+class Counters:
+    def __init__(self, max_pending: int):
+        self.max_pending = max(1, max_pending)
+        self._pending: Dict[Row, Dict[str, int]] = {}
+        self._size = 0                                  # (row, column) cells
+        self._metrics = {"deltas": 0, "flushes": 0, "cells_written": 0}
+        self.bind()
+
+    def bind(self):
+        """Fresh lock and event for the running event loop."""
+        self.lock = asyncio.Lock()
+        self._full = asyncio.Event()
+        if self._size >= self.max_pending:
+            self._full.set()
+
+    def add(self, table: str, key: int, column: str, delta: int):
+        if not delta:
+            return
+        cols = self._pending.setdefault((table, key), {})
+        if column not in cols:
+            cols[column] = 0
+            self._size += 1
+        cols[column] += delta
+        self._metrics["deltas"] += 1
+        if self._size >= self.max_pending:
+            self._full.set()
+
+    def pending(self, table: str, key: int) -> Dict[str, int]:
+        """{column: delta} not yet in SQLite for one row."""
+        return self._pending.get((table, key), {})
+
+    def keys(self, table: str) -> Set[int]:
+        """Rows of `table` with deltas not yet in SQLite."""
+        return {k for (t, k) in self._pending if t == table}
+
+    def take(self) -> Dict[Row, Dict[str, int]]:
+        """Everything pending, for a flush; call under `lock`."""
+        batch, self._pending, self._size = self._pending, {}, 0
+        self._full.clear()
+        return batch
+
+    def requeue(self, batch: Dict[Row, Dict[str, int]]):
+        """Put back (part of) a batch whose flush failed."""
+        for (table, key), cols in batch.items():
+            for column, delta in cols.items():
+                self.add(table, key, column, delta)
+                self._metrics["deltas"] -= 1
+
+    def drop(self, table: str):
+        """Forget every pending delta for `table`; call under `lock`."""
+        for row in [r for r in self._pending if r[0] == table]:
+            self._size -= len(self._pending.pop(row))
+
+    def flushed(self, cells: int):
+        self._metrics["flushes"] += 1
+        self._metrics["cells_written"] += cells
+
+    async def wait_full(self, timeout: float) -> bool:
+        """Wait up to `timeout` seconds for `max_pending` cells to be waiting."""
+        try:
+            await asyncio.wait_for(self._full.wait(), timeout)
+            return True
+        except asyncio.TimeoutError:
+            return False
+
+    def stats(self) -> Dict:
+        m = self._metrics
+        return {
+            "pending":       self._size,
+            "deltas":        m["deltas"],
+            "flushes":       m["flushes"],
+            "cells_written": m["cells_written"],
+            # increments folded into each cell written
+            "coalesce":      (m["deltas"] / m["cells_written"]) if m["cells_written"] else 0.0,
+        }
@@ -5,21 +5,723 @@ import aiosqlite
 import asyncio
 import json
 import logging
+import os
+import re
+import sys
+import time
+import uuid
+from collections import OrderedDict
+from contextlib import asynccontextmanager
+from contextvars import ContextVar
 from datetime import datetime, date
-from typing import Optional, List, Dict, Any
-from config import DB_PATH, STARTING_COINS
+from typing import Optional, List, Dict, Any, AsyncIterator, Callable, Sequence, Set, Tuple
+from config import (
+    DB_PATH, STARTING_COINS, LEVEL_XP_REQUIREMENTS, RARITY_CONFIG,
+    DB_POOL_READERS, DB_POOL_TIMEOUT,
+    DB_WRITE_QUEUE_SIZE, DB_GROUP_COMMIT_MS, DB_GROUP_COMMIT_MAX,
+    USER_CACHE_SIZE, USER_CACHE_TTL, OWNED_CACHE_BYTES, CACHE_POLL_MS, CACHE_INVALIDATION_KEEP,
+    DB_ITER_CHUNK, LEDGER_DB_PATH, AUDIT_DB_PATH,
+    DB_SHARDS, DB_BACKEND, DB_MAINT_QUIET_MS, DB_MAINT_VACUUM_PAGES,
+    COUNTER_FLUSH_MS, COUNTER_FLUSH_MAX,
+    LEDGER_DURABILITY, LEDGER_FLUSH_MS, LEDGER_BATCH_MAX, LEDGER_BUFFER_MAX,
+    HOT_STATE, HOT_STATE_JOURNAL, HOT_STATE_FSYNC_MS, HOT_STATE_APPLY_MS,
+)
+from backends import Backend, make_backend
+from catalog import Catalog, NameIndex
+from counters import Counters
+from hotstate import HotState, Journal, HOT_FIELDS
+from migrations import run_migrations, current_version, NOW_EPOCH
+from models import User, Card, UserCard, Mission, Transaction
+from utils import now_ts, utc_day_start
 
 log = logging.getLogger(__name__)
 
+# ─────────────────────────────────────────────
+# CONNECTION POOL
+# ─────────────────────────────────────────────
+# The append-only tables live in their own files, ATTACHed under these
+# schema names: `ledger.transactions` and `audit.audit_log`. Each file has
+# its own WAL, so ledger appends never grow or checkpoint the main file,
+# a write touching only the ledger takes no lock on main; backups copy
+# them alongside main (see backup_to). A transaction writing main and the ledger commits each
+# file atomically, but (in WAL mode) not both as one unit: a crash in the
+# commit can keep a balance change and lose its ledger row. With
+# LEDGER_DURABILITY=async that window grows to LEDGER_FLUSH_MS.
+ATTACHED: Dict[str, str] = {"ledger": LEDGER_DB_PATH, "audit": AUDIT_DB_PATH}
+
+# Where the databases live (see backends.py); shared by every pool.
+backend: Backend = make_backend(DB_BACKEND)
+
+
+# Callbacks registered with `on_commit` by the writer block running in
+# this task.
+_commit_hooks: ContextVar[Optional[List[Callable[[], None]]]] = ContextVar("_commit_hooks", default=None)
+
+
+def on_commit(fn: Callable[[], None]):
+    """Run `fn` once the enclosing `writer()` block has committed, and never
+    if it rolls back. Outside a writer block it runs at once."""
+    hooks = _commit_hooks.get()
+    if hooks is None:
+        fn()
+    else:
+        hooks.append(fn)
+
+
+# Pools whose writer block this task is inside (see `writer`).
+_writing: ContextVar[Tuple["ConnectionPool", ...]] = ContextVar("_writing", default=())
+
+
+# INSERTs queued with `append` by the writer block running in this task.
+_block_appends: ContextVar[Optional[List[Tuple[str, tuple]]]] = ContextVar("_block_appends", default=None)
+
+
+def append(sql: str, params: tuple):
+    """Queue an append-only INSERT from inside a `writer()` block. The
+    pool writes queued rows with one `executemany` per statement when the
+    block's batch commits (or later, see LEDGER_DURABILITY); they are
+    dropped if the block rolls back."""
+    rows = _block_appends.get()
+    if rows is None:
+        raise RuntimeError("append() outside a writer() block")
+    rows.append((sql, params))
+
+
+# Returned by `ConnectionPool._next_job` when buffered appends are due.
+_FLUSH = object()
+
+
+class _WriteJob:
+    """One caller's turn on the writer connection."""
+    __slots__ = ("standalone", "granted", "released", "durable")
+
+    def __init__(self, standalone: bool = False):
+        loop = asyncio.get_running_loop()
+        self.standalone = standalone
+        self.granted  = loop.create_future()   # -> connection, set by writer task
+        self.released = loop.create_future()   # -> True (ok) / False (error), set by caller
+        self.durable  = loop.create_future()   # -> None once committed
+
+
+class ConnectionPool:
+    """Process-wide SQLite pool: one writer connection plus N read-only
+    reader connections sharing the same WAL file. Connections come from
+    the configured `backend`.
+
+    Connections are opened lazily on first checkout and kept for the life
+    of the process, so per-connection PRAGMAs are applied exactly once.
+
+    All mutations go through a single writer task fed by a bounded queue.
+    Jobs that arrive within DB_GROUP_COMMIT_MS of each other share one
+    BEGIN IMMEDIATE transaction (each inside its own SAVEPOINT, so one
+    failing job does not undo the others); every caller is released only
+    after that transaction commits.
+
+    Rows queued with `append` are buffered on the pool and inserted in
+    bulk: inside the batch that produced them, or, with
+    `durable_appends=False`, in a transaction of their own once
+    LEDGER_FLUSH_MS has passed or LEDGER_BATCH_MAX rows are waiting.
+    """
+
+    def __init__(self, path: str, readers: int = DB_POOL_READERS,
+                 timeout: float = DB_POOL_TIMEOUT,
+                 attached: Optional[Dict[str, str]] = None,
+                 durable_appends: bool = LEDGER_DURABILITY != "async"):
+        self.path     = path
+        self.attached = ATTACHED if attached is None else attached
+        self.size     = max(1, readers)
+        self.timeout  = timeout
+        self._writer: Optional[aiosqlite.Connection] = None
+        self._readers: List[aiosqlite.Connection] = []
+        self._idle: Optional[asyncio.Queue] = None
+        self._jobs: Optional[asyncio.Queue] = None
+        self._writer_task: Optional[asyncio.Task] = None
+        self._inode: Optional[int] = None
+        self._last_write = time.monotonic()
+        self._open_lock  = asyncio.Lock()
+        self.durable_appends = durable_appends
+        self._appends: List[Tuple[str, tuple]] = []
+        self._appends_since = 0.0          # monotonic time the oldest was queued
+        self._flush_appends_now = False
+        self._metrics = {
+            "connects":        0,
+            "read_checkouts":  0,
+            "write_checkouts": 0,
+            "timeouts":        0,
+            "wait_ms_total":   0.0,
+            "wait_ms_max":     0.0,
+            "queue_max":       0,
+            "batches":         0,
+            "batched_jobs":    0,
+            "batch_max":       0,
+            "commit_ms_total": 0.0,
+            "commit_ms_max":   0.0,
+            "last_batch":      0,
+            "appends":         0,
+            "append_flushes":  0,
+            "append_waits":    0,
+        }
+
+    @property
+    def is_open(self) -> bool:
+        return self._writer is not None
+
+    async def _connect(self, read_only: bool = False) -> aiosqlite.Connection:
+        conn = await backend.connect(self.path, self.attached, read_only)
+        self._metrics["connects"] += 1
+        return conn
+
+    async def open(self):
+        if self.is_open:
+            return
+        async with self._open_lock:
+            if self.is_open:
+                return
+            writer = await self._connect()
+            self._inode = backend.identity(self.path)
+            self._idle = asyncio.Queue()
+            for _ in range(self.size):
+                conn = await self._connect(read_only=True)
+                self._readers.append(conn)
+                self._idle.put_nowait(conn)
+            self._jobs   = asyncio.Queue(maxsize=DB_WRITE_QUEUE_SIZE)
+            self._writer = writer
+            self._writer_task = asyncio.create_task(self._write_loop())
+            log.info(f"🗄️ DB pool open: 1 writer + {self.size} readers on {self.path}")
+
+    async def close(self):
+        async with self._open_lock:
+            if self._writer_task is not None:
+                await self._jobs.put(None)
+                await self._writer_task
+            for conn in self._readers:
+                await conn.close()
+            if self._writer is not None:
+                await self._writer.close()
+            self._readers = []
+            self._idle    = None
+            self._jobs    = None
+            self._writer  = None
+            self._writer_task = None
+
+    def replaced(self) -> bool:
+        """True if the file at `path` is no longer the one we have open
+        (e.g. another process restored a backup over it)."""
+        if self._inode is None:
+            return False
+        return backend.identity(self.path) != self._inode
+
+    def idle_for(self) -> float:
+        """Seconds since the last write checkout (0 while writes are queued)."""
+        if self._jobs is not None and not self._jobs.empty():
+            return 0.0
+        return time.monotonic() - self._last_write
+
+    def files(self) -> List[str]:
+        """The main file and every ATTACHed file this pool writes to."""
+        return [self.path, *self.attached.values()]
+
+    def _record_wait(self, started: float):
+        waited = (time.perf_counter() - started) * 1000
+        self._metrics["wait_ms_total"] += waited
+        if waited > self._metrics["wait_ms_max"]:
+            self._metrics["wait_ms_max"] = waited
+
+    # ── writer task ───────────────────────────
+    async def _run_job(self, job: _WriteJob, in_batch: bool) -> bool:
+        """Hand the connection to one job and wait for it to finish.
+        Returns False if the caller gave up before being granted."""
+        if job.granted.done():           # caller timed out / was cancelled
+            return False
+        conn = self._writer
+        if in_batch:
+            await conn.execute("SAVEPOINT job")
+        job.granted.set_result(conn)
+        ok = await job.released
+        if in_batch:
+            if not ok:
+                await conn.execute("ROLLBACK TO SAVEPOINT job")
+            await conn.execute("RELEASE SAVEPOINT job")
+        return True
+
+    async def _run_standalone(self, job: _WriteJob):
+        """DDL, VACUUM, backups: run outside any batch transaction."""
+        conn = self._writer
+        try:
+            if not await self._run_job(job, in_batch=False):
+                return
+            ok = job.released.result()
+            if ok and self.durable_appends and self._appends:
+                await self._write_appends(conn, self._take_appends())
+            if conn.in_transaction:
+                await (conn.commit() if ok else conn.rollback())
+            job.durable.set_result(None)
+        except Exception as e:
+            if conn.in_transaction:
+                await conn.rollback()
+            if not job.durable.done():
+                job.durable.set_exception(e)
+
+    # ── batched appends ───────────────────────
+    def _queue_appends(self, rows: List[Tuple[str, tuple]]):
+        if not self._appends:
+            self._appends_since = time.monotonic()
+        self._appends.extend(rows)
+        self._metrics["appends"] += len(rows)
+
+    def _take_appends(self) -> List[Tuple[str, tuple]]:
+        rows, self._appends = self._appends, []
+        self._flush_appends_now = False
+        return rows
+
+    def _appends_due(self) -> bool:
+        """Whether buffered rows should get their own transaction now."""
+        if not self._appends or self.durable_appends:
+            return False
+        return (self._flush_appends_now
+                or len(self._appends) >= LEDGER_BATCH_MAX
+                or time.monotonic() - self._appends_since >= LEDGER_FLUSH_MS / 1000)
+
+    async def _write_appends(self, conn: aiosqlite.Connection, rows: List[Tuple[str, tuple]]):
+        by_sql: Dict[str, List[tuple]] = {}
+        for sql, params in rows:
+            by_sql.setdefault(sql, []).append(params)
+        for sql, params in by_sql.items():
+            await conn.executemany(sql, params)
+        self._metrics["append_flushes"] += 1
+
+    async def _flush_appends(self):
+        """Write every buffered row in a transaction of its own. On failure
+        the rows stay buffered (their jobs have committed) for the next try."""
+        conn = self._writer
+        rows = self._take_appends()
+        try:
+            await conn.execute("BEGIN IMMEDIATE")
+            await self._write_appends(conn, rows)
+            await conn.commit()
+        except Exception as e:
+            log.error(f"Append flush failed ({len(rows)} rows), will retry: {e}")
+            if conn.in_transaction:
+                await conn.rollback()
+            self._appends[:0] = rows
+            self._appends_since = time.monotonic()
+
+    async def _next_job(self):
+        """The next queued job, or `_FLUSH` when buffered appends fall due
+        while the queue is idle."""
+        if self._appends and not self.durable_appends:
+            wait = self._appends_since + LEDGER_FLUSH_MS / 1000 - time.monotonic()
+            try:
+                return await asyncio.wait_for(self._jobs.get(), max(0.0, wait))
+            except asyncio.TimeoutError:
+                return _FLUSH
+        return await self._jobs.get()
+
+    async def _write_loop(self):
+        conn   = self._writer
+        loop   = asyncio.get_running_loop()
+        window = DB_GROUP_COMMIT_MS / 1000
+        stop   = False
+        while not stop:
+            job = await self._next_job()
+            if self._appends_due():
+                await self._flush_appends()
+            if job is _FLUSH:
+                continue
+            if job is None:
+                break
+            if job.standalone:
+                await self._run_standalone(job)
+                continue
+
+            batch: List[_WriteJob] = []
+            deferred: Optional[_WriteJob] = None
+            try:
+                await conn.execute("BEGIN IMMEDIATE")
+                batch.append(job)
+                if not await self._run_job(job, in_batch=True):
+                    batch.pop()
+                deadline = loop.time() + window
+                while len(batch) < DB_GROUP_COMMIT_MAX:
+                    try:
+                        remaining = deadline - loop.time()
+                        if self._jobs.empty() and remaining > 0:
+                            nxt = await asyncio.wait_for(self._jobs.get(), remaining)
+                        else:
+                            nxt = self._jobs.get_nowait()
+                    except (asyncio.TimeoutError, asyncio.QueueEmpty):
+                        break
+                    if nxt is None:
+                        stop = True
+                        break
+                    if nxt.standalone:
+                        deferred = nxt
+                        break
+                    batch.append(nxt)
+                    if not await self._run_job(nxt, in_batch=True):
+                        batch.pop()
+                if self.durable_appends and self._appends:
+                    await self._write_appends(conn, self._take_appends())
+                started = time.perf_counter()
+                await conn.commit()
+                self._record_batch(len(batch), started)
+                if self._appends_due():
+                    await self._flush_appends()
+                for j in batch:
+                    if not j.durable.done():
+                        j.durable.set_result(None)
+            except Exception as e:
+                log.error(f"Group commit failed ({len(batch)} jobs): {e}")
+                if conn.in_transaction:
+                    await conn.rollback()
+                if self.durable_appends:
+                    self._take_appends()           # rows of the failed jobs
+                for j in batch:
+                    if not j.released.done():
+                        j.released.cancel()
+                    if not j.durable.done():
+                        j.durable.set_exception(e)
+            if deferred is not None:
+                await self._run_standalone(deferred)
+        if self._appends:
+            await self._flush_appends()
+
+    def _record_batch(self, size: int, started: float):
+        took = (time.perf_counter() - started) * 1000
+        m = self._metrics
+        m["batches"]         += 1
+        m["batched_jobs"]    += size
+        m["last_batch"]       = size
+        m["batch_max"]        = max(m["batch_max"], size)
+        m["commit_ms_total"] += took
+        m["commit_ms_max"]    = max(m["commit_ms_max"], took)
+
+    # ── checkouts ─────────────────────────────
+    @asynccontextmanager
+    async def reader(self):
+        """Check out an idle reader connection."""
+        await self.open()
+        started = time.perf_counter()
+        try:
+            conn = await asyncio.wait_for(self._idle.get(), self.timeout)
+        except asyncio.TimeoutError:
+            self._metrics["timeouts"] += 1
+            raise
+        self._record_wait(started)
+        self._metrics["read_checkouts"] += 1
+        try:
+            yield conn
+        finally:
+            self._idle.put_nowait(conn)
+
+    @asynccontextmanager
+    async def writer(self, standalone: bool = False):
+        """Queue for the writer connection. Returns once the block's writes
+        are committed; an exception inside the block rolls back only this
+        block, and drops whatever it passed to `on_commit`.
+
+        `standalone=True` runs outside a batch transaction (needed for
+        executescript, VACUUM, checkpoints and backups).
+
+        Blocks don't nest: the writer task is busy running the outer block
+        until it is released, so a second `writer()` on the same pool from
+        inside it would wait forever. That raises RuntimeError instead.
+        Writer blocks on different pools may nest."""
+        if self in _writing.get():
+            raise RuntimeError(f"writer() on {self.path} inside its own writer() block")
+        await self.open()
+        job = _WriteJob(standalone)
+        started = time.perf_counter()
+        try:
+            await asyncio.wait_for(self._jobs.put(job), self.timeout)
+            depth = self._jobs.qsize()
+            if depth > self._metrics["queue_max"]:
+                self._metrics["queue_max"] = depth
+            conn = await asyncio.wait_for(job.granted, self.timeout)
+        except asyncio.TimeoutError:
+            self._metrics["timeouts"] += 1
+            raise
+        self._record_wait(started)
+        self._metrics["write_checkouts"] += 1
+        self._last_write = time.monotonic()
+        hooks: List[Callable[[], None]] = []
+        rows: List[Tuple[str, tuple]] = []
+        token = _commit_hooks.set(hooks)
+        rows_token = _block_appends.set(rows)
+        writing_token = _writing.set(_writing.get() + (self,))
+        try:
+            yield conn
+        except BaseException:
+            if not job.released.done():
+                job.released.set_result(False)
+            raise
+        finally:
+            _commit_hooks.reset(token)
+            _block_appends.reset(rows_token)
+            _writing.reset(writing_token)
+        if not job.released.done():
+            if rows:
+                self._queue_appends(rows)
+            job.released.set_result(True)
+        await job.durable
+        for fn in hooks:
+            fn()
+        if rows and len(self._appends) >= LEDGER_BUFFER_MAX:
+            # back-pressure: whoever fills the buffer waits for it to drain
+            self._metrics["append_waits"] += 1
+            await self.flush_appends()
+
+    async def flush_appends(self):
+        """Returns once every row appended so far is committed."""
+        if not self.is_open or not self._appends:
+            return
+        self._flush_appends_now = True
+        async with self.writer():
+            pass
+
+    def stats(self) -> Dict:
+        m = self._metrics
+        checkouts = m["read_checkouts"] + m["write_checkouts"]
+        return {
+            "readers":         self.size,
+            "readers_idle":    self._idle.qsize() if self._idle else 0,
+            "queue_depth":     self._jobs.qsize() if self._jobs else 0,
+            "queue_max":       m["queue_max"],
+            "connects":        m["connects"],
+            "read_checkouts":  m["read_checkouts"],
+            "write_checkouts": m["write_checkouts"],
+            "timeouts":        m["timeouts"],
+            "wait_ms_avg":     (m["wait_ms_total"] / checkouts) if checkouts else 0.0,
+            "wait_ms_max":     m["wait_ms_max"],
+            "batches":         m["batches"],
+            "batch_avg":       (m["batched_jobs"] / m["batches"]) if m["batches"] else 0.0,
+            "batch_max":       m["batch_max"],
+            "last_batch":      m["last_batch"],
+            "commit_ms_avg":   (m["commit_ms_total"] / m["batches"]) if m["batches"] else 0.0,
+            "commit_ms_max":   m["commit_ms_max"],
+            "appends":         m["appends"],
+            "appends_pending": len(self._appends),
+            "append_flushes":  m["append_flushes"],
+            "append_waits":    m["append_waits"],
+        }
+
+
+_pool = ConnectionPool(DB_PATH)
+
+# ─────────────────────────────────────────────
+# SHARDS
+# ─────────────────────────────────────────────
+# With DB_SHARDS > 1 the per-player tables (users, user_cards,
+# user_inventory, user_missions, friends, weekly_board, earned achievements
+# and titles, and the ledger) are split across that many files by a hash of
+# user_id. Each shard has its own pool and writer task, so writes for
+# players on different shards commit in parallel. DB_PATH keeps the catalog
+# (cards, shop, missions, achievement/title definitions, admin tables) and
+# is the only place it is edited. Each shard holds a read-only mirror of the
+# catalog tables its queries join against, refreshed after every catalog
+# write, so collection and mission queries stay single-file joins. Every
+# file has the full schema and runs the same migrations. With DB_SHARDS = 1
+# the single shard is `_pool` itself.
+_CATALOG_MIRRORED = ("cards", "shop_items", "missions", "achievements", "titles")
+
+# The /cards browser only reads the catalog: migration 11 lays its search
+# index and facet counts (and the triggers that keep them) on every file,
+# and init_db drops the shards' copies so mirroring cards doesn't pay for
+# them.
+_CATALOG_ONLY = (
+    "DROP TRIGGER IF EXISTS cards_browser_ai",
+    "DROP TRIGGER IF EXISTS cards_browser_ad",
+    "DROP TRIGGER IF EXISTS cards_browser_au",
+    "DROP TABLE IF EXISTS cards_fts",
+    "DROP TABLE IF EXISTS card_facets",
+)
+
+
+def _shard_path(i: int, suffix: str = "") -> str:
+    return f"{os.path.splitext(DB_PATH)[0]}.shard{i}{suffix}.db"
+
+
+_shards: List[ConnectionPool] = (
+    [_pool] if DB_SHARDS <= 1 else [
+        ConnectionPool(_shard_path(i), attached={"ledger": _shard_path(i, "_ledger"),
+                                                 "audit": AUDIT_DB_PATH})
+        for i in range(DB_SHARDS)
+    ]
+)
+
+
+def _sharded() -> bool:
+    return len(_shards) > 1
+
+
+def _shard_index(user_id: int) -> int:
+    # Fibonacci hashing, reduced to [0, shards) by the high bits of a
+    # multiply: sequential or patterned ids still spread evenly
+    h = (user_id * 0x9E3779B97F4A7C15) & 0xFFFFFFFFFFFFFFFF
+    return (h * len(_shards)) >> 64
+
+
+def _shard(user_id: int) -> ConnectionPool:
+    return _shards[_shard_index(user_id)]
+
+
+def _all_pools() -> List[ConnectionPool]:
+    """Every pool; the catalog comes last."""
+    return _shards + [_pool] if _sharded() else [_pool]
+
+
+async def _gather_shards(sql: str, params: Sequence = ()) -> List[aiosqlite.Row]:
+    """Run one read on every shard concurrently and concatenate the rows."""
+    async def one(pool: ConnectionPool):
+        async with pool.reader() as db:
+            async with db.execute(sql, params) as cur:
+                return await cur.fetchall()
+    return [r for rows in await asyncio.gather(*(one(p) for p in _shards)) for r in rows]
+
+
+async def _mirror_catalog(table: str, ids: Optional[Sequence[int]] = None):
+    """Copy `table`'s catalog rows (all of them, or just `ids`) into every
+    shard's mirror. Mirror rows whose id is gone from the catalog are
+    deleted, so callers remove dependent rows first."""
+    if not _sharded():
+        return
+    where, params = " WHERE 1", ()
+    if ids is not None:
+        where, params = " WHERE id IN (SELECT value FROM json_each(?))", (json.dumps(list(ids)),)
+    async with _pool.reader() as db:
+        async with db.execute(f"SELECT * FROM {table}{where}", params) as cur:
+            rows = await cur.fetchall()
+    keep = json.dumps([r["id"] for r in rows])
+    for shard in _shards:
+        async with shard.writer() as db:
+            if rows:
+                cols = list(rows[0].keys())
+                await db.executemany(
+                    f"INSERT INTO {table} ({', '.join(cols)}) VALUES ({', '.join('?' * len(cols))}) "
+                    f"ON CONFLICT(id) DO UPDATE SET "
+                    + ", ".join(f"{c}=excluded.{c}" for c in cols if c != "id"),
+                    [tuple(r) for r in rows]
+                )
+            await db.execute(
+                f"DELETE FROM {table}{where} AND id NOT IN (SELECT value FROM json_each(?))",
+                (*params, keep)
+            )
+
+
+async def close_db():
+    """Close all pooled connections (reopened lazily on next use). Hot
+    state and pending counters are written to SQLite first and their
+    background tasks stop until next needed."""
+    await _hot_flush()
+    await _counter_flush()
+    if _counter_task["task"] is not None:
+        _counter_task["task"].cancel()
+        _counter_task["task"] = None
+    _counters.bind()
+    if _hot is not None:
+        if _hot_task["task"] is not None:
+            _hot_task["task"].cancel()
+            _hot_task["task"] = _hot_task["lock"] = None
+        await _hot.journal.close()
+    for pool in _all_pools():
+        await pool.close()
+    _users.clear()
+    _owned.clear()
+    _catalog.invalidate()
+    _definitions.clear()
+    _sync_state["pools"].clear()
+
+
+def get_pool_stats() -> Dict:
+    return _pool.stats()
+
+
+def get_ledger_stats() -> Dict:
+    """Batched ledger inserts, summed over every pool."""
+    pools = [p.stats() for p in _all_pools()]
+    rows    = sum(p["appends"] for p in pools)
+    flushes = sum(p["append_flushes"] for p in pools)
+    return {
+        "durability": LEDGER_DURABILITY,
+        "rows":       rows,
+        "pending":    sum(p["appends_pending"] for p in pools),
+        "flushes":    flushes,
+        "waits":      sum(p["append_waits"] for p in pools),
+        "batch_avg":  (rows / flushes) if flushes else 0.0,
+    }
+
+
+def get_shard_stats() -> List[Dict]:
+    """Pool stats per shard (empty when not sharded)."""
+    return [s.stats() for s in _shards] if _sharded() else []
+
+
+def backup_paths(dst_path: str) -> Dict[str, str]:
+    """{schema: file} that `backup_to(dst_path)` writes for the main
+    database: `dst_path` itself for "main", `<dst>_<schema>.db` beside it
+    for each ATTACHed file (as DB_PATH's own are named)."""
+    base = os.path.splitext(dst_path)[0]
+    return {"main": dst_path, **{schema: f"{base}_{schema}.db" for schema in _pool.attached}}
+
+
+async def backup_to(dst_path: str) -> List[str]:
+    """Consistent online copy of the main database (includes un-checkpointed
+    WAL) and its ATTACHed ledger and audit files, named as `backup_paths`
+    says. When sharded, each shard and its ledger are copied alongside as
+    `<dst>.shard<i>.db` and `<dst>.shard<i>_ledger.db`. Each pool's files
+    are copied inside one writer block, so they agree with each other.
+    Returns the files written, `dst_path` first."""
+    await _hot_flush()
+    await _counter_flush()
+    written = []
+    targets = [(_pool, backup_paths(dst_path))]
+    if _sharded():
+        base = os.path.splitext(dst_path)[0]
+        targets += [(s, {"main": f"{base}.shard{i}.db", "ledger": f"{base}.shard{i}_ledger.db"})
+                    for i, s in enumerate(_shards)]
+    for pool, paths in targets:
+        async with pool.writer(standalone=True) as db:
+            for schema, path in paths.items():
+                async with aiosqlite.connect(path) as dst:
+                    await db.backup(dst, name=schema)
+                written.append(path)
+    return written
+
+
+async def log_backup(filename: str, size_bytes: int):
+    async with _pool.writer() as db:
+        await db.execute(
+            "INSERT INTO backups (filename, size_bytes) VALUES (?,?)",
+            (filename, size_bytes)
+        )
+
 # ─────────────────────────────────────────────
 # INIT
 # ─────────────────────────────────────────────
 async def init_db():
-    async with aiosqlite.connect(DB_PATH) as db:
+    # The version-0 schema is only laid down on a file that has never been
+    # migrated; later versions have moved or reshaped some of its tables.
+    for pool in _all_pools():
+        if await current_version(pool) == 0:
+            await _create_base_schema(pool)
+        version = await run_migrations(pool)
+    if _sharded():
+        for shard in _shards:
+            async with shard.writer() as db:
+                for sql in _CATALOG_ONLY:
+                    await db.execute(sql)
+        for table in _CATALOG_MIRRORED:
+            await _mirror_catalog(table)
+        await _recover_cross_shard()
+        log.info(f"🧩 {len(_shards)} shards")
+    if _hot is not None:
+        await _hot_recover()
+        log.info("🔥 Hot state on: player counters live in memory")
+    log.info(f"✅ Database initialized (schema v{version})")
+
+async def _create_base_schema(pool: ConnectionPool):
+    async with pool.writer(standalone=True) as db:
         await db.executescript("""
-        PRAGMA journal_mode=WAL;
-        PRAGMA foreign_keys=ON;
-
         CREATE TABLE IF NOT EXISTS users (
             user_id     INTEGER PRIMARY KEY,
             username    TEXT,
@@ -199,88 +901,683 @@ async def init_db():
         INSERT OR IGNORE INTO drop_settings (base_rate, current_rate, set_by, note)
         VALUES (1.0, 1.0, 0, 'default');
         """)
-        await db.commit()
-    log.info("✅ Database initialized")
+
+async def get_schema_version() -> int:
+    return await current_version(_pool)
 
 # ─────────────────────────────────────────────
-# USER OPERATIONS
+# USER CACHE
 # ─────────────────────────────────────────────
-async def get_or_create_user(user_id: int, username: str = "", first_name: str = "") -> Dict:
-    async with aiosqlite.connect(DB_PATH) as db:
-        db.row_factory = aiosqlite.Row
-        async with db.execute("SELECT * FROM users WHERE user_id=?", (user_id,)) as cur:
-            row = await cur.fetchone()
-        if not row:
+class UserCache:
+    """In-process LRU of `users` rows, bounded by USER_CACHE_SIZE entries and
+    USER_CACHE_TTL seconds.
+
+    Kept current by write-through: every function here that changes a users
+    row gets the new row back via RETURNING and `put`s it once the write has
+    committed. Rows read from SQLite are only `fill`ed if no write-through
+    happened while the read was in flight, so a slow read can never
+    overwrite a newer row. Cached `User` objects are handed out shared
+    (no per-hit copy), so callers must not modify them in place.
+    """
+
+    def __init__(self, capacity: int = USER_CACHE_SIZE, ttl: float = USER_CACHE_TTL):
+        self.capacity = max(0, capacity)
+        self.ttl      = ttl
+        self._rows: "OrderedDict[int, tuple]" = OrderedDict()   # user_id -> (expires, User)
+        self._writes  = 0
+        self._metrics = {"hits": 0, "misses": 0, "expired": 0, "evictions": 0, "writes": 0}
+
+    def get(self, user_id: int) -> Optional[User]:
+        entry = self._rows.get(user_id)
+        if entry is None:
+            self._metrics["misses"] += 1
+            return None
+        if entry[0] < time.monotonic():
+            del self._rows[user_id]
+            self._metrics["expired"] += 1
+            self._metrics["misses"] += 1
+            return None
+        self._rows.move_to_end(user_id)
+        self._metrics["hits"] += 1
+        return entry[1]
+
+    def token(self) -> int:
+        """Snapshot to pass to `fill` after a read."""
+        return self._writes
+
+    # fill/put return the row callers should use from then on (see HotState)
+    def fill(self, row: Optional[User], token: int) -> Optional[User]:
+        if row is not None and token == self._writes:
+            self._store(row)
+        return row
+
+    def put(self, row: Optional[User]) -> Optional[User]:
+        if row is None:
+            return None
+        self._writes += 1
+        self._metrics["writes"] += 1
+        self._store(row)
+        return row
+
+    def invalidate(self, user_id: int):
+        self._writes += 1
+        self._rows.pop(user_id, None)
+
+    def clear(self):
+        self._writes += 1
+        self._rows.clear()
+
+    def _store(self, row: User):
+        if not self.capacity:
+            return
+        user_id = row.user_id
+        self._rows[user_id] = (time.monotonic() + self.ttl, row)
+        self._rows.move_to_end(user_id)
+        while len(self._rows) > self.capacity:
+            self._rows.popitem(last=False)
+            self._metrics["evictions"] += 1
+
+    def stats(self) -> Dict:
+        m = self._metrics
+        lookups = m["hits"] + m["misses"]
+        return {
+            "size":      len(self._rows),
+            "capacity":  self.capacity,
+            "ttl":       self.ttl,
+            "hit_rate":  (m["hits"] / lookups) if lookups else 0.0,
+            **m,
+        }
+
+
+# With HOT_STATE on, the hot-state engine is the user cache (see HOT STATE).
+_hot: Optional[HotState] = (
+    HotState(Journal(HOT_STATE_JOURNAL, HOT_STATE_FSYNC_MS),
+             lambda level, xp: _level_up(level, xp))
+    if HOT_STATE else None
+)
+_users = _hot if _hot is not None else UserCache()
+
+
+def get_user_cache_stats() -> Dict:
+    return {**_users.stats(), **_sync_stats, "owned": _owned.stats()}
+
+
+class OwnedCache:
+    """In-process LRU of each player's collection as a card set (see
+    Catalog.bitset), sized and aged like the user cache and also bounded by
+    OWNED_CACHE_BYTES: a set costs up to catalog size / 8 bytes however
+    few cards it holds, so the byte budget is what limits it on a large
+    catalog. Emptied whenever the catalog reassigns slots.
+
+    Filled from `user_cards` on a miss; catches set bits in the cached
+    entry once they have committed. As in UserCache, a rebuild is only
+    stored if no catch or invalidation happened while it was read.
+    """
+
+    def __init__(self, capacity: int = USER_CACHE_SIZE, ttl: float = USER_CACHE_TTL,
+                 max_bytes: int = OWNED_CACHE_BYTES):
+        self.capacity  = max(0, capacity)
+        self.ttl       = ttl
+        self.max_bytes = max(0, max_bytes)
+        self._bits: "OrderedDict[int, tuple]" = OrderedDict()   # user_id -> (expires, int)
+        self._bytes    = 0
+        self._writes   = 0
+        self._metrics  = {"hits": 0, "misses": 0, "rebuilds": 0, "evictions": 0}
+
+    def get(self, user_id: int) -> Optional[int]:
+        entry = self._bits.get(user_id)
+        if entry is None or entry[0] < time.monotonic():
+            self._drop(user_id)
+            self._metrics["misses"] += 1
+            return None
+        self._bits.move_to_end(user_id)
+        self._metrics["hits"] += 1
+        return entry[1]
+
+    def token(self) -> int:
+        return self._writes
+
+    def fill(self, user_id: int, bits: int, token: int):
+        self._metrics["rebuilds"] += 1
+        if token != self._writes or not self.capacity:
+            return
+        self._store(user_id, time.monotonic() + self.ttl, bits)
+
+    def add(self, user_id: int, card_ids: Sequence[int]):
+        """Cards `user_id` has just (committed) catches of."""
+        self._writes += 1
+        entry = self._bits.get(user_id)
+        if entry is not None:
+            self._store(user_id, entry[0], entry[1] | _catalog.bitset(card_ids))
+
+    def invalidate(self, user_id: int):
+        self._writes += 1
+        self._drop(user_id)
+
+    def clear(self):
+        self._writes += 1
+        self._bits.clear()
+        self._bytes = 0
+
+    def stats(self) -> Dict:
+        return {"size": len(self._bits), "bytes": self._bytes, "max_bytes": self.max_bytes,
+                **self._metrics}
+
+    def _store(self, user_id: int, expires: float, bits: int):
+        self._drop(user_id)
+        self._bits[user_id] = (expires, bits)
+        self._bytes += sys.getsizeof(bits)
+        while self._bits and (len(self._bits) > self.capacity or self._bytes > self.max_bytes):
+            self._drop(next(iter(self._bits)))
+            self._metrics["evictions"] += 1
+
+    def _drop(self, user_id: int):
+        entry = self._bits.pop(user_id, None)
+        if entry is not None:
+            self._bytes -= sys.getsizeof(entry[1])
+
+
+_owned = OwnedCache()
+
+# ─────────────────────────────────────────────
+# CACHE COHERENCE
+# ─────────────────────────────────────────────
+# Several processes may share the database file (a second worker, admin
+# scripts). Every mutation that a cache could be holding appends
+# (scope, key) rows to `invalidations` inside its own transaction, tagged
+# with this process's origin. Each process checks `PRAGMA data_version`
+# at most every CACHE_POLL_MS; only when it moved does it read the new
+# log rows from other origins and evict just those keys. The log is a
+# ring of the last CACHE_INVALIDATION_KEEP rows; a process that falls
+# further behind than that drops its whole cache.
+_ORIGIN = uuid.uuid4().hex[:12]
+
+_sync_state: Dict[str, Any] = {"polled_at": 0.0, "pools": {}}   # path -> {last_seq, versions}
+_sync_stats = {"polls": 0, "remote_evictions": 0, "full_resets": 0}
+
+
+async def _publish(db, scope: str, *keys: Optional[int]):
+    """Record invalidations on an already checked-out writer connection."""
+    for key in keys:
+        async with db.execute(
+            "INSERT INTO invalidations (scope, key, origin) VALUES (?,?,?) RETURNING seq",
+            (scope, key, _ORIGIN)
+        ) as cur:
+            seq = (await cur.fetchone())[0]
+        if seq % 512 == 0:
             await db.execute(
-                "INSERT INTO users (user_id, username, first_name, coins) VALUES (?,?,?,?)",
-                (user_id, username, first_name, STARTING_COINS)
+                "DELETE FROM invalidations WHERE seq <= ?", (seq - CACHE_INVALIDATION_KEEP,)
             )
-            await db.commit()
+
+
+def _evict(scope: str, key: Optional[int]):
+    if scope == "cards":
+        _catalog.invalidate()
+    elif scope == "owned" and key is None:
+        _owned.clear()
+    elif scope in ("user", "owned") and key is not None:
+        # catches elsewhere publish the player's row, which they change too
+        if scope == "user":
+            _users.invalidate(key)
+        _owned.invalidate(key)
+    else:
+        _users.clear()
+        _owned.clear()
+
+
+async def _sync_caches():
+    """Apply other processes' invalidations (rate-limited to CACHE_POLL_MS).
+    Each shard has its own log; all of them are polled."""
+    now = time.monotonic()
+    if now - _sync_state["polled_at"] < CACHE_POLL_MS / 1000:
+        return
+    _sync_state["polled_at"] = now
+    if any(pool.replaced() for pool in _all_pools()):
+        log.warning("🔄 Database file was replaced; reopening pool and dropping caches")
+        await close_db()
+        return
+    _sync_stats["polls"] += 1
+    for pool in _all_pools():
+        state = _sync_state["pools"].setdefault(pool.path, {"last_seq": None, "versions": {}})
+        await _sync_pool(pool, state)
+
+
+async def _sync_pool(pool: ConnectionPool, state: Dict[str, Any]):
+    async with pool.reader() as db:
+        # data_version is per connection: compare against what this
+        # connection saw last time
+        async with db.execute("PRAGMA data_version") as cur:
+            version = (await cur.fetchone())[0]
+        if state["versions"].get(id(db)) == version and state["last_seq"] is not None:
+            return
+        state["versions"][id(db)] = version
+        if state["last_seq"] is None:
+            async with db.execute("SELECT COALESCE(MAX(seq), 0) FROM invalidations") as cur:
+                state["last_seq"] = (await cur.fetchone())[0]
+            return
+        async with db.execute("SELECT MIN(seq) FROM invalidations") as cur:
+            oldest = (await cur.fetchone())[0]
+        async with db.execute(
+            "SELECT seq, scope, key FROM invalidations WHERE seq > ? AND origin != ? ORDER BY seq",
+            (state["last_seq"], _ORIGIN)
+        ) as cur:
+            rows = await cur.fetchall()
+        async with db.execute("SELECT COALESCE(MAX(seq), 0) FROM invalidations") as cur:
+            newest = (await cur.fetchone())[0]
+    if oldest is not None and oldest > state["last_seq"] + 1:
+        _users.clear()
+        _owned.clear()
+        _catalog.invalidate()
+        _sync_stats["full_resets"] += 1
+    else:
+        for _, scope, key in rows:
+            _evict(scope, key)
+        _sync_stats["remote_evictions"] += len(rows)
+    state["last_seq"] = max(state["last_seq"], newest)
+
+# ─────────────────────────────────────────────
+# HOT STATE
+# ─────────────────────────────────────────────
+# With HOT_STATE on (see hotstate.py) the functions below that change
+# coins, xp, the play counters or mission progress do it in `_hot`, and
+# return once their journal batch is fsynced. `_hot_loop` writes the
+# journaled changes to SQLite every HOT_STATE_APPLY_MS, one transaction
+# per shard, so leaderboards and other SQL reads lag by up to that long.
+# `close_db` stops that task and the journal's fsync task; like the pools,
+# they start again on next use (once startup recovery has run).
+_hot_task: Dict[str, Any] = {"task": None, "lock": None, "recovered": False}
+
+
+async def _hot_durable():
+    """`_hot.durable()`, restarting the background tasks if stopped."""
+    if _hot_task["task"] is None and _hot_task["recovered"]:
+        _hot.journal.resume()
+        _hot_task["task"] = asyncio.create_task(_hot_loop())
+    await _hot.durable()
+
+
+async def _hot_row(user_id: int) -> Optional[User]:
+    """The player's in-memory row, loading it first if needed."""
+    while True:
+        row = _users.get(user_id)
+        if row is not None:
+            return row
+        if await get_user(user_id) is None:
+            return None
+
+
+def _hot_credit(user_id: int, amount: int) -> User:
+    """`_credit` for a player in memory: coins, plus the weekly board."""
+    row = _hot.change(user_id, incrs={"coins": amount})
+    if amount > 0:
+        _hot.record("w", user_id, amount)
+    return row
+
+
+def _hot_ledger(owner: int, from_user: int, to_user: int, amount: int, tx_type: str, note: str = ""):
+    """`_ledger` for the journal: the row goes to `owner`'s shard."""
+    _hot.record("t", owner, from_user, to_user, amount, tx_type, note, now_ts())
+
+
+async def _hot_apply(records: List[list]) -> int:
+    """Write journal records to SQLite, coalesced, one transaction per
+    shard. Each shard's hot_journal row is the last seq it has applied;
+    older records are skipped, so a batch may safely be applied again.
+    Returns how many records were new."""
+    applied = 0
+    by_shard: Dict[int, List[list]] = {}
+    for rec in records:
+        by_shard.setdefault(_shard_index(rec[2]), []).append(rec)
+    for i, recs in by_shard.items():
+        async with _shards[i].writer() as db:
+            async with db.execute("SELECT COALESCE(MAX(seq), 0) FROM hot_journal") as cur:
+                done = (await cur.fetchone())[0]
+            users: Dict[int, Dict[str, Any]] = {}
+            weekly: Dict[int, int] = {}
+            missions: Dict[tuple, list] = {}
+            ledger = []
+            for seq, kind, user_id, *data in recs:
+                if seq <= done:
+                    continue
+                applied += 1
+                if kind == "u":
+                    users.setdefault(user_id, {}).update(
+                        (k, v) for k, v in data[0].items() if k in HOT_FIELDS
+                    )
+                elif kind == "w":
+                    weekly[user_id] = weekly.get(user_id, 0) + data[0]
+                elif kind == "m":
+                    missions[(user_id, data[0])] = data[1:]
+                elif kind == "t":
+                    ledger.append(tuple(data))
+            by_columns: Dict[tuple, list] = {}
+            for user_id, fields in users.items():
+                by_columns.setdefault(tuple(fields), []).append((*fields.values(), user_id))
+            for columns, params in by_columns.items():
+                await db.executemany(
+                    f"UPDATE users SET {', '.join(f'{c}=?' for c in columns)} WHERE user_id=?", params
+                )
+            if weekly:
+                await db.executemany(
+                    "UPDATE weekly_board SET weekly_coins = weekly_coins + ? WHERE user_id=?",
+                    [(delta, user_id) for user_id, delta in weekly.items()]
+                )
+            if missions:
+                await db.executemany(
+                    "UPDATE user_missions SET progress=?, completed=?, reset_at=? "
+                    "WHERE user_id=? AND mission_key=?",
+                    [(*state, user_id, key) for (user_id, key), state in missions.items()]
+                )
+            if ledger:
+                await db.executemany(
+                    "INSERT INTO ledger.transactions (from_user, to_user, amount, tx_type, note, created_at) "
+                    "VALUES (?,?,?,?,?,?)", ledger
+                )
+            top = recs[-1][0]
+            if top > done:
+                await db.execute(
+                    "INSERT INTO hot_journal (id, seq) VALUES (1, ?) "
+                    "ON CONFLICT(id) DO UPDATE SET seq=excluded.seq", (top,)
+                )
+    return applied
+
+
+async def _hot_flush():
+    """Write everything journaled so far to SQLite."""
+    if _hot is None:
+        return
+    if _hot_task["lock"] is None:
+        _hot_task["lock"] = asyncio.Lock()
+    async with _hot_task["lock"]:
+        batch = _hot.take_pending()
+        if not batch:
+            return
+        try:
+            await _hot_apply(batch)
+        except BaseException:
+            _hot.requeue(batch)
+            raise
+        _hot.applied(len(batch))
+        await _hot.journal.discard(batch[-1][0])
+
+
+async def _hot_loop():
+    while True:
+        await asyncio.sleep(HOT_STATE_APPLY_MS / 1000)
+        try:
+            await _hot_flush()
+        except asyncio.CancelledError:
+            raise
+        except Exception as e:
+            log.error(f"🔥 Hot state write-behind failed (will retry): {e}")
+
+
+async def _hot_recover():
+    """Apply what the journal on disk holds beyond each shard's marker,
+    then start a fresh journal and the write-behind task."""
+    records = list(_hot.journal.read())
+    if records and await _hot_apply(records):
+        log.warning(f"🔥 Replayed {len(records)} hot state journal records")
+    markers = await _gather_shards("SELECT COALESCE(MAX(seq), 0) FROM hot_journal")
+    _hot.seq = max([r[0] for r in markers] + [rec[0] for rec in records[-1:]])
+    _hot.journal.start()
+    _hot_task["recovered"] = True
+    if _hot_task["task"] is None:
+        _hot_task["task"] = asyncio.create_task(_hot_loop())
+
+
+def get_hot_state_stats() -> Dict:
+    """Hot state engine counters (empty when HOT_STATE is off)."""
+    return _hot.hot_stats() if _hot is not None else {}
+
+# ─────────────────────────────────────────────
+# WRITE-BEHIND COUNTERS
+# ─────────────────────────────────────────────
+# See counters.py. `_COUNTED` maps each table whose counters are written
+# behind to its key column; every key is a user_id, so rows flush to
+# their player's shard.
+_COUNTED = {"weekly_board": "user_id"}
+_counters = Counters(COUNTER_FLUSH_MAX)
+_counter_task: Dict[str, Optional[asyncio.Task]] = {"task": None}
+
+
+def _count(table: str, key: int, column: str, delta: int):
+    """Add `delta` to a counter once the current writer block commits."""
+    on_commit(lambda: _counters.add(table, key, column, delta))
+    if _counter_task["task"] is None:
+        _counter_task["task"] = asyncio.create_task(_counter_loop())
+
+
+async def _counter_flush():
+    async with _counters.lock:
+        batch = _counters.take()
+        if not batch:
+            return
+        by_shard: Dict[int, Dict[tuple, List[tuple]]] = {}
+        for (table, key), cols in batch.items():
+            groups = by_shard.setdefault(_shard_index(key), {})
+            for column, delta in cols.items():
+                groups.setdefault((table, column), []).append((delta, key))
+        done: Set[int] = set()
+        try:
+            for i, groups in by_shard.items():
+                async with _shards[i].writer() as db:
+                    for (table, column), params in groups.items():
+                        await db.executemany(
+                            f"UPDATE {table} SET {column} = {column} + ? "
+                            f"WHERE {_COUNTED[table]} = ?", params
+                        )
+                done.add(i)
+        except BaseException:
+            _counters.requeue({row: cols for row, cols in batch.items()
+                               if _shard_index(row[1]) not in done})
+            raise
+        _counters.flushed(sum(len(cols) for cols in batch.values()))
+
+
+async def _counter_loop():
+    while True:
+        await _counters.wait_full(COUNTER_FLUSH_MS / 1000)
+        try:
+            await _counter_flush()
+        except asyncio.CancelledError:
+            raise
+        except Exception as e:
+            log.error(f"🧮 Counter flush failed (will retry): {e}")
+
+
+def get_counter_stats() -> Dict:
+    return _counters.stats()
+
+# ─────────────────────────────────────────────
+# USER OPERATIONS
+# ─────────────────────────────────────────────
+async def get_or_create_user(user_id: int, username: str = "", first_name: str = "") -> User:
+    """Served from the cache when the names match; otherwise one upsert that
+    creates the player or refreshes a changed username / first name (empty
+    arguments never overwrite stored names)."""
+    await _sync_caches()
+    cached = _users.get(user_id)
+    if (cached is not None
+            and (not username or cached.username == username)
+            and (not first_name or cached.first_name == first_name)):
+        return cached
+    async with _shard(user_id).writer() as db:
+        async with db.execute("""
+            INSERT INTO users (user_id, username, first_name, coins) VALUES (?,?,?,?)
+            ON CONFLICT(user_id) DO UPDATE SET
+                username   = COALESCE(NULLIF(excluded.username, ''), username),
+                first_name = COALESCE(NULLIF(excluded.first_name, ''), first_name)
+            WHERE (excluded.username != '' AND excluded.username IS NOT username)
+               OR (excluded.first_name != '' AND excluded.first_name IS NOT first_name)
+            RETURNING *
+        """, (user_id, username, first_name, STARTING_COINS)) as cur:
+            row = await cur.fetchone()
+        if row is None:    # existed and nothing changed: the upsert was a no-op
             async with db.execute("SELECT * FROM users WHERE user_id=?", (user_id,)) as cur:
                 row = await cur.fetchone()
-        return dict(row)
-
-async def get_user(user_id: int) -> Optional[Dict]:
-    async with aiosqlite.connect(DB_PATH) as db:
-        db.row_factory = aiosqlite.Row
+        else:
+            await _publish(db, "user", user_id)
+        row = User.from_row(row)
+    return _users.put(row)
+
+async def get_user(user_id: int) -> Optional[User]:
+    await _sync_caches()
+    cached = _users.get(user_id)
+    if cached is not None:
+        return cached
+    token = _users.token()
+    async with _shard(user_id).reader() as db:
         async with db.execute("SELECT * FROM users WHERE user_id=?", (user_id,)) as cur:
             row = await cur.fetchone()
-        return dict(row) if row else None
+    return _users.fill(User.from_row(row), token)
 
 async def update_user(user_id: int, **kwargs):
+    hot = {k: kwargs.pop(k) for k in list(kwargs) if k in HOT_FIELDS} if _hot is not None else {}
+    if hot and await _hot_row(user_id) is not None:
+        _hot.change(user_id, sets=hot)
+        await _hot_durable()
     if not kwargs:
         return
     cols = ", ".join(f"{k}=?" for k in kwargs)
     vals = list(kwargs.values()) + [user_id]
-    async with aiosqlite.connect(DB_PATH) as db:
-        await db.execute(f"UPDATE users SET {cols} WHERE user_id=?", vals)
-        await db.commit()
+    async with _shard(user_id).writer() as db:
+        async with db.execute(f"UPDATE users SET {cols} WHERE user_id=? RETURNING *", vals) as cur:
+            row = await cur.fetchone()
+        await _publish(db, "user", user_id)
+    _users.put(User.from_row(row))
 
-async def add_coins(user_id: int, amount: int, tx_type: str = "reward", from_user: int = 0, note: str = ""):
-    async with aiosqlite.connect(DB_PATH) as db:
-        await db.execute("UPDATE users SET coins = coins + ? WHERE user_id=?", (amount, user_id))
-        await db.execute(
-            "INSERT INTO transactions (from_user, to_user, amount, tx_type, note) VALUES (?,?,?,?,?)",
-            (from_user, user_id, amount, tx_type, note)
-        )
-        if amount > 0:
-            await db.execute(
-                "UPDATE weekly_board SET weekly_coins = weekly_coins + ? WHERE user_id=?",
-                (amount, user_id)
-            )
-        await db.commit()
+# ─────────────────────────────────────────────
+# ECONOMY PRIMITIVES
+# ─────────────────────────────────────────────
+# Each primitive is one conditional UPDATE ... RETURNING on the writer
+# connection, with its ledger row written in the same writer job: no
+# read-decide-write gap for two racing commands to double-spend through.
+class InsufficientCoins(Exception):
+    """Raised when a conditional debit finds the balance too low."""
 
-async def add_xp(user_id: int, amount: int) -> Dict:
-    """Add XP and handle level ups. Returns {leveled_up, new_level}"""
-    from config import LEVEL_XP_REQUIREMENTS
-    user = await get_user(user_id)
-    if not user:
-        return {"leveled_up": False, "new_level": 1}
+    def __init__(self, balance: Optional[int] = None):
+        super().__init__("insufficient coins")
+        self.balance = balance
 
-    new_xp   = user["xp"] + amount
-    new_level = user["level"]
-    leveled_up = False
 
-    while new_level < len(LEVEL_XP_REQUIREMENTS) - 1:
-        if new_xp >= LEVEL_XP_REQUIREMENTS[new_level]:
-            new_level += 1
-            leveled_up = True
+# Level thresholds 1..max-1 as a JSON array for json_each(): the level for
+# `xp` is 1 + the number of thresholds at or below it.
+_LEVEL_THRESHOLDS = json.dumps(LEVEL_XP_REQUIREMENTS[1:-1])
+_LEVEL_SQL = "MAX(level, 1 + (SELECT COUNT(*) FROM json_each(?) WHERE value <= xp + ?))"
+
+
+def _level_up(level: int, xp: int) -> int:
+    """Highest level reachable from `level` with `xp` total experience."""
+    while level < len(LEVEL_XP_REQUIREMENTS) - 1:
+        if xp >= LEVEL_XP_REQUIREMENTS[level]:
+            level += 1
         else:
             break
+    return level
+
+_LEDGER_SQL = "INSERT INTO ledger.transactions (from_user, to_user, amount, tx_type, note) VALUES (?,?,?,?,?)"
+
+def _ledger(from_user: int, to_user: int, amount: int, tx_type: str, note: str = ""):
+    """Queue a ledger row; the pool inserts it in bulk (see `append`)."""
+    append(_LEDGER_SQL, (from_user, to_user, amount, tx_type, note))
+
+async def _credit(db, user_id: int, amount: int) -> Optional[User]:
+    """Returns the updated users row (for the cache) or None."""
+    async with db.execute(
+        "UPDATE users SET coins = coins + ? WHERE user_id=? RETURNING *",
+        (amount, user_id)
+    ) as cur:
+        row = await cur.fetchone()
+    if row:
+        await _publish(db, "user", user_id)
+    if row and amount > 0:
+        _count("weekly_board", user_id, "weekly_coins", amount)
+    return User.from_row(row)
+
+async def _debit(db, user_id: int, amount: int, spent: bool = False) -> Optional[User]:
+    """Debit only if balance >= amount. Returns the updated row or None."""
+    spent_sql = ", total_spent = total_spent + ?" if spent else ""
+    params = (amount, amount, user_id, amount) if spent else (amount, user_id, amount)
+    async with db.execute(
+        f"UPDATE users SET coins = coins - ?{spent_sql} "
+        f"WHERE user_id=? AND coins >= ? RETURNING *",
+        params
+    ) as cur:
+        row = await cur.fetchone()
+    if row:
+        await _publish(db, "user", user_id)
+    return User.from_row(row)
+
+async def _balance(db, user_id: int) -> Optional[int]:
+    async with db.execute("SELECT coins FROM users WHERE user_id=?", (user_id,)) as cur:
+        row = await cur.fetchone()
+    return row[0] if row else None
+
+async def add_coins(user_id: int, amount: int, tx_type: str = "reward", from_user: int = 0, note: str = "") -> Optional[int]:
+    """Unconditional credit (or admin debit). Returns the new balance."""
+    if _hot is not None:
+        if await _hot_row(user_id) is None:
+            return None
+        row = _hot_credit(user_id, amount)
+        _hot_ledger(user_id, from_user, user_id, amount, tx_type, note)
+        await _hot_durable()
+        return row.coins
+    async with _shard(user_id).writer() as db:
+        row = await _credit(db, user_id, amount)
+        _ledger(from_user, user_id, amount, tx_type, note)
+    _users.put(row)
+    return row.coins if row else None
+
+async def debit_coins(user_id: int, amount: int, tx_type: str = "spend", note: str = "") -> Optional[int]:
+    """Debit `amount` if the balance covers it. Returns the new balance,
+    or None (and writes nothing) if it does not."""
+    if _hot is not None:
+        if await _hot_row(user_id) is None:
+            return None
+        row = _hot.change(user_id, incrs={"coins": -amount}, floor=amount)
+        if row is None:
+            return None
+        _hot_ledger(user_id, 0, user_id, -amount, tx_type, note)
+        await _hot_durable()
+        return row.coins
+    async with _shard(user_id).writer() as db:
+        row = await _debit(db, user_id, amount)
+        if row is not None:
+            _ledger(0, user_id, -amount, tx_type, note)
+    _users.put(row)
+    return row.coins if row else None
 
-    async with aiosqlite.connect(DB_PATH) as db:
-        await db.execute(
-            "UPDATE users SET xp=?, level=? WHERE user_id=?",
-            (new_xp, new_level, user_id)
-        )
-        await db.commit()
+async def add_xp(user_id: int, amount: int) -> Dict:
+    """Add XP and handle level ups in one statement. Returns {leveled_up, new_level}"""
+    if _hot is not None:
+        row = await _hot_row(user_id)
+        if row is not None:
+            row = _hot.change(user_id, incrs={"xp": amount})
+            await _hot_durable()
+    else:
+        async with _shard(user_id).writer() as db:
+            async with db.execute(
+                f"UPDATE users SET xp = xp + ?, level = {_LEVEL_SQL} "
+                f"WHERE user_id=? RETURNING *",
+                (amount, _LEVEL_THRESHOLDS, amount, user_id)
+            ) as cur:
+                row = await cur.fetchone()
+            await _publish(db, "user", user_id)
+        row = _users.put(User.from_row(row))
+    if not row:
+        return {"leveled_up": False, "new_level": 1}
+    new_xp, new_level = row.xp, row.level
+    # level only ever moves with xp, so the pre-update level is the one
+    # the pre-update xp implies
+    leveled_up = new_level > _level_up(1, new_xp - amount)
     return {"leveled_up": leveled_up, "new_level": new_level, "xp": new_xp}
 
 async def ensure_weekly_entry(user_id: int, username: str):
     from datetime import date, timedelta
     today = date.today()
     monday = today - timedelta(days=today.weekday())
-    async with aiosqlite.connect(DB_PATH) as db:
+    async with _shard(user_id).writer() as db:
         async with db.execute(
             "SELECT * FROM weekly_board WHERE user_id=?", (user_id,)
         ) as cur:
@@ -295,181 +1592,364 @@ async def ensure_weekly_entry(user_id: int, username: str):
                 "UPDATE weekly_board SET username=? WHERE user_id=?",
                 (username, user_id)
             )
-        await db.commit()
+
+# ─────────────────────────────────────────────
+# CARD CATALOG
+# ─────────────────────────────────────────────
+# The whole `cards` table and the current drop rate, kept in memory (see
+# catalog.py). Loaded on first use; the card functions below update it
+# after they commit and publish a "cards" invalidation, so other
+# processes reload theirs.
+_catalog = Catalog({r: cfg["drop_weight"] for r, cfg in RARITY_CONFIG.items()})
+
+
+async def _load_catalog() -> Catalog:
+    await _sync_caches()
+    while not _catalog.loaded:
+        generation = _catalog.generation
+        async with _pool.reader() as db:
+            async with db.execute("SELECT * FROM cards") as cur:
+                cards = [Card.from_row(r) for r in await cur.fetchall()]
+            async with db.execute(
+                "SELECT current_rate FROM drop_settings ORDER BY id DESC LIMIT 1"
+            ) as cur:
+                row = await cur.fetchone()
+        layout = _catalog.layout
+        _catalog.load(cards, row[0] if row else 1.0, generation)
+        if _catalog.layout != layout:
+            _owned.clear()
+    return _catalog
+
+
+async def _named_catalog() -> Catalog:
+    """The catalog with its name index built. The first build runs in a
+    thread: it takes seconds on a catalog of tens of thousands."""
+    catalog = await _load_catalog()
+    while not catalog.names_ready and len(catalog):
+        generation = catalog.generation
+        index = await asyncio.to_thread(NameIndex.build, list(catalog))
+        catalog.install_names(index, generation)
+        catalog = await _load_catalog()
+    return catalog
+
+
+def get_catalog_stats() -> Dict:
+    return _catalog.stats()
 
 # ─────────────────────────────────────────────
 # CARD OPERATIONS
 # ─────────────────────────────────────────────
 async def add_card(name: str, movie: str, rarity: str, file_id: str,
                    file_type: str, uploaded_by: int) -> int:
-    async with aiosqlite.connect(DB_PATH) as db:
-        cur = await db.execute(
-            "INSERT INTO cards (name, movie, rarity, file_id, file_type, uploaded_by) VALUES (?,?,?,?,?,?)",
-            (name, movie, rarity, file_id, file_type, uploaded_by)
-        )
-        await db.commit()
-        return cur.lastrowid
-
-async def get_card(card_id: int) -> Optional[Dict]:
-    async with aiosqlite.connect(DB_PATH) as db:
-        db.row_factory = aiosqlite.Row
-        async with db.execute("SELECT * FROM cards WHERE id=?", (card_id,)) as cur:
-            row = await cur.fetchone()
-        return dict(row) if row else None
-
-async def get_card_by_name(name: str) -> Optional[Dict]:
-    async with aiosqlite.connect(DB_PATH) as db:
-        db.row_factory = aiosqlite.Row
+    async with _pool.writer() as db:
         async with db.execute(
-            "SELECT * FROM cards WHERE LOWER(name) LIKE ?", (f"%{name.lower()}%",)
+            "INSERT INTO cards (name, movie, rarity, file_id, file_type, uploaded_by) "
+            "VALUES (?,?,?,?,?,?) RETURNING *",
+            (name, movie, rarity, file_id, file_type, uploaded_by)
         ) as cur:
-            row = await cur.fetchone()
-        return dict(row) if row else None
+            card = Card.from_row(await cur.fetchone())
+        await _publish(db, "cards", card.id)
+    # Into the shards' mirrors before the draw tables: a catch of the card
+    # adds a shard user_cards row, which must find it there
+    await _mirror_catalog("cards", [card.id])
+    _catalog.put(card)
+    return card.id
+
+async def get_card(card_id: int) -> Optional[Card]:
+    return (await _load_catalog()).get(card_id)
+
+async def get_card_by_name(name: str) -> Optional[Card]:
+    """The card `name` clearly means, or None (see `find_cards`)."""
+    return (await find_cards(name))[0]
+
+async def find_cards(name: str, limit: int = 5) -> Tuple[Optional[Card], List[Card]]:
+    """Resolve a typed card name, which may be partial, misspelt or followed
+    by the movie: (the card it clearly means, or None if there is no such
+    card or several fit; the best candidates, best first)."""
+    return (await _named_catalog()).resolve(name, limit)
 
 async def delete_card(card_id: int):
-    async with aiosqlite.connect(DB_PATH) as db:
-        await db.execute("DELETE FROM cards WHERE id=?", (card_id,))
-        await db.execute("DELETE FROM user_cards WHERE card_id=?", (card_id,))
-        await db.commit()
-
-async def edit_card(card_id: int, name: str, movie: str):
-    async with aiosqlite.connect(DB_PATH) as db:
-        await db.execute(
-            "UPDATE cards SET name=?, movie=? WHERE id=?",
-            (name, movie, card_id)
-        )
-        await db.commit()
-
-async def get_random_card(rarity: Optional[str] = None) -> Optional[Dict]:
-    async with aiosqlite.connect(DB_PATH) as db:
-        db.row_factory = aiosqlite.Row
-        if rarity:
-            async with db.execute(
-                "SELECT * FROM cards WHERE rarity=? ORDER BY RANDOM() LIMIT 1", (rarity,)
-            ) as cur:
-                row = await cur.fetchone()
-        else:
+    # shards first, so no collection row is ever left pointing at a card
+    # the catalog no longer has
+    unset = []
+    for pool in _all_pools():
+        async with pool.writer() as db:
             async with db.execute(
-                "SELECT * FROM cards ORDER BY RANDOM() LIMIT 1"
+                "UPDATE users SET favorite_card_id=NULL WHERE favorite_card_id=? RETURNING user_id",
+                (card_id,)
             ) as cur:
-                row = await cur.fetchone()
-        return dict(row) if row else None
+                cleared = [r[0] for r in await cur.fetchall()]
+            await _publish(db, "user", *cleared)
+            await db.execute("DELETE FROM user_cards WHERE card_id=?", (card_id,))
+            await db.execute("DELETE FROM cards WHERE id=?", (card_id,))
+            if pool is _pool:
+                await _publish(db, "cards", card_id)
+                await _publish(db, "owned", None)
+        unset += cleared
+    _catalog.remove(card_id)
+    _owned.clear()
+    for user_id in unset:
+        _users.invalidate(user_id)
 
-async def get_all_cards(page: int = 1, per_page: int = 10) -> List[Dict]:
+async def edit_card(card_id: int, name: str, movie: str):
+    async with _pool.writer() as db:
+        async with db.execute(
+            "UPDATE cards SET name=?, movie=? WHERE id=? RETURNING *",
+            (name, movie, card_id)
+        ) as cur:
+            card = Card.from_row(await cur.fetchone())
+        if card is not None:
+            await _publish(db, "cards", card_id)
+    await _mirror_catalog("cards", [card_id])
+    if card is not None:
+        _catalog.put(card)
+
+async def get_random_card(rarity: Optional[str] = None) -> Optional[Card]:
+    """A card drawn by rarity weight, drop rate and each card's drop_rate
+    (see catalog.py); of `rarity` only, if given."""
+    return (await _load_catalog()).draw(rarity)
+
+async def get_all_cards(page: int = 1, per_page: int = 10) -> List[Card]:
     offset = (page - 1) * per_page
-    async with aiosqlite.connect(DB_PATH) as db:
-        db.row_factory = aiosqlite.Row
+    async with _pool.reader() as db:
         async with db.execute(
             "SELECT * FROM cards ORDER BY rarity, name LIMIT ? OFFSET ?",
             (per_page, offset)
         ) as cur:
             rows = await cur.fetchall()
-        return [dict(r) for r in rows]
+        return [Card.from_row(r) for r in rows]
 
 async def count_cards() -> int:
-    async with aiosqlite.connect(DB_PATH) as db:
+    async with _pool.reader() as db:
         async with db.execute("SELECT COUNT(*) FROM cards") as cur:
             row = await cur.fetchone()
         return row[0]
 
-async def add_card_to_user(user_id: int, card_id: int):
-    async with aiosqlite.connect(DB_PATH) as db:
-        await db.execute(
-            "INSERT INTO user_cards (user_id, card_id) VALUES (?,?)",
-            (user_id, card_id)
-        )
-        await db.execute(
-            "UPDATE users SET total_caught = total_caught + 1 WHERE user_id=?",
-            (user_id,)
-        )
-        await db.commit()
+# ─────────────────────────────────────────────
+# CATALOG BROWSER
+# ─────────────────────────────────────────────
+# Admin /cards: full-text search (cards_fts) and filters, paged by card id
+# in either direction, plus card_facets counts. Both tables are kept up to
+# date by triggers on the catalog's `cards` (migrations 11 and 12), so a
+# page is an index range read and the facets are a few rows, however large
+# the catalog.
+_FTS_TERM = re.compile(r"\w+", re.UNICODE)
+
+
+def _fts_query(text: str) -> Optional[str]:
+    """Every word of `text` as a quoted prefix term ('"spider"* "man"*'), so
+    user input can't break FTS5 query syntax."""
+    terms = _FTS_TERM.findall(text or "")
+    return " ".join(f'"{t}"*' for t in terms) if terms else None
+
+
+async def browse_cards(text: Optional[str] = None, rarity: Optional[str] = None,
+                       movie: Optional[str] = None, file_type: Optional[str] = None,
+                       after_id: int = 0, before_id: Optional[int] = None,
+                       limit: int = 10) -> Tuple[List[Card], bool, bool]:
+    """One page of cards matching every given filter, in id order: those
+    after `after_id`, or the last page before `before_id`. `text` matches
+    the start of words in name or movie; `movie` is exact, case-insensitive.
+    Returns (cards, has_prev, has_next)."""
+    match = _fts_query(text) if text else None
+    if match:
+        source, id_col = "cards_fts f JOIN cards c ON c.id = f.rowid", "f.rowid"
+        where, params = ["cards_fts MATCH ?"], [match]
+    else:
+        source, id_col = "cards c", "c.id"
+        where, params = [], []
+    for col, value in (("rarity", rarity), ("file_type", file_type)):
+        if value:
+            where.append(f"c.{col} = ?")
+            params.append(value)
+    if movie:
+        where.append("c.movie = ? COLLATE NOCASE")
+        params.append(movie)
+
+    def page_sql(op: str, order: str) -> str:
+        conds = " AND ".join(where + [f"{id_col} {op} ?"])
+        return f"SELECT c.* FROM {source} WHERE {conds} ORDER BY {id_col} {order} LIMIT ?"
+
+    backwards = before_id is not None
+    async with _pool.reader() as db:
+        if backwards:
+            sql, bound = page_sql("<", "DESC"), before_id
+        else:
+            sql, bound = page_sql(">", "ASC"), after_id
+        async with db.execute(sql, (*params, bound, limit + 1)) as cur:
+            rows = await cur.fetchall()
+        more = len(rows) > limit
+        cards = [Card.from_row(r) for r in rows[:limit]]
+        if backwards:
+            cards.reverse()
+        if not cards:
+            return [], False, False
+        # the other direction: is there anything beyond this page?
+        if backwards:
+            sql, bound = page_sql(">", "ASC"), cards[-1].id
+        else:
+            sql, bound = page_sql("<", "DESC"), cards[0].id
+        async with db.execute(sql, (*params, bound, 1)) as cur:
+            beyond = await cur.fetchone() is not None
+    return (cards, more, beyond) if backwards else (cards, beyond, more)
+
 
-async def get_user_cards(user_id: int, sort: str = "rarity", page: int = 1) -> List[Dict]:
+async def get_card_facets(top_movies: int = 10) -> Dict[str, Any]:
+    """Card counts per rarity and per file type, the `top_movies` movies
+    with the most cards, and how many movies there are."""
+    async with _pool.reader() as db:
+        async with db.execute(
+            "SELECT facet, value, count FROM card_facets WHERE facet IN ('rarity', 'file_type')"
+        ) as cur:
+            rows = await cur.fetchall()
+        async with db.execute(
+            "SELECT value, count FROM card_facets WHERE facet='movie' "
+            "ORDER BY count DESC, value LIMIT ?", (top_movies,)
+        ) as cur:
+            movies = await cur.fetchall()
+        async with db.execute("SELECT COUNT(*) FROM card_facets WHERE facet='movie'") as cur:
+            movie_count = (await cur.fetchone())[0]
+    facets: Dict[str, Any] = {"rarity": {}, "file_type": {}}
+    for facet, value, count in rows:
+        facets[facet][value] = count
+    facets["movie"] = {value: count for value, count in movies}
+    facets["movies"] = movie_count
+    facets["cards"] = sum(facets["rarity"].values())
+    return facets
+
+# A catch bumps the (user, card) row's count, creating it on the first copy.
+_CATCH_SQL = f"""
+    INSERT INTO user_cards (user_id, card_id) VALUES (?,?)
+    ON CONFLICT(user_id, card_id) DO UPDATE
+    SET count = count + 1, last_caught_at = {NOW_EPOCH}
+    RETURNING count
+"""
+
+async def add_card_to_user(user_id: int, card_id: int) -> int:
+    """Record one catch. Returns how many copies of the card the player now has."""
+    async with _shard(user_id).writer() as db:
+        async with db.execute(_CATCH_SQL, (user_id, card_id)) as cur:
+            count = (await cur.fetchone())[0]
+        if _hot is None:
+            async with db.execute(
+                "UPDATE users SET total_caught = total_caught + 1 WHERE user_id=? RETURNING *",
+                (user_id,)
+            ) as cur:
+                row = await cur.fetchone()
+            await _publish(db, "user", user_id)
+        else:
+            await _publish(db, "owned", user_id)
+    if _hot is None:
+        _users.put(User.from_row(row))
+    elif await _hot_row(user_id) is not None:
+        _hot.change(user_id, incrs={"total_caught": 1})
+        await _hot_durable()
+    _owned.add(user_id, [card_id])
+    return count
+
+async def get_user_cards(user_id: int, sort: str = "rarity", page: int = 1) -> List[UserCard]:
     per_page = 12
     offset   = (page - 1) * per_page
-    order    = "c.rarity DESC, c.name" if sort == "rarity" else "uc.caught_at DESC"
-    async with aiosqlite.connect(DB_PATH) as db:
-        db.row_factory = aiosqlite.Row
+    order    = "c.rarity DESC, c.name" if sort == "rarity" else "uc.last_caught_at DESC"
+    async with _shard(user_id).reader() as db:
         async with db.execute(f"""
             SELECT c.id, c.name, c.movie, c.rarity, c.file_id, c.file_type,
-                   uc.is_favorite, uc.caught_at
+                   c.id IS u.favorite_card_id AS is_favorite,
+                   uc.count, uc.first_caught_at, uc.last_caught_at
             FROM user_cards uc
             JOIN cards c ON uc.card_id = c.id
+            JOIN users u ON u.user_id = uc.user_id
             WHERE uc.user_id=?
             ORDER BY {order}
             LIMIT ? OFFSET ?
         """, (user_id, per_page, offset)) as cur:
             rows = await cur.fetchall()
-        return [dict(r) for r in rows]
+        return [UserCard.from_row(r) for r in rows]
 
 async def count_user_cards(user_id: int) -> int:
-    async with aiosqlite.connect(DB_PATH) as db:
+    """Distinct cards owned (duplicates are one row with a count)."""
+    async with _shard(user_id).reader() as db:
         async with db.execute(
             "SELECT COUNT(*) FROM user_cards WHERE user_id=?", (user_id,)
         ) as cur:
             row = await cur.fetchone()
         return row[0]
 
+async def owned_cards(user_id: int) -> int:
+    """Card set of every card the player owns (test with Catalog.has_card)."""
+    await _load_catalog()
+    bits = _owned.get(user_id)
+    if bits is None:
+        async with _shard(user_id).reader() as db:
+            bits = await _load_owned(db, user_id)
+    return bits
+
+async def _owned_cards(db, user_id: int, fill: bool = True) -> int:
+    """The player's bitset, rebuilt on `db` on a miss. Pass fill=False on a
+    writer connection: what it reads may not be committed yet."""
+    bits = _owned.get(user_id)
+    if bits is None:
+        bits = await _load_owned(db, user_id, fill)
+    return bits
+
+async def _load_owned(db, user_id: int, fill: bool = True) -> int:
+    token = _owned.token()
+    async with db.execute(
+        "SELECT card_id FROM user_cards WHERE user_id=?", (user_id,)
+    ) as cur:
+        bits = _catalog.bitset(r[0] for r in await cur.fetchall())
+    if fill:
+        _owned.fill(user_id, bits, token)
+    return bits
+
 async def user_has_card(user_id: int, card_id: int) -> bool:
-    async with aiosqlite.connect(DB_PATH) as db:
-        async with db.execute(
-            "SELECT 1 FROM user_cards WHERE user_id=? AND card_id=?", (user_id, card_id)
-        ) as cur:
-            return await cur.fetchone() is not None
+    return _catalog.has_card(await owned_cards(user_id), card_id)
 
-async def set_favorite(user_id: int, card_id: int) -> bool:
-    """Set card as favorite. Returns False if card not owned."""
-    has = await user_has_card(user_id, card_id)
-    if not has:
+async def _set_favorite_card(user_id: int, card_id: int, value_sql: str) -> bool:
+    """Point users.favorite_card_id at `value_sql` if the player owns `card_id`."""
+    async with _shard(user_id).writer() as db:
+        async with db.execute(f"""
+            UPDATE users SET favorite_card_id = {value_sql}
+            WHERE user_id=:user_id
+              AND EXISTS (SELECT 1 FROM user_cards WHERE user_id=:user_id AND card_id=:card_id)
+            RETURNING *
+        """, {"user_id": user_id, "card_id": card_id}) as cur:
+            row = await cur.fetchone()
+        if row is not None:
+            await _publish(db, "user", user_id)
+    if row is None:
         return False
-    async with aiosqlite.connect(DB_PATH) as db:
-        await db.execute(
-            "UPDATE user_cards SET is_favorite=0 WHERE user_id=?", (user_id,)
-        )
-        await db.execute(
-            "UPDATE user_cards SET is_favorite=1 WHERE user_id=? AND card_id=?",
-            (user_id, card_id)
-        )
-        await db.commit()
+    _users.put(User.from_row(row))
     return True
 
+async def set_favorite(user_id: int, card_id: int) -> bool:
+    """Set card as favorite. Returns False if card not owned."""
+    return await _set_favorite_card(user_id, card_id, ":card_id")
+
 async def remove_favorite(user_id: int, card_id: int) -> bool:
-    has = await user_has_card(user_id, card_id)
-    if not has:
-        return False
-    async with aiosqlite.connect(DB_PATH) as db:
-        await db.execute(
-            "UPDATE user_cards SET is_favorite=0 WHERE user_id=? AND card_id=?",
-            (user_id, card_id)
-        )
-        await db.commit()
-    return True
+    """Clear the favorite if it is `card_id`. Returns False if card not owned."""
+    return await _set_favorite_card(user_id, card_id, "NULLIF(favorite_card_id, :card_id)")
 
-async def get_favorite_card(user_id: int) -> Optional[Dict]:
-    async with aiosqlite.connect(DB_PATH) as db:
-        db.row_factory = aiosqlite.Row
-        async with db.execute("""
-            SELECT c.* FROM user_cards uc
-            JOIN cards c ON uc.card_id = c.id
-            WHERE uc.user_id=? AND uc.is_favorite=1
-        """, (user_id,)) as cur:
-            row = await cur.fetchone()
-        return dict(row) if row else None
+async def get_favorite_card(user_id: int) -> Optional[Card]:
+    user = await get_user(user_id)
+    if not user or user.favorite_card_id is None:
+        return None
+    return await get_card(user.favorite_card_id)
 
 async def user_has_rarity(user_id: int, rarity: str) -> bool:
-    async with aiosqlite.connect(DB_PATH) as db:
-        async with db.execute("""
-            SELECT 1 FROM user_cards uc
-            JOIN cards c ON uc.card_id = c.id
-            WHERE uc.user_id=? AND c.rarity=?
-        """, (user_id, rarity)) as cur:
-            return await cur.fetchone() is not None
+    await _load_catalog()
+    return _owns_rarities(await owned_cards(user_id), [rarity])
+
+def _owns_rarities(owned: int, rarities: Sequence[str]) -> bool:
+    """At least one card of each rarity in the bitset `owned`. Needs the
+    catalog loaded."""
+    return all(owned & _catalog.rarity_mask(r) for r in rarities)
 
 # ─────────────────────────────────────────────
 # SHOP & INVENTORY
 # ─────────────────────────────────────────────
 async def init_shop(items: list):
-    async with aiosqlite.connect(DB_PATH) as db:
+    async with _pool.writer() as db:
         for item in items:
             await db.execute("""
                 INSERT OR IGNORE INTO shop_items
@@ -477,11 +1957,10 @@ async def init_shop(items: list):
                 VALUES (?,?,?,?,?,?)
             """, (item["id"], item["name"], item["desc"], item["price"],
                   item["effect"], item["duration"]))
-        await db.commit()
+    await _mirror_catalog("shop_items")
 
 async def get_shop_items() -> List[Dict]:
-    async with aiosqlite.connect(DB_PATH) as db:
-        db.row_factory = aiosqlite.Row
+    async with _pool.reader() as db:
         async with db.execute(
             "SELECT * FROM shop_items WHERE is_active=1 ORDER BY price"
         ) as cur:
@@ -489,45 +1968,58 @@ async def get_shop_items() -> List[Dict]:
         return [dict(r) for r in rows]
 
 async def get_shop_item(item_key: str) -> Optional[Dict]:
-    async with aiosqlite.connect(DB_PATH) as db:
-        db.row_factory = aiosqlite.Row
+    async with _pool.reader() as db:
         async with db.execute(
             "SELECT * FROM shop_items WHERE item_key=? AND is_active=1", (item_key,)
         ) as cur:
             row = await cur.fetchone()
         return dict(row) if row else None
 
+_ADD_ITEM_SQL = """
+    INSERT INTO user_inventory (user_id, item_key, quantity)
+    VALUES (?,?,1)
+    ON CONFLICT(user_id, item_key) DO UPDATE SET quantity = quantity + 1
+"""
+
+async def _hot_buy_item(user_id: int, item: Dict) -> Dict:
+    price = item["price"]
+    if await _hot_row(user_id) is None:
+        return {"success": False, "message": "User not found"}
+    row = _hot.change(user_id, incrs={"coins": -price, "total_spent": price}, floor=price)
+    if row is None:
+        return {"success": False, "message": f"Not enough coins! Need {price:,} coins."}
+    try:
+        # the inventory is not hot state: it is written straight to SQLite
+        async with _shard(user_id).writer() as db:
+            await db.execute(_ADD_ITEM_SQL, (user_id, item["item_key"]))
+    except BaseException:
+        _hot.change(user_id, incrs={"coins": price, "total_spent": -price})
+        raise
+    _hot_ledger(user_id, user_id, 0, price, "shop_buy", f"Bought {item['name']}")
+    await _hot_durable()
+    return {"success": True, "message": f"✅ Purchased **{item['name']}**!", "item": item, "balance": row.coins}
+
 async def buy_item(user_id: int, item_key: str) -> Dict:
     """Returns {success, message}"""
     item = await get_shop_item(item_key)
     if not item:
         return {"success": False, "message": "Item not found"}
-    user = await get_user(user_id)
-    if not user:
-        return {"success": False, "message": "User not found"}
-    if user["coins"] < item["price"]:
-        return {"success": False, "message": f"Not enough coins! Need {item['price']:,} coins."}
 
-    async with aiosqlite.connect(DB_PATH) as db:
-        await db.execute(
-            "UPDATE users SET coins = coins - ?, total_spent = total_spent + ? WHERE user_id=?",
-            (item["price"], item["price"], user_id)
-        )
-        await db.execute("""
-            INSERT INTO user_inventory (user_id, item_key, quantity)
-            VALUES (?,?,1)
-            ON CONFLICT DO UPDATE SET quantity = quantity + 1
-        """, (user_id, item_key))
-        await db.execute(
-            "INSERT INTO transactions (from_user, to_user, amount, tx_type, note) VALUES (?,0,?,?,?)",
-            (user_id, item["price"], "shop_buy", f"Bought {item['name']}")
-        )
-        await db.commit()
-    return {"success": True, "message": f"✅ Purchased **{item['name']}**!", "item": item}
+    if _hot is not None:
+        return await _hot_buy_item(user_id, item)
+    async with _shard(user_id).writer() as db:
+        row = await _debit(db, user_id, item["price"], spent=True)
+        if row is None:
+            if await _balance(db, user_id) is None:
+                return {"success": False, "message": "User not found"}
+            return {"success": False, "message": f"Not enough coins! Need {item['price']:,} coins."}
+        await db.execute(_ADD_ITEM_SQL, (user_id, item_key))
+        _ledger(user_id, 0, item["price"], "shop_buy", f"Bought {item['name']}")
+    _users.put(row)
+    return {"success": True, "message": f"✅ Purchased **{item['name']}**!", "item": item, "balance": row.coins}
 
 async def get_user_inventory(user_id: int) -> List[Dict]:
-    async with aiosqlite.connect(DB_PATH) as db:
-        db.row_factory = aiosqlite.Row
+    async with _shard(user_id).reader() as db:
         async with db.execute("""
             SELECT ui.item_key, ui.quantity, ui.expires_at,
                    si.name, si.description, si.effect
@@ -538,115 +2030,326 @@ async def get_user_inventory(user_id: int) -> List[Dict]:
             rows = await cur.fetchall()
         return [dict(r) for r in rows]
 
+# ─────────────────────────────────────────────
+# CROSS-SHARD OPERATIONS
+# ─────────────────────────────────────────────
+# A gift, marriage or friendship between players on different shards can't
+# commit in one transaction. It runs as three local ones instead:
+#   1. on the initiator's shard, its own half plus an outbox row describing
+#      the other half;
+#   2. on the other shard, that half, recorded in the inbox under the
+#      outbox id so that a replay is a no-op;
+#   3. back on the initiator's shard, an undo of step 1 if step 2 could not
+#      apply (the other player is gone), and removal of the outbox row.
+# Outbox rows left behind by a crash between the steps are finished by
+# `_recover_cross_shard` at startup.
+async def _refund_transfer(db, p: Dict) -> Optional[User]:
+    async with db.execute(
+        "UPDATE users SET coins = coins + ? WHERE user_id=? RETURNING *",
+        (p["amount"], p["from"])
+    ) as cur:
+        row = await cur.fetchone()
+    if row:
+        await _publish(db, "user", p["from"])
+        _ledger(0, p["from"], p["amount"], "transfer_refund", "Recipient not found")
+    return User.from_row(row)
+
+
+async def _add_friend_row(db, user_id: int, friend_id: int) -> bool:
+    await db.execute(
+        "INSERT OR IGNORE INTO friends (user_id, friend_id) VALUES (?,?)", (user_id, friend_id)
+    )
+    return True
+
+
+async def _remove_friend_row(db, p: Dict):
+    await db.execute(
+        "DELETE FROM friends WHERE user_id=? AND friend_id=?", (p["user"], p["friend"])
+    )
+
+
+# kind -> (apply the remote half: falsy if it could not, undo the local half)
+_REMOTE: Dict[str, tuple] = {
+    "transfer": (lambda db, p: _credit(db, p["to"], p["amount"]), _refund_transfer),
+    "marry":    (lambda db, p: _set_married_to(db, p["partner"], p["user"]),
+                 lambda db, p: _set_married_to(db, p["user"], None)),
+    "divorce":  (lambda db, p: _set_married_to(db, p["partner"], None), None),
+    "friend":   (lambda db, p: _add_friend_row(db, p["friend"], p["user"]), _remove_friend_row),
+}
+
+
+async def _cross_shard(kind: str, user_id: int, other_id: int, payload: Dict,
+                       local: Callable) -> tuple:
+    """Run `local(db)` on user_id's shard and the `kind` half on other_id's.
+    Returns (local's result, whether the remote half applied). If `local`
+    returns None nothing is written and the remote half is not attempted."""
+    op_id = uuid.uuid4().hex
+    src = _shard(user_id)
+    async with src.writer() as db:
+        result = await local(db)
+        if result is None:
+            return None, False
+        await db.execute(
+            "INSERT INTO shard_outbox (id, kind, user_id, payload) VALUES (?,?,?,?)",
+            (op_id, kind, other_id, json.dumps(payload))
+        )
+    if isinstance(result, User):
+        _users.put(result)
+    ok = await _finish_cross_shard(src, op_id, kind, other_id, payload)
+    return result, ok
+
+
+async def _finish_cross_shard(src: ConnectionPool, op_id: str, kind: str,
+                              other_id: int, payload: Dict) -> bool:
+    apply, undo = _REMOTE[kind]
+    applied = None
+    async with _shard(other_id).writer() as db:
+        async with db.execute("SELECT ok FROM shard_inbox WHERE id=?", (op_id,)) as cur:
+            seen = await cur.fetchone()
+        if seen is None:
+            applied = await apply(db, payload)
+            ok = applied is not None and applied is not False
+            await db.execute("INSERT INTO shard_inbox (id, ok) VALUES (?,?)", (op_id, ok))
+        else:
+            ok = bool(seen[0])
+    if isinstance(applied, User):
+        _users.put(applied)
+    elif seen is None:
+        _users.invalidate(other_id)
+    undone = None
+    async with src.writer() as db:
+        if not ok and undo is not None:
+            undone = await undo(db, payload)
+        await db.execute("DELETE FROM shard_outbox WHERE id=?", (op_id,))
+    if isinstance(undone, User):
+        _users.put(undone)
+    return ok
+
+
+async def _recover_cross_shard(inbox_keep: int = 86400):
+    """Finish every operation left in a shard outbox, then drop inbox
+    entries older than `inbox_keep` seconds — long after any replay."""
+    for src in _shards:
+        async with src.reader() as db:
+            async with db.execute(
+                "SELECT id, kind, user_id, payload FROM shard_outbox ORDER BY created_at"
+            ) as cur:
+                pending = await cur.fetchall()
+        for row in pending:
+            ok = await _finish_cross_shard(src, row["id"], row["kind"], row["user_id"],
+                                           json.loads(row["payload"]))
+            log.warning(f"🧩 Replayed cross-shard {row['kind']} {row['id']} (applied={ok})")
+    for shard in _shards:
+        async with shard.writer() as db:
+            await db.execute(
+                "DELETE FROM shard_inbox WHERE applied_at < ?", (now_ts() - inbox_keep,)
+            )
+
 # ─────────────────────────────────────────────
 # SOCIAL: FRIENDS, MARRIAGE
 # ─────────────────────────────────────────────
 async def add_friend(user_id: int, friend_id: int) -> bool:
     try:
-        async with aiosqlite.connect(DB_PATH) as db:
-            await db.execute(
-                "INSERT OR IGNORE INTO friends (user_id, friend_id) VALUES (?,?)",
-                (user_id, friend_id)
-            )
-            await db.execute(
-                "INSERT OR IGNORE INTO friends (user_id, friend_id) VALUES (?,?)",
-                (friend_id, user_id)
+        if _shard(user_id) is not _shard(friend_id):
+            _, ok = await _cross_shard(
+                "friend", user_id, friend_id, {"user": user_id, "friend": friend_id},
+                lambda db: _add_friend_row(db, user_id, friend_id)
             )
-            await db.commit()
+            return ok
+        async with _shard(user_id).writer() as db:
+            await _add_friend_row(db, user_id, friend_id)
+            await _add_friend_row(db, friend_id, user_id)
         return True
     except Exception:
         return False
 
-async def get_friends(user_id: int) -> List[Dict]:
-    async with aiosqlite.connect(DB_PATH) as db:
-        db.row_factory = aiosqlite.Row
-        async with db.execute("""
-            SELECT u.user_id, u.username, u.first_name, u.level, u.active_title
+async def _users_by_id(user_ids: Sequence[int], columns: str = "*") -> List[User]:
+    """Fetch users rows from whichever shards hold them (unordered)."""
+    by_shard: Dict[int, List[int]] = {}
+    for uid in user_ids:
+        by_shard.setdefault(_shard_index(uid), []).append(uid)
+    users = []
+    for i, ids in by_shard.items():
+        async with _shards[i].reader() as db:
+            async with db.execute(
+                f"SELECT {columns} FROM users WHERE user_id IN (SELECT value FROM json_each(?))",
+                (json.dumps(ids),)
+            ) as cur:
+                users += [User.from_row(r) for r in await cur.fetchall()]
+    return users
+
+async def get_friends(user_id: int) -> List[User]:
+    columns = "u.user_id, u.username, u.first_name, u.level, u.active_title"
+    if _sharded():
+        async with _shard(user_id).reader() as db:
+            async with db.execute(
+                "SELECT friend_id FROM friends WHERE user_id=?", (user_id,)
+            ) as cur:
+                ids = [r[0] for r in await cur.fetchall()]
+        return await _users_by_id(ids, columns.replace("u.", ""))
+    async with _shard(user_id).reader() as db:
+        async with db.execute(f"""
+            SELECT {columns}
             FROM friends f JOIN users u ON f.friend_id = u.user_id
             WHERE f.user_id=?
         """, (user_id,)) as cur:
             rows = await cur.fetchall()
-        return [dict(r) for r in rows]
+        return [User.from_row(r) for r in rows]
 
 async def are_friends(user_id: int, friend_id: int) -> bool:
-    async with aiosqlite.connect(DB_PATH) as db:
+    async with _shard(user_id).reader() as db:
         async with db.execute(
             "SELECT 1 FROM friends WHERE user_id=? AND friend_id=?", (user_id, friend_id)
         ) as cur:
             return await cur.fetchone() is not None
 
+async def _set_married_to(db, user_id: int, partner_id: Optional[int]) -> Optional[User]:
+    async with db.execute(
+        "UPDATE users SET married_to=? WHERE user_id=? RETURNING *", (partner_id, user_id)
+    ) as cur:
+        row = await cur.fetchone()
+    if row:
+        await _publish(db, "user", user_id)
+    return User.from_row(row)
+
 async def marry(user1_id: int, user2_id: int) -> bool:
-    async with aiosqlite.connect(DB_PATH) as db:
-        await db.execute(
-            "UPDATE users SET married_to=? WHERE user_id=?", (user2_id, user1_id)
-        )
-        await db.execute(
-            "UPDATE users SET married_to=? WHERE user_id=?", (user1_id, user2_id)
+    if _shard(user1_id) is not _shard(user2_id):
+        _, ok = await _cross_shard(
+            "marry", user1_id, user2_id, {"user": user1_id, "partner": user2_id},
+            lambda db: _set_married_to(db, user1_id, user2_id)
         )
-        await db.commit()
+        return ok
+    async with _shard(user1_id).writer() as db:
+        rows = [await _set_married_to(db, user1_id, user2_id),
+                await _set_married_to(db, user2_id, user1_id)]
+    for row in rows:
+        _users.put(row)
     return True
 
 async def divorce(user_id: int) -> Optional[int]:
     user = await get_user(user_id)
-    if not user or not user["married_to"]:
+    if not user or not user.married_to:
         return None
-    partner_id = user["married_to"]
-    async with aiosqlite.connect(DB_PATH) as db:
-        await db.execute("UPDATE users SET married_to=NULL WHERE user_id=?", (user_id,))
-        await db.execute("UPDATE users SET married_to=NULL WHERE user_id=?", (partner_id,))
-        await db.commit()
+    partner_id = user.married_to
+    if _shard(user_id) is not _shard(partner_id):
+        await _cross_shard(
+            "divorce", user_id, partner_id, {"user": user_id, "partner": partner_id},
+            lambda db: _set_married_to(db, user_id, None)
+        )
+        return partner_id
+    async with _shard(user_id).writer() as db:
+        rows = [await _set_married_to(db, user_id, None),
+                await _set_married_to(db, partner_id, None)]
+    for row in rows:
+        _users.put(row)
     return partner_id
 
-async def give_coins(from_id: int, to_id: int, amount: int) -> Dict:
-    sender = await get_user(from_id)
-    if not sender:
+async def _give_coins_cross_shard(from_id: int, to_id: int, amount: int) -> Dict:
+    if await get_user(to_id) is None:
+        return {"success": False, "message": "Recipient not found"}
+
+    async def local(db):
+        sender = await _debit(db, from_id, amount)
+        if sender is not None:
+            _ledger(from_id, to_id, amount, "transfer", "Coin gift")
+        return sender
+
+    sender, ok = await _cross_shard(
+        "transfer", from_id, to_id, {"from": from_id, "to": to_id, "amount": amount}, local
+    )
+    if sender is None:
+        user = await get_user(from_id)
+        if user is None:
+            return {"success": False, "message": "Sender not found"}
+        return {"success": False, "message": f"Insufficient coins! You have {user.coins:,}"}
+    if not ok:
+        return {"success": False, "message": "Recipient not found"}
+    return {"success": True, "balance": sender.coins}
+
+async def _hot_give_coins(from_id: int, to_id: int, amount: int) -> Dict:
+    # both players are in this process's memory, so no cross-shard saga
+    if await _hot_row(to_id) is None:
+        return {"success": False, "message": "Recipient not found"}
+    sender = await _hot_row(from_id)
+    if sender is None:
         return {"success": False, "message": "Sender not found"}
-    if sender["coins"] < amount:
-        return {"success": False, "message": f"Insufficient coins! You have {sender['coins']:,}"}
+    sender = _hot.change(from_id, incrs={"coins": -amount}, floor=amount)
+    if sender is None:
+        have = _users.get(from_id) or await _hot_row(from_id)
+        return {"success": False, "message": f"Insufficient coins! You have {have.coins:,}"}
+    _hot_credit(to_id, amount)
+    _hot_ledger(from_id, from_id, to_id, amount, "transfer", "Coin gift")
+    await _hot_durable()
+    return {"success": True, "balance": sender.coins}
+
+async def give_coins(from_id: int, to_id: int, amount: int) -> Dict:
     if amount <= 0:
         return {"success": False, "message": "Amount must be positive"}
-    async with aiosqlite.connect(DB_PATH) as db:
-        await db.execute("UPDATE users SET coins = coins - ? WHERE user_id=?", (amount, from_id))
-        await db.execute("UPDATE users SET coins = coins + ? WHERE user_id=?", (amount, to_id))
-        await db.execute(
-            "INSERT INTO transactions (from_user, to_user, amount, tx_type, note) VALUES (?,?,?,?,?)",
-            (from_id, to_id, amount, "transfer", f"Coin gift")
-        )
-        await db.commit()
-    return {"success": True}
+    if _hot is not None:
+        return await _hot_give_coins(from_id, to_id, amount)
+    if _shard(from_id) is not _shard(to_id):
+        return await _give_coins_cross_shard(from_id, to_id, amount)
+    async with _shard(from_id).writer() as db:
+        if await _balance(db, to_id) is None:
+            return {"success": False, "message": "Recipient not found"}
+        sender = await _debit(db, from_id, amount)
+        if sender is None:
+            have = await _balance(db, from_id)
+            if have is None:
+                return {"success": False, "message": "Sender not found"}
+            return {"success": False, "message": f"Insufficient coins! You have {have:,}"}
+        recipient = await _credit(db, to_id, amount)
+        _ledger(from_id, to_id, amount, "transfer", "Coin gift")
+    _users.put(sender)
+    _users.put(recipient)
+    return {"success": True, "balance": sender.coins}
 
 # ─────────────────────────────────────────────
 # LEADERBOARD
 # ─────────────────────────────────────────────
-async def get_top_users(limit: int = 10) -> List[Dict]:
-    async with aiosqlite.connect(DB_PATH) as db:
-        db.row_factory = aiosqlite.Row
-        async with db.execute(
-            "SELECT user_id, username, first_name, coins, level, active_title "
-            "FROM users ORDER BY coins DESC LIMIT ?", (limit,)
-        ) as cur:
-            rows = await cur.fetchall()
-        return [dict(r) for r in rows]
+# Each shard returns its own top `limit`; the overall top is among them.
+async def get_top_users(limit: int = 10) -> List[User]:
+    rows = await _gather_shards(
+        "SELECT user_id, username, first_name, coins, level, active_title "
+        "FROM users ORDER BY coins DESC LIMIT ?", (limit,)
+    )
+    rows.sort(key=lambda r: r["coins"], reverse=True)
+    return [User.from_row(r) for r in rows[:limit]]
 
 async def get_weekly_top(limit: int = 10) -> List[Dict]:
-    async with aiosqlite.connect(DB_PATH) as db:
-        db.row_factory = aiosqlite.Row
-        async with db.execute(
-            "SELECT * FROM weekly_board ORDER BY weekly_coins DESC LIMIT ?", (limit,)
-        ) as cur:
-            rows = await cur.fetchall()
-        return [dict(r) for r in rows]
+    # Under the counter lock, so each pending delta is counted once. Only
+    # players with pending deltas can overtake one of the SQL top rows, so
+    # reading that many extra rows, plus those players, is enough.
+    async with _counters.lock:
+        waiting = _counters.keys("weekly_board")
+        rows = await _gather_shards(
+            "SELECT * FROM weekly_board ORDER BY weekly_coins DESC LIMIT ?",
+            (limit + len(waiting),)
+        )
+        if waiting:
+            rows += await _gather_shards(
+                "SELECT * FROM weekly_board WHERE user_id IN (SELECT value FROM json_each(?))",
+                (json.dumps(list(waiting)),)
+            )
+        board = {r["user_id"]: dict(r) for r in rows}
+        for user_id in waiting & board.keys():
+            board[user_id]["weekly_coins"] += _counters.pending("weekly_board", user_id).get("weekly_coins", 0)
+    top = sorted(board.values(), key=lambda r: r["weekly_coins"], reverse=True)
+    return top[:limit]
 
 async def reset_weekly_board():
-    async with aiosqlite.connect(DB_PATH) as db:
-        await db.execute("DELETE FROM weekly_board")
-        await db.commit()
+    await _hot_flush()
+    async with _counters.lock:
+        _counters.drop("weekly_board")
+        for shard in _shards:
+            async with shard.writer() as db:
+                await db.execute("DELETE FROM weekly_board")
 
 # ─────────────────────────────────────────────
 # MISSIONS
 # ─────────────────────────────────────────────
 async def init_missions(daily_list: list, weekly_list: list):
-    async with aiosqlite.connect(DB_PATH) as db:
+    async with _pool.writer() as db:
         for m in daily_list:
             await db.execute("""
                 INSERT OR IGNORE INTO missions
@@ -659,140 +2362,265 @@ async def init_missions(daily_list: list, weekly_list: list):
                 (mission_key, name, description, mission_type, requirement, reward, period)
                 VALUES (?,?,?,?,?,?,?)
             """, (m["id"], m["name"], m["desc"], m["type"], m["req"], m["reward"], "weekly"))
-        await db.commit()
-
-async def get_user_missions(user_id: int) -> List[Dict]:
-    from datetime import datetime, timedelta
-    now = datetime.utcnow()
-    today_end = (now.date() + timedelta(days=1)).strftime("%Y-%m-%d 00:00:00")
-    week_end  = (now.date() + timedelta(days=(7 - now.weekday()))).strftime("%Y-%m-%d 00:00:00")
-
-    async with aiosqlite.connect(DB_PATH) as db:
-        db.row_factory = aiosqlite.Row
-        rows = []
-        async with db.execute("SELECT * FROM missions") as cur:
-            missions = await cur.fetchall()
+    await _mirror_catalog("missions")
+    _definitions.pop("missions", None)
+
+def _period_end(period: str) -> int:
+    """Epoch of the next daily (UTC midnight) or weekly (Monday) reset."""
+    from datetime import timedelta
+    today = datetime.utcnow().date()
+    if period == "daily":
+        return utc_day_start(today + timedelta(days=1))
+    return utc_day_start(today + timedelta(days=(7 - today.weekday())))
+
+async def get_user_missions(user_id: int) -> List[Mission]:
+    today_end = _period_end("daily")
+    week_end  = _period_end("weekly")
+
+    async with _shard(user_id).writer() as db:
+        await db.execute("""
+            INSERT OR IGNORE INTO user_missions (user_id, mission_key, reset_at)
+            SELECT ?, mission_key, CASE period WHEN 'daily' THEN ? ELSE ? END FROM missions
+        """, (user_id, today_end, week_end))
+        async with db.execute("""
+            SELECT m.*, um.user_id, um.progress, um.completed, um.reset_at
+            FROM missions m
+            JOIN user_missions um ON um.mission_key = m.mission_key AND um.user_id=?
+            ORDER BY m.id
+        """, (user_id,)) as cur:
+            rows = await cur.fetchall()
+    missions = [Mission.from_row(r) for r in rows]
+    if _hot is not None:
+        mine = _hot.adopt_missions(
+            user_id, [(m.mission_key, m.progress, m.completed, m.reset_at) for m in missions]
+        )
         for m in missions:
-            m = dict(m)
-            reset_at = today_end if m["period"] == "daily" else week_end
-            async with db.execute("""
-                INSERT OR IGNORE INTO user_missions (user_id, mission_key, reset_at)
-                VALUES (?,?,?)
-            """, (user_id, m["mission_key"], reset_at)) as _:
-                pass
-            await db.commit()
-            async with db.execute(
-                "SELECT * FROM user_missions WHERE user_id=? AND mission_key=?",
-                (user_id, m["mission_key"])
-            ) as cur2:
-                um = await cur2.fetchone()
-            if um:
-                m.update(dict(um))
-                rows.append(m)
-        return rows
+            m.progress, m.completed, m.reset_at = mine[m.mission_key]
+    return missions
 
 async def update_mission_progress(user_id: int, mission_type: str, delta: int = 1):
-    from datetime import datetime
-    now = datetime.utcnow().strftime("%Y-%m-%d %H:%M:%S")
-    async with aiosqlite.connect(DB_PATH) as db:
-        db.row_factory = aiosqlite.Row
-        async with db.execute(
-            "SELECT * FROM missions WHERE mission_type=?", (mission_type,)
-        ) as cur:
-            missions = [dict(r) for r in await cur.fetchall()]
-        rewards = []
-        for m in missions:
-            async with db.execute(
-                "SELECT * FROM user_missions WHERE user_id=? AND mission_key=?",
-                (user_id, m["mission_key"])
-            ) as cur2:
-                um = await cur2.fetchone()
-            if um:
-                um = dict(um)
-                # Check if expired
-                if um["reset_at"] and now > um["reset_at"]:
-                    await db.execute(
-                        "UPDATE user_missions SET progress=0, completed=0 WHERE user_id=? AND mission_key=?",
-                        (user_id, m["mission_key"])
-                    )
-                    um["progress"] = 0
-                    um["completed"] = 0
-                if not um["completed"]:
-                    new_prog = min(um["progress"] + delta, m["requirement"])
-                    completed = 1 if new_prog >= m["requirement"] else 0
-                    await db.execute(
-                        "UPDATE user_missions SET progress=?, completed=? WHERE user_id=? AND mission_key=?",
-                        (new_prog, completed, user_id, m["mission_key"])
-                    )
-                    if completed and not um["completed"]:
-                        rewards.append({"mission": m["name"], "reward": m["reward"]})
-        await db.commit()
+    if _hot is not None:
+        rewards = await _hot_mission_progress(user_id, mission_type, delta)
+        await _hot_durable()
         return rewards
+    async with _shard(user_id).writer() as db:
+        return await _apply_mission_progress(db, user_id, mission_type, delta)
+
+def _advance_mission(mission, progress: int, completed: int, reset_at: Optional[int],
+                     delta: int, now: int) -> Optional[tuple]:
+    """(progress, completed, reset_at) after `delta` more of `mission`'s
+    requirement, or None if it is already complete for this period."""
+    # Expired: start the next period
+    if reset_at and now > reset_at:
+        progress, completed, reset_at = 0, 0, _period_end(mission["period"])
+    if completed:
+        return None
+    new_prog = min(progress + delta, mission["requirement"])
+    return new_prog, 1 if new_prog >= mission["requirement"] else 0, reset_at
+
+async def _apply_mission_progress(db, user_id: int, mission_type: str, delta: int) -> List[Dict]:
+    """Advance matching missions on an already checked-out writer connection."""
+    now = now_ts()
+    async with db.execute("""
+        SELECT m.mission_key, m.name, m.requirement, m.reward, m.period,
+               um.progress, um.completed, um.reset_at
+        FROM missions m
+        JOIN user_missions um ON um.user_id=? AND um.mission_key = m.mission_key
+        WHERE m.mission_type=?
+    """, (user_id, mission_type)) as cur:
+        rows = await cur.fetchall()
+    rewards = []
+    for r in rows:
+        step = _advance_mission(r, r["progress"], r["completed"], r["reset_at"], delta, now)
+        if step is None:
+            continue
+        await db.execute(
+            "UPDATE user_missions SET progress=?, completed=?, reset_at=? WHERE user_id=? AND mission_key=?",
+            (*step, user_id, r["mission_key"])
+        )
+        if step[1]:
+            rewards.append({"mission": r["name"], "reward": r["reward"]})
+    return rewards
+
+async def _hot_mission_progress(user_id: int, mission_type: str, delta: int) -> List[Dict]:
+    """`_apply_mission_progress` against the in-memory mission rows."""
+    mine = _hot.missions.get(user_id)
+    if mine is None:
+        async with _shard(user_id).reader() as db:
+            async with db.execute(
+                "SELECT mission_key, progress, completed, reset_at FROM user_missions WHERE user_id=?",
+                (user_id,)
+            ) as cur:
+                mine = _hot.adopt_missions(user_id, [tuple(r) for r in await cur.fetchall()])
+    defs = _definitions.get("missions")
+    if defs is None:
+        async with _pool.reader() as db:
+            async with db.execute(
+                "SELECT mission_key, name, mission_type, requirement, reward, period FROM missions"
+            ) as cur:
+                defs = _definitions["missions"] = [dict(r) for r in await cur.fetchall()]
+    now = now_ts()
+    rewards = []
+    for m in defs:
+        state = mine.get(m["mission_key"]) if m["mission_type"] == mission_type else None
+        if state is None:
+            continue
+        step = _advance_mission(m, *state, delta, now)
+        if step is None:
+            continue
+        _hot.set_mission(user_id, m["mission_key"], *step)
+        if step[1]:
+            rewards.append({"mission": m["name"], "reward": m["reward"]})
+    return rewards
+
+# ─────────────────────────────────────────────
+# EARNED BITMASKS
+# ─────────────────────────────────────────────
+# Every achievement and title definition owns a fixed bit (`bit` column,
+# assigned on first insert and never reused). What a player has earned is
+# `users.ach_mask` / `users.title_mask`, so "already earned?" is a bit test
+# on the cached users row. user_achievements / user_titles remain as an
+# append-only log of when each one was earned, read only for display.
+_MAX_BITS = 63        # SQLite integers are signed 64-bit
+
+_definitions: Dict[str, List[Dict]] = {}
+
+
+async def _load_definitions(table: str, db=None) -> List[Dict]:
+    """Definition rows of `table` ('achievements' or 'titles'), each with its
+    `mask`. Read once and kept in memory; `init_*` drops the cached copy."""
+    defs = _definitions.get(table)
+    if defs is not None:
+        return defs
+    if db is None:
+        async with _pool.reader() as conn:
+            return await _load_definitions(table, conn)
+    async with db.execute(f"SELECT * FROM {table} WHERE bit IS NOT NULL ORDER BY bit") as cur:
+        defs = [dict(r) for r in await cur.fetchall()]
+    for d in defs:
+        d["mask"] = 1 << d["bit"]
+    _definitions[table] = defs
+    return defs
+
+
+async def _seed_definitions(table: str, columns: Sequence[str], rows: List[tuple]):
+    """INSERT OR IGNORE definitions; each new one takes the next free bit."""
+    async with _pool.writer() as db:
+        for values in rows:
+            await db.execute(f"""
+                INSERT OR IGNORE INTO {table} ({', '.join(columns)}, bit)
+                VALUES ({', '.join('?' * len(columns))},
+                        (SELECT COALESCE(MAX(bit) + 1, 0) FROM {table}))
+            """, values)
+        async with db.execute(f"SELECT MAX(bit) FROM {table}") as cur:
+            top = (await cur.fetchone())[0]
+        if top is not None and top >= _MAX_BITS:
+            raise ValueError(f"Too many {table}: a bitmask holds at most {_MAX_BITS}")
+    _definitions.pop(table, None)
+    await _mirror_catalog(table)
+
+
+async def _record_earned(db, user: User, mask_col: str, log_table: str, key: str,
+                         earned: List[Dict]) -> List[Dict]:
+    """Set the bits of `earned` on the users row and log each one, updating
+    `user` in place. Returns the entries whose bit was not already set —
+    a concurrent grant may have got there first."""
+    async with db.execute(
+        f"SELECT {mask_col} FROM users WHERE user_id=?", (user.user_id,)
+    ) as cur:
+        row = await cur.fetchone()
+    if row is None:
+        return []
+    fresh = [d for d in earned if not row[0] & d["mask"]]
+    if not fresh:
+        return []
+    await db.executemany(
+        f"INSERT OR IGNORE INTO {log_table} (user_id, {key}) VALUES (?,?)",
+        [(user.user_id, d[key]) for d in fresh]
+    )
+    async with db.execute(
+        f"UPDATE users SET {mask_col} = {mask_col} | ? WHERE user_id=? RETURNING *",
+        (sum(d["mask"] for d in fresh), user.user_id)
+    ) as cur:
+        user.update(User.from_row(await cur.fetchone()))
+    await _publish(db, "user", user.user_id)
+    return fresh
 
 # ─────────────────────────────────────────────
 # ACHIEVEMENTS
 # ─────────────────────────────────────────────
 async def init_achievements(ach_list: list):
-    async with aiosqlite.connect(DB_PATH) as db:
-        for a in ach_list:
-            await db.execute("""
-                INSERT OR IGNORE INTO achievements
-                (ach_key, name, description, badge, req_type, req_value)
-                VALUES (?,?,?,?,?,?)
-            """, (a["id"], a["name"], a["desc"], a["badge"], a["req_type"], a["req_value"]))
-        await db.commit()
+    await _seed_definitions(
+        "achievements", ("ach_key", "name", "description", "badge", "req_type", "req_value"),
+        [(a["id"], a["name"], a["desc"], a["badge"], a["req_type"], a["req_value"]) for a in ach_list]
+    )
 
 async def check_achievements(user_id: int) -> List[Dict]:
-    """Check and grant new achievements. Returns list of newly earned."""
+    """Check and grant new achievements. Returns list of newly earned.
+    Only takes a writer slot when something was actually earned."""
     user = await get_user(user_id)
     if not user:
         return []
-    new_earned = []
-    async with aiosqlite.connect(DB_PATH) as db:
-        db.row_factory = aiosqlite.Row
-        async with db.execute(
-            "SELECT ach_key FROM user_achievements WHERE user_id=?", (user_id,)
-        ) as cur:
-            already = {r[0] for r in await cur.fetchall()}
-        async with db.execute("SELECT * FROM achievements") as cur:
-            all_achs = [dict(r) for r in await cur.fetchall()]
+    await _load_catalog()
+    async with _shard(user_id).reader() as db:
+        pending = await _pending_achievements(db, user)
+    if not pending:
+        return []
+    user = user.copy()
+    async with _shard(user_id).writer() as db:
+        earned = await _record_earned(db, user, "ach_mask", "user_achievements", "ach_key", pending)
+    if earned:
+        _users.put(user)
+    return earned
+
+async def _grant_achievements(db, user: User, owned: int) -> List[Dict]:
+    """Evaluate and record achievements on a writer connection, so friend
+    checks also see writes made earlier in the same transaction; `owned`
+    must include any catches made in it. Updates `user` in place."""
+    pending = await _pending_achievements(db, user, owned)
+    if not pending:
+        return []
+    return await _record_earned(db, user, "ach_mask", "user_achievements", "ach_key", pending)
+
+async def _pending_achievements(db, user: User, owned: Optional[int] = None) -> List[Dict]:
+    """Achievements `user` now qualifies for but has not earned yet.
+    `owned` is the player's card bitset, read from `db` if not given."""
+    user_id = user.user_id
+    mask = user.ach_mask or 0
+    pending = []
+    for a in await _load_definitions("achievements", db):
+        if mask & a["mask"]:
+            continue
+        earned = False
+        rt, rv = a["req_type"], a["req_value"]
+        if rt == "catch_count"   and user.total_caught >= rv:     earned = True
+        elif rt == "coins"       and user.coins >= rv:            earned = True
+        elif rt == "level"       and user.level >= rv:            earned = True
+        elif rt == "streak"      and user.streak >= rv:           earned = True
+        elif rt == "jackpot"     and user.jackpots >= rv:         earned = True
+        elif rt == "combo"       and user.best_combo >= rv:       earned = True
+        elif rt == "married"     and user.married_to is not None: earned = True
+        elif rt == "days_played" and user.days_played >= rv:      earned = True
+        elif rt == "catch_legendary":
+            if owned is None:
+                owned = await _owned_cards(db, user_id)
+            earned = _owns_rarities(owned, ["Legendary"])
+        elif rt == "friends":
+            async with db.execute(
+                "SELECT COUNT(*) FROM friends WHERE user_id=?", (user_id,)
+            ) as cur:
+                earned = (await cur.fetchone())[0] >= rv
+        elif rt == "all_rarities":
+            if owned is None:
+                owned = await _owned_cards(db, user_id)
+            earned = _owns_rarities(owned, ["Common", "Uncommon", "Rare", "Epic", "Legendary"])
 
-        for a in all_achs:
-            if a["ach_key"] in already:
-                continue
-            earned = False
-            rt, rv = a["req_type"], a["req_value"]
-            if rt == "catch_count"   and user["total_caught"] >= rv:     earned = True
-            elif rt == "coins"       and user["coins"] >= rv:             earned = True
-            elif rt == "level"       and user["level"] >= rv:             earned = True
-            elif rt == "streak"      and user["streak"] >= rv:            earned = True
-            elif rt == "jackpot"     and user["jackpots"] >= rv:          earned = True
-            elif rt == "combo"       and user["best_combo"] >= rv:        earned = True
-            elif rt == "married"     and user.get("married_to") is not None: earned = True
-            elif rt == "days_played" and user["days_played"] >= rv:       earned = True
-            elif rt == "catch_legendary":
-                has_leg = await user_has_rarity(user_id, "Legendary")
-                earned = has_leg
-            elif rt == "friends":
-                friends = await get_friends(user_id)
-                earned  = len(friends) >= rv
-            elif rt == "all_rarities":
-                all_r   = all(await user_has_rarity(user_id, r)
-                               for r in ["Common","Uncommon","Rare","Epic","Legendary"])
-                earned  = all_r
-
-            if earned:
-                await db.execute(
-                    "INSERT OR IGNORE INTO user_achievements (user_id, ach_key) VALUES (?,?)",
-                    (user_id, a["ach_key"])
-                )
-                new_earned.append(a)
-        await db.commit()
-    return new_earned
+        if earned:
+            pending.append(a)
+    return pending
 
 async def get_user_achievements(user_id: int) -> List[Dict]:
-    async with aiosqlite.connect(DB_PATH) as db:
-        db.row_factory = aiosqlite.Row
+    async with _shard(user_id).reader() as db:
         async with db.execute("""
             SELECT a.*, ua.earned_at
             FROM user_achievements ua
@@ -807,17 +2635,13 @@ async def get_user_achievements(user_id: int) -> List[Dict]:
 # TITLES
 # ─────────────────────────────────────────────
 async def init_titles(title_list: list):
-    async with aiosqlite.connect(DB_PATH) as db:
-        for t in title_list:
-            await db.execute("""
-                INSERT OR IGNORE INTO titles (title_key, name, description, condition, emoji)
-                VALUES (?,?,?,?,?)
-            """, (t["id"], t["name"], t["desc"], t["condition"], t["emoji"]))
-        await db.commit()
+    await _seed_definitions(
+        "titles", ("title_key", "name", "description", "condition", "emoji"),
+        [(t["id"], t["name"], t["desc"], t["condition"], t["emoji"]) for t in title_list]
+    )
 
 async def get_user_titles(user_id: int) -> List[Dict]:
-    async with aiosqlite.connect(DB_PATH) as db:
-        db.row_factory = aiosqlite.Row
+    async with _shard(user_id).reader() as db:
         async with db.execute("""
             SELECT t.*, ut.earned_at
             FROM user_titles ut JOIN titles t ON ut.title_key = t.title_key
@@ -826,52 +2650,252 @@ async def get_user_titles(user_id: int) -> List[Dict]:
             rows = await cur.fetchall()
         return [dict(r) for r in rows]
 
+async def earned_title_keys(user: User) -> Set[str]:
+    """Title keys set in `user.title_mask` (no query once definitions are loaded)."""
+    mask = user.title_mask or 0
+    return {t["title_key"] for t in await _load_definitions("titles") if mask & t["mask"]}
+
 async def grant_title(user_id: int, title_key: str):
-    async with aiosqlite.connect(DB_PATH) as db:
-        await db.execute(
-            "INSERT OR IGNORE INTO user_titles (user_id, title_key) VALUES (?,?)",
-            (user_id, title_key)
-        )
-        await db.commit()
+    defs = [t for t in await _load_definitions("titles") if t["title_key"] == title_key]
+    if not defs:
+        return
+    user = User(user_id=user_id)
+    async with _shard(user_id).writer() as db:
+        earned = await _record_earned(db, user, "title_mask", "user_titles", "title_key", defs)
+    if earned:
+        _users.put(user)
 
 async def check_titles(user_id: int) -> List[Dict]:
     user = await get_user(user_id)
     if not user:
         return []
-    new_titles = []
-    async with aiosqlite.connect(DB_PATH) as db:
-        db.row_factory = aiosqlite.Row
-        async with db.execute(
-            "SELECT title_key FROM user_titles WHERE user_id=?", (user_id,)
-        ) as cur:
-            already = {r[0] for r in await cur.fetchall()}
-        async with db.execute("SELECT * FROM titles") as cur:
-            all_titles = [dict(r) for r in await cur.fetchall()]
+    await _load_catalog()
+    async with _shard(user_id).reader() as db:
+        pending = await _pending_titles(db, user)
+    if not pending:
+        return []
+    user = user.copy()
+    async with _shard(user_id).writer() as db:
+        earned = await _record_earned(db, user, "title_mask", "user_titles", "title_key", pending)
+    if earned:
+        _users.put(user)
+    return earned
+
+async def _grant_titles(db, user: User, owned: int) -> List[Dict]:
+    pending = await _pending_titles(db, user, owned)
+    if not pending:
+        return []
+    return await _record_earned(db, user, "title_mask", "user_titles", "title_key", pending)
+
+async def _pending_titles(db, user: User, owned: Optional[int] = None) -> List[Dict]:
+    user_id = user.user_id
+    mask = user.title_mask or 0
+    pending = []
+    for t in await _load_definitions("titles", db):
+        if mask & t["mask"]:
+            continue
+        cond = t["condition"]
+        earned = False
+        if cond == "default":                                   earned = True
+        elif cond == "catch_20"   and user.total_caught >= 20: earned = True
+        elif cond == "own_legendary":
+            if owned is None:
+                owned = await _owned_cards(db, user_id)
+            earned = _owns_rarities(owned, ["Legendary"])
+        elif cond == "coins_100k" and user.coins >= 100000:   earned = True
+        elif cond == "married"    and user.married_to:        earned = True
+        elif cond == "combo_15"   and user.best_combo >= 15:  earned = True
+        elif cond == "level_25"   and user.level >= 25:       earned = True
+        elif cond == "streak_30"  and user.streak >= 30:      earned = True
+        elif cond == "slots_win_10k" and user.slots_wins >= 10000: earned = True
+
+        if earned:
+            pending.append(t)
+    return pending
 
-        for t in all_titles:
-            if t["title_key"] in already:
-                continue
-            cond = t["condition"]
-            earned = False
-            if cond == "default":                                   earned = True
-            elif cond == "catch_20"   and user["total_caught"] >= 20: earned = True
-            elif cond == "own_legendary":
-                earned = await user_has_rarity(user_id, "Legendary")
-            elif cond == "coins_100k" and user["coins"] >= 100000:  earned = True
-            elif cond == "married"    and user.get("married_to"):    earned = True
-            elif cond == "combo_15"   and user["best_combo"] >= 15:  earned = True
-            elif cond == "level_25"   and user["level"] >= 25:       earned = True
-            elif cond == "streak_30"  and user["streak"] >= 30:      earned = True
-            elif cond == "slots_win_10k" and user["slots_wins"] >= 10000: earned = True
-
-            if earned:
-                await db.execute(
-                    "INSERT OR IGNORE INTO user_titles (user_id, title_key) VALUES (?,?)",
-                    (user_id, t["title_key"])
-                )
-                new_titles.append(t)
-        await db.commit()
-    return new_titles
+# ─────────────────────────────────────────────
+# UNIT OF WORK
+# ─────────────────────────────────────────────
+class UnitOfWork:
+    """Request-scoped view of one player's state.
+
+    The `users` row is loaded once; every change made through this object is
+    applied to `uow.user` immediately (so the handler sees its own writes)
+    and recorded as a dirty field. `flush()` writes everything in one
+    BEGIN IMMEDIATE transaction. If the handler raises before flushing,
+    nothing is written.
+
+    Coin changes are applied as one conditional delta: when the buffered
+    debits dig below the starting balance, the flush raises
+    InsufficientCoins (and writes nothing) unless the live balance covers
+    the deepest point they reach. Credit-only changes are never refused,
+    even on a negative balance.
+
+    Missions the flush completes are listed in `mission_rewards`; like
+    `update_mission_progress`, the flush does not pay their reward.
+
+    With HOT_STATE on, the users row, ledger, weekly board and missions go
+    to the hot state journal; only catches and earned achievements/titles
+    still open an SQLite transaction.
+    """
+
+    def __init__(self, user: User):
+        self.user_id = user.user_id
+        self.user    = user.copy()
+        self._sets:     Dict[str, Any] = {}
+        self._incrs:    Dict[str, int] = {}
+        self._ledger:   List[tuple]    = []
+        self._weekly    = 0
+        self._coin_run  = 0
+        self._coin_floor = 0
+        self._cards:    List[int]      = []
+        self._missions: List[tuple]    = []
+        self._want_achs   = False
+        self._want_titles = False
+        self.new_achievements: List[Dict] = []
+        self.new_titles:       List[Dict] = []
+        self.mission_rewards:  List[Dict] = []
+        self.card_counts:      Dict[int, int] = {}   # card_id -> copies owned after flush
+
+    @property
+    def dirty(self) -> bool:
+        return bool(self._sets or self._incrs or self._ledger or self._cards
+                    or self._missions or self._want_achs or self._want_titles)
+
+    # ── buffered mutations ─────────────────────
+    def set(self, **fields):
+        for k, v in fields.items():
+            setattr(self.user, k, v)
+            self._sets[k] = v
+            self._incrs.pop(k, None)
+
+    def incr(self, field: str, delta: int):
+        value = (getattr(self.user, field) or 0) + delta
+        setattr(self.user, field, value)
+        if field in self._sets:
+            self._sets[field] = value
+        else:
+            self._incrs[field] = self._incrs.get(field, 0) + delta
+
+    def add_coins(self, amount: int, tx_type: str = "reward", from_user: int = 0, note: str = ""):
+        self.incr("coins", amount)
+        self._ledger.append((from_user, self.user_id, amount, tx_type, note))
+        self._coin_run += amount
+        self._coin_floor = max(self._coin_floor, -self._coin_run)
+        if amount > 0:
+            self._weekly += amount
+
+    def add_xp(self, amount: int) -> Dict:
+        # level is recomputed from xp in SQL on flush; keep the view in step
+        old_level = self.user.level
+        self.incr("xp", amount)
+        new_level = _level_up(old_level, self.user.xp)
+        self.user.level = new_level
+        return {"leveled_up": new_level > old_level, "new_level": new_level, "xp": self.user.xp}
+
+    def add_card(self, card_id: int):
+        self._cards.append(card_id)
+        self.incr("total_caught", 1)
+
+    def update_mission_progress(self, mission_type: str, delta: int = 1):
+        self._missions.append((mission_type, delta))
+
+    def check_achievements(self):
+        self._want_achs = True
+
+    def check_titles(self):
+        self._want_titles = True
+
+    # ── commit ─────────────────────────────────
+    async def _flush_hot(self) -> bool:
+        """Hot columns, ledger, weekly board and missions into the hot state."""
+        written = False
+        sets  = {k: v for k, v in self._sets.items() if k in HOT_FIELDS}
+        incrs = {k: v for k, v in self._incrs.items() if k in HOT_FIELDS}
+        if sets or incrs:
+            if await _hot_row(self.user_id) is None:
+                raise InsufficientCoins(None)
+            row = _hot.change(self.user_id, sets, incrs, floor=self._coin_floor)
+            if row is None:
+                raise InsufficientCoins(_users.get(self.user_id).coins)
+            self.user.update(row)
+            written = True
+        for entry in self._ledger:
+            _hot_ledger(self.user_id, *entry)
+        if self._weekly:
+            _hot.record("w", self.user_id, self._weekly)
+        for mission_type, delta in self._missions:
+            self.mission_rewards += await _hot_mission_progress(self.user_id, mission_type, delta)
+        return written
+
+    async def flush(self) -> "UnitOfWork":
+        if not self.dirty:
+            return self
+        sets, incrs, floor = self._sets, self._incrs, self._coin_floor
+        written = False
+        if _hot is not None:
+            written = await self._flush_hot()
+            sets  = {k: v for k, v in sets.items() if k not in HOT_FIELDS}
+            incrs = {k: v for k, v in incrs.items() if k not in HOT_FIELDS}
+            floor = 0
+        if self._want_achs or self._want_titles:
+            await _load_catalog()
+        if _hot is None or sets or incrs or self._cards or self._want_achs or self._want_titles:
+            async with _shard(self.user_id).writer() as db:
+                if sets or incrs:
+                    cols = [f"{k}=?" for k in sets] + [f"{k}={k}+?" for k in incrs]
+                    vals = list(sets.values()) + list(incrs.values())
+                    if "xp" in incrs:
+                        cols.append(f"level={_LEVEL_SQL}")
+                        vals += [_LEVEL_THRESHOLDS, incrs["xp"]]
+                    where, params = "user_id=?", [self.user_id]
+                    if floor > 0:
+                        where += " AND coins >= ?"
+                        params.append(floor)
+                    async with db.execute(
+                        f"UPDATE users SET {', '.join(cols)} WHERE {where} RETURNING *",
+                        vals + params
+                    ) as cur:
+                        row = await cur.fetchone()
+                    if row is None:
+                        raise InsufficientCoins(await _balance(db, self.user_id))
+                    self.user.update(User.from_row(row))
+                    await _publish(db, "user", self.user_id)
+                    written = True
+                elif self._cards:
+                    await _publish(db, "owned", self.user_id)
+                if _hot is None:
+                    for entry in self._ledger:
+                        _ledger(*entry)
+                    if self._weekly:
+                        _count("weekly_board", self.user_id, "weekly_coins", self._weekly)
+                    for mission_type, delta in self._missions:
+                        self.mission_rewards += await _apply_mission_progress(db, self.user_id, mission_type, delta)
+                for cid in self._cards:
+                    async with db.execute(_CATCH_SQL, (self.user_id, cid)) as cur:
+                        self.card_counts[cid] = (await cur.fetchone())[0]
+                if self._want_achs or self._want_titles:
+                    owned = await _owned_cards(db, self.user_id, fill=False) | _catalog.bitset(self._cards)
+                if self._want_achs:
+                    self.new_achievements = await _grant_achievements(db, self.user, owned)
+                if self._want_titles:
+                    self.new_titles = await _grant_titles(db, self.user, owned)
+                written = written or bool(self.new_achievements or self.new_titles)
+            if self._cards:
+                _owned.add(self.user_id, self._cards)
+        if written:
+            self.user.update(_users.put(self.user.copy()))
+        if _hot is not None:
+            await _hot_durable()
+        self._sets, self._incrs, self._ledger, self._cards, self._missions = {}, {}, [], [], []
+        self._weekly = self._coin_run = self._coin_floor = 0
+        self._want_achs = self._want_titles = False
+        return self
+
+
+async def unit_of_work(user_id: int, username: str = "", first_name: str = "") -> UnitOfWork:
+    """Load (or create) a player and return a UnitOfWork over their row."""
+    return UnitOfWork(await get_or_create_user(user_id, username, first_name))
 
 # ─────────────────────────────────────────────
 # SUDO / ADMIN
@@ -880,23 +2904,21 @@ async def is_sudo(user_id: int) -> bool:
     from config import OWNER_ID
     if user_id == OWNER_ID:
         return True
-    async with aiosqlite.connect(DB_PATH) as db:
+    async with _pool.reader() as db:
         async with db.execute(
             "SELECT 1 FROM sudo_admins WHERE user_id=?", (user_id,)
         ) as cur:
             return await cur.fetchone() is not None
 
 async def add_sudo(user_id: int, username: str, added_by: int):
-    async with aiosqlite.connect(DB_PATH) as db:
+    async with _pool.writer() as db:
         await db.execute(
             "INSERT OR IGNORE INTO sudo_admins (user_id, username, added_by) VALUES (?,?,?)",
             (user_id, username, added_by)
         )
-        await db.commit()
 
 async def get_sudo_list() -> List[Dict]:
-    async with aiosqlite.connect(DB_PATH) as db:
-        db.row_factory = aiosqlite.Row
+    async with _pool.reader() as db:
         async with db.execute("SELECT * FROM sudo_admins ORDER BY added_at") as cur:
             rows = await cur.fetchall()
         return [dict(r) for r in rows]
@@ -905,31 +2927,30 @@ async def get_sudo_list() -> List[Dict]:
 # DROP SETTINGS
 # ─────────────────────────────────────────────
 async def get_drop_rate() -> float:
-    async with aiosqlite.connect(DB_PATH) as db:
-        async with db.execute(
-            "SELECT current_rate FROM drop_settings ORDER BY id DESC LIMIT 1"
-        ) as cur:
-            row = await cur.fetchone()
-        return row[0] if row else 1.0
+    return (await _load_catalog()).multiplier
 
 async def set_drop_rate(rate: float, set_by: int):
-    async with aiosqlite.connect(DB_PATH) as db:
+    async with _pool.writer() as db:
         await db.execute(
-            "UPDATE drop_settings SET current_rate=?, set_by=?, updated_at=datetime('now')",
+            f"UPDATE drop_settings SET current_rate=?, set_by=?, updated_at={NOW_EPOCH}",
             (rate, set_by)
         )
-        await db.commit()
+        await _publish(db, "cards", None)
+    _catalog.set_multiplier(rate)
 
 # ─────────────────────────────────────────────
 # STATS
 # ─────────────────────────────────────────────
 async def get_server_stats() -> Dict:
-    async with aiosqlite.connect(DB_PATH) as db:
-        async with db.execute("SELECT COUNT(*) FROM users")   as c: total_users   = (await c.fetchone())[0]
+    totals = await _gather_shards("""
+        SELECT (SELECT COUNT(*) FROM users),
+               (SELECT COALESCE(SUM(count), 0) FROM user_cards),
+               (SELECT COALESCE(SUM(coins), 0) FROM users),
+               (SELECT COUNT(*) FROM ledger.transactions)
+    """)
+    total_users, total_caught, total_coins, total_txs = (sum(col) for col in zip(*totals))
+    async with _pool.reader() as db:
         async with db.execute("SELECT COUNT(*) FROM cards")   as c: total_cards   = (await c.fetchone())[0]
-        async with db.execute("SELECT COUNT(*) FROM user_cards") as c: total_caught = (await c.fetchone())[0]
-        async with db.execute("SELECT SUM(coins) FROM users") as c: total_coins   = (await c.fetchone())[0] or 0
-        async with db.execute("SELECT COUNT(*) FROM transactions") as c: total_txs = (await c.fetchone())[0]
         async with db.execute("SELECT COUNT(*) FROM sudo_admins") as c: total_sudos = (await c.fetchone())[0]
     return {
         "total_users":   total_users,
@@ -940,36 +2961,259 @@ async def get_server_stats() -> Dict:
         "total_sudos":   total_sudos,
     }
 
-async def get_all_users() -> List[Dict]:
-    async with aiosqlite.connect(DB_PATH) as db:
-        db.row_factory = aiosqlite.Row
-        async with db.execute("SELECT * FROM users") as cur:
-            rows = await cur.fetchall()
-        return [dict(r) for r in rows]
+async def count_users() -> int:
+    return sum(r[0] for r in await _gather_shards("SELECT COUNT(*) FROM users"))
+
+async def get_all_users() -> List[User]:
+    """Every player in one list. Prefer `iter_users` for mass jobs."""
+    return [u async for u in iter_users()]
+
+# ─────────────────────────────────────────────
+# MAINTENANCE
+# ─────────────────────────────────────────────
+# One pass over every pool, run every DB_MAINT_INTERVAL_S by the bot's job
+# queue. For each file (main and ATTACHed):
+#   vacuum      hands up to DB_MAINT_VACUUM_PAGES free pages back to the
+#               filesystem (auto_vacuum=INCREMENTAL, migration 10).
+#   optimize    ANALYZE on a file that has never been analysed, then
+#               PRAGMA optimize, which re-analyses only the tables whose
+#               statistics have drifted.
+#   checkpoint  copies the WAL into the database. TRUNCATE also empties the
+#               -wal file but waits out every reader, so it only runs once
+#               the pool has gone DB_MAINT_QUIET_MS without a write;
+#               otherwise PASSIVE copies what it can without waiting.
+_maintenance: Dict[str, Any] = {
+    "runs": 0, "last_at": None, "checkpoint": None, "busy": 0,
+    "pages_freed": 0, "free_pages": 0,
+    "vacuum_ms": 0.0, "optimize_ms": 0.0, "checkpoint_ms": 0.0,
+}
+
+
+def _schemas(pool: ConnectionPool) -> List[str]:
+    return ["main", *pool.attached]
+
+
+async def _free_pages(db, schema: str) -> int:
+    async with db.execute(f"PRAGMA {schema}.freelist_count") as cur:
+        return (await cur.fetchone())[0]
+
+
+async def _incremental_vacuum(pool: ConnectionPool) -> Dict[str, int]:
+    freed = left = 0
+    async with pool.writer(standalone=True) as db:
+        for schema in _schemas(pool):
+            before = await _free_pages(db, schema)
+            if before:
+                # frees one page per step; execute() would only step once
+                await db.executescript(
+                    f"PRAGMA {schema}.incremental_vacuum({min(before, DB_MAINT_VACUUM_PAGES)})"
+                )
+            after = await _free_pages(db, schema)
+            freed += before - after
+            left  += after
+    return {"freed": freed, "left": left}
+
+
+async def _optimize(pool: ConnectionPool):
+    async with pool.writer(standalone=True) as db:
+        for schema in _schemas(pool):
+            async with db.execute(
+                f"SELECT 1 FROM {schema}.sqlite_master WHERE name='sqlite_stat1'"
+            ) as cur:
+                if await cur.fetchone() is None:
+                    await db.execute(f"ANALYZE {schema}")
+        await db.execute("PRAGMA optimize")
+
+
+async def _checkpoint(pool: ConnectionPool, mode: str) -> int:
+    """Checkpoint every file; returns how many could not finish because a
+    reader or writer was in the way."""
+    busy = 0
+    async with pool.writer(standalone=True) as db:
+        for schema in _schemas(pool):
+            async with db.execute(f"PRAGMA {schema}.wal_checkpoint({mode})") as cur:
+                busy += (await cur.fetchone())[0]
+    return busy
+
+
+async def run_maintenance() -> Dict:
+    """One maintenance pass over every database file. Returns the same
+    stats as `get_maintenance_stats`."""
+    m = _maintenance
+    timings = {"vacuum_ms": 0.0, "optimize_ms": 0.0, "checkpoint_ms": 0.0}
+    modes, busy, freed, left = set(), 0, 0, 0
+    for pool in _all_pools():
+        # decided before our own writes below reset the pool's idle clock
+        mode = "TRUNCATE" if pool.idle_for() * 1000 >= DB_MAINT_QUIET_MS else "PASSIVE"
+        started = time.perf_counter()
+        pages = await _incremental_vacuum(pool)
+        freed += pages["freed"]
+        left  += pages["left"]
+        timings["vacuum_ms"] += (time.perf_counter() - started) * 1000
+
+        started = time.perf_counter()
+        await _optimize(pool)
+        timings["optimize_ms"] += (time.perf_counter() - started) * 1000
+
+        started = time.perf_counter()
+        busy += await _checkpoint(pool, mode)
+        modes.add(mode)
+        timings["checkpoint_ms"] += (time.perf_counter() - started) * 1000
+
+    m.update(timings)
+    m["runs"]        += 1
+    m["last_at"]      = time.time()
+    m["checkpoint"]   = "TRUNCATE" if modes == {"TRUNCATE"} else "PASSIVE"
+    m["busy"]         = busy
+    m["pages_freed"]  = freed
+    m["free_pages"]   = left
+    return get_maintenance_stats()
+
+
+def get_maintenance_stats() -> Dict:
+    """The last maintenance pass, plus the current size of every -wal file
+    (the audit file is shared by all shards and counted once)."""
+    files = {f for pool in _all_pools() for f in pool.files()}
+    wal_bytes = sum(
+        os.path.getsize(f + "-wal") for f in files if os.path.exists(f + "-wal")
+    )
+    return {**_maintenance, "wal_bytes": wal_bytes}
+
+# ─────────────────────────────────────────────
+# BULK ITERATORS
+# ─────────────────────────────────────────────
+# Constant-memory scans for broadcasts, exports and backfills. Each chunk is
+# one keyset query (`key > last_seen ORDER BY key LIMIT n`) on a reader that
+# is returned to the pool before the chunk's rows are yielded, so a slow
+# consumer never pins a connection or an open read transaction, and rows
+# written mid-scan behind the cursor are simply not revisited.
+def _projection(columns: Optional[Sequence[str]], qualified: Dict[str, str],
+                always: Sequence[str] = ()) -> str:
+    if columns is None:
+        columns = list(qualified)
+    unknown = [c for c in columns if c not in qualified]
+    if unknown:
+        raise ValueError(f"Unknown columns: {', '.join(unknown)}")
+    wanted = list(dict.fromkeys([*always, *columns]))
+    return ", ".join(f"{qualified[c]} AS {c}" for c in wanted)
+
+async def _iter_keyset(query: str, params: tuple, build: Callable, chunk: int,
+                       after: Any = 0, key: Sequence[str] = ("_k",),
+                       pool: Optional[ConnectionPool] = None) -> AsyncIterator:
+    """`query` must select the key as `_k`, filter on `_k > ?` (its first
+    placeholder) and `ORDER BY` it; LIMIT is appended here. A composite key
+    is selected as the `key` columns, filtered as a row value
+    `(a, b) > (?, ?)`, and `after` is then a tuple. Reads `pool` (default:
+    the main database)."""
+    pool = pool or _pool
+    chunk = max(1, chunk)
+    after = after if isinstance(after, tuple) else (after,)
+    while True:
+        async with pool.reader() as db:
+            async with db.execute(f"{query} LIMIT ?", (*after, *params, chunk)) as cur:
+                rows = await cur.fetchall()
+        for r in rows:
+            yield build(r)
+        if len(rows) < chunk:
+            return
+        after = tuple(rows[-1][k] for k in key)
+
+async def iter_users(columns: Optional[Sequence[str]] = None,
+                     chunk: int = DB_ITER_CHUNK) -> AsyncIterator[User]:
+    """Every player in user_id order (shard by shard when sharded).
+    `columns` limits what is read (the rest are None); user_id is always
+    included."""
+    cols = _projection(columns, {c: c for c in User.__slots__}, always=("user_id",))
+    query = f"SELECT {cols}, user_id AS _k FROM users WHERE user_id > ? ORDER BY user_id"
+    for shard in _shards:
+        async for u in _iter_keyset(query, (), User.from_row, chunk, pool=shard):
+            yield u
+
+_USER_CARD_COLUMNS = {
+    "id": "c.id", "name": "c.name", "movie": "c.movie", "rarity": "c.rarity",
+    "file_id": "c.file_id", "file_type": "c.file_type",
+    "is_favorite": "c.id IS (SELECT favorite_card_id FROM users u WHERE u.user_id = uc.user_id)",
+    "count": "uc.count", "first_caught_at": "uc.first_caught_at",
+    "last_caught_at": "uc.last_caught_at", "user_id": "uc.user_id",
+}
+
+async def iter_user_cards(user_id: Optional[int] = None,
+                          columns: Optional[Sequence[str]] = None,
+                          chunk: int = DB_ITER_CHUNK) -> AsyncIterator[UserCard]:
+    """Collection rows in (user_id, card_id) order — one player's, or
+    everyone's (shard by shard when sharded)."""
+    cols = _projection(columns, _USER_CARD_COLUMNS, always=("user_id",))
+    where, params = ("AND uc.user_id=?", (user_id,)) if user_id is not None else ("", ())
+    query = (
+        f"SELECT {cols}, uc.user_id AS _k, uc.card_id AS _k2 "
+        f"FROM user_cards uc JOIN cards c ON c.id = uc.card_id "
+        f"WHERE (uc.user_id, uc.card_id) > (?, ?) {where} ORDER BY uc.user_id, uc.card_id"
+    )
+    shards = [_shard(user_id)] if user_id is not None else _shards
+    for shard in shards:
+        async for uc in _iter_keyset(query, params, UserCard.from_row, chunk,
+                                     after=(0, 0), key=("_k", "_k2"), pool=shard):
+            yield uc
+
+async def iter_transactions(user_id: Optional[int] = None, after_id: int = 0,
+                            since: Optional[int] = None, until: Optional[int] = None,
+                            columns: Optional[Sequence[str]] = None,
+                            chunk: int = DB_ITER_CHUNK) -> AsyncIterator[Transaction]:
+    """Ledger rows in id order, optionally only those touching `user_id`
+    and/or created in the epoch window [since, until). Pass the last seen
+    id as `after_id` to resume an export. When sharded, each shard keeps
+    its own ledger: rows come shard by shard, ids are only unique within a
+    shard, and `after_id` is applied to every one of them."""
+    cols = _projection(columns, {c: c for c in Transaction.__slots__}, always=("id",))
+    where, params = [], []
+    if user_id is not None:
+        where.append("(from_user=? OR to_user=?)")
+        params += [user_id, user_id]
+    if since is not None:
+        where.append("created_at >= ?")
+        params.append(since)
+    if until is not None:
+        where.append("created_at < ?")
+        params.append(until)
+    filters = "".join(f" AND {w}" for w in where)
+    query = f"SELECT {cols}, id AS _k FROM ledger.transactions WHERE id > ?{filters} ORDER BY id"
+    for shard in _shards:
+        await shard.flush_appends()
+        async for tx in _iter_keyset(query, tuple(params), Transaction.from_row, chunk,
+                                     after=after_id, pool=shard):
+            yield tx
 
 # ─────────────────────────────────────────────
 # AUDIT LOG
 # ─────────────────────────────────────────────
 async def audit(admin_id: int, action: str, target: str, details: str = ""):
-    async with aiosqlite.connect(DB_PATH) as db:
+    async with _pool.writer() as db:
         await db.execute(
-            "INSERT INTO audit_log (admin_id, action, target, details) VALUES (?,?,?,?)",
+            "INSERT INTO audit.audit_log (admin_id, action, target, details) VALUES (?,?,?,?)",
             (admin_id, action, target, details)
         )
-        await db.commit()
 
 # ─────────────────────────────────────────────
 # DATABASE NUKE (Owner only)
 # ─────────────────────────────────────────────
 async def clear_all_users():
-    async with aiosqlite.connect(DB_PATH) as db:
-        await db.execute("DELETE FROM users")
-        await db.execute("DELETE FROM user_cards")
-        await db.execute("DELETE FROM user_inventory")
-        await db.execute("DELETE FROM user_missions")
-        await db.execute("DELETE FROM user_achievements")
-        await db.execute("DELETE FROM user_titles")
-        await db.execute("DELETE FROM friends")
-        await db.execute("DELETE FROM transactions")
-        await db.execute("DELETE FROM weekly_board")
-        await db.commit()
+    await _hot_flush()
+    async with _counters.lock:
+        _counters.take()
+    for pool in _all_pools():
+        await pool.flush_appends()
+        async with pool.writer() as db:
+            await db.execute("DELETE FROM user_cards")
+            await db.execute("DELETE FROM user_inventory")
+            await db.execute("DELETE FROM user_missions")
+            await db.execute("DELETE FROM user_achievements")
+            await db.execute("DELETE FROM user_titles")
+            await db.execute("DELETE FROM friends")
+            await db.execute("DELETE FROM ledger.transactions")
+            await db.execute("DELETE FROM weekly_board")
+            await db.execute("DELETE FROM users")
+            await _publish(db, "*", None)
+    if _hot is not None:
+        _hot.reset()
+    _users.clear()
+    _owned.clear()
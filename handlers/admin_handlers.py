@@ -1,16 +1,21 @@
 # ════════════════════════════════════════════
-# 🛠 Admin Handlers: /upload /uploadvd /edit /delete /setdrop /stats /backup /restore
+# 🛠 Admin Handlers: /upload /uploadvd /edit /delete /cards /setdrop /stats /backup /restore
 # ════════════════════════════════════════════
 import logging
 import os
+import shlex
 import shutil
 import sqlite3
+import zipfile
 from datetime import datetime
+from typing import Dict, Set, Tuple
 from telegram import Update
 from telegram.ext import ContextTypes
 
 import database as db
-from config import DB_PATH, BACKUP_DIR
+from config import DB_PATH, BACKUP_DIR, DB_SHARDS, HOT_STATE
+from migrations import LATEST_VERSION
+from utils import rarity_stars
 
 log = logging.getLogger(__name__)
 
@@ -175,16 +180,16 @@ async def edit_cmd(update: Update, ctx: ContextTypes.DEFAULT_TYPE):
         await update.message.reply_text(f"❌ Card #{card_id} not found.")
         return
 
-    final_name  = new_name  or card["name"]
-    final_movie = new_movie or card["movie"]
+    final_name  = new_name  or card.name
+    final_movie = new_movie or card.movie
 
     await db.edit_card(card_id, final_name, final_movie)
-    await db.audit(u_obj.id, "edit_card", f"card#{card_id}", f"{card['name']} → {final_name}")
+    await db.audit(u_obj.id, "edit_card", f"card#{card_id}", f"{card.name} → {final_name}")
 
     await update.message.reply_text(
         f"✅ <b>Card #{card_id} Updated!</b>\n\n"
-        f"🃏 Name:  {card['name']} → <b>{final_name}</b>\n"
-        f"🎬 Movie: {card['movie']} → <b>{final_movie}</b>",
+        f"🃏 Name:  {card.name} → <b>{final_name}</b>\n"
+        f"🎬 Movie: {card.movie} → <b>{final_movie}</b>",
         parse_mode="HTML"
     )
 
@@ -219,8 +224,8 @@ async def delete_cmd(update: Update, ctx: ContextTypes.DEFAULT_TYPE):
 
     await update.message.reply_text(
         f"⚠️ <b>Confirm Delete?</b>\n\n"
-        f"🃏 <b>#{card_id}</b> — {card['name']}\n"
-        f"🎬 {card['movie']}  |  ⭐ {card['rarity']}\n\n"
+        f"🃏 <b>#{card_id}</b> — {card.name}\n"
+        f"🎬 {card.movie}  |  ⭐ {card.rarity}\n\n"
         f"Reply <code>/confirmdelete</code> to confirm.\n"
         f"This will remove the card from ALL players!",
         parse_mode="HTML"
@@ -240,11 +245,103 @@ async def confirmdelete_cmd(update: Update, ctx: ContextTypes.DEFAULT_TYPE):
     card_id = _pending_delete.pop(u_obj.id)
     card    = await db.get_card(card_id)
     await db.delete_card(card_id)
-    await db.audit(u_obj.id, "delete_card", f"card#{card_id}", card["name"] if card else "?")
+    await db.audit(u_obj.id, "delete_card", f"card#{card_id}", card.name if card else "?")
 
     await update.message.reply_text(f"🗑️ Card <b>#{card_id}</b> deleted from database.", parse_mode="HTML")
 
 
+# ─────────────────────────────────────────────
+# /cards [words] [rarity=..] [movie=..] [type=..] [after=id|before=id]
+# ─────────────────────────────────────────────
+CARDS_PER_PAGE = 15
+_CARD_FILTERS  = ("rarity", "movie", "type")
+
+
+def _cards_args(args: list) -> dict:
+    """Split /cards arguments into search words and key=value filters;
+    values with spaces go in quotes (movie="Star Wars")."""
+    try:
+        tokens = shlex.split(" ".join(args))
+    except ValueError:                      # unbalanced quote
+        tokens = list(args)
+    opts, words = {}, []
+    for tok in tokens:
+        key, sep, value = tok.partition("=")
+        if sep and key.lower() in _CARD_FILTERS + ("after", "before"):
+            opts[key.lower()] = value
+        else:
+            words.append(tok)
+    opts["text"] = " ".join(words)
+    return opts
+
+
+def _cards_cmd(opts: dict, **page) -> str:
+    """The /cards command that shows another page of the same listing."""
+    parts = [opts["text"]] if opts["text"] else []
+    for key in _CARD_FILTERS:
+        if opts.get(key):
+            value = opts[key]
+            parts.append(f'{key}="{value}"' if " " in value else f"{key}={value}")
+    parts += [f"{k}={v}" for k, v in page.items()]
+    return "/cards " + " ".join(parts)
+
+
+async def cards_cmd(update: Update, ctx: ContextTypes.DEFAULT_TYPE):
+    u_obj = update.effective_user
+    if not await db.is_sudo(u_obj.id):
+        await update.message.reply_text("🚫 Admin only command.")
+        return
+
+    opts = _cards_args(ctx.args)
+    rarity = opts.get("rarity")
+    if rarity:
+        rarity = next((r for r in RARITIES if r.lower() == rarity.lower()), None)
+        if rarity is None:
+            await update.message.reply_text(f"❌ Invalid rarity! Choose: {', '.join(RARITIES)}")
+            return
+        opts["rarity"] = rarity
+    try:
+        after  = int(opts.get("after") or 0)
+        before = int(opts["before"]) if opts.get("before") else None
+    except ValueError:
+        await update.message.reply_text("❌ after= / before= take a card ID.")
+        return
+
+    cards, has_prev, has_next = await db.browse_cards(
+        opts["text"] or None, rarity, opts.get("movie") or None, opts.get("type") or None,
+        after_id=after, before_id=before, limit=CARDS_PER_PAGE,
+    )
+    facets = await db.get_card_facets(top_movies=5)
+
+    text = (
+        f"🗂 <b>Card Catalog</b> — {facets['cards']:,} cards · {facets['movies']:,} movies\n"
+        + " · ".join(f"{rarity_stars(r)} {facets['rarity'].get(r, 0):,}" for r in RARITIES) + "\n"
+        + " · ".join(f"{t or '?'} {n:,}" for t, n in sorted(facets["file_type"].items())) + "\n"
+        + "🎬 " + " · ".join(f"{m} {n:,}" for m, n in facets["movie"].items()) + "\n"
+    )
+    shown = [f"“{opts['text']}”"] if opts["text"] else []
+    shown += [f"{k}={opts[k]}" for k in _CARD_FILTERS if opts.get(k)]
+    if shown:
+        text += f"\n🔎 {' · '.join(shown)}\n"
+    text += "\n"
+    if not cards:
+        text += "No cards match."
+    else:
+        text += "\n".join(
+            f"<code>#{c.id}</code> {rarity_stars(c.rarity)} <b>{c.name}</b> — {c.movie}"
+            + (" 🎥" if c.file_type == "video" else "")
+            for c in cards
+        )
+        nav = []
+        if has_prev:
+            nav.append(f"◀ <code>{_cards_cmd(opts, before=cards[0].id)}</code>")
+        if has_next:
+            nav.append(f"▶ <code>{_cards_cmd(opts, after=cards[-1].id)}</code>")
+        if nav:
+            text += "\n\n" + "\n".join(nav)
+    await update.message.reply_text(text, parse_mode="HTML")
+
+
 # ─────────────────────────────────────────────
 # /setdrop <rate>
 # ─────────────────────────────────────────────
@@ -328,20 +425,21 @@ async def backup_cmd(update: Update, ctx: ContextTypes.DEFAULT_TYPE):
 
     os.makedirs(BACKUP_DIR, exist_ok=True)
     ts       = datetime.utcnow().strftime("%Y%m%d_%H%M%S")
-    filename = f"backup_{ts}.db"
+    filename = f"backup_{ts}.zip"
     dst      = os.path.join(BACKUP_DIR, filename)
 
     try:
-        shutil.copy2(DB_PATH, dst)
+        # the main file and its ledger and audit files, as one document
+        copied  = os.path.join(BACKUP_DIR, f"backup_{ts}.db")
+        written = await db.backup_to(copied)
+        paths   = db.backup_paths(copied)
+        with zipfile.ZipFile(dst, "w", zipfile.ZIP_DEFLATED) as zf:
+            for schema, path in paths.items():
+                zf.write(path, f"{schema}.db")
         size = os.path.getsize(dst)
 
         # Log backup
-        async with __import__("aiosqlite").connect(DB_PATH) as dbc:
-            await dbc.execute(
-                "INSERT INTO backups (filename, size_bytes) VALUES (?,?)",
-                (filename, size)
-            )
-            await dbc.commit()
+        await db.log_backup(filename, size)
 
         await db.audit(u_obj.id, "backup", filename, f"size={size}")
 
@@ -354,7 +452,9 @@ async def backup_cmd(update: Update, ctx: ContextTypes.DEFAULT_TYPE):
                     f"✅ <b>Backup Created!</b>\n\n"
                     f"📁 File: <code>{filename}</code>\n"
                     f"💾 Size: {size/1024:.1f} KB\n"
-                    f"🕒 Time: {ts}"
+                    + (f"🧩 Shards: {len(written) - len(paths)} files kept in the backup dir\n"
+                       if len(written) > len(paths) else "")
+                    + f"🕒 Time: {ts}"
                 ),
                 parse_mode="HTML"
             )
@@ -368,27 +468,41 @@ async def backup_cmd(update: Update, ctx: ContextTypes.DEFAULT_TYPE):
 # ─────────────────────────────────────────────
 _pending_restore: dict = {}
 
+
+def _restore_unsupported() -> bool:
+    """Restore swaps DB_PATH and its ledger and audit files, so it only
+    works for a single on-disk database that holds all player state."""
+    return DB_SHARDS > 1 or HOT_STATE or not db.backend.persistent
+
+
 async def restore_cmd(update: Update, ctx: ContextTypes.DEFAULT_TYPE):
     u_obj = update.effective_user
     if not await db.is_sudo(u_obj.id):
         await update.message.reply_text("🚫 Admin only command.")
         return
 
+    if _restore_unsupported():
+        await update.message.reply_text(
+            "❌ Restore is not supported while the database is sharded (DB_SHARDS > 1), "
+            "player state is held in memory (HOT_STATE) or the database is not on disk."
+        )
+        return
+
     if not update.message.reply_to_message or not update.message.reply_to_message.document:
         await update.message.reply_text(
             "📥 <b>Restore Database</b>\n\n"
-            "Reply to a <b>.db backup file</b> with /restore.\n"
+            "Reply to a <b>.zip backup</b> from /backup with /restore.\n"
             "⚠️ This will overwrite the current database!",
             parse_mode="HTML"
         )
         return
 
     doc = update.message.reply_to_message.document
-    if not doc.file_name.endswith(".db"):
-        await update.message.reply_text("❌ File must be a .db backup file.")
+    if not doc.file_name.endswith((".zip", ".db")):
+        await update.message.reply_text("❌ File must be a .zip (or older .db) backup file.")
         return
 
-    _pending_restore[u_obj.id] = doc.file_id
+    _pending_restore[u_obj.id] = (doc.file_id, doc.file_name)
     await update.message.reply_text(
         f"⚠️ <b>CONFIRM RESTORE?</b>\n\n"
         f"File: <code>{doc.file_name}</code>\n\n"
@@ -398,28 +512,128 @@ async def restore_cmd(update: Update, ctx: ContextTypes.DEFAULT_TYPE):
     )
 
 
+def _inspect_backup(path: str) -> Tuple[int, Set[str]]:
+    """(schema version recorded in a database file, 0 if it predates
+    migrations; the names of its tables)."""
+    conn = sqlite3.connect(path)
+    try:
+        tables = {r[0] for r in conn.execute("SELECT name FROM sqlite_master WHERE type='table'")}
+        if "schema_version" not in tables:
+            return 0, tables
+        return conn.execute("SELECT COALESCE(MAX(version), 0) FROM schema_version").fetchone()[0], tables
+    finally:
+        conn.close()
+
+
+def _unpack_backup(download: str, file_name: str, work: str) -> Dict[str, str]:
+    """{schema: file} of a downloaded backup, unpacked into `work`. A .zip
+    from /backup holds main.db and one file per ATTACHed schema; a bare
+    .db is the main file alone."""
+    if not file_name.endswith(".zip"):
+        path = os.path.join(work, "main.db")
+        os.replace(download, path)
+        return {"main": path}
+    files = {}
+    with zipfile.ZipFile(download) as zf:
+        names = set(zf.namelist())
+        for schema in ("main", *db.ATTACHED):
+            member = f"{schema}.db"
+            if member in names:
+                files[schema] = os.path.join(work, member)
+                with zf.open(member) as src, open(files[schema], "wb") as dst:
+                    shutil.copyfileobj(src, dst)
+    if set(files) != {"main", *db.ATTACHED}:
+        raise ValueError(f"a backup .zip holds {', '.join(f'{s}.db' for s in ('main', *db.ATTACHED))}")
+    return files
+
+
+def _copy_db(src: str, dst: str):
+    source, target = sqlite3.connect(src), sqlite3.connect(dst)
+    try:
+        source.backup(target)
+    finally:
+        source.close()
+        target.close()
+
+
+async def _swap_db_files(files: Dict[str, str]):
+    """Put each {schema: file} in place of the live one and migrate them
+    before anything reads them. A live file with no replacement is
+    removed: a backup from before the ledger and audit log left the main
+    file carries its own, and migrating moves them into fresh files."""
+    # Pooled connections must not outlive the files they point at
+    await db.close_db()
+    for schema, live in {"main": DB_PATH, **db.ATTACHED}.items():
+        for suffix in ("-wal", "-shm", "-journal"):
+            if os.path.exists(live + suffix):
+                os.remove(live + suffix)
+        if schema in files:
+            os.replace(files[schema], live)
+        elif os.path.exists(live):
+            os.remove(live)
+    await db.init_db()
+
+
 async def confirmrestore_cmd(update: Update, ctx: ContextTypes.DEFAULT_TYPE):
     u_obj = update.effective_user
     if not await db.is_sudo(u_obj.id):
         await update.message.reply_text("🚫 Admin only command.")
         return
 
+    if _restore_unsupported():
+        await update.message.reply_text(
+            "❌ Restore is not supported while the database is sharded (DB_SHARDS > 1), "
+            "player state is held in memory (HOT_STATE) or the database is not on disk."
+        )
+        return
+
     if u_obj.id not in _pending_restore:
         await update.message.reply_text("❌ No pending restore. Use /restore first.")
         return
 
-    file_id = _pending_restore.pop(u_obj.id)
+    file_id, file_name = _pending_restore.pop(u_obj.id)
+    work = DB_PATH + ".restore"
     try:
         file = await ctx.bot.get_file(file_id)
         ts   = datetime.utcnow().strftime("%Y%m%d_%H%M%S")
         bak  = os.path.join(BACKUP_DIR, f"pre_restore_{ts}.db")
-        shutil.copy2(DB_PATH, bak)
-        await file.download_to_drive(DB_PATH)
+        await db.backup_to(bak)
+        shutil.rmtree(work, ignore_errors=True)
+        os.makedirs(work)
+        download = os.path.join(work, "download")
+        await file.download_to_drive(download)
+        files = _unpack_backup(download, file_name, work)
+        restored, tables = _inspect_backup(files["main"])
+        if restored > LATEST_VERSION:
+            await update.message.reply_text(
+                f"❌ Backup is at schema v{restored}, newer than this bot (v{LATEST_VERSION}). "
+                f"Upgrade the bot before restoring it."
+            )
+            return
+        if len(files) == 1 and not {"transactions", "audit_log"} <= tables:
+            await update.message.reply_text(
+                "❌ This .db is only the main database: its ledger and audit log are kept "
+                "in separate files. Restore the .zip made by /backup instead."
+            )
+            return
+        try:
+            await _swap_db_files(files)
+        except Exception:
+            # Leave the bot on the data it had rather than a half-migrated file
+            rollback = {}
+            for schema, path in db.backup_paths(bak).items():
+                rollback[schema] = os.path.join(work, f"rollback_{schema}.db")
+                _copy_db(path, rollback[schema])
+            await _swap_db_files(rollback)
+            raise
         await update.message.reply_text(
             f"✅ <b>Database Restored!</b>\n\n"
+            f"🧱 Schema: v{restored} → v{await db.get_schema_version()}\n"
             f"🔄 Pre-restore backup: <code>{bak}</code>",
             parse_mode="HTML"
         )
     except Exception as e:
         log.error(f"Restore error: {e}")
         await update.message.reply_text(f"❌ Restore failed: {e}")
+    finally:
+        shutil.rmtree(work, ignore_errors=True)
@@ -36,7 +36,7 @@ def _check_cd(store: dict, user_id: int, seconds: int) -> int:
 # ─────────────────────────────────────────────
 async def catch_cmd(update: Update, ctx: ContextTypes.DEFAULT_TYPE):
     u_obj = update.effective_user
-    user  = await db.get_or_create_user(u_obj.id, u_obj.username or "", u_obj.first_name or "")
+    uow   = await db.unit_of_work(u_obj.id, u_obj.username or "", u_obj.first_name or "")
 
     wait = _check_cd(_catch_cd, u_obj.id, CATCH_COOLDOWN)
     if wait:
@@ -47,7 +47,32 @@ async def catch_cmd(update: Update, ctx: ContextTypes.DEFAULT_TYPE):
     card = None
     if ctx.args:
         name = " ".join(ctx.args)
-        card = await db.get_card_by_name(name)
+        card, candidates = await db.find_cards(name)
+        if not card and len(candidates) == 1:
+            # one near miss: suggest it, without spending the cooldown
+            _catch_cd.pop(u_obj.id, None)
+            c = candidates[0]
+            await update.message.reply_text(
+                f"🤔 Did you mean {rarity_stars(c.rarity)} <b>{c.name}</b> [{c.movie}]?\n\n"
+                f"  <code>/catch {c.name}</code>",
+                parse_mode="HTML"
+            )
+            return
+        if not card and candidates:
+            # ambiguous: let them pick, without spending the cooldown
+            _catch_cd.pop(u_obj.id, None)
+            names = [c.name for c in candidates]
+            lines = "\n".join(
+                f"  {rarity_stars(c.rarity)} <code>/catch {c.name}"
+                + (f" {c.movie}" if names.count(c.name) > 1 else "")
+                + f"</code> [{c.movie}]"
+                for c in candidates
+            )
+            await update.message.reply_text(
+                f"🤔 Which card did you mean by '<b>{name}</b>'?\n\n{lines}",
+                parse_mode="HTML"
+            )
+            return
         if not card:
             await update.message.reply_text(
                 f"❌ Card '<b>{name}</b>' not found!\n\nTry /catch without a name for a random card.",
@@ -71,17 +96,19 @@ async def catch_cmd(update: Update, ctx: ContextTypes.DEFAULT_TYPE):
             boost += 0.20
             break
 
-    catch_chance = calculate_catch_chance(card["rarity"], drop_rate, boost)
-    rarity_cfg   = RARITY_CONFIG.get(card["rarity"], RARITY_CONFIG["Common"])
+    catch_chance = calculate_catch_chance(card.rarity, drop_rate, boost)
+    rarity_cfg   = RARITY_CONFIG.get(card.rarity, RARITY_CONFIG["Common"])
+    duplicate    = await db.user_has_card(u_obj.id, card.id)
 
     # Catching animation
     rarity_emoji = rarity_cfg["emoji"]
     anim_msg     = await update.message.reply_text(
         f"{rarity_emoji} <b>A wild card appeared!</b>\n\n"
-        f"🃏 <b>{card['name']}</b>\n"
-        f"🎬 {card['movie']}\n"
-        f"⭐ {card['rarity']}\n\n"
-        f"🎯 Catch rate: <b>{catch_chance*100:.0f}%</b>\n\n"
+        f"🃏 <b>{card.name}</b>\n"
+        f"🎬 {card.movie}\n"
+        f"⭐ {card.rarity}\n"
+        + ("📦 <i>Already in your collection</i>\n" if duplicate else "") +
+        f"\n🎯 Catch rate: <b>{catch_chance*100:.0f}%</b>\n\n"
         f"⌛ Throwing ball...",
         parse_mode="HTML"
     )
@@ -90,20 +117,26 @@ async def catch_cmd(update: Update, ctx: ContextTypes.DEFAULT_TYPE):
     success = attempt_catch(catch_chance)
 
     if success:
-        await db.add_card_to_user(u_obj.id, card["id"])
+        uow.add_card(card.id)
         xp_gain  = rarity_cfg["xp_reward"]
-        xp_res   = await db.add_xp(u_obj.id, xp_gain)
-        await db.update_mission_progress(u_obj.id, "catch", 1)
-        new_achs = await db.check_achievements(u_obj.id)
-        new_tits = await db.check_titles(u_obj.id)
+        xp_res   = uow.add_xp(xp_gain)
+        uow.update_mission_progress("catch", 1)
+        uow.check_achievements()
+        uow.check_titles()
+        try:
+            await uow.flush()
+        except db.InsufficientCoins:
+            await anim_msg.edit_text("❌ The card slipped away, please try again.")
+            return
+        new_achs = uow.new_achievements
 
-        is_dup = await db.count_user_cards(u_obj.id) > 1
+        copies   = uow.card_counts.get(card.id, 1)
 
-        if card["rarity"] == "Legendary":
+        if card.rarity == "Legendary":
             catch_fx = "🌟⚡🌟 <b>LEGENDARY CATCH!</b> 🌟⚡🌟"
-        elif card["rarity"] == "Epic":
+        elif card.rarity == "Epic":
             catch_fx = "✨🟣 <b>EPIC CATCH!</b> 🟣✨"
-        elif card["rarity"] == "Rare":
+        elif card.rarity == "Rare":
             catch_fx = "💙 <b>RARE CATCH!</b> 💙"
         else:
             catch_fx = "✅ <b>Caught!</b>"
@@ -111,30 +144,32 @@ async def catch_cmd(update: Update, ctx: ContextTypes.DEFAULT_TYPE):
         text = (
             f"{catch_fx}\n\n"
             f"╔══════════════════╗\n"
-            f"  🃏 <b>{card['name']}</b>\n"
-            f"  🎬 {card['movie']}\n"
-            f"  {rarity_stars(card['rarity'])} {card['rarity']}\n"
-            f"  🆔 Card ID: {card['id']}\n"
+            f"  🃏 <b>{card.name}</b>\n"
+            f"  🎬 {card.movie}\n"
+            f"  {rarity_stars(card.rarity)} {card.rarity}\n"
+            f"  🆔 Card ID: {card.id}\n"
             f"╚══════════════════╝\n\n"
             f"✨ +{xp_gain} XP"
         )
+        if copies > 1:
+            text += f"\n📦 Duplicate — you now own ×{copies}"
         if xp_res["leveled_up"]:
             text += f"\n🎊 <b>LEVEL UP → {xp_res['new_level']}!</b>"
         for a in new_achs:
             text += f"\n{a['badge']} Achievement: <b>{a['name']}</b>"
 
-        text += f"\n\n💡 Use <code>/set {card['id']}</code> to make it your profile card!"
+        text += f"\n\n💡 Use <code>/set {card.id}</code> to make it your profile card!"
 
         # Send with card image if available
-        if card.get("file_id"):
+        if card.file_id:
             await anim_msg.delete()
-            if card.get("file_type") == "video":
+            if card.file_type == "video":
                 await update.message.reply_video(
-                    card["file_id"], caption=text, parse_mode="HTML"
+                    card.file_id, caption=text, parse_mode="HTML"
                 )
             else:
                 await update.message.reply_photo(
-                    card["file_id"], caption=text, parse_mode="HTML"
+                    card.file_id, caption=text, parse_mode="HTML"
                 )
         else:
             await anim_msg.edit_text(text, parse_mode="HTML")
@@ -143,7 +178,7 @@ async def catch_cmd(update: Update, ctx: ContextTypes.DEFAULT_TYPE):
         # Failed to catch
         text = (
             f"💨 <b>It got away!</b>\n\n"
-            f"🃏 <b>{card['name']}</b> ({card['rarity']})\n"
+            f"🃏 <b>{card.name}</b> ({card.rarity})\n"
             f"🎯 Catch rate was: {catch_chance*100:.0f}%\n\n"
             f"💡 Try again or use a Catch Boost from /shop!"
         )
@@ -182,9 +217,9 @@ async def set_cmd(update: Update, ctx: ContextTypes.DEFAULT_TYPE):
     card = await db.get_card(card_id)
     text = (
         f"⭐ <b>Favorite Card Set!</b>\n\n"
-        f"🃏 <b>{card['name']}</b>\n"
-        f"🎬 {card['movie']}\n"
-        f"{rarity_stars(card['rarity'])} {card['rarity']}\n\n"
+        f"🃏 <b>{card.name}</b>\n"
+        f"🎬 {card.movie}\n"
+        f"{rarity_stars(card.rarity)} {card.rarity}\n\n"
         f"📊 Your profile now shows this card!"
     )
     await update.message.reply_text(text, parse_mode="HTML")
@@ -250,23 +285,24 @@ async def inventory_cmd(update: Update, ctx: ContextTypes.DEFAULT_TYPE):
     # Group by rarity
     rarity_counts = {}
     for c in cards:
-        r = c["rarity"]
+        r = c.rarity
         rarity_counts[r] = rarity_counts.get(r, 0) + 1
 
     header = (
         f"🃏 <b>CARD COLLECTION</b>  [{u_obj.first_name}]\n"
         f"━━━━━━━━━━━━━━━━━━━━━\n"
-        f"📊 Total: <b>{total} cards</b>  |  Page {page}/{total_pages}\n"
+        f"📊 Unique: <b>{total} cards</b>  |  Caught: <b>{user.total_caught}</b>  |  Page {page}/{total_pages}\n"
         f"🔽 Sort: {sort}\n"
         f"━━━━━━━━━━━━━━━━━━━━━\n\n"
     )
 
     card_list = ""
     for c in cards:
-        fav_star = "⭐" if c["is_favorite"] else "  "
+        fav_star = "⭐" if c.is_favorite else "  "
+        copies   = f" ×{c.count}" if c.count > 1 else ""
         card_list += (
-            f"{fav_star} [{c['id']:>3}] {rarity_stars(c['rarity'])} "
-            f"<b>{c['name']}</b> — {c['movie']}\n"
+            f"{fav_star} [{c.id:>3}] {rarity_stars(c.rarity)} "
+            f"<b>{c.name}</b>{copies} — {c.movie}\n"
         )
 
     footer = (
@@ -36,12 +36,20 @@ def _check_cd(store: dict, user_id: int, seconds: int) -> int:
     return 0
 
 
+def _not_enough(e: db.InsufficientCoins) -> str:
+    # the balance is unknown when the player's row could not be read
+    if e.balance is None:
+        return "❌ Not enough coins!"
+    return f"❌ Not enough coins! You have {fmt_coins(e.balance)}"
+
+
 # ─────────────────────────────────────────────
 # /slots <amount>
 # ─────────────────────────────────────────────
 async def slots_cmd(update: Update, ctx: ContextTypes.DEFAULT_TYPE):
     u_obj = update.effective_user
-    user  = await db.get_or_create_user(u_obj.id, u_obj.username or "", u_obj.first_name or "")
+    uow   = await db.unit_of_work(u_obj.id, u_obj.username or "", u_obj.first_name or "")
+    user  = uow.user
 
     if not ctx.args:
         await update.message.reply_text(
@@ -64,22 +72,16 @@ async def slots_cmd(update: Update, ctx: ContextTypes.DEFAULT_TYPE):
     if amount < 50:
         await update.message.reply_text("❌ Minimum bet is 50 coins.")
         return
-    if user["coins"] < amount:
-        await update.message.reply_text(f"❌ Not enough coins! You have {fmt_coins(user['coins'])}")
+    if user.coins < amount:
+        await update.message.reply_text(f"❌ Not enough coins! You have {fmt_coins(user.coins)}")
         return
 
     # Deduct bet
-    await db.add_coins(u_obj.id, -amount, tx_type="slots_bet")
+    uow.add_coins(-amount, tx_type="slots_bet")
 
     # Spin
     result = spin_slots()
 
-    # Animation
-    spin_msg = await update.message.reply_text("🎰 Spinning...\n\n⌛ | ? | ? | ? |")
-    await asyncio.sleep(0.7)
-    await spin_msg.edit_text(f"🎰 Spinning...\n\n{result['display']}")
-    await asyncio.sleep(0.5)
-
     # Calculate winnings
     winnings  = int(amount * result["multiplier"])
     net       = winnings - amount
@@ -87,23 +89,30 @@ async def slots_cmd(update: Update, ctx: ContextTypes.DEFAULT_TYPE):
     is_jack   = result["result"] == "jackpot"
 
     if is_win:
-        await db.add_coins(u_obj.id, winnings, tx_type="slots_win")
-        await db.update_mission_progress(u_obj.id, "slots", 1)
+        uow.add_coins(winnings, tx_type="slots_win")
+        uow.update_mission_progress("slots", 1)
+        uow.incr("slots_wins", winnings)
 
     if is_jack:
-        await db.update_user(
-            u_obj.id,
-            jackpots=user["jackpots"] + 1,
-            slots_wins=user["slots_wins"] + winnings
-        )
-    elif is_win:
-        await db.update_user(u_obj.id, slots_wins=user["slots_wins"] + winnings)
+        uow.incr("jackpots", 1)
 
     xp_gain = 10 if is_win else 5
-    xp_res  = await db.add_xp(u_obj.id, xp_gain)
+    xp_res  = uow.add_xp(xp_gain)
 
-    new_achs = await db.check_achievements(u_obj.id)
-    new_tits = await db.check_titles(u_obj.id)
+    uow.check_achievements()
+    uow.check_titles()
+    try:
+        await uow.flush()
+    except db.InsufficientCoins as e:
+        await update.message.reply_text(_not_enough(e))
+        return
+    new_achs = uow.new_achievements
+
+    # Animation
+    spin_msg = await update.message.reply_text("🎰 Spinning...\n\n⌛ | ? | ? | ? |")
+    await asyncio.sleep(0.7)
+    await spin_msg.edit_text(f"🎰 Spinning...\n\n{result['display']}")
+    await asyncio.sleep(0.5)
 
     # Build result message
     if is_jack:
@@ -154,7 +163,8 @@ async def slots_cmd(update: Update, ctx: ContextTypes.DEFAULT_TYPE):
 # ─────────────────────────────────────────────
 async def basket_cmd(update: Update, ctx: ContextTypes.DEFAULT_TYPE):
     u_obj = update.effective_user
-    user  = await db.get_or_create_user(u_obj.id, u_obj.username or "", u_obj.first_name or "")
+    uow   = await db.unit_of_work(u_obj.id, u_obj.username or "", u_obj.first_name or "")
+    user  = uow.user
 
     if not ctx.args:
         await update.message.reply_text(
@@ -177,11 +187,11 @@ async def basket_cmd(update: Update, ctx: ContextTypes.DEFAULT_TYPE):
     if amount < 50:
         await update.message.reply_text("❌ Minimum bet: 50 coins.")
         return
-    if user["coins"] < amount:
-        await update.message.reply_text(f"❌ Not enough coins! You have {fmt_coins(user['coins'])}")
+    if user.coins < amount:
+        await update.message.reply_text(f"❌ Not enough coins! You have {fmt_coins(user.coins)}")
         return
 
-    await db.add_coins(u_obj.id, -amount, tx_type="basket_bet")
+    uow.add_coins(-amount, tx_type="basket_bet")
 
     # Play 5 shots
     shots = 5
@@ -221,18 +231,24 @@ async def basket_cmd(update: Update, ctx: ContextTypes.DEFAULT_TYPE):
 
     winnings = int(amount * multiplier)
     net      = winnings - amount
-    await db.add_coins(u_obj.id, winnings, tx_type="basket_win")
+    uow.add_coins(winnings, tx_type="basket_win")
 
     # Update best combo
-    if max_combo > user["best_combo"]:
-        await db.update_user(u_obj.id, best_combo=max_combo)
+    if max_combo > user.best_combo:
+        uow.set(best_combo=max_combo)
 
     xp_gain = 10 + (total_pts * 2)
-    xp_res  = await db.add_xp(u_obj.id, xp_gain)
-    await db.update_mission_progress(u_obj.id, "basket", 1)
-    await db.update_mission_progress(u_obj.id, "bscore", total_pts)
-    new_achs = await db.check_achievements(u_obj.id)
-    new_tits = await db.check_titles(u_obj.id)
+    xp_res  = uow.add_xp(xp_gain)
+    uow.update_mission_progress("basket", 1)
+    uow.update_mission_progress("bscore", total_pts)
+    uow.check_achievements()
+    uow.check_titles()
+    try:
+        await uow.flush()
+    except db.InsufficientCoins as e:
+        await update.message.reply_text(_not_enough(e))
+        return
+    new_achs = uow.new_achievements
 
     shots_text = "\n".join(shot_log)
 
@@ -273,7 +289,8 @@ async def basket_cmd(update: Update, ctx: ContextTypes.DEFAULT_TYPE):
 # ─────────────────────────────────────────────
 async def wheel_cmd(update: Update, ctx: ContextTypes.DEFAULT_TYPE):
     u_obj = update.effective_user
-    user  = await db.get_or_create_user(u_obj.id, u_obj.username or "", u_obj.first_name or "")
+    uow   = await db.unit_of_work(u_obj.id, u_obj.username or "", u_obj.first_name or "")
+    user  = uow.user
 
     if not ctx.args:
         await update.message.reply_text(
@@ -296,36 +313,25 @@ async def wheel_cmd(update: Update, ctx: ContextTypes.DEFAULT_TYPE):
     if amount < 100:
         await update.message.reply_text("❌ Minimum spin cost: 100 coins.")
         return
-    if user["coins"] < amount:
-        await update.message.reply_text(f"❌ Insufficient coins! You have {fmt_coins(user['coins'])}")
+    if user.coins < amount:
+        await update.message.reply_text(f"❌ Insufficient coins! You have {fmt_coins(user.coins)}")
         return
 
-    await db.add_coins(u_obj.id, -amount, tx_type="wheel_cost")
-
-    # Spin animation
-    spin_msg = await update.message.reply_text(
-        "🎡 <b>WHEEL OF FORTUNE</b>\n\n🌀 Spinning...", parse_mode="HTML"
-    )
-    await asyncio.sleep(0.8)
-    await spin_msg.edit_text(
-        "🎡 <b>WHEEL OF FORTUNE</b>\n\n💫 Almost there...", parse_mode="HTML"
-    )
-    await asyncio.sleep(0.7)
+    uow.add_coins(-amount, tx_type="wheel_cost")
 
     prize = spin_wheel()
 
     # Apply prize
     result_text = ""
     if prize["type"] == "coins":
-        await db.add_coins(u_obj.id, prize["value"], tx_type="wheel_prize",
-                          note=prize["name"])
+        uow.add_coins(prize["value"], tx_type="wheel_prize", note=prize["name"])
         net = prize["value"] - amount
         result_text = (
             f"💰 Won: <b>+{fmt_coins(prize['value'])}</b>\n"
             f"{'📈' if net>0 else '📉'} Net: <b>{'+' if net>=0 else ''}{fmt_coins(net)}</b>"
         )
     elif prize["type"] == "xp":
-        xp_res = await db.add_xp(u_obj.id, prize["value"])
+        xp_res = uow.add_xp(prize["value"])
         result_text = f"✨ Won: <b>+{prize['value']} XP!</b>"
         if xp_res.get("leveled_up"):
             result_text += f"\n🎊 <b>LEVEL UP → {xp_res['new_level']}!</b>"
@@ -333,23 +339,39 @@ async def wheel_cmd(update: Update, ctx: ContextTypes.DEFAULT_TYPE):
         # Give a random card from the DB
         card = await db.get_random_card()
         if card:
-            await db.add_card_to_user(u_obj.id, card["id"])
+            uow.add_card(card.id)
             from utils import rarity_stars
             result_text = (
                 f"🃏 Rare Card Drop!\n"
-                f"  {rarity_stars(card['rarity'])} <b>{card['name']}</b> [{card['movie']}]"
+                f"  {rarity_stars(card.rarity)} <b>{card.name}</b> [{card.movie}]"
             )
         else:
-            await db.add_coins(u_obj.id, 500, tx_type="wheel_fallback")
+            uow.add_coins(500, tx_type="wheel_fallback")
             result_text = "🃏 No cards available, got 500 coins instead!"
     elif prize["type"] == "item":
-        await db.add_coins(u_obj.id, 300, tx_type="wheel_item_fallback")
+        uow.add_coins(300, tx_type="wheel_item_fallback")
         result_text = "🎁 Lucky Item! +300 coins!"
 
-    xp_res2 = await db.add_xp(u_obj.id, 15)
-    await db.update_mission_progress(u_obj.id, "wheel", 1)
-    new_achs = await db.check_achievements(u_obj.id)
-    new_tits = await db.check_titles(u_obj.id)
+    xp_res2 = uow.add_xp(15)
+    uow.update_mission_progress("wheel", 1)
+    uow.check_achievements()
+    uow.check_titles()
+    try:
+        await uow.flush()
+    except db.InsufficientCoins as e:
+        await update.message.reply_text(_not_enough(e))
+        return
+    new_achs = uow.new_achievements
+
+    # Spin animation
+    spin_msg = await update.message.reply_text(
+        "🎡 <b>WHEEL OF FORTUNE</b>\n\n🌀 Spinning...", parse_mode="HTML"
+    )
+    await asyncio.sleep(0.8)
+    await spin_msg.edit_text(
+        "🎡 <b>WHEEL OF FORTUNE</b>\n\n💫 Almost there...", parse_mode="HTML"
+    )
+    await asyncio.sleep(0.7)
 
     text = (
         f"🎡 <b>WHEEL RESULT</b>\n"
@@ -11,8 +11,8 @@ from telegram import Update
 from telegram.ext import ContextTypes
 
 import database as db
-from config import OWNER_ID, DB_PATH, BACKUP_DIR
-from utils import fmt_coins
+from config import OWNER_ID, DB_PATH, LEDGER_DB_PATH, AUDIT_DB_PATH, BACKUP_DIR
+from utils import fmt_coins, fmt_date
 
 log = logging.getLogger(__name__)
 
@@ -49,8 +49,8 @@ async def addsudo_cmd(update: Update, ctx: ContextTypes.DEFAULT_TYPE):
                 # Create a minimal user-like dict
                 class FakeUser:
                     id         = uid
-                    username   = target_user.get("username", "")
-                    first_name = target_user.get("first_name", "")
+                    username   = target_user.username or ""
+                    first_name = target_user.first_name or ""
                     is_bot     = False
                 target = FakeUser()
         except ValueError:
@@ -105,8 +105,8 @@ async def addcoin_cmd(update: Update, ctx: ContextTypes.DEFAULT_TYPE):
             if t_user:
                 class FU:
                     id         = uid
-                    username   = t_user.get("username","")
-                    first_name = t_user.get("first_name","")
+                    username   = t_user.username or ""
+                    first_name = t_user.first_name or ""
                 target = FU()
         except ValueError:
             pass
@@ -155,7 +155,7 @@ async def sudolist_cmd(update: Update, ctx: ContextTypes.DEFAULT_TYPE):
     else:
         for i, s in enumerate(sudos, 1):
             uname = s.get("username") or "N/A"
-            added = s.get("added_at", "?")[:10]
+            added = fmt_date(s.get("added_at"))
             text += f"{i}. <code>{s['user_id']}</code> @{uname}  <i>({added})</i>\n"
 
     text += f"\n━━━━━━━━━━━━━━━━━━━━━\nTotal sudos: <b>{len(sudos)}</b>"
@@ -181,24 +181,24 @@ async def broadcast_cmd(update: Update, ctx: ContextTypes.DEFAULT_TYPE):
         text_parts.remove("--pin")
 
     message = " ".join(text_parts)
-    users   = await db.get_all_users()
+    total   = await db.count_users()
 
     sent = failed = 0
     status_msg = await update.message.reply_text(
-        f"📡 Broadcasting to {len(users)} users..."
+        f"📡 Broadcasting to {total} users..."
     )
 
-    for u in users:
+    async for u in db.iter_users(columns=("user_id",)):
         try:
             sent_msg = await ctx.bot.send_message(
-                chat_id=u["user_id"],
+                chat_id=u.user_id,
                 text=f"📢 <b>BROADCAST</b>\n\n{message}",
                 parse_mode="HTML"
             )
             sent += 1
             if pin_msg:
                 try:
-                    await ctx.bot.pin_chat_message(u["user_id"], sent_msg.message_id)
+                    await ctx.bot.pin_chat_message(u.user_id, sent_msg.message_id)
                 except Exception:
                     pass
         except Exception:
@@ -208,7 +208,7 @@ async def broadcast_cmd(update: Update, ctx: ContextTypes.DEFAULT_TYPE):
         f"📢 <b>Broadcast Complete!</b>\n\n"
         f"✅ Sent:   {sent}\n"
         f"❌ Failed: {failed}\n"
-        f"👥 Total:  {len(users)}",
+        f"👥 Total:  {sent + failed}",
         parse_mode="HTML"
     )
     await db.audit(update.effective_user.id, "broadcast", "all", message[:100])
@@ -267,7 +267,18 @@ async def systemcheck_cmd(update: Update, ctx: ContextTypes.DEFAULT_TYPE):
 
     # DB check
     db_size = os.path.getsize(DB_PATH) if os.path.exists(DB_PATH) else 0
+    ledger_size = os.path.getsize(LEDGER_DB_PATH) if os.path.exists(LEDGER_DB_PATH) else 0
+    audit_size  = os.path.getsize(AUDIT_DB_PATH) if os.path.exists(AUDIT_DB_PATH) else 0
     stats   = await db.get_server_stats()
+    pool    = db.get_pool_stats()
+    ucache  = db.get_user_cache_stats()
+    schema  = await db.get_schema_version()
+    shards  = db.get_shard_stats()
+    hot     = db.get_hot_state_stats()
+    maint   = db.get_maintenance_stats()
+    counts  = db.get_counter_stats()
+    ledger  = db.get_ledger_stats()
+    catalog = db.get_catalog_stats()
 
     # Backup count
     bak_count = 0
@@ -276,23 +287,75 @@ async def systemcheck_cmd(update: Update, ctx: ContextTypes.DEFAULT_TYPE):
 
     elapsed = (time.time() - start) * 1000
 
+    if maint["last_at"] is None:
+        maint_lines = "🧹 Maintenance:  <b>not run yet</b>\n"
+    else:
+        ago = (time.time() - maint["last_at"]) / 60
+        maint_lines = (
+            f"🧹 Maintenance:  <b>{ago:.0f}m ago</b> · {maint['runs']} runs\n"
+            f"   checkpoint {maint['checkpoint']} {maint['checkpoint_ms']:.1f}ms"
+            + (f" ({maint['busy']} busy)" if maint["busy"] else "")
+            + f" · vacuum {maint['vacuum_ms']:.1f}ms · optimize {maint['optimize_ms']:.1f}ms\n"
+        )
+    maint_lines += (
+        f"📜 WAL:          <b>{maint['wal_bytes']/1024:.1f} KB</b> · "
+        f"{maint['free_pages']:,} free pages\n"
+    )
+
     # Python / OS info
     py_ver  = sys.version.split()[0]
     os_name = platform.system()
     now     = datetime.utcnow().strftime("%Y-%m-%d %H:%M:%S")
 
+    engine_lines = ""
+    if shards:
+        queues = "/".join(str(s["queue_depth"]) for s in shards)
+        writes = sum(s["write_checkouts"] for s in shards)
+        engine_lines = f"🧩 Shards:       <b>{len(shards)}</b> · queues {queues} · {writes:,}W\n"
+    engine_lines += (
+        f"🧮 Counters:     <b>{counts['pending']:,}</b> pending · {counts['flushes']:,} flushes · "
+        f"{counts['coalesce']:.1f} deltas/write\n"
+        f"🧾 Ledger:       <b>{ledger['durability']}</b> · {ledger['pending']:,} pending · "
+        f"{ledger['batch_avg']:.1f} rows/insert"
+        + (f" · {ledger['waits']:,} waits" if ledger["waits"] else "") + "\n"
+        f"🎴 Catalog:      <b>{catalog['cards']:,}</b> cards · {catalog['draws']:,} draws · "
+        f"{catalog['builds']} builds ({catalog['build_ms']:.1f}ms) · "
+        f"{catalog['searches']:,} name searches ({catalog['search_us']:.0f}µs)\n"
+    )
+    if hot:
+        engine_lines += (
+            f"🔥 Hot State:    <b>{hot['players']:,}</b> players · {hot['pending']:,} pending · "
+            f"fsync {hot['fsync_ms_avg']:.2f}ms avg\n"
+        )
+
     text = (
         f"🖥️ <b>SYSTEM CHECK</b>\n"
         f"━━━━━━━━━━━━━━━━━━━━━\n\n"
         f"🤖 Bot Status:   <b>✅ Online</b>\n"
         f"🗄️  DB Status:    <b>✅ Connected</b>\n"
         f"💾 DB Size:      <b>{db_size/1024:.1f} KB</b>\n"
+        f"📒 Ledger/Audit: <b>{ledger_size/1024:.1f} KB</b> / <b>{audit_size/1024:.1f} KB</b>\n"
+        f"🧱 Schema:       <b>v{schema}</b>\n"
         f"📦 Backups:      <b>{bak_count}</b> files\n\n"
         f"━━━━━━━━━━━━━━━━━━━━━\n"
         f"👥 Users:        <b>{stats['total_users']:,}</b>\n"
         f"🃏 Cards:        <b>{stats['total_cards']:,}</b>\n"
         f"💰 Total Coins:  <b>{stats['total_coins']:,}</b>\n\n"
         f"━━━━━━━━━━━━━━━━━━━━━\n"
+        f"🔌 DB Pool:      <b>1W + {pool['readers']}R</b> ({pool['readers_idle']} idle)\n"
+        f"🔁 Checkouts:    <b>{pool['read_checkouts']:,}R / {pool['write_checkouts']:,}W</b>\n"
+        f"⏱️ Pool Wait:    <b>{pool['wait_ms_avg']:.2f}ms</b> avg · {pool['wait_ms_max']:.1f}ms max\n"
+        f"🔗 Connects:     <b>{pool['connects']}</b> · timeouts {pool['timeouts']}\n"
+        f"📥 Write Queue:  <b>{pool['queue_depth']}</b> (max {pool['queue_max']})\n"
+        f"📦 Group Commit: <b>{pool['batch_avg']:.1f}</b> avg · {pool['batch_max']} max jobs\n"
+        f"💽 Commit:       <b>{pool['commit_ms_avg']:.2f}ms</b> avg · {pool['commit_ms_max']:.1f}ms max\n"
+        f"👤 User Cache:   <b>{ucache['hit_rate']:.1%}</b> hits · {ucache['size']:,}/{ucache['capacity']:,} rows · "
+        f"{ucache['owned']['size']:,} collections ({ucache['owned']['bytes'] / 1048576:.1f}/"
+        f"{ucache['owned']['max_bytes'] / 1048576:.0f} MB)\n"
+        f"🔄 Invalidations: <b>{ucache['remote_evictions']:,}</b> remote · {ucache['full_resets']} resets\n"
+        f"{engine_lines}"
+        f"{maint_lines}\n"
+        f"━━━━━━━━━━━━━━━━━━━━━\n"
         f"🐍 Python:       <b>{py_ver}</b>\n"
         f"💻 OS:           <b>{os_name}</b>\n"
         f"⚡ Response:     <b>{elapsed:.1f}ms</b>\n"
@@ -6,7 +6,7 @@ from telegram import Update
 from telegram.ext import ContextTypes
 
 import database as db
-from utils import fmt_coins, rarity_stars, make_bar
+from utils import fmt_coins, fmt_date, rarity_stars, make_bar
 from config import RARITY_CONFIG
 
 log = logging.getLogger(__name__)
@@ -31,11 +31,11 @@ async def top_cmd(update: Update, ctx: ContextTypes.DEFAULT_TYPE):
 
     for i, u in enumerate(top_all):
         medal = medals[i] if i < len(medals) else f"{i+1}."
-        name  = u.get("first_name") or u.get("username") or f"User#{u['user_id']}"
-        is_me = " 👈" if u["user_id"] == u_obj.id else ""
+        name  = u.first_name or u.username or f"User#{u.user_id}"
+        is_me = " 👈" if u.user_id == u_obj.id else ""
         text += (
             f"{medal} <b>{name}</b>{is_me}\n"
-            f"    💰 {u['coins']:,}  ·  Lv.{u['level']}\n"
+            f"    💰 {u.coins:,}  ·  Lv.{u.level}\n"
         )
 
     text += "\n━━━━━━━━━━━━━━━━━━━━━\n"
@@ -62,9 +62,8 @@ async def titles_cmd(update: Update, ctx: ContextTypes.DEFAULT_TYPE):
     u_obj   = update.effective_user
     user    = await db.get_or_create_user(u_obj.id, u_obj.username or "", u_obj.first_name or "")
 
-    my_titles   = await db.get_user_titles(u_obj.id)
-    earned_keys = {t["title_key"] for t in my_titles}
-    active      = user.get("active_title", "t1")
+    earned_keys = await db.earned_title_keys(user)
+    active      = user.active_title or "t1"
 
     # Check for new titles
     new_titles = await db.check_titles(u_obj.id)
@@ -107,8 +106,8 @@ async def missions_cmd(update: Update, ctx: ContextTypes.DEFAULT_TYPE):
 
     missions = await db.get_user_missions(u_obj.id)
 
-    daily_ms  = [m for m in missions if m.get("period") == "daily"]
-    weekly_ms = [m for m in missions if m.get("period") == "weekly"]
+    daily_ms  = [m for m in missions if m.period == "daily"]
+    weekly_ms = [m for m in missions if m.period == "weekly"]
 
     text = (
         f"📋 <b>MISSIONS</b>  [{u_obj.first_name}]\n"
@@ -117,28 +116,28 @@ async def missions_cmd(update: Update, ctx: ContextTypes.DEFAULT_TYPE):
     )
 
     for m in daily_ms:
-        prog  = m.get("progress", 0)
-        req   = m.get("requirement", 1)
-        done  = m.get("completed", 0)
+        prog  = m.progress
+        req   = m.requirement
+        done  = m.completed
         bar   = make_bar(prog, req, 8)
         check = "✅" if done else "⏳"
         text += (
-            f"\n{check} <b>{m['name']}</b>  ({prog}/{req})\n"
-            f"  {bar}  💰 +{m['reward']:,}\n"
-            f"  <i>{m['description']}</i>\n"
+            f"\n{check} <b>{m.name}</b>  ({prog}/{req})\n"
+            f"  {bar}  💰 +{m.reward:,}\n"
+            f"  <i>{m.description}</i>\n"
         )
 
     text += f"\n━━━━━━━━━━━━━━━━━━━━━\n📆 <b>Weekly Missions</b>\n"
     for m in weekly_ms:
-        prog  = m.get("progress", 0)
-        req   = m.get("requirement", 1)
-        done  = m.get("completed", 0)
+        prog  = m.progress
+        req   = m.requirement
+        done  = m.completed
         bar   = make_bar(prog, req, 8)
         check = "✅" if done else "⏳"
         text += (
-            f"\n{check} <b>{m['name']}</b>  ({prog}/{req})\n"
-            f"  {bar}  💰 +{m['reward']:,}\n"
-            f"  <i>{m['description']}</i>\n"
+            f"\n{check} <b>{m.name}</b>  ({prog}/{req})\n"
+            f"  {bar}  💰 +{m.reward:,}\n"
+            f"  <i>{m.description}</i>\n"
         )
 
     text += "\n━━━━━━━━━━━━━━━━━━━━━\n💡 Missions reset daily/weekly automatically!"
@@ -167,7 +166,7 @@ async def achievements_cmd(update: Update, ctx: ContextTypes.DEFAULT_TYPE):
 
     for a in ACHIEVEMENTS:
         if a["id"] in earned_keys:
-            earned_at = next((x["earned_at"][:10] for x in all_achs if x["ach_key"] == a["id"]), "?")
+            earned_at = next((fmt_date(x["earned_at"]) for x in all_achs if x["ach_key"] == a["id"]), "?")
             text += f"{a['badge']} <b>{a['name']}</b> ✅\n"
             text += f"  └ {a['desc']}  <i>({earned_at})</i>\n\n"
         else:
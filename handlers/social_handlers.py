@@ -61,7 +61,8 @@ async def givecoin_cmd(update: Update, ctx: ContextTypes.DEFAULT_TYPE):
         f"💸 <b>COINS TRANSFERRED!</b>\n\n"
         f"📤 From: <b>{u_obj.first_name}</b>\n"
         f"📥 To:   <b>{target.first_name}</b>\n"
-        f"💰 Amount: <b>{fmt_coins(amount)}</b>\n\n"
+        f"💰 Amount: <b>{fmt_coins(amount)}</b>\n"
+        f"👛 Your balance: <b>{fmt_coins(result['balance'])}</b>\n\n"
         f"💡 Transaction logged!"
     )
     await update.message.reply_text(text, parse_mode="HTML")
@@ -77,9 +78,9 @@ async def marry_cmd(update: Update, ctx: ContextTypes.DEFAULT_TYPE):
     u_obj = update.effective_user
     user  = await db.get_or_create_user(u_obj.id, u_obj.username or "", u_obj.first_name or "")
 
-    if user.get("married_to"):
-        partner = await db.get_user(user["married_to"])
-        pname   = partner.get("first_name") or partner.get("username") if partner else "Unknown"
+    if user.married_to:
+        partner = await db.get_user(user.married_to)
+        pname   = partner.first_name or partner.username if partner else "Unknown"
         await update.message.reply_text(
             f"💍 You're already married to <b>{pname}</b>!\n"
             f"Use /divorce first to get divorced.",
@@ -104,7 +105,7 @@ async def marry_cmd(update: Update, ctx: ContextTypes.DEFAULT_TYPE):
         return
 
     t_user = await db.get_or_create_user(target.id, target.username or "", target.first_name or "")
-    if t_user.get("married_to"):
+    if t_user.married_to:
         await update.message.reply_text(
             f"💔 <b>{target.first_name}</b> is already married to someone else!",
             parse_mode="HTML"
@@ -141,13 +142,13 @@ async def divorce_cmd(update: Update, ctx: ContextTypes.DEFAULT_TYPE):
     u_obj = update.effective_user
     user  = await db.get_or_create_user(u_obj.id, u_obj.username or "", u_obj.first_name or "")
 
-    if not user.get("married_to"):
+    if not user.married_to:
         await update.message.reply_text("💔 You're not married to anyone!")
         return
 
     partner_id = await db.divorce(u_obj.id)
     partner    = await db.get_user(partner_id) if partner_id else None
-    pname      = partner.get("first_name") or partner.get("username") if partner else "your partner"
+    pname      = partner.first_name or partner.username if partner else "your partner"
 
     text = (
         f"💔 <b>Divorced</b>\n\n"
@@ -185,9 +186,9 @@ async def friends_cmd(update: Update, ctx: ContextTypes.DEFAULT_TYPE):
     )
 
     for i, f in enumerate(friends, 1):
-        fname = f.get("first_name") or f.get("username") or f"User #{f['user_id']}"
+        fname = f.first_name or f.username or f"User #{f.user_id}"
         title_emoji = "🌱"  # default
-        text += f"<b>{i}.</b> {fname}  ·  Lv.{f['level']} {title_emoji}\n"
+        text += f"<b>{i}.</b> {fname}  ·  Lv.{f.level} {title_emoji}\n"
 
     text += (
         f"\n━━━━━━━━━━━━━━━━━━━━━\n"
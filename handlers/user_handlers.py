@@ -9,9 +9,9 @@ from telegram.ext import ContextTypes
 import database as db
 from utils import (
     mention, safe_name, xp_bar, fmt_coins, rarity_stars,
-    calc_daily_bonus, is_new_day, today_str, make_bar
+    calc_daily_bonus, is_new_day, local_date, now_ts, make_bar
 )
-from config import LEVEL_XP_REQUIREMENTS, RARITY_CONFIG
+from config import LEVEL_XP_REQUIREMENTS, RARITY_CONFIG, ACHIEVEMENTS, TITLES
 
 log = logging.getLogger(__name__)
 
@@ -24,17 +24,16 @@ async def balance_cmd(update: Update, ctx: ContextTypes.DEFAULT_TYPE):
     user   = await db.get_or_create_user(u_obj.id, u_obj.username or "", u_obj.first_name or "")
     await db.ensure_weekly_entry(u_obj.id, u_obj.username or u_obj.first_name)
 
-    level    = user["level"]
-    xp       = user["xp"]
-    coins    = user["coins"]
-    streak   = user["streak"]
-    married  = user["married_to"]
+    level    = user.level
+    xp       = user.xp
+    coins    = user.coins
+    streak   = user.streak
+    married  = user.married_to
     fav_card = await db.get_favorite_card(u_obj.id)
-    titles   = await db.get_user_titles(u_obj.id)
-    active_t = user.get("active_title", "t1")
+    active_t = user.active_title or "t1"
 
     # Find active title
-    cur_title = next((t for t in titles if t["title_key"] == active_t), None)
+    cur_title = next((t for t in TITLES if t["id"] == active_t), None)
     title_str = f"{cur_title['emoji']} {cur_title['name']}" if cur_title else "🌱 Novice"
 
     # XP bar
@@ -46,19 +45,16 @@ async def balance_cmd(update: Update, ctx: ContextTypes.DEFAULT_TYPE):
     if married:
         spouse = await db.get_user(married)
         if spouse:
-            spouse_str = f"💍 {spouse.get('first_name') or spouse.get('username','?')}"
+            spouse_str = f"💍 {spouse.first_name or spouse.username or '?'}"
 
     # Favorite card
     card_str = "🃏 None set"
     if fav_card:
-        card_str = f"{rarity_stars(fav_card['rarity'])} {fav_card['name']} [{fav_card['movie']}]"
-
-    # Achievements count
-    achs = await db.get_user_achievements(u_obj.id)
+        card_str = f"{rarity_stars(fav_card.rarity)} {fav_card.name} [{fav_card.movie}]"
 
     # Rank position
     top = await db.get_top_users(100)
-    rank = next((i+1 for i,t in enumerate(top) if t["user_id"]==u_obj.id), "N/A")
+    rank = next((i+1 for i,t in enumerate(top) if t.user_id==u_obj.id), "N/A")
 
     text = (
         f"╔═══════════════════════╗\n"
@@ -74,11 +70,11 @@ async def balance_cmd(update: Update, ctx: ContextTypes.DEFAULT_TYPE):
         f"━━━━━━━━━━━━━━━━━━━━━\n"
         f"🎴 <b>Fav Card:</b> {card_str}\n"
         f"{spouse_str}\n"
-        f"🎖️ Achievements: <b>{len(achs)}/15</b>\n"
+        f"🎖️ Achievements: <b>{user.achievement_count}/{len(ACHIEVEMENTS)}</b>\n"
         f"━━━━━━━━━━━━━━━━━━━━━\n"
-        f"📦 Cards: <b>{user['total_caught']}</b> total caught\n"
-        f"🎰 Jackpots: <b>{user['jackpots']}</b>\n"
-        f"🏀 Best Combo: <b>{user['best_combo']}</b>\n"
+        f"📦 Cards: <b>{user.total_caught}</b> total caught\n"
+        f"🎰 Jackpots: <b>{user.jackpots}</b>\n"
+        f"🏀 Best Combo: <b>{user.best_combo}</b>\n"
     )
     await update.message.reply_text(text, parse_mode="HTML")
 
@@ -88,9 +84,10 @@ async def balance_cmd(update: Update, ctx: ContextTypes.DEFAULT_TYPE):
 # ─────────────────────────────────────────────
 async def daily_cmd(update: Update, ctx: ContextTypes.DEFAULT_TYPE):
     u_obj = update.effective_user
-    user  = await db.get_or_create_user(u_obj.id, u_obj.username or "", u_obj.first_name or "")
+    uow   = await db.unit_of_work(u_obj.id, u_obj.username or "", u_obj.first_name or "")
+    user  = uow.user
 
-    last_daily = user.get("last_daily")
+    last_daily = user.last_daily
 
     if not is_new_day(last_daily):
         # Already claimed
@@ -98,7 +95,7 @@ async def daily_cmd(update: Update, ctx: ContextTypes.DEFAULT_TYPE):
         tomorrow = date.today() + timedelta(days=1)
         text = (
             f"⏰ <b>Already Claimed!</b>\n\n"
-            f"🔥 Current Streak: <b>{user['streak']} days</b>\n"
+            f"🔥 Current Streak: <b>{user.streak} days</b>\n"
             f"🕒 Next daily: <b>{tomorrow.strftime('%Y-%m-%d')}</b>\n\n"
             f"💡 Come back tomorrow for more bonus!"
         )
@@ -106,20 +103,26 @@ async def daily_cmd(update: Update, ctx: ContextTypes.DEFAULT_TYPE):
         return
 
     # Calculate new streak
-    yesterday = (date.today() - __import__("datetime").timedelta(days=1)).isoformat()
-    new_streak = (user["streak"] + 1) if (last_daily and last_daily[:10] == yesterday) else 1
+    yesterday = date.today() - __import__("datetime").timedelta(days=1)
+    new_streak = (user.streak + 1) if local_date(last_daily) == yesterday else 1
     bonus      = calc_daily_bonus(new_streak)
 
-    # Update DB
-    await db.update_user(u_obj.id, streak=new_streak, last_daily=today_str(),
-                         days_played=user["days_played"] + 1)
-    await db.add_coins(u_obj.id, bonus, tx_type="daily", note=f"Daily streak {new_streak}")
-    xp_result = await db.add_xp(u_obj.id, 30)
+    # Update DB (single transaction on flush)
+    uow.set(streak=new_streak, last_daily=now_ts())
+    uow.incr("days_played", 1)
+    uow.add_coins(bonus, tx_type="daily", note=f"Daily streak {new_streak}")
+    xp_result = uow.add_xp(30)
 
     # Check missions & achievements
-    await db.update_mission_progress(u_obj.id, "streak", 1)
-    new_achs = await db.check_achievements(u_obj.id)
-    new_tits = await db.check_titles(u_obj.id)
+    uow.update_mission_progress("streak", 1)
+    uow.check_achievements()
+    uow.check_titles()
+    try:
+        await uow.flush()
+    except db.InsufficientCoins:
+        await update.message.reply_text("❌ Couldn't claim your daily bonus, please try again.")
+        return
+    new_achs = uow.new_achievements
 
     # Streak milestone emoji
     streak_emoji = "🔥" * min(new_streak // 3 + 1, 5)
@@ -161,13 +164,13 @@ async def shop_cmd(update: Update, ctx: ContextTypes.DEFAULT_TYPE):
     text = (
         f"🏪 <b>CARD GAME SHOP</b>\n"
         f"━━━━━━━━━━━━━━━━━━━━━\n"
-        f"💰 Your Balance: {fmt_coins(user['coins'])}\n"
+        f"💰 Your Balance: {fmt_coins(user.coins)}\n"
         f"━━━━━━━━━━━━━━━━━━━━━\n\n"
         f"🛒 <i>Use /buy &lt;number&gt; to purchase</i>\n\n"
     )
 
     for i, item in enumerate(items, 1):
-        can_afford = "✅" if user["coins"] >= item["price"] else "❌"
+        can_afford = "✅" if user.coins >= item["price"] else "❌"
         text += (
             f"<b>[{i}]</b> {can_afford} <b>{item['name']}</b>\n"
             f"  📝 {item['description']}\n"
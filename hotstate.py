@@ -0,0 +1,387 @@
+# ════════════════════════════════════════════
+# 🃏 Card Collection Bot — Hot State
+# ════════════════════════════════════════════
+# Peak-event mode (HOT_STATE=1). The per-player counters that every
+# command touches — coins, xp, level, streak, the play counters and
+# mission progress — are owned by memory instead of SQLite:
+#
+#   * `HotState` holds one `User` per player seen since startup and stands
+#     in for the user cache (same get/token/fill/put/invalidate/clear
+#     interface). Rows read from SQLite are merged with it: columns in
+#     HOT_FIELDS always come from memory, everything else from the row.
+#   * Every change is appended to a `Journal` as a numbered record. The
+#     journal is written and fsynced in batches every HOT_STATE_FSYNC_MS;
+#     a command waits for its batch (`durable()`), never for SQLite.
+#   * `database` applies the records to SQLite in the background. Each
+#     shard stores the last record number it has applied in the same
+#     transaction, so applying a record twice is a no-op.
+#   * On startup the journal segments still on disk are applied before
+#     anything is served, then deleted.
+#
+# Record kinds, as JSON arrays `[seq, kind, user_id, ...]`:
+#   "u"  {column: new value}                  users row
+#   "w"  delta                                 weekly_board coins
+#   "m"  mission_key, progress, completed, reset_at
+#   "t"  from_user, to_user, amount, tx_type, note, created_at   ledger row
+#
+# Memory is not shared between processes, so only one bot process may run
+# with HOT_STATE on.
+import asyncio
+import json
+import logging
+import os
+import time
+from typing import Any, Callable, Dict, Iterable, Iterator, List, Optional, Set
+
+from models import User
+
+log = logging.getLogger(__name__)
+
+HOT_FIELDS = (
+    "coins", "xp", "level", "streak", "last_daily", "total_caught", "total_spent",
+    "slots_wins", "jackpots", "best_combo", "days_played",
+)
+
+
+# ─────────────────────────────────────────────
+# JOURNAL
+# ─────────────────────────────────────────────
+class Journal:
+    """Append-only JSON-lines journal in numbered segment files
+    `<prefix>.<n>.log`.
+
+    `append` only buffers. A background task writes the buffer and fsyncs
+    it every `fsync_ms`, then wakes everything waiting in `durable()` —
+    one fsync per batch, like the writer's group commit. `discard(seq)`
+    deletes the closed segments holding nothing newer than `seq` and makes
+    the next batch start a new segment.
+    """
+
+    def __init__(self, prefix: str, fsync_ms: float):
+        self.prefix   = prefix
+        self.fsync_ms = fsync_ms
+        self._buf: List[str] = []
+        self._buf_top = 0
+        self._batch: Optional[asyncio.Future] = None      # resolved when _buf is on disk
+        self._inflight: Optional[asyncio.Future] = None
+        self._file = None
+        self._next = 0
+        self._segments: List[list] = []     # [path, highest seq], oldest first; last one is open
+        self._rotate = False
+        self._lock: Optional[asyncio.Lock] = None
+        self._task: Optional[asyncio.Task] = None
+        self._metrics = {"records": 0, "fsyncs": 0, "fsync_ms_total": 0.0, "fsync_ms_max": 0.0}
+
+    def _on_disk(self) -> List[tuple]:
+        directory = os.path.dirname(self.prefix) or "."
+        stem = os.path.basename(self.prefix) + "."
+        if not os.path.isdir(directory):
+            return []
+        found = []
+        for name in os.listdir(directory):
+            number = name[len(stem):-len(".log")]
+            if name.startswith(stem) and name.endswith(".log") and number.isdigit():
+                found.append((int(number), os.path.join(directory, name)))
+        return sorted(found)
+
+    def existing(self) -> List[str]:
+        """Segment files on disk, oldest first."""
+        return [path for _, path in self._on_disk()]
+
+    def read(self) -> Iterator[list]:
+        """Every record in the segments on disk, in order. A torn last line
+        (the process died mid-write) ends its segment."""
+        for path in self.existing():
+            with open(path, encoding="utf-8") as f:
+                for line in f:
+                    try:
+                        yield json.loads(line)
+                    except ValueError:
+                        log.warning(f"🔥 Torn journal record in {path}; ignoring the rest")
+                        break
+
+    def start(self):
+        """Delete the segments on disk (their records must already be
+        applied) and start the fsync task."""
+        found = self._on_disk()
+        if found:
+            self._next = found[-1][0] + 1
+        for _, path in found:
+            os.remove(path)
+        self._segments = []
+        self._rotate = False
+        self._lock = asyncio.Lock()
+        if self._task is None:
+            self._task = asyncio.create_task(self._run())
+
+    def resume(self):
+        """Restart the fsync task after `close`, keeping the segments."""
+        if self._task is None:
+            self._task = asyncio.create_task(self._run())
+
+    async def close(self):
+        if self._task is not None:
+            self._task.cancel()
+            self._task = None
+        await self.sync()
+        if self._file is not None:
+            self._file.close()
+            self._file = None
+
+    def append(self, seq: int, record: list):
+        self._buf.append(json.dumps(record, separators=(",", ":")) + "\n")
+        self._buf_top = seq
+        self._metrics["records"] += 1
+        if self._batch is None:
+            self._batch = asyncio.get_running_loop().create_future()
+
+    async def durable(self):
+        """Wait until everything appended so far is fsynced."""
+        if self._task is None:
+            await self.sync()
+            return
+        waiting = self._batch if self._buf else self._inflight
+        if waiting is not None:
+            await asyncio.shield(waiting)
+
+    async def sync(self):
+        if self._lock is None:
+            self._lock = asyncio.Lock()
+        async with self._lock:
+            if not self._buf:
+                return
+            lines, top, done = self._buf, self._buf_top, self._batch
+            self._buf, self._batch = [], None
+            self._inflight = done
+            started = time.perf_counter()
+            try:
+                await asyncio.to_thread(self._write, lines, top)
+            except Exception as e:
+                log.error(f"🔥 Journal write failed: {e}")
+                done.set_exception(e)
+                done.exception()    # waiters re-raise it; don't warn if there are none
+                return
+            finally:
+                self._inflight = None
+            took = (time.perf_counter() - started) * 1000
+            self._metrics["fsyncs"] += 1
+            self._metrics["fsync_ms_total"] += took
+            self._metrics["fsync_ms_max"] = max(self._metrics["fsync_ms_max"], took)
+            done.set_result(None)
+
+    async def discard(self, upto: int):
+        if self._lock is None:
+            self._lock = asyncio.Lock()
+        async with self._lock:
+            keep = []
+            for seg in self._segments[:-1]:
+                if seg[1] <= upto:
+                    os.remove(seg[0])
+                else:
+                    keep.append(seg)
+            self._segments = keep + self._segments[-1:]
+            self._rotate = True
+
+    def _write(self, lines: List[str], top: int):
+        # runs in a worker thread, one call at a time (under _lock)
+        if self._file is None or self._rotate:
+            if self._file is not None:
+                self._file.close()
+            path = f"{self.prefix}.{self._next}.log"
+            self._next += 1
+            self._file = open(path, "a", encoding="utf-8")
+            self._segments.append([path, 0])
+            self._rotate = False
+        self._file.write("".join(lines))
+        self._file.flush()
+        os.fsync(self._file.fileno())
+        self._segments[-1][1] = top
+
+    async def _run(self):
+        while True:
+            await asyncio.sleep(self.fsync_ms / 1000)
+            try:
+                await self.sync()
+            except Exception as e:
+                log.error(f"🔥 Journal sync error: {e}")
+
+    def stats(self) -> Dict:
+        m = self._metrics
+        return {
+            "journal_records":  m["records"],
+            "journal_fsyncs":   m["fsyncs"],
+            "journal_segments": len(self._segments),
+            "fsync_ms_avg":     (m["fsync_ms_total"] / m["fsyncs"]) if m["fsyncs"] else 0.0,
+            "fsync_ms_max":     m["fsync_ms_max"],
+        }
+
+
+# ─────────────────────────────────────────────
+# HOT STATE
+# ─────────────────────────────────────────────
+class HotState:
+    """In-memory owner of the HOT_FIELDS columns, used as the user cache.
+
+    Rows are never evicted: a player stays in memory from first use until
+    shutdown. `invalidate`/`clear` only mark rows stale, so the next read
+    refreshes the other columns from SQLite while the hot ones are kept.
+    Rows are handed out shared; every change replaces the row object.
+    """
+
+    def __init__(self, journal: Journal, level_for: Callable[[int, int], int]):
+        self.journal   = journal
+        self.level_for = level_for     # (current level, xp) -> level
+        self.users: Dict[int, User] = {}
+        self.stale: Set[int] = set()
+        self.missions: Dict[int, Dict[str, list]] = {}   # user_id -> key -> [progress, completed, reset_at]
+        self.pending: List[list] = []                    # journaled, not yet in SQLite
+        self.seq      = 0
+        self._writes  = 0
+        self._touched: Dict[int, int] = {}   # user_id -> _writes at its last put/invalidate
+        self._cleared = 0
+        self._metrics = {"hits": 0, "misses": 0, "writes": 0, "applied": 0}
+
+    # ── user cache interface ───────────────────
+    def get(self, user_id: int) -> Optional[User]:
+        row = self.users.get(user_id)
+        if row is None or user_id in self.stale:
+            self._metrics["misses"] += 1
+            return None
+        self._metrics["hits"] += 1
+        return row
+
+    def token(self) -> int:
+        return self._writes
+
+    def fill(self, row: Optional[User], token: int) -> Optional[User]:
+        """Unlike UserCache, only a put/invalidate of this same player (or a
+        clear) during the read keeps the row out: hot changes never touch
+        the columns the row is trusted for."""
+        if row is None:
+            return None
+        if max(self._touched.get(row.user_id, 0), self._cleared) <= token:
+            return self._adopt(row)
+        return self._overlay(row)
+
+    def put(self, row: Optional[User]) -> Optional[User]:
+        if row is None:
+            return None
+        self._writes += 1
+        self._touched[row.user_id] = self._writes
+        self._metrics["writes"] += 1
+        return self._adopt(row)
+
+    def invalidate(self, user_id: int):
+        self._writes += 1
+        self._touched[user_id] = self._writes
+        if user_id in self.users:
+            self.stale.add(user_id)
+
+    def clear(self):
+        self._writes += 1
+        self._cleared = self._writes
+        self.stale.update(self.users)
+
+    def _overlay(self, row: User) -> User:
+        cur = self.users.get(row.user_id)
+        if cur is None or cur is row:
+            return row
+        merged = row.copy()
+        for f in HOT_FIELDS:
+            setattr(merged, f, getattr(cur, f))
+        return merged
+
+    def _adopt(self, row: User) -> User:
+        merged = self._overlay(row)
+        self.users[row.user_id] = merged
+        self.stale.discard(row.user_id)
+        return merged
+
+    # ── changes ────────────────────────────────
+    def record(self, kind: str, user_id: int, *data: Any):
+        self.seq += 1
+        rec = [self.seq, kind, user_id, *data]
+        self.pending.append(rec)
+        self.journal.append(self.seq, rec)
+
+    def change(self, user_id: int, sets: Optional[Dict[str, Any]] = None,
+               incrs: Optional[Dict[str, int]] = None, floor: int = 0) -> Optional[User]:
+        """Set and increment hot columns of a player already in memory.
+        Like the SQL debits, nothing changes (and None is returned) unless
+        the balance is at least a positive `floor`. Returns the new row."""
+        cur = self.users[user_id]
+        if floor > 0 and (cur.coins or 0) < floor:
+            return None
+        row = cur.copy()
+        changed: Dict[str, Any] = {}
+        for k, v in (sets or {}).items():
+            setattr(row, k, v)
+            changed[k] = v
+        for k, delta in (incrs or {}).items():
+            changed[k] = (getattr(row, k) or 0) + delta
+            setattr(row, k, changed[k])
+        if incrs and "xp" in incrs:
+            row.level = changed["level"] = self.level_for(row.level or 1, row.xp)
+        self.users[user_id] = row
+        self.record("u", user_id, changed)
+        return row
+
+    def adopt_missions(self, user_id: int, rows: Iterable[tuple]) -> Dict[str, list]:
+        """Merge (mission_key, progress, completed, reset_at) rows read from
+        SQLite; entries already in memory win."""
+        mine = self.missions.setdefault(user_id, {})
+        for key, *state in rows:
+            mine.setdefault(key, list(state))
+        return mine
+
+    def set_mission(self, user_id: int, key: str, progress: int, completed: int,
+                    reset_at: Optional[int]):
+        self.missions[user_id][key] = [progress, completed, reset_at]
+        self.record("m", user_id, key, progress, completed, reset_at)
+
+    async def durable(self):
+        await self.journal.durable()
+
+    # ── write-behind ───────────────────────────
+    def take_pending(self) -> List[list]:
+        batch, self.pending = self.pending, []
+        return batch
+
+    def requeue(self, batch: List[list]):
+        self.pending = batch + self.pending
+
+    def applied(self, count: int):
+        self._metrics["applied"] += count
+
+    def reset(self):
+        """Forget every player (after the tables were emptied)."""
+        self.clear()
+        self._touched.clear()
+        self.users.clear()
+        self.stale.clear()
+        self.missions.clear()
+        self.pending.clear()
+
+    def stats(self) -> Dict:
+        m = self._metrics
+        lookups = m["hits"] + m["misses"]
+        return {
+            "size":      len(self.users),
+            "capacity":  len(self.users),
+            "ttl":       0.0,
+            "hit_rate":  (m["hits"] / lookups) if lookups else 0.0,
+            "hits":      m["hits"],
+            "misses":    m["misses"],
+            "expired":   0,
+            "evictions": 0,
+            "writes":    m["writes"],
+        }
+
+    def hot_stats(self) -> Dict:
+        return {
+            "players": len(self.users),
+            "pending": len(self.pending),
+            "seq":     self.seq,
+            "applied": self._metrics["applied"],
+            **self.journal.stats(),
+        }
@@ -0,0 +1,807 @@
+# ════════════════════════════════════════════
+# 🃏 Card Collection Bot — Schema Migrations
+# ════════════════════════════════════════════
+# `init_db` creates the original (version 0) schema; every change after
+# that is an entry in MIGRATIONS. Applied versions are recorded in the
+# `schema_version` table, so each migration runs exactly once per file.
+#
+# A migration is a list of steps. Each step runs as its own writer job
+# (its own short transaction), so a long migration never holds the write
+# lock for its whole duration — queued gameplay writes get through
+# between steps, and WAL readers are never blocked. Steps must therefore
+# be idempotent (IF NOT EXISTS, guarded backfills) in case the process
+# dies between a step and the version record.
+#
+# Migrations that rebuild tables are `standalone`: their steps run outside
+# the group-commit batch, because foreign key enforcement can only be
+# switched off between transactions (see `_rebuild_table`).
+import logging
+import time
+from typing import Callable, Dict, List, Union
+
+log = logging.getLogger(__name__)
+
+Step = Union[str, Callable]
+
+
+class Migration:
+    def __init__(self, version: int, name: str, steps: List[Step], standalone: bool = False):
+        self.version    = version
+        self.name       = name
+        self.steps      = steps
+        self.standalone = standalone
+
+
+# ─────────────────────────────────────────────
+# STEP HELPERS
+# ─────────────────────────────────────────────
+async def _dedupe_user_inventory(db):
+    """Fold duplicate (user_id, item_key) rows into the oldest one, then add
+    the unique index `buy_item`'s upsert relies on — in one transaction so no
+    new duplicate can slip in between."""
+    await db.execute("""
+        UPDATE user_inventory
+        SET quantity = (
+            SELECT SUM(u2.quantity) FROM user_inventory u2
+            WHERE u2.user_id = user_inventory.user_id
+              AND u2.item_key = user_inventory.item_key
+        )
+        WHERE id IN (
+            SELECT MIN(id) FROM user_inventory
+            GROUP BY user_id, item_key HAVING COUNT(*) > 1
+        )
+    """)
+    await db.execute("""
+        DELETE FROM user_inventory
+        WHERE id NOT IN (SELECT MIN(id) FROM user_inventory GROUP BY user_id, item_key)
+    """)
+    await db.execute(
+        "CREATE UNIQUE INDEX IF NOT EXISTS ux_user_inventory_user_item "
+        "ON user_inventory(user_id, item_key)"
+    )
+
+
+# Current time as integer epoch seconds, usable as a column DEFAULT
+# (unixepoch() would need SQLite 3.38).
+NOW_EPOCH = "CAST(strftime('%s','now') AS INTEGER)"
+
+
+def _epoch(col: str, local: bool = False) -> str:
+    """SQL converting a stored 'YYYY-MM-DD[ HH:MM:SS]' string to epoch
+    seconds. `local` strings were written in server local time."""
+    modifier = ", 'utc'" if local else ""
+    return f"CAST(strftime('%s', {col}{modifier}) AS INTEGER)"
+
+
+async def _column_type(db, table: str, column: str) -> str:
+    async with db.execute(
+        "SELECT type FROM pragma_table_info(?) WHERE name=?", (table, column)
+    ) as cur:
+        row = await cur.fetchone()
+    return (row[0] if row else "").upper()
+
+
+def _rebuild_table(table: str, ddl: str, columns: Dict[str, str],
+                   indexes: List[str] = (), done=None, where: str = "",
+                   group_by: str = "") -> Callable:
+    """Step that recreates `table` from `ddl` (with `{name}` as the table
+    name), copying rows via `columns` (new column -> SQL over the old row),
+    then recreating `indexes`. `where` filters the copied rows; with
+    `group_by`, `columns` may use aggregates to fold old rows. `done(db)`
+    returns True if the table already has the new shape, which makes the
+    step safe to re-run.
+
+    Runs with foreign keys off in its own transaction — with them on, DROP
+    TABLE on a referenced parent would fail — and runs foreign_key_check
+    before committing. AUTOINCREMENT counters are carried over so ids are
+    never reused."""
+    async def step(db):
+        if done is not None and await done(db):
+            return
+        await db.execute("PRAGMA foreign_keys=OFF")
+        try:
+            await db.execute("BEGIN IMMEDIATE")
+            tmp = f"{table}__new"
+            await db.execute(f"DROP TABLE IF EXISTS {tmp}")
+            await db.execute(ddl.format(name=tmp))
+            cols = ", ".join(columns)
+            await db.execute(
+                f"INSERT INTO {tmp} ({cols}) SELECT {', '.join(columns.values())} FROM {table}"
+                + (f" WHERE {where}" if where else "")
+                + (f" GROUP BY {group_by}" if group_by else "")
+            )
+            async with db.execute(
+                "SELECT 1 FROM sqlite_master WHERE name='sqlite_sequence'"
+            ) as cur:
+                has_seq = await cur.fetchone() is not None
+            if has_seq:
+                await db.execute("""
+                    UPDATE sqlite_sequence
+                    SET seq = MAX(seq, COALESCE((SELECT seq FROM sqlite_sequence WHERE name=?), 0))
+                    WHERE name=?
+                """, (table, tmp))
+            await db.execute(f"DROP TABLE {table}")
+            await db.execute(f"ALTER TABLE {tmp} RENAME TO {table}")
+            for ix in indexes:
+                await db.execute(ix)
+            async with db.execute("PRAGMA foreign_key_check") as cur:
+                bad = await cur.fetchall()
+            if bad:
+                raise RuntimeError(f"foreign key check failed after rebuilding {table}: {bad[:5]}")
+            await db.commit()
+        except Exception:
+            await db.rollback()
+            raise
+        finally:
+            await db.execute("PRAGMA foreign_keys=ON")
+    step.__name__ = f"rebuild_{table}"
+    return step
+
+
+def _epoch_rebuild(table: str, ddl: str, all_columns: List[str],
+                   epoch_columns: List[str], indexes: List[str] = (),
+                   local: List[str] = ()) -> Callable:
+    """Rebuild `table` with `epoch_columns` converted from TEXT to INTEGER."""
+    columns = {
+        c: (_epoch(c, local=c in local) if c in epoch_columns else c)
+        for c in all_columns
+    }
+
+    async def done(db):
+        return await _column_type(db, table, epoch_columns[0]) == "INTEGER"
+
+    return _rebuild_table(table, ddl, columns, indexes, done)
+
+
+async def _is_without_rowid(db, table: str) -> bool:
+    async with db.execute(
+        "SELECT sql FROM sqlite_master WHERE type='table' AND name=?", (table,)
+    ) as cur:
+        row = await cur.fetchone()
+    return bool(row) and "WITHOUT ROWID" in row[0].upper()
+
+
+def _clustered_rebuild(table: str, ddl: str, columns: List[str], key: List[str]) -> Callable:
+    """Rebuild `table` as WITHOUT ROWID keyed on `key`, dropping its
+    surrogate id. Rows with a NULL key part (impossible to address anyway)
+    are not carried over."""
+    async def done(db):
+        return await _is_without_rowid(db, table)
+
+    return _rebuild_table(
+        table, ddl, {c: c for c in columns}, done=done,
+        where=" AND ".join(f"{k} IS NOT NULL" for k in key),
+    )
+
+
+async def _backfill_favorite_card(db):
+    """Copy each player's is_favorite user_cards row to users.favorite_card_id
+    (before the collection rebuild drops the flag)."""
+    if not await _column_type(db, "user_cards", "is_favorite"):
+        return
+    await db.execute("""
+        UPDATE users SET favorite_card_id = (
+            SELECT card_id FROM user_cards
+            WHERE user_id = users.user_id AND is_favorite = 1
+            ORDER BY id LIMIT 1
+        )
+        WHERE favorite_card_id IS NULL
+          AND user_id IN (SELECT user_id FROM user_cards WHERE is_favorite = 1)
+    """)
+
+
+async def _table_exists(db, schema: str, table: str) -> bool:
+    async with db.execute(
+        f"SELECT 1 FROM {schema}.sqlite_master WHERE type='table' AND name=?", (table,)
+    ) as cur:
+        return await cur.fetchone() is not None
+
+
+def _move_to_attached(table: str, schema: str, ddl: str, columns: List[str],
+                      indexes: List[str] = ()) -> Callable:
+    """Create `table` in the ATTACHed `schema` from `ddl`, copy main's rows
+    over with their ids, then drop main's copy. Rows an interrupted run
+    already copied are skipped; any other row already holding one of the
+    ids (the attached file has history of its own) stops the migration
+    before anything is lost."""
+    async def step(db):
+        await db.execute(ddl.format(name=f"{schema}.{table}"))
+        for ix in indexes:
+            await db.execute(ix)
+        if not await _table_exists(db, "main", table):
+            return
+        cols = ", ".join(columns)
+        mine  = ", ".join(f"m.{c}" for c in columns)
+        there = ", ".join(f"a.{c}" for c in columns)
+        async with db.execute(
+            f"SELECT COUNT(*) FROM main.{table} m JOIN {schema}.{table} a ON a.id = m.id "
+            f"WHERE ({mine}) IS NOT ({there})"
+        ) as cur:
+            clashes = (await cur.fetchone())[0]
+        if clashes:
+            raise RuntimeError(
+                f"{schema}.{table} already has {clashes} other rows with ids of main.{table}; "
+                f"move its file aside before migrating"
+            )
+        await db.execute(
+            f"INSERT OR IGNORE INTO {schema}.{table} ({cols}) SELECT {cols} FROM main.{table}"
+        )
+        # AUTOINCREMENT: ids of rows deleted from main's copy stay used
+        if await _table_exists(db, "main", "sqlite_sequence"):
+            async with db.execute(
+                "SELECT seq FROM main.sqlite_sequence WHERE name=?", (table,)
+            ) as cur:
+                row = await cur.fetchone()
+            if row is not None:
+                await db.execute(
+                    f"UPDATE {schema}.sqlite_sequence SET seq = MAX(seq, ?) WHERE name=?",
+                    (row[0], table)
+                )
+                await db.execute(
+                    f"INSERT INTO {schema}.sqlite_sequence (name, seq) SELECT ?, ? "
+                    f"WHERE NOT EXISTS (SELECT 1 FROM {schema}.sqlite_sequence WHERE name=?)",
+                    (table, row[0], table)
+                )
+        await db.execute(f"DROP TABLE main.{table}")
+    step.__name__ = f"move_{table}_to_{schema}"
+    return step
+
+
+def _has_column(table: str, column: str) -> Callable:
+    async def check(db):
+        return bool(await _column_type(db, table, column))
+    return check
+
+
+def _add_column(table: str, column: str, decl: str) -> Callable:
+    """ADD COLUMN, skipped if the column already exists."""
+    async def step(db):
+        if not await _column_type(db, table, column):
+            await db.execute(f"ALTER TABLE {table} ADD COLUMN {column} {decl}")
+    step.__name__ = f"add_{table}_{column}"
+    return step
+
+
+async def _incremental_auto_vacuum(db):
+    """Switch main and every ATTACHed file to auto_vacuum=INCREMENTAL, so
+    the maintenance job can hand free pages back to the filesystem a few
+    at a time. An existing file only takes the new mode after a full
+    VACUUM, which rewrites it once; files already switched are skipped."""
+    async with db.execute("PRAGMA database_list") as cur:
+        schemas = [r[1] for r in await cur.fetchall() if r[1] != "temp"]
+    for schema in schemas:
+        async with db.execute(f"PRAGMA {schema}.auto_vacuum") as cur:
+            if (await cur.fetchone())[0] == 2:
+                continue
+        await db.execute(f"PRAGMA {schema}.auto_vacuum=INCREMENTAL")
+        await db.execute(f"VACUUM {schema}")
+
+
+async def _nocase_card_facets(db):
+    """Rebuild card_facets with a NOCASE value, so movies that differ only in
+    case share one facet, as they share one `movie=` filter. Shards have
+    dropped their mirror's copy (the browser only reads the catalog's)."""
+    if not await _table_exists(db, "main", "card_facets"):
+        return
+    await db.execute("DROP TABLE card_facets")
+    await db.execute("""
+        CREATE TABLE card_facets (
+            facet       TEXT NOT NULL,
+            value       TEXT NOT NULL COLLATE NOCASE,
+            count       INTEGER NOT NULL,
+            PRIMARY KEY (facet, value)
+        ) WITHOUT ROWID
+    """)
+    await db.execute("""
+        INSERT INTO card_facets (facet, value, count)
+        SELECT 'rarity', COALESCE(rarity, ''), COUNT(*) FROM cards GROUP BY 2
+        UNION ALL
+        SELECT 'movie', MIN(movie), COUNT(*) FROM cards GROUP BY movie COLLATE NOCASE
+        UNION ALL
+        SELECT 'file_type', COALESCE(file_type, ''), COUNT(*) FROM cards GROUP BY 2
+    """)
+
+
+def _bitmask_backfill(defs: str, key: str, earned: str, mask: str) -> Callable:
+    """Give every `defs` row a bit (in id order), then OR each player's
+    earned rows from the `earned` table into `users.<mask>`."""
+    async def step(db):
+        await db.execute(f"""
+            UPDATE {defs}
+            SET bit = (SELECT COUNT(*) FROM {defs} d2 WHERE d2.id < {defs}.id)
+            WHERE (SELECT COUNT(*) FROM {defs} WHERE bit IS NOT NULL) = 0
+        """)
+        await db.execute(f"CREATE UNIQUE INDEX IF NOT EXISTS ux_{defs}_bit ON {defs}(bit)")
+        await db.execute(f"""
+            UPDATE users SET {mask} = {mask} | (
+                SELECT COALESCE(SUM(1 << d.bit), 0)
+                FROM {earned} e JOIN {defs} d ON d.{key} = e.{key}
+                WHERE e.user_id = users.user_id
+            )
+            WHERE user_id IN (SELECT user_id FROM {earned})
+        """)
+    step.__name__ = f"backfill_{mask}"
+    return step
+
+
+# ─────────────────────────────────────────────
+# MIGRATIONS (append only — never edit a released entry)
+# ─────────────────────────────────────────────
+MIGRATIONS: List[Migration] = [
+    Migration(1, "hot_path_indexes", [
+        _dedupe_user_inventory,
+        "CREATE INDEX IF NOT EXISTS ix_user_cards_user ON user_cards(user_id)",
+        "CREATE INDEX IF NOT EXISTS ix_user_cards_card ON user_cards(card_id)",
+        "CREATE INDEX IF NOT EXISTS ix_transactions_to ON transactions(to_user, created_at)",
+        "CREATE INDEX IF NOT EXISTS ix_transactions_from ON transactions(from_user, created_at)",
+        "CREATE INDEX IF NOT EXISTS ix_users_coins ON users(coins DESC)",
+        "CREATE INDEX IF NOT EXISTS ix_weekly_board_coins ON weekly_board(weekly_coins DESC)",
+    ]),
+    Migration(2, "cache_invalidations", [
+        """
+        CREATE TABLE IF NOT EXISTS invalidations (
+            seq         INTEGER PRIMARY KEY AUTOINCREMENT,
+            scope       TEXT NOT NULL,
+            key         INTEGER,
+            origin      TEXT NOT NULL,
+            created_at  TEXT DEFAULT (datetime('now'))
+        )
+        """,
+    ]),
+    Migration(3, "epoch_timestamps", standalone=True, steps=[
+        _epoch_rebuild("users", f"""
+            CREATE TABLE {{name}} (
+                user_id     INTEGER PRIMARY KEY,
+                username    TEXT,
+                first_name  TEXT,
+                coins       INTEGER DEFAULT 1000,
+                level       INTEGER DEFAULT 1,
+                xp          INTEGER DEFAULT 0,
+                streak      INTEGER DEFAULT 0,
+                last_daily  INTEGER,
+                married_to  INTEGER DEFAULT NULL,
+                active_title TEXT DEFAULT 't1',
+                total_caught INTEGER DEFAULT 0,
+                total_spent  INTEGER DEFAULT 0,
+                slots_wins   INTEGER DEFAULT 0,
+                jackpots     INTEGER DEFAULT 0,
+                best_combo   INTEGER DEFAULT 0,
+                days_played  INTEGER DEFAULT 0,
+                created_at  INTEGER DEFAULT ({NOW_EPOCH})
+            )""",
+            ["user_id", "username", "first_name", "coins", "level", "xp", "streak",
+             "last_daily", "married_to", "active_title", "total_caught", "total_spent",
+             "slots_wins", "jackpots", "best_combo", "days_played", "created_at"],
+            ["created_at", "last_daily"],
+            ["CREATE INDEX IF NOT EXISTS ix_users_coins ON users(coins DESC)"],
+            local=["last_daily"]),
+        _epoch_rebuild("cards", f"""
+            CREATE TABLE {{name}} (
+                id          INTEGER PRIMARY KEY AUTOINCREMENT,
+                name        TEXT NOT NULL,
+                movie       TEXT NOT NULL,
+                rarity      TEXT DEFAULT 'Common',
+                file_id     TEXT,
+                file_type   TEXT DEFAULT 'photo',
+                drop_rate   REAL DEFAULT 1.0,
+                uploaded_by INTEGER,
+                created_at  INTEGER DEFAULT ({NOW_EPOCH})
+            )""",
+            ["id", "name", "movie", "rarity", "file_id", "file_type", "drop_rate",
+             "uploaded_by", "created_at"],
+            ["created_at"]),
+        _epoch_rebuild("user_cards", f"""
+            CREATE TABLE {{name}} (
+                id          INTEGER PRIMARY KEY AUTOINCREMENT,
+                user_id     INTEGER,
+                card_id     INTEGER,
+                is_favorite INTEGER DEFAULT 0,
+                caught_at   INTEGER DEFAULT ({NOW_EPOCH}),
+                FOREIGN KEY(user_id) REFERENCES users(user_id),
+                FOREIGN KEY(card_id) REFERENCES cards(id)
+            )""",
+            ["id", "user_id", "card_id", "is_favorite", "caught_at"],
+            ["caught_at"],
+            ["CREATE INDEX IF NOT EXISTS ix_user_cards_user ON user_cards(user_id)",
+             "CREATE INDEX IF NOT EXISTS ix_user_cards_card ON user_cards(card_id)"]),
+        _epoch_rebuild("user_inventory", """
+            CREATE TABLE {name} (
+                id          INTEGER PRIMARY KEY AUTOINCREMENT,
+                user_id     INTEGER,
+                item_key    TEXT,
+                quantity    INTEGER DEFAULT 1,
+                expires_at  INTEGER DEFAULT NULL,
+                FOREIGN KEY(user_id) REFERENCES users(user_id)
+            )""",
+            ["id", "user_id", "item_key", "quantity", "expires_at"],
+            ["expires_at"],
+            ["CREATE UNIQUE INDEX IF NOT EXISTS ux_user_inventory_user_item "
+             "ON user_inventory(user_id, item_key)"]),
+        _epoch_rebuild("friends", f"""
+            CREATE TABLE {{name}} (
+                id          INTEGER PRIMARY KEY AUTOINCREMENT,
+                user_id     INTEGER,
+                friend_id   INTEGER,
+                created_at  INTEGER DEFAULT ({NOW_EPOCH}),
+                UNIQUE(user_id, friend_id)
+            )""",
+            ["id", "user_id", "friend_id", "created_at"],
+            ["created_at"]),
+        _epoch_rebuild("sudo_admins", f"""
+            CREATE TABLE {{name}} (
+                user_id     INTEGER PRIMARY KEY,
+                username    TEXT,
+                added_by    INTEGER,
+                added_at    INTEGER DEFAULT ({NOW_EPOCH})
+            )""",
+            ["user_id", "username", "added_by", "added_at"],
+            ["added_at"]),
+        _epoch_rebuild("transactions", f"""
+            CREATE TABLE {{name}} (
+                id          INTEGER PRIMARY KEY AUTOINCREMENT,
+                from_user   INTEGER,
+                to_user     INTEGER,
+                amount      INTEGER,
+                tx_type     TEXT,
+                note        TEXT,
+                created_at  INTEGER DEFAULT ({NOW_EPOCH})
+            )""",
+            ["id", "from_user", "to_user", "amount", "tx_type", "note", "created_at"],
+            ["created_at"],
+            ["CREATE INDEX IF NOT EXISTS ix_transactions_to ON transactions(to_user, created_at)",
+             "CREATE INDEX IF NOT EXISTS ix_transactions_from ON transactions(from_user, created_at)",
+             "CREATE INDEX IF NOT EXISTS ix_transactions_created ON transactions(created_at)"]),
+        _epoch_rebuild("user_missions", """
+            CREATE TABLE {name} (
+                id          INTEGER PRIMARY KEY AUTOINCREMENT,
+                user_id     INTEGER,
+                mission_key TEXT,
+                progress    INTEGER DEFAULT 0,
+                completed   INTEGER DEFAULT 0,
+                reset_at    INTEGER,
+                UNIQUE(user_id, mission_key)
+            )""",
+            ["id", "user_id", "mission_key", "progress", "completed", "reset_at"],
+            ["reset_at"]),
+        _epoch_rebuild("user_achievements", f"""
+            CREATE TABLE {{name}} (
+                id          INTEGER PRIMARY KEY AUTOINCREMENT,
+                user_id     INTEGER,
+                ach_key     TEXT,
+                earned_at   INTEGER DEFAULT ({NOW_EPOCH}),
+                UNIQUE(user_id, ach_key)
+            )""",
+            ["id", "user_id", "ach_key", "earned_at"],
+            ["earned_at"]),
+        _epoch_rebuild("user_titles", f"""
+            CREATE TABLE {{name}} (
+                id          INTEGER PRIMARY KEY AUTOINCREMENT,
+                user_id     INTEGER,
+                title_key   TEXT,
+                earned_at   INTEGER DEFAULT ({NOW_EPOCH}),
+                UNIQUE(user_id, title_key)
+            )""",
+            ["id", "user_id", "title_key", "earned_at"],
+            ["earned_at"]),
+        _epoch_rebuild("drop_settings", f"""
+            CREATE TABLE {{name}} (
+                id          INTEGER PRIMARY KEY AUTOINCREMENT,
+                base_rate   REAL DEFAULT 1.0,
+                current_rate REAL DEFAULT 1.0,
+                set_by      INTEGER,
+                note        TEXT,
+                updated_at  INTEGER DEFAULT ({NOW_EPOCH})
+            )""",
+            ["id", "base_rate", "current_rate", "set_by", "note", "updated_at"],
+            ["updated_at"]),
+        _epoch_rebuild("backups", f"""
+            CREATE TABLE {{name}} (
+                id          INTEGER PRIMARY KEY AUTOINCREMENT,
+                filename    TEXT,
+                size_bytes  INTEGER,
+                created_at  INTEGER DEFAULT ({NOW_EPOCH})
+            )""",
+            ["id", "filename", "size_bytes", "created_at"],
+            ["created_at"]),
+        _epoch_rebuild("audit_log", f"""
+            CREATE TABLE {{name}} (
+                id          INTEGER PRIMARY KEY AUTOINCREMENT,
+                admin_id    INTEGER,
+                action      TEXT,
+                target      TEXT,
+                details     TEXT,
+                created_at  INTEGER DEFAULT ({NOW_EPOCH})
+            )""",
+            ["id", "admin_id", "action", "target", "details", "created_at"],
+            ["created_at"],
+            ["CREATE INDEX IF NOT EXISTS ix_audit_log_created ON audit_log(created_at)"]),
+        _epoch_rebuild("invalidations", f"""
+            CREATE TABLE {{name}} (
+                seq         INTEGER PRIMARY KEY AUTOINCREMENT,
+                scope       TEXT NOT NULL,
+                key         INTEGER,
+                origin      TEXT NOT NULL,
+                created_at  INTEGER DEFAULT ({NOW_EPOCH})
+            )""",
+            ["seq", "scope", "key", "origin", "created_at"],
+            ["created_at"]),
+    ]),
+    # Relationship tables: the natural key becomes the clustered primary key,
+    # so a lookup is one b-tree seek instead of unique index + rowid table.
+    Migration(4, "without_rowid_relations", standalone=True, steps=[
+        _clustered_rebuild("friends", f"""
+            CREATE TABLE {{name}} (
+                user_id     INTEGER NOT NULL,
+                friend_id   INTEGER NOT NULL,
+                created_at  INTEGER DEFAULT ({NOW_EPOCH}),
+                PRIMARY KEY (user_id, friend_id)
+            ) WITHOUT ROWID""",
+            ["user_id", "friend_id", "created_at"], ["user_id", "friend_id"]),
+        _clustered_rebuild("user_missions", """
+            CREATE TABLE {name} (
+                user_id     INTEGER NOT NULL,
+                mission_key TEXT NOT NULL,
+                progress    INTEGER DEFAULT 0,
+                completed   INTEGER DEFAULT 0,
+                reset_at    INTEGER,
+                PRIMARY KEY (user_id, mission_key)
+            ) WITHOUT ROWID""",
+            ["user_id", "mission_key", "progress", "completed", "reset_at"],
+            ["user_id", "mission_key"]),
+        _clustered_rebuild("user_achievements", f"""
+            CREATE TABLE {{name}} (
+                user_id     INTEGER NOT NULL,
+                ach_key     TEXT NOT NULL,
+                earned_at   INTEGER DEFAULT ({NOW_EPOCH}),
+                PRIMARY KEY (user_id, ach_key)
+            ) WITHOUT ROWID""",
+            ["user_id", "ach_key", "earned_at"], ["user_id", "ach_key"]),
+        _clustered_rebuild("user_titles", f"""
+            CREATE TABLE {{name}} (
+                user_id     INTEGER NOT NULL,
+                title_key   TEXT NOT NULL,
+                earned_at   INTEGER DEFAULT ({NOW_EPOCH}),
+                PRIMARY KEY (user_id, title_key)
+            ) WITHOUT ROWID""",
+            ["user_id", "title_key", "earned_at"], ["user_id", "title_key"]),
+    ]),
+    # Earned achievements/titles as bitmasks on the users row; the
+    # user_achievements/user_titles rows stay as the earned_at log.
+    Migration(5, "earned_bitmasks", [
+        _add_column("achievements", "bit", "INTEGER"),
+        _add_column("titles", "bit", "INTEGER"),
+        _add_column("users", "ach_mask", "INTEGER NOT NULL DEFAULT 0"),
+        _add_column("users", "title_mask", "INTEGER NOT NULL DEFAULT 0"),
+        _bitmask_backfill("achievements", "ach_key", "user_achievements", "ach_mask"),
+        _bitmask_backfill("titles", "title_key", "user_titles", "title_mask"),
+    ]),
+    # One user_cards row per (user, card) with a catch count instead of one
+    # row per catch; the favorite moves to a pointer on the users row.
+    Migration(6, "collection_counts", standalone=True, steps=[
+        _add_column("users", "favorite_card_id", "INTEGER REFERENCES cards(id)"),
+        "CREATE INDEX IF NOT EXISTS ix_users_favorite_card ON users(favorite_card_id) "
+        "WHERE favorite_card_id IS NOT NULL",
+        _backfill_favorite_card,
+        _rebuild_table("user_cards", f"""
+            CREATE TABLE {{name}} (
+                user_id         INTEGER NOT NULL,
+                card_id         INTEGER NOT NULL,
+                count           INTEGER NOT NULL DEFAULT 1,
+                first_caught_at INTEGER DEFAULT ({NOW_EPOCH}),
+                last_caught_at  INTEGER DEFAULT ({NOW_EPOCH}),
+                PRIMARY KEY (user_id, card_id),
+                FOREIGN KEY(user_id) REFERENCES users(user_id),
+                FOREIGN KEY(card_id) REFERENCES cards(id)
+            ) WITHOUT ROWID""",
+            {"user_id": "user_id", "card_id": "card_id", "count": "COUNT(*)",
+             "first_caught_at": "MIN(caught_at)", "last_caught_at": "MAX(caught_at)"},
+            ["CREATE INDEX IF NOT EXISTS ix_user_cards_card ON user_cards(card_id)",
+             "CREATE INDEX IF NOT EXISTS ix_user_cards_recent "
+             "ON user_cards(user_id, last_caught_at)"],
+            done=_has_column("user_cards", "count"),
+            where="user_id IS NOT NULL AND card_id IS NOT NULL",
+            group_by="user_id, card_id"),
+    ]),
+    # The append-only ledger and audit log move to their own ATTACHed files
+    # (see ATTACHED in database.py).
+    Migration(7, "attached_ledger_audit", [
+        _move_to_attached("transactions", "ledger", f"""
+            CREATE TABLE IF NOT EXISTS {{name}} (
+                id          INTEGER PRIMARY KEY AUTOINCREMENT,
+                from_user   INTEGER,
+                to_user     INTEGER,
+                amount      INTEGER,
+                tx_type     TEXT,
+                note        TEXT,
+                created_at  INTEGER DEFAULT ({NOW_EPOCH})
+            )""",
+            ["id", "from_user", "to_user", "amount", "tx_type", "note", "created_at"],
+            ["CREATE INDEX IF NOT EXISTS ledger.ix_transactions_to ON transactions(to_user, created_at)",
+             "CREATE INDEX IF NOT EXISTS ledger.ix_transactions_from ON transactions(from_user, created_at)",
+             "CREATE INDEX IF NOT EXISTS ledger.ix_transactions_created ON transactions(created_at)"]),
+        _move_to_attached("audit_log", "audit", f"""
+            CREATE TABLE IF NOT EXISTS {{name}} (
+                id          INTEGER PRIMARY KEY AUTOINCREMENT,
+                admin_id    INTEGER,
+                action      TEXT,
+                target      TEXT,
+                details     TEXT,
+                created_at  INTEGER DEFAULT ({NOW_EPOCH})
+            )""",
+            ["id", "admin_id", "action", "target", "details", "created_at"],
+            ["CREATE INDEX IF NOT EXISTS audit.ix_audit_log_created ON audit_log(created_at)"]),
+    ]),
+    # Two-player operations whose players live on different shards: the
+    # sending shard records the remote half in its outbox, the receiving
+    # shard records each one it has applied in its inbox.
+    Migration(8, "shard_outbox_inbox", [
+        f"""
+        CREATE TABLE IF NOT EXISTS shard_outbox (
+            id          TEXT PRIMARY KEY,
+            kind        TEXT NOT NULL,
+            user_id     INTEGER NOT NULL,
+            payload     TEXT NOT NULL,
+            created_at  INTEGER DEFAULT ({NOW_EPOCH})
+        ) WITHOUT ROWID
+        """,
+        f"""
+        CREATE TABLE IF NOT EXISTS shard_inbox (
+            id          TEXT PRIMARY KEY,
+            ok          INTEGER NOT NULL,
+            applied_at  INTEGER DEFAULT ({NOW_EPOCH})
+        ) WITHOUT ROWID
+        """,
+    ]),
+    # Last hot state journal record written to this file (HOT_STATE mode).
+    Migration(9, "hot_journal_marker", [
+        """
+        CREATE TABLE IF NOT EXISTS hot_journal (
+            id          INTEGER PRIMARY KEY CHECK (id = 1),
+            seq         INTEGER NOT NULL
+        )
+        """,
+    ]),
+    # VACUUM can't run inside a transaction.
+    Migration(10, "incremental_auto_vacuum", standalone=True, steps=[
+        _incremental_auto_vacuum,
+    ]),
+    # Admin catalog browser (/cards): full-text search over name and movie,
+    # and per-rarity / movie / file_type card counts, both kept current by
+    # triggers on `cards`.
+    Migration(11, "card_browser", [
+        "CREATE INDEX IF NOT EXISTS ix_cards_rarity ON cards(rarity)",
+        "CREATE INDEX IF NOT EXISTS ix_cards_movie ON cards(movie COLLATE NOCASE)",
+        "CREATE INDEX IF NOT EXISTS ix_cards_file_type ON cards(file_type)",
+        """
+        CREATE VIRTUAL TABLE IF NOT EXISTS cards_fts USING fts5(
+            name, movie,
+            content='cards', content_rowid='id',
+            tokenize='unicode61 remove_diacritics 2'
+        )
+        """,
+        "INSERT INTO cards_fts(cards_fts) VALUES ('rebuild')",
+        """
+        CREATE TABLE IF NOT EXISTS card_facets (
+            facet       TEXT NOT NULL,
+            value       TEXT NOT NULL,
+            count       INTEGER NOT NULL,
+            PRIMARY KEY (facet, value)
+        ) WITHOUT ROWID
+        """,
+        "DELETE FROM card_facets",
+        """
+        INSERT INTO card_facets (facet, value, count)
+        SELECT 'rarity', COALESCE(rarity, ''), COUNT(*) FROM cards GROUP BY 1, 2
+        UNION ALL
+        SELECT 'movie', movie, COUNT(*) FROM cards GROUP BY 1, 2
+        UNION ALL
+        SELECT 'file_type', COALESCE(file_type, ''), COUNT(*) FROM cards GROUP BY 1, 2
+        """,
+        """
+        CREATE TRIGGER IF NOT EXISTS cards_browser_ai AFTER INSERT ON cards BEGIN
+            INSERT INTO cards_fts (rowid, name, movie) VALUES (new.id, new.name, new.movie);
+            INSERT INTO card_facets (facet, value, count) VALUES
+                ('rarity', COALESCE(new.rarity, ''), 1),
+                ('movie', new.movie, 1),
+                ('file_type', COALESCE(new.file_type, ''), 1)
+            ON CONFLICT(facet, value) DO UPDATE SET count = count + 1;
+        END
+        """,
+        """
+        CREATE TRIGGER IF NOT EXISTS cards_browser_ad AFTER DELETE ON cards BEGIN
+            INSERT INTO cards_fts (cards_fts, rowid, name, movie)
+            VALUES ('delete', old.id, old.name, old.movie);
+            UPDATE card_facets SET count = count - 1
+            WHERE (facet = 'rarity' AND value = COALESCE(old.rarity, ''))
+               OR (facet = 'movie' AND value = old.movie)
+               OR (facet = 'file_type' AND value = COALESCE(old.file_type, ''));
+            DELETE FROM card_facets
+            WHERE count <= 0
+              AND ((facet = 'rarity' AND value = COALESCE(old.rarity, ''))
+                OR (facet = 'movie' AND value = old.movie)
+                OR (facet = 'file_type' AND value = COALESCE(old.file_type, '')));
+        END
+        """,
+        """
+        CREATE TRIGGER IF NOT EXISTS cards_browser_au AFTER UPDATE OF name, movie, rarity, file_type ON cards BEGIN
+            INSERT INTO cards_fts (cards_fts, rowid, name, movie)
+            VALUES ('delete', old.id, old.name, old.movie);
+            INSERT INTO cards_fts (rowid, name, movie) VALUES (new.id, new.name, new.movie);
+            UPDATE card_facets SET count = count - 1
+            WHERE (facet = 'rarity' AND value = COALESCE(old.rarity, ''))
+               OR (facet = 'movie' AND value = old.movie)
+               OR (facet = 'file_type' AND value = COALESCE(old.file_type, ''));
+            INSERT INTO card_facets (facet, value, count) VALUES
+                ('rarity', COALESCE(new.rarity, ''), 1),
+                ('movie', new.movie, 1),
+                ('file_type', COALESCE(new.file_type, ''), 1)
+            ON CONFLICT(facet, value) DO UPDATE SET count = count + 1;
+            DELETE FROM card_facets
+            WHERE count <= 0
+              AND ((facet = 'rarity' AND value = COALESCE(old.rarity, ''))
+                OR (facet = 'movie' AND value = old.movie)
+                OR (facet = 'file_type' AND value = COALESCE(old.file_type, '')));
+        END
+        """,
+    ]),
+    # Movie facets keyed case-insensitively, like the /cards movie= filter.
+    # The triggers from 11 compare through the column, so they need no change.
+    Migration(12, "card_facets_nocase", [
+        _nocase_card_facets,
+    ]),
+]
+
+LATEST_VERSION = max(m.version for m in MIGRATIONS)
+
+
+# ─────────────────────────────────────────────
+# RUNNER
+# ─────────────────────────────────────────────
+async def _ensure_version_table(pool):
+    async with pool.writer() as db:
+        await db.execute("""
+            CREATE TABLE IF NOT EXISTS schema_version (
+                version     INTEGER PRIMARY KEY,
+                name        TEXT,
+                applied_at  TEXT DEFAULT (datetime('now'))
+            )
+        """)
+
+
+async def current_version(pool) -> int:
+    await _ensure_version_table(pool)
+    async with pool.reader() as db:
+        async with db.execute("SELECT COALESCE(MAX(version), 0) FROM schema_version") as cur:
+            return (await cur.fetchone())[0]
+
+
+async def run_migrations(pool, migrations: List[Migration] = MIGRATIONS) -> int:
+    """Apply every pending migration in version order. Returns the new version."""
+    await _ensure_version_table(pool)
+    async with pool.reader() as db:
+        async with db.execute("SELECT version FROM schema_version") as cur:
+            applied = {r[0] for r in await cur.fetchall()}
+
+    version = max(applied, default=0)
+    for m in sorted(migrations, key=lambda x: x.version):
+        if m.version in applied:
+            continue
+        started = time.perf_counter()
+        log.info(f"🧱 Migration {m.version} ({m.name}): {len(m.steps)} steps")
+        for i, step in enumerate(m.steps, 1):
+            step_started = time.perf_counter()
+            last = i == len(m.steps)
+            async with pool.writer(standalone=m.standalone) as db:
+                if isinstance(step, str):
+                    await db.execute(step)
+                else:
+                    await step(db)
+                if last:
+                    await db.execute(
+                        "INSERT INTO schema_version (version, name) VALUES (?,?)",
+                        (m.version, m.name)
+                    )
+            log.debug(f"   step {i}/{len(m.steps)} took {(time.perf_counter() - step_started) * 1000:.1f}ms")
+        version = m.version
+        log.info(f"✅ Migration {m.version} applied in {(time.perf_counter() - started) * 1000:.0f}ms")
+    return version
@@ -0,0 +1,161 @@
+# ════════════════════════════════════════════
+# 🃏 Card Collection Bot — Row Models
+# ════════════════════════════════════════════
+# Compact `__slots__` records for the rows the bot handles most: players,
+# cards, collection entries and missions. A slotted object holds its
+# fields in a fixed array instead of a per-instance hash table, which
+# is several times smaller than `dict(row)` for a users row — and the
+# user cache keeps thousands of them alive.
+#
+# Fields are read as attributes (`user.coins`). Item access (`user["coins"]`,
+# `.get()`, `.keys()`, `.items()`) is kept for older call sites. Columns a
+# query did not select are None. Objects handed out by `database` may be shared (the user
+# cache returns the cached instance), so treat them as read-only and `copy()`
+# before changing one.
+from typing import Any, Callable, Dict, Iterator, Tuple
+
+
+class Model:
+    __slots__ = ()
+
+    # per subclass: column-name tuple -> compiled row constructor
+    _plans: Dict[Tuple[str, ...], Callable]
+
+    def __init_subclass__(cls, **kwargs):
+        super().__init_subclass__(**kwargs)
+        cls._plans = {}
+
+    def __init__(self, **fields):
+        for f in self.__slots__:
+            object.__setattr__(self, f, fields.get(f))
+
+    @classmethod
+    def _compile(cls, keys: Tuple[str, ...]) -> Callable:
+        """Generate `build(row)` for one column list: a straight run of slot
+        stores by index, like namedtuple's generated code — no per-field
+        lookups or setattr() calls on the hot path."""
+        index: Dict[str, int] = {}
+        for i, k in enumerate(keys):
+            index.setdefault(k, i)
+        body = "\n".join(
+            f"    o.{f} = row[{index[f]}]" if f in index else f"    o.{f} = None"
+            for f in cls.__slots__
+        )
+        ns: Dict[str, Any] = {"_new": object.__new__, "_cls": cls}
+        exec(f"def build(row):\n    o = _new(_cls)\n{body}\n    return o", ns)
+        return ns["build"]
+
+    @classmethod
+    def from_row(cls, row):
+        """Build from an sqlite Row (anything with keys() and positional
+        access). The constructor is compiled once per distinct column list."""
+        if row is None:
+            return None
+        keys = tuple(row.keys())
+        build = cls._plans.get(keys)
+        if build is None:
+            build = cls._plans[keys] = cls._compile(keys)
+        return build(row)
+
+    @classmethod
+    def from_dict(cls, data: Dict):
+        return cls(**data)
+
+    def copy(self):
+        obj = self.__class__.__new__(self.__class__)
+        obj.update(self)
+        return obj
+
+    def update(self, other: "Model"):
+        for f in self.__slots__:
+            object.__setattr__(self, f, getattr(other, f))
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {f: getattr(self, f) for f in self.__slots__}
+
+    # ── mapping compatibility ─────────────────
+    def __getitem__(self, key: str):
+        try:
+            return getattr(self, key)
+        except AttributeError:
+            raise KeyError(key) from None
+
+    def __setitem__(self, key: str, value):
+        if key not in self.__slots__:
+            raise KeyError(key)
+        object.__setattr__(self, key, value)
+
+    def __contains__(self, key: str) -> bool:
+        return key in self.__slots__
+
+    def get(self, key: str, default=None):
+        value = getattr(self, key, None)
+        return default if value is None else value
+
+    def keys(self) -> Iterator[str]:
+        return iter(self.__slots__)
+
+    def items(self) -> Iterator[Tuple[str, Any]]:
+        return ((f, getattr(self, f)) for f in self.__slots__)
+
+    def __eq__(self, other):
+        if other.__class__ is not self.__class__:
+            return NotImplemented
+        return all(getattr(self, f) == getattr(other, f) for f in self.__slots__)
+
+    __hash__ = None
+
+    def __repr__(self):
+        fields = ", ".join(f"{f}={getattr(self, f)!r}" for f in self.__slots__[:3])
+        return f"{self.__class__.__name__}({fields}, ...)"
+
+
+# ─────────────────────────────────────────────
+# MODELS
+# ─────────────────────────────────────────────
+class User(Model):
+    __slots__ = (
+        "user_id", "username", "first_name", "coins", "level", "xp",
+        "streak", "last_daily", "married_to", "active_title",
+        "total_caught", "total_spent", "slots_wins", "jackpots",
+        "best_combo", "days_played", "created_at", "ach_mask", "title_mask",
+        "favorite_card_id",
+    )
+
+    @property
+    def achievement_count(self) -> int:
+        return (self.ach_mask or 0).bit_count()
+
+    @property
+    def title_count(self) -> int:
+        return (self.title_mask or 0).bit_count()
+
+
+class Card(Model):
+    __slots__ = (
+        "id", "name", "movie", "rarity", "file_id", "file_type",
+        "drop_rate", "uploaded_by", "created_at",
+    )
+
+
+class UserCard(Model):
+    """A card as it appears in a player's collection: one entry per distinct
+    card, with how many copies were caught."""
+    __slots__ = (
+        "id", "name", "movie", "rarity", "file_id", "file_type",
+        "is_favorite", "count", "first_caught_at", "last_caught_at", "user_id",
+    )
+
+
+class Mission(Model):
+    """A mission definition joined with one player's progress on it."""
+    __slots__ = (
+        "mission_key", "name", "description", "mission_type", "requirement",
+        "reward", "period", "user_id", "progress", "completed", "reset_at",
+    )
+
+
+class Transaction(Model):
+    __slots__ = (
+        "id", "from_user", "to_user", "amount", "tx_type", "note", "created_at",
+    )
@@ -0,0 +1,82 @@
+# ════════════════════════════════════════════
+# 🃏 Card Collection Bot — Test Fixtures
+# ════════════════════════════════════════════
+# `database` reads its whole configuration (backend, shards, hot state...)
+# from `config` at import time, so each test gets a freshly imported copy
+# configured through the environment by the `make_db` factory. Its files
+# go to the test's tmp_path; the default backend is "memory".
+#
+# Every test drives the database inside one `asyncio.run` (the `run`
+# fixture) and closes it before the loop ends: the pool's connections
+# belong to that loop.
+import asyncio
+import importlib
+import os
+import sys
+
+import pytest
+
+ROOT = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..")
+sys.path.insert(0, ROOT)
+
+# reloaded in this order: each one imports values from those before it
+_MODULES = ("config", "models", "utils", "backends", "catalog", "counters",
+            "hotstate", "migrations", "database")
+
+
+@pytest.fixture
+def make_db(tmp_path, monkeypatch):
+    """make_db(backend=None, **env) -> a freshly imported `database`.
+    Pass `backend=` an earlier instance's backend to reopen its data, as
+    a restarted process would."""
+    made = []
+
+    def make(backend=None, **env):
+        for key in ("LEDGER_DB_PATH", "AUDIT_DB_PATH", "HOT_STATE_JOURNAL"):
+            monkeypatch.delenv(key, raising=False)
+        settings = {"DB_BACKEND": "memory", "DB_SHARDS": 1, "HOT_STATE": 0,
+                    "DB_PATH": tmp_path / "bot.db", "BACKUP_DIR": tmp_path / "backups"}
+        for key, value in {**settings, **env}.items():
+            monkeypatch.setenv(key, str(value))
+        for name in _MODULES:
+            if name in sys.modules:
+                importlib.reload(sys.modules[name])
+            else:
+                importlib.import_module(name)
+        db = sys.modules["database"]
+        if backend is not None:
+            db.backend = backend
+        made.append(db.backend)
+        return db
+
+    yield make
+    for backend in made:
+        if hasattr(backend, "reset"):
+            backend.reset()
+
+
+@pytest.fixture
+def run():
+    """run(db, fn): await fn() on a fresh event loop, then close `db`."""
+    def go(db, fn):
+        async def body():
+            try:
+                return await fn()
+            finally:
+                await db.close_db()
+        return asyncio.run(body())
+    return go
+
+
+async def crash(db):
+    """Stop `db` the way a killed process would: background tasks die and
+    connections close, but nothing buffered in memory (hot state, pending
+    counters) is written out first."""
+    for holder in (db._hot_task, db._counter_task):
+        if holder["task"] is not None:
+            holder["task"].cancel()
+            holder["task"] = None
+    if db._hot is not None:
+        await db._hot.journal.close()
+    for pool in db._all_pools():
+        await pool.close()
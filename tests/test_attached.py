@@ -0,0 +1,117 @@
+# ════════════════════════════════════════════
+# 🃏 Card Collection Bot — Attached Ledger & Audit Files
+# ════════════════════════════════════════════
+# `ledger.transactions` and `audit.audit_log` live in their own files,
+# ATTACHed to every connection (migration 7 moved them out of main).
+import sqlite3
+import sys
+
+import pytest
+
+
+def test_backup_copies_the_attached_files(make_db, run, tmp_path):
+    db = make_db(DB_BACKEND="sqlite")
+    dst = tmp_path / "copy.db"
+
+    async def body():
+        await db.init_db()
+        await db.get_or_create_user(7)
+        await db.add_coins(7, 5, note="kept")
+        await db.audit(1, "test", "7", "")
+        written = await db.backup_to(str(dst))
+        paths = db.backup_paths(str(dst))
+        assert written == list(paths.values())
+        assert paths == {"main": str(dst), "ledger": str(tmp_path / "copy_ledger.db"),
+                         "audit": str(tmp_path / "copy_audit.db")}
+        return paths
+
+    paths = run(db, body)
+    conn = sqlite3.connect(paths["ledger"])
+    assert conn.execute("SELECT amount, note FROM transactions").fetchall() == [(5, "kept")]
+    conn = sqlite3.connect(paths["audit"])
+    assert conn.execute("SELECT action FROM audit_log").fetchall() == [("test",)]
+
+
+def test_moving_the_ledger_out_refuses_to_overwrite_other_rows(make_db, run, tmp_path):
+    path = tmp_path / "old.db"
+    db = make_db(DB_BACKEND="sqlite", DB_PATH=path)
+    migrations = sys.modules["migrations"]
+
+    async def old():
+        await db._create_base_schema(db._pool)
+        await migrations.run_migrations(db._pool, migrations.MIGRATIONS[:6])
+        async with db._pool.writer() as conn:
+            await conn.execute("INSERT INTO transactions (from_user, to_user, amount, tx_type, note) "
+                               "VALUES (0, 42, 777, 'admin', 'old')")
+
+    run(db, old)
+    # a ledger file with a history of its own
+    ledger = sqlite3.connect(tmp_path / "old_ledger.db")
+    ledger.execute("CREATE TABLE transactions (id INTEGER PRIMARY KEY AUTOINCREMENT, from_user INTEGER, "
+                   "to_user INTEGER, amount INTEGER, tx_type TEXT, note TEXT, created_at INTEGER)")
+    ledger.execute("INSERT INTO transactions VALUES (1, 0, 9, 1, 'reward', 'other history', 0)")
+    ledger.commit()
+    ledger.close()
+    db = make_db(DB_BACKEND="sqlite", DB_PATH=path)
+
+    async def upgrade():
+        with pytest.raises(RuntimeError, match="other rows"):
+            await db.init_db()
+        async with db._pool.reader() as conn:
+            async with conn.execute("SELECT note FROM main.transactions") as cur:
+                assert [r[0] for r in await cur.fetchall()] == ["old"]
+
+    run(db, upgrade)
+
+
+async def _tables(conn, schema):
+    async with conn.execute(f"SELECT name FROM {schema}.sqlite_master WHERE type='table'") as cur:
+        return {r[0] for r in await cur.fetchall()}
+
+
+def test_ledger_and_audit_live_in_their_own_files(make_db, run, tmp_path):
+    db = make_db(DB_BACKEND="sqlite")
+
+    async def body():
+        await db.init_db()
+        async with db._pool.reader() as conn:
+            main, ledger, audit = [await _tables(conn, s) for s in ("main", "ledger", "audit")]
+        assert "transactions" in ledger and "audit_log" in audit
+        assert not {"transactions", "audit_log"} & main
+
+    run(db, body)
+    assert (tmp_path / "bot_ledger.db").exists() and (tmp_path / "bot_audit.db").exists()
+
+
+def test_upgrade_moves_rows_with_their_ids(make_db, run):
+    db = make_db()
+    migrations = sys.modules["migrations"]
+
+    async def body():
+        await db._create_base_schema(db._pool)
+        await migrations.run_migrations(db._pool, [m for m in migrations.MIGRATIONS if m.version <= 6])
+        async with db._pool.writer() as conn:
+            await conn.executemany(
+                "INSERT INTO transactions (id, to_user, amount, tx_type) VALUES (?, 7, ?, 'test')",
+                [(3, 30), (4, 40), (9, 90)]
+            )
+            await conn.execute("DELETE FROM transactions WHERE id = 9")
+            # an interrupted earlier run had already copied row 3
+            await conn.execute("CREATE TABLE ledger.transactions (id INTEGER PRIMARY KEY AUTOINCREMENT, "
+                               "from_user INTEGER, to_user INTEGER, amount INTEGER, tx_type TEXT, "
+                               "note TEXT, created_at INTEGER)")
+            await conn.execute(
+                "INSERT INTO ledger.transactions SELECT * FROM main.transactions WHERE id = 3"
+            )
+            await conn.execute("INSERT INTO audit_log (id, action) VALUES (12, 'kept')")
+        await db.init_db()
+
+        assert [(t.id, t.amount) async for t in db.iter_transactions(user_id=7)] == [(3, 30), (4, 40)]
+        async with db._pool.reader() as conn:
+            async with conn.execute("SELECT id, action FROM audit.audit_log") as cur:
+                assert [tuple(r) for r in await cur.fetchall()] == [(12, "kept")]
+        # the ledger's counter still covers the deleted row 9
+        await db.add_coins(7, 1, tx_type="test")
+        assert max([t.id async for t in db.iter_transactions(user_id=7)]) == 10
+
+    run(db, body)
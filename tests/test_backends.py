@@ -0,0 +1,165 @@
+# ════════════════════════════════════════════
+# 🃏 Card Collection Bot — Connection Backends
+# ════════════════════════════════════════════
+# The same checks run against every SQLite connection backend in backends.BACKENDS.
+# `test_backends_agree` replays one session of the database API (players,
+# catches, economy, shop, social, missions, achievements, leaderboards,
+# bulk iterators) on each backend and requires identical results;
+# timestamps are left out of the comparison.
+import asyncio
+
+import pytest
+
+from backends import BACKENDS
+
+_VOLATILE = {"created_at", "first_caught_at", "last_caught_at", "earned_at",
+             "reset_at", "purchased_at", "last_daily", "week_start"}
+
+
+def _plain(value):
+    """Comparable form of a database return value."""
+    if hasattr(value, "to_dict"):
+        value = value.to_dict()
+    if isinstance(value, dict):
+        return {k: _plain(v) for k, v in sorted(value.items()) if k not in _VOLATILE}
+    if isinstance(value, (list, tuple)):
+        return [_plain(v) for v in value]
+    if hasattr(value, "keys"):                # sqlite Row
+        return _plain(dict(value))
+    return value
+
+
+async def _scenario(db, record):
+    from config import (DEFAULT_SHOP_ITEMS, DAILY_MISSIONS, WEEKLY_MISSIONS,
+                        ACHIEVEMENTS, TITLES)
+
+    await db.init_db()
+    await db.init_shop(DEFAULT_SHOP_ITEMS)
+    await db.init_missions(DAILY_MISSIONS, WEEKLY_MISSIONS)
+    await db.init_achievements(ACHIEVEMENTS)
+    await db.init_titles(TITLES)
+    record("schema", await db.get_schema_version())
+
+    players = [101, 202, 303, 404, 505]
+    for uid in players:
+        record(f"create {uid}", await db.get_or_create_user(uid, f"p{uid}", f"P{uid}"))
+        await db.ensure_weekly_entry(uid, f"p{uid}")
+
+    cards = []
+    for i, rarity in enumerate(["Common", "Rare", "Legendary", "Epic", "Uncommon"]):
+        cards.append(await db.add_card(f"Card{i}", f"Movie{i % 2}", rarity, f"f{i}", "photo", 101))
+    record("card ids distinct", len(set(cards)))
+    record("card by name", (await db.get_card_by_name("card2"))["name"])
+    record("count cards", await db.count_cards())
+    record("card page", [c.name for c in await db.get_all_cards(1, 3)])
+    await db.edit_card(cards[4], "Renamed", "Movie9")
+    record("edited", (await db.get_card(cards[4]))["name"])
+    record("random exists", (await db.get_random_card("Rare")) is not None)
+
+    for n, uid in enumerate(players):
+        for cid in cards[: n + 1]:
+            record(f"catch {uid}", await db.add_card_to_user(uid, cid))
+    await db.add_card_to_user(101, cards[0])
+    record("collection", [(c.name, c.count) for c in await db.get_user_cards(505)])
+    record("count user cards", await db.count_user_cards(303))
+    record("has card", [await db.user_has_card(101, cards[0]), await db.user_has_card(101, cards[3])])
+    record("has rarity", await db.user_has_rarity(505, "Legendary"))
+    record("favorite", [await db.set_favorite(303, cards[1]), await db.set_favorite(101, cards[4])])
+    record("favorite card", (await db.get_favorite_card(303))["name"])
+
+    record("add coins", await db.add_coins(101, 750, tx_type="test"))
+    record("debit ok", await db.debit_coins(202, 300))
+    record("debit short", await db.debit_coins(202, 10 ** 9))
+    record("xp", await db.add_xp(303, 1200))
+    record("give", await db.give_coins(101, 404, 250))
+    record("give short", await db.give_coins(202, 101, 10 ** 9))
+    record("buy", await db.buy_item(505, "s1"))
+    record("buy again", await db.buy_item(505, "s1"))
+    record("inventory", await db.get_user_inventory(505))
+
+    record("friend", [await db.add_friend(101, 202), await db.add_friend(101, 303),
+                      await db.add_friend(101, 202)])
+    record("friends", sorted(u.user_id for u in await db.get_friends(101)))
+    record("are friends", await db.are_friends(202, 101))
+    record("marry", [await db.marry(404, 505), await db.marry(404, 101)])
+    record("divorce", await db.divorce(505))
+
+    await db.get_user_missions(202)
+    for _ in range(3):
+        await db.update_mission_progress(202, "catch")
+    record("missions", [(m.mission_key, m.progress, m.completed)
+                        for m in await db.get_user_missions(202)])
+    record("achievements", await db.check_achievements(505))
+    record("titles", await db.check_titles(505))
+    record("user achievements", await db.get_user_achievements(505))
+
+    uow = await db.unit_of_work(202, "p202", "P202")
+    uow.add_coins(400, tx_type="uow")
+    uow.add_xp(50)
+    uow.add_card(cards[2])
+    uow.incr("slots_wins", 1)
+    uow.update_mission_progress("slots")
+    uow.check_achievements()
+    await uow.flush()
+    record("uow", [uow.user, uow.new_achievements])
+
+    record("users", [await db.get_user(uid) for uid in players])
+    record("top", [u.user_id for u in await db.get_top_users(5)])
+    record("weekly top", await db.get_weekly_top(5))
+    record("stats", await db.get_server_stats())
+    record("iter users", [u.user_id async for u in db.iter_users(["coins"], chunk=2)])
+    record("iter cards", [(c.user_id, c.name, c.count)
+                          async for c in db.iter_user_cards(chunk=3)])
+    record("iter txs", [(t.from_user, t.to_user, t.amount, t.tx_type)
+                        async for t in db.iter_transactions(chunk=2)])
+
+    await db.delete_card(cards[0])
+    record("after delete", [await db.count_cards(), await db.count_user_cards(101)])
+
+
+@pytest.mark.parametrize("shards", [1, 3])
+def test_backends_agree(make_db, run, tmp_path, shards):
+    results = {}
+    for name in BACKENDS:
+        (tmp_path / name).mkdir()
+        db = make_db(DB_BACKEND=name, DB_SHARDS=shards, DB_PATH=tmp_path / name / "bot.db")
+        steps = []
+        run(db, lambda: _scenario(db, lambda step, value: steps.append((step, _plain(value)))))
+        results[name] = steps
+    first, *others = BACKENDS
+    for name in others:
+        assert [s for s, _ in results[name]] == [s for s, _ in results[first]]
+        for (step, want), (_, got) in zip(results[first], results[name]):
+            assert got == want, f"{step}: {first}={want!r} {name}={got!r}"
+
+
+@pytest.mark.parametrize("backend", list(BACKENDS))
+def test_readers_see_committed_rows_only(make_db, run, backend):
+    db = make_db(DB_BACKEND=backend)
+
+    async def users():
+        async with db._pool.reader() as conn:
+            async with conn.execute("SELECT COUNT(*) FROM users") as cur:
+                return (await cur.fetchone())[0]
+
+    async def body():
+        await db.init_db()
+        async with db._pool.writer() as conn:
+            await conn.execute("INSERT INTO users (user_id, username) VALUES (1, 'a')")
+            assert await asyncio.create_task(users()) == 0
+        assert await users() == 1
+
+    run(db, body)
+
+
+@pytest.mark.parametrize("backend", list(BACKENDS))
+def test_data_outlives_close(make_db, run, backend):
+    db = make_db(DB_BACKEND=backend)
+
+    async def body():
+        await db.init_db()
+        await db.get_or_create_user(7, "p7")
+        await db.close_db()
+        return await db.get_user(7)
+
+    assert run(db, body).username == "p7"
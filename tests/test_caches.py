@@ -0,0 +1,133 @@
+# ════════════════════════════════════════════
+# 🃏 Card Collection Bot — Caches
+# ════════════════════════════════════════════
+# The in-process caches in front of `users` and `user_cards`.
+import sys
+
+from catalog import bitset
+from models import User
+
+
+def test_users_are_created_once_and_then_served_from_the_cache(make_db, run):
+    db = make_db()
+
+    async def body():
+        await db.init_db()
+        user = await db.get_or_create_user(7, "ann", "Ann")
+        before = db._users.stats()
+        assert (await db.get_or_create_user(7, "ann", "Ann")) is user
+        assert (await db.get_or_create_user(7)) is user
+        after = db._users.stats()
+        assert after["hits"] - before["hits"] == 2 and after["writes"] == before["writes"]
+
+        renamed = await db.get_or_create_user(7, "anne", "")   # empty names are kept
+        assert (renamed.username, renamed.first_name) == ("anne", "Ann")
+        db._users.clear()
+        stored = await db.get_user(7)
+        assert (stored.username, stored.first_name, stored.coins) == ("anne", "Ann", user.coins)
+
+    run(db, body)
+
+
+def test_writes_go_through_to_the_cache(make_db, run):
+    db = make_db()
+
+    async def body():
+        await db.init_db()
+        start = (await db.get_or_create_user(7)).coins
+        await db.add_coins(7, 25, tx_type="test")
+        await db.update_user(7, best_combo=4)
+        misses = db._users.stats()["misses"]
+        user = await db.get_user(7)
+        assert (user.coins, user.best_combo) == (start + 25, 4)
+        assert db._users.stats()["misses"] == misses
+
+    run(db, body)
+
+
+def test_user_cache_is_bounded_and_aged(make_db, monkeypatch):
+    db = make_db()
+    cache = db.UserCache(capacity=2, ttl=60)
+    for user_id in (1, 2, 3):
+        cache.put(User.from_dict({"user_id": user_id}))
+    assert cache.get(1) is None and cache.get(3).user_id == 3
+    assert cache.stats()["evictions"] == 1
+
+    # a read that raced a write does not overwrite the newer row
+    token = cache.token()
+    cache.put(User.from_dict({"user_id": 2, "coins": 5}))
+    cache.fill(User.from_dict({"user_id": 2, "coins": 1}), token)
+    assert cache.get(2).coins == 5
+
+    clock = [db.time.monotonic() + 61]
+    monkeypatch.setattr(db.time, "monotonic", lambda: clock[0])
+    assert cache.get(2) is None and cache.stats()["expired"] == 1
+
+
+def test_owned_cards_miss_is_counted_once(make_db, run):
+    db = make_db()
+
+    async def body():
+        await db.init_db()
+        await db.get_or_create_user(7)
+        before = db._owned.stats()
+        assert not await db.user_has_card(7, 1)
+        assert not await db.user_has_card(7, 1)
+        after = db._owned.stats()
+        assert after["misses"] - before["misses"] == 1
+        assert after["hits"] - before["hits"] == 1
+        assert after["rebuilds"] - before["rebuilds"] == 1
+
+    run(db, body)
+
+
+def test_owned_cache_is_bounded_by_bytes(make_db):
+    db = make_db()
+    big = bitset([50_000])                      # one card in slot 50,000: ~6KB
+    cache = db.OwnedCache(capacity=100, ttl=60, max_bytes=3 * sys.getsizeof(big))
+    for user_id in range(1, 5):
+        cache.fill(user_id, big, cache.token())
+    stats = cache.stats()
+    assert stats["size"] == 3 and stats["evictions"] == 1
+    assert stats["bytes"] <= stats["max_bytes"]
+    assert cache.get(1) is None                 # least recently used went first
+    assert cache.get(4) == big
+
+    # small collections are cheap: many fit where three big ones did
+    for user_id in range(10, 60):
+        cache.fill(user_id, bitset([3, 7]), cache.token())
+    assert cache.get(59) == bitset([3, 7])
+    assert cache.stats()["bytes"] <= stats["max_bytes"]
+
+    cache.add(59, [60_000])                     # growing an entry re-checks the budget
+    assert cache.stats()["bytes"] <= stats["max_bytes"]
+    cache.clear()
+    assert cache.stats()["bytes"] == 0
+
+
+def test_deleted_cards_do_not_grow_card_sets(make_db, run):
+    db = make_db()
+
+    async def body():
+        await db.init_db()
+        await db.get_or_create_user(7)
+        ids = [await db.add_card(f"Card{i}", "Movie", "Common", f"f{i}", "photo", 1)
+               for i in range(200)]
+        for card_id in ids[:-1]:
+            await db.delete_card(card_id)
+        await db.add_card_to_user(7, ids[-1])
+        assert (await db.owned_cards(7)).bit_length() <= 200
+
+        # the slot of a deleted card goes to the next new card
+        fresh = await db.add_card("Fresh", "Movie", "Common", "fresh", "photo", 1)
+        await db.add_card_to_user(7, fresh)
+        assert (await db.owned_cards(7)).bit_length() <= 200
+        assert await db.user_has_card(7, fresh) and await db.user_has_card(7, ids[-1])
+        assert not await db.user_has_card(7, ids[0])
+
+        # a reload packs the slots: two cards, two bits
+        db._catalog.invalidate()
+        assert (await db.owned_cards(7)).bit_length() == 2
+        assert await db.user_has_card(7, fresh) and await db.user_has_card(7, ids[-1])
+
+    run(db, body)
@@ -0,0 +1,73 @@
+# ════════════════════════════════════════════
+# 🃏 Card Collection Bot — Catalog Browser
+# ════════════════════════════════════════════
+# /cards reads the catalog's full-text index and facet counts, both kept
+# current by triggers on `cards`.
+import sys
+
+
+async def _add(db, name, movie):
+    return await db.add_card(name, movie, "Common", f"f-{name}", "photo", 1)
+
+
+async def _browser_objects(pool):
+    async with pool.reader() as conn:
+        async with conn.execute(
+            "SELECT name FROM sqlite_master WHERE name LIKE 'cards_fts%' "
+            "OR name = 'card_facets' OR name LIKE 'cards_browser_%' ORDER BY name"
+        ) as cur:
+            return [r[0] for r in await cur.fetchall()]
+
+
+def test_movie_facet_ignores_case(make_db, run):
+    db = make_db()
+
+    async def body():
+        await db.init_db()
+        first = await _add(db, "Luke", "Star Wars")
+        second = await _add(db, "Leia", "star wars")
+        await _add(db, "Frodo", "The Lord of the Rings")
+        facets = await db.get_card_facets()
+        assert facets["movie"] == {"Star Wars": 2, "The Lord of the Rings": 1}
+        assert facets["movies"] == 2
+        await db.delete_card(first)
+        assert (await db.get_card_facets())["movie"]["Star Wars"] == 1
+        await db.delete_card(second)
+        assert (await db.get_card_facets())["movies"] == 1
+
+    run(db, body)
+
+
+def test_upgrade_merges_movie_facets(make_db, run):
+    db = make_db()
+    migrations = sys.modules["migrations"]
+
+    async def body():
+        await db._create_base_schema(db._pool)
+        await migrations.run_migrations(db._pool, [m for m in migrations.MIGRATIONS if m.version <= 11])
+        await _add(db, "Luke", "Star Wars")
+        await _add(db, "Leia", "star wars")
+        assert len((await db.get_card_facets())["movie"]) == 2
+        await db.init_db()
+        assert (await db.get_card_facets())["movie"] == {"Star Wars": 2}
+
+    run(db, body)
+
+
+def test_browser_tables_live_on_the_catalog_only(make_db, run):
+    db = make_db(DB_SHARDS=3)
+
+    async def body():
+        await db.init_db()
+        await _add(db, "Luke", "Star Wars")
+        assert {"card_facets", "cards_browser_ad", "cards_browser_ai", "cards_browser_au",
+                "cards_fts"} <= set(await _browser_objects(db._pool))
+        for shard in db._shards:
+            assert await _browser_objects(shard) == []
+            async with shard.reader() as conn:
+                async with conn.execute("SELECT name FROM cards") as cur:
+                    assert [r[0] for r in await cur.fetchall()] == ["Luke"]
+        cards, _, _ = await db.browse_cards(text="luke")
+        assert [c.name for c in cards] == ["Luke"]
+
+    run(db, body)
@@ -0,0 +1,74 @@
+# ════════════════════════════════════════════
+# 🃏 Card Collection Bot — Cross-Process Cache Coherence
+# ════════════════════════════════════════════
+# Another process sharing the database file publishes what it changed to
+# the invalidation log; this process evicts those keys once PRAGMA
+# data_version says the file moved.
+
+OTHER = "elsewhere"
+
+
+async def _remote_write(db, sql, params, scope, key):
+    """What another process's write looks like from here."""
+    async with db._pool.writer() as conn:
+        await conn.execute(sql, params)
+        await conn.execute(
+            "INSERT INTO invalidations (scope, key, origin) VALUES (?,?,?)", (scope, key, OTHER)
+        )
+
+
+def test_remote_user_writes_evict_the_cached_row(make_db, run):
+    db = make_db(CACHE_POLL_MS=0)
+
+    async def body():
+        await db.init_db()
+        start = (await db.get_or_create_user(7)).coins
+        assert (await db.get_user(7)).coins == start           # cached, log position taken
+        await _remote_write(db, "UPDATE users SET coins=? WHERE user_id=?", (5, 7), "user", 7)
+        assert (await db.get_user(7)).coins == 5
+        assert db.get_user_cache_stats()["remote_evictions"] == 1
+
+        # this process's own entries are not applied back to it
+        await db.add_coins(7, 10, tx_type="test")
+        assert (await db.get_user(7)).coins == 15
+        assert db.get_user_cache_stats()["remote_evictions"] == 1
+
+    run(db, body)
+
+
+def test_a_quiet_file_is_not_read_again(make_db, run):
+    db = make_db(CACHE_POLL_MS=0)
+
+    async def body():
+        await db.init_db()
+        await db.get_or_create_user(7)
+        await db.get_user(7)
+        hits = db._users.stats()["hits"]
+        for _ in range(3):
+            await db.get_user(7)
+        assert db._users.stats()["hits"] - hits == 3
+        assert db.get_user_cache_stats()["remote_evictions"] == 0
+
+    run(db, body)
+
+
+def test_falling_behind_the_log_drops_every_cache(make_db, run):
+    db = make_db(CACHE_POLL_MS=0)
+
+    async def body():
+        await db.init_db()
+        await db.get_or_create_user(7)
+        await db.get_or_create_user(8)
+        await db.get_user(7)
+        for key in (100, 101, 102):
+            await _remote_write(db, "SELECT ?", (key,), "user", key)
+        async with db._pool.writer() as conn:                 # pruned past our position
+            await conn.execute(
+                "DELETE FROM invalidations WHERE seq < (SELECT seq FROM invalidations WHERE key = 102)"
+            )
+        await _remote_write(db, "UPDATE users SET coins=? WHERE user_id=?", (1, 8), "user", 8)
+        await db.get_user(7)
+        assert db.get_user_cache_stats()["full_resets"] == 1
+        assert (await db.get_user(8)).coins == 1
+
+    run(db, body)
@@ -0,0 +1,79 @@
+# ════════════════════════════════════════════
+# 🃏 Card Collection Bot — Collections
+# ════════════════════════════════════════════
+# One user_cards row per (player, card) with a copy count; the favorite is
+# a pointer on the users row.
+import sys
+
+
+async def _card(db, name):
+    return await db.add_card(name, "Movie", "Common", f"f-{name}", "photo", 1)
+
+
+def test_duplicates_bump_one_row(make_db, run):
+    db = make_db()
+
+    async def body():
+        await db.init_db()
+        await db.get_or_create_user(7)
+        luke, leia = await _card(db, "Luke"), await _card(db, "Leia")
+        assert [await db.add_card_to_user(7, luke) for _ in range(3)] == [1, 2, 3]
+        assert await db.add_card_to_user(7, leia) == 1
+        assert await db.count_user_cards(7) == 2
+        counts = {c.id: c.count for c in await db.get_user_cards(7)}
+        assert counts == {luke: 3, leia: 1}
+        assert (await db.get_user(7)).total_caught == 4
+        assert (await db.get_server_stats())["total_caught"] == 4
+
+    run(db, body)
+
+
+def test_favorite_is_a_pointer_to_an_owned_card(make_db, run):
+    db = make_db()
+
+    async def body():
+        await db.init_db()
+        await db.get_or_create_user(7)
+        luke, leia = await _card(db, "Luke"), await _card(db, "Leia")
+        await db.add_card_to_user(7, luke)
+        assert not await db.set_favorite(7, leia)                # not owned
+        assert await db.set_favorite(7, luke)
+        assert (await db.get_favorite_card(7)).id == luke
+        assert [c.is_favorite for c in await db.get_user_cards(7)] == [1]
+
+        await db.add_card_to_user(7, leia)
+        assert await db.remove_favorite(7, leia)                 # not the favorite: kept
+        assert (await db.get_favorite_card(7)).id == luke
+        assert await db.remove_favorite(7, luke)
+        assert await db.get_favorite_card(7) is None
+
+        await db.set_favorite(7, leia)
+        await db.delete_card(leia)
+        assert (await db.get_user(7)).favorite_card_id is None
+
+    run(db, body)
+
+
+def test_upgrade_folds_catches_into_counts(make_db, run):
+    db = make_db()
+    migrations = sys.modules["migrations"]
+
+    async def body():
+        await db._create_base_schema(db._pool)
+        await migrations.run_migrations(db._pool, [m for m in migrations.MIGRATIONS if m.version <= 5])
+        async with db._pool.writer() as conn:
+            await conn.execute("INSERT INTO users (user_id) VALUES (7)")
+            await conn.executemany("INSERT INTO cards (id, name, movie) VALUES (?, ?, 'Movie')",
+                                   [(1, "Luke"), (2, "Leia")])
+            await conn.executemany(
+                "INSERT INTO user_cards (user_id, card_id, is_favorite, caught_at) VALUES (7,?,?,?)",
+                [(1, 0, 100), (1, 0, 300), (2, 1, 200), (1, 0, 200)]
+            )
+        await db.init_db()
+
+        rows = [(r.id, r.count, r.first_caught_at, r.last_caught_at)
+                async for r in db.iter_user_cards(7)]
+        assert rows == [(1, 3, 100, 300), (2, 1, 200, 200)]
+        assert (await db.get_user(7)).favorite_card_id == 2
+
+    run(db, body)
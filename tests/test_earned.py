@@ -0,0 +1,96 @@
+# ════════════════════════════════════════════
+# 🃏 Card Collection Bot — Achievements & Titles
+# ════════════════════════════════════════════
+# Each definition owns a fixed bit; what a player earned is a mask on their
+# users row. user_achievements / user_titles stay as the earned_at log.
+import sys
+
+from config import ACHIEVEMENTS, TITLES
+
+
+async def _bits(db, table, key):
+    async with db._pool.reader() as conn:
+        async with conn.execute(f"SELECT {key}, bit FROM {table} ORDER BY bit") as cur:
+            return {r[0]: r[1] for r in await cur.fetchall()}
+
+
+def test_definitions_keep_their_bits(make_db, run):
+    db = make_db()
+
+    async def body():
+        await db.init_db()
+        await db.init_achievements(ACHIEVEMENTS)
+        bits = await _bits(db, "achievements", "ach_key")
+        assert sorted(bits.values()) == list(range(len(ACHIEVEMENTS)))
+
+        extra = {**ACHIEVEMENTS[0], "id": "ach_new"}
+        await db.init_achievements([extra] + ACHIEVEMENTS)       # seeded again, in another order
+        again = await _bits(db, "achievements", "ach_key")
+        assert again == {**bits, "ach_new": len(ACHIEVEMENTS)}
+
+    run(db, body)
+
+
+def test_an_achievement_is_earned_once(make_db, run):
+    db = make_db()
+    rich = next(a for a in ACHIEVEMENTS if a["req_type"] == "coins")
+
+    async def body():
+        await db.init_db()
+        await db.init_achievements(ACHIEVEMENTS)
+        await db.get_or_create_user(7)
+        assert [a for a in await db.check_achievements(7) if a["ach_key"] == rich["id"]] == []
+        await db.add_coins(7, rich["req_value"], tx_type="test")
+
+        earned = await db.check_achievements(7)
+        assert rich["id"] in {a["ach_key"] for a in earned}
+        assert await db.check_achievements(7) == []
+        user = await db.get_user(7)
+        bit = (await _bits(db, "achievements", "ach_key"))[rich["id"]]
+        assert user.ach_mask >> bit & 1
+        assert user.achievement_count == len(earned)
+        logged = [a["ach_key"] for a in await db.get_user_achievements(7)]
+        assert sorted(logged) == sorted(a["ach_key"] for a in earned)
+
+    run(db, body)
+
+
+def test_granted_titles_are_read_from_the_mask(make_db, run):
+    db = make_db()
+
+    async def body():
+        await db.init_db()
+        await db.init_titles(TITLES)
+        await db.get_or_create_user(7)
+        await db.grant_title(7, TITLES[2]["id"])
+        await db.grant_title(7, TITLES[2]["id"])
+        await db.grant_title(7, "no_such_title")
+        user = await db.get_user(7)
+        assert await db.earned_title_keys(user) == {TITLES[2]["id"]}
+        assert user.title_count == 1
+        assert [t["title_key"] for t in await db.get_user_titles(7)] == [TITLES[2]["id"]]
+
+    run(db, body)
+
+
+def test_upgrade_backfills_masks_from_the_earned_log(make_db, run):
+    db = make_db()
+    migrations = sys.modules["migrations"]
+
+    async def body():
+        await db._create_base_schema(db._pool)
+        await migrations.run_migrations(db._pool, [m for m in migrations.MIGRATIONS if m.version <= 4])
+        async with db._pool.writer() as conn:
+            await conn.executemany(
+                "INSERT INTO achievements (ach_key, name) VALUES (?, ?)",
+                [(a["id"], a["name"]) for a in ACHIEVEMENTS[:3]]
+            )
+            await conn.execute("INSERT INTO users (user_id) VALUES (7)")
+            await conn.executemany(
+                "INSERT INTO user_achievements (user_id, ach_key) VALUES (7, ?)",
+                [(ACHIEVEMENTS[0]["id"],), (ACHIEVEMENTS[2]["id"],)]
+            )
+        await db.init_db()
+        assert (await db.get_user(7)).ach_mask == 0b101
+
+    run(db, body)
@@ -0,0 +1,49 @@
+# ════════════════════════════════════════════
+# 🃏 Card Collection Bot — Game Commands
+# ════════════════════════════════════════════
+# /slots, /basket and /wheel flush one unit of work; a refused debit is
+# answered, never raised.
+import importlib
+from types import SimpleNamespace
+
+import pytest
+
+
+class _Message:
+    def __init__(self):
+        self.replies = []
+
+    async def reply_text(self, text, **kwargs):
+        self.replies.append(text)
+
+
+@pytest.mark.parametrize("balance, reply", [
+    (None, "❌ Not enough coins!"),
+    (20, "❌ Not enough coins! You have 20 🪙"),
+])
+def test_refused_flush_is_answered(make_db, run, monkeypatch, balance, reply):
+    db = make_db()
+    games = importlib.reload(importlib.import_module("handlers.game_handlers"))
+    unit_of_work = db.unit_of_work
+
+    async def refusing(*args, **kwargs):
+        uow = await unit_of_work(*args, **kwargs)
+
+        async def flush():
+            raise db.InsufficientCoins(balance)
+
+        uow.flush = flush
+        return uow
+
+    monkeypatch.setattr(db, "unit_of_work", refusing)
+
+    async def body():
+        await db.init_db()
+        message = _Message()
+        update = SimpleNamespace(
+            effective_user=SimpleNamespace(id=7, username="u", first_name="U"), message=message
+        )
+        await games.slots_cmd(update, SimpleNamespace(args=["50"]))
+        assert message.replies == [reply]
+
+    run(db, body)
@@ -0,0 +1,88 @@
+# ════════════════════════════════════════════
+# 🃏 Card Collection Bot — Hot State
+# ════════════════════════════════════════════
+# With HOT_STATE on, coins and xp change in memory and are journaled;
+# SQLite catches up in the background. A crash must lose nothing that
+# was acknowledged: the next startup replays the journal.
+import asyncio
+
+from conftest import crash
+
+
+async def _sql_user(db, user_id):
+    async with db._shard(user_id).reader() as conn:
+        async with conn.execute("SELECT coins, xp FROM users WHERE user_id=?", (user_id,)) as cur:
+            return tuple(await cur.fetchone())
+
+
+def test_journal_replays_after_crash(make_db, run, tmp_path):
+    # nothing reaches SQLite on its own before the crash
+    env = dict(HOT_STATE=1, HOT_STATE_APPLY_MS=600000, DB_SHARDS=2)
+    db = make_db(**env)
+
+    async def before():
+        await db.init_db()
+        for uid in (1, 2):
+            await db.get_or_create_user(uid, f"p{uid}")
+        await db._hot_flush()
+        await db.add_coins(1, 250, tx_type="test")
+        await db.add_coins(2, 40, tx_type="test")
+        await db.add_xp(1, 30)
+        await db.give_coins(1, 2, 100)
+        assert await _sql_user(db, 1) == (1000, 0)
+        await crash(db)
+
+    run(db, before)
+    segments = sorted(tmp_path.glob("bot_journal.*.log"))
+    assert segments
+    with open(segments[-1], "a") as f:
+        f.write('[99999, "u", 1, {"coi')          # torn by the crash
+
+    db = make_db(backend=db.backend, **env)
+
+    async def after():
+        await db.init_db()
+        sql = [await _sql_user(db, 1), await _sql_user(db, 2)]
+        txs = [(t.from_user, t.to_user, t.amount, t.tx_type)
+               async for t in db.iter_transactions(user_id=1)]
+        return sql, txs
+
+    sql, txs = run(db, after)
+    assert sql == [(1150, 30), (1140, 0)]
+    assert (0, 1, 250, "test") in txs and (1, 2, 100, "transfer") in txs
+    assert not list(tmp_path.glob("bot_journal.*.log"))
+
+
+def test_replay_is_idempotent(make_db, run):
+    env = dict(HOT_STATE=1, HOT_STATE_APPLY_MS=600000)
+    db = make_db(**env)
+
+    async def body():
+        await db.init_db()
+        await db.get_or_create_user(1, "p1")
+        await db.add_coins(1, 10, tx_type="test")
+        records = list(db._hot.journal.read())
+        await db._hot_flush()
+        assert await db._hot_apply(records) == 0           # already applied
+        return await _sql_user(db, 1)
+
+    assert run(db, body) == (1010, 0)
+
+
+def test_write_behind_restarts_after_close(make_db, run):
+    db = make_db(HOT_STATE=1, HOT_STATE_APPLY_MS=20)
+
+    async def body():
+        await db.init_db()
+        await db.get_or_create_user(1, "p1")
+        await db.close_db()
+        assert db._hot_task["task"] is None
+        await db.add_coins(1, 5, tx_type="test")
+        assert db._hot_task["task"] is not None
+        for _ in range(50):
+            if await _sql_user(db, 1) == (1005, 0):
+                break
+            await asyncio.sleep(0.02)
+        return await _sql_user(db, 1)
+
+    assert run(db, body) == (1005, 0)
@@ -0,0 +1,90 @@
+# ════════════════════════════════════════════
+# 🃏 Card Collection Bot — Bulk Read Iterators
+# ════════════════════════════════════════════
+# iter_users / iter_user_cards / iter_transactions page through a table by
+# key, `chunk` rows per read, so an export never holds it all at once.
+import pytest
+
+
+async def _collect(it):
+    return [row async for row in it]
+
+
+def test_users_come_in_key_order_across_chunks(make_db, run):
+    db = make_db()
+
+    async def body():
+        await db.init_db()
+        for user_id in (5, 3, 9, 1, 7):
+            await db.get_or_create_user(user_id, f"p{user_id}")
+        users = await _collect(db.iter_users(chunk=2))
+        assert [u.user_id for u in users] == [1, 3, 5, 7, 9]
+        assert users[0].username == "p1"
+
+        slim = await _collect(db.iter_users(columns=["coins"], chunk=3))
+        assert [u.user_id for u in slim] == [1, 3, 5, 7, 9]   # the key is always read
+        assert slim[0].coins is not None and slim[0].username is None
+        with pytest.raises(ValueError):
+            await _collect(db.iter_users(columns=["password"]))
+
+    run(db, body)
+
+
+def test_sharded_users_are_all_visited(make_db, run):
+    db = make_db(DB_SHARDS=3)
+
+    async def body():
+        await db.init_db()
+        for user_id in range(1, 11):
+            await db.get_or_create_user(user_id)
+        users = await _collect(db.iter_users(chunk=2))
+        assert sorted(u.user_id for u in users) == list(range(1, 11))
+
+    run(db, body)
+
+
+def test_collection_rows_page_on_the_composite_key(make_db, run):
+    db = make_db()
+
+    async def body():
+        await db.init_db()
+        cards = [await db.add_card(f"Card{i}", "Movie", "Common", f"f{i}", "photo", 1)
+                 for i in range(4)]
+        for user_id in (1, 2):
+            await db.get_or_create_user(user_id)
+            for card_id in cards[user_id - 1:]:
+                await db.add_card_to_user(user_id, card_id)
+        await db.add_card_to_user(2, cards[3])
+
+        rows = await _collect(db.iter_user_cards(chunk=1))
+        assert [(r.user_id, r.id) for r in rows] == (
+            [(1, c) for c in cards] + [(2, c) for c in cards[1:]]
+        )
+        mine = await _collect(db.iter_user_cards(2, columns=["count"], chunk=2))
+        assert [r.count for r in mine] == [1, 1, 2] and mine[0].name is None
+
+    run(db, body)
+
+
+def test_transactions_resume_after_the_last_seen_id(make_db, run):
+    db = make_db()
+
+    async def body():
+        await db.init_db()
+        for user_id in (1, 2):
+            await db.get_or_create_user(user_id)
+        for amount in range(1, 6):
+            await db.add_coins(1 + amount % 2, amount, tx_type="test")
+
+        every = await _collect(db.iter_transactions(chunk=2))
+        assert [t.amount for t in every] == [1, 2, 3, 4, 5]
+        rest = await _collect(db.iter_transactions(after_id=every[1].id, chunk=2))
+        assert [t.amount for t in rest] == [3, 4, 5]
+        player = await _collect(db.iter_transactions(user_id=2, columns=["amount"]))
+        assert [t.amount for t in player] == [1, 3, 5] and player[0].tx_type is None
+
+        stamp = every[0].created_at
+        assert len(await _collect(db.iter_transactions(since=stamp))) == 5
+        assert await _collect(db.iter_transactions(until=stamp)) == []
+
+    run(db, body)
@@ -0,0 +1,70 @@
+# ════════════════════════════════════════════
+# 🃏 Card Collection Bot — Scheduled Maintenance
+# ════════════════════════════════════════════
+# run_maintenance(): incremental vacuum, ANALYZE / PRAGMA optimize and a
+# WAL checkpoint over every database file.
+
+
+async def _pragma(pool, sql):
+    # on the writer: a reader opened before migration 10's VACUUM still
+    # reports the auto_vacuum mode its file had then
+    async with pool.writer(standalone=True) as conn:
+        async with conn.execute(sql) as cur:
+            return (await cur.fetchone())[0]
+
+
+async def _fill_and_empty_ledger(db, rows=3000):
+    async with db._pool.writer() as conn:
+        await conn.executemany(
+            "INSERT INTO ledger.transactions (to_user, amount, tx_type, note) VALUES (7, 1, 'test', ?)",
+            [("x" * 200,)] * rows
+        )
+    async with db._pool.writer() as conn:
+        await conn.execute("DELETE FROM ledger.transactions")
+
+
+def test_every_file_vacuums_incrementally(make_db, run):
+    db = make_db(DB_BACKEND="sqlite")
+
+    async def body():
+        await db.init_db()
+        for schema in ("main", "ledger", "audit"):
+            assert await _pragma(db._pool, f"PRAGMA {schema}.auto_vacuum") == 2, schema
+
+    run(db, body)
+
+
+def test_a_pass_frees_pages_analyses_and_truncates_the_wal(make_db, run):
+    db = make_db(DB_BACKEND="sqlite", DB_MAINT_QUIET_MS=0, DB_MAINT_VACUUM_PAGES=100_000)
+
+    async def body():
+        await db.init_db()
+        await _fill_and_empty_ledger(db)
+        free = await _pragma(db._pool, "PRAGMA ledger.freelist_count")
+        assert free > 0
+
+        stats = await db.run_maintenance()
+        assert stats["runs"] == 1 and stats["checkpoint"] == "TRUNCATE"
+        assert stats["pages_freed"] >= free and stats["free_pages"] == 0
+        assert stats["busy"] == 0 and stats["wal_bytes"] == 0
+        for schema in ("main", "ledger", "audit"):
+            assert await _pragma(
+                db._pool, f"SELECT COUNT(*) FROM {schema}.sqlite_master WHERE name = 'sqlite_stat1'"
+            ) == 1, schema
+
+    run(db, body)
+
+
+def test_vacuum_is_capped_and_a_busy_pool_gets_a_passive_checkpoint(make_db, run):
+    db = make_db(DB_BACKEND="sqlite", DB_MAINT_QUIET_MS=3_600_000, DB_MAINT_VACUUM_PAGES=10)
+
+    async def body():
+        await db.init_db()
+        await _fill_and_empty_ledger(db)
+        free = await _pragma(db._pool, "PRAGMA ledger.freelist_count")
+        stats = await db.run_maintenance()
+        assert stats["checkpoint"] == "PASSIVE"
+        assert stats["pages_freed"] <= 10 * 3
+        assert stats["free_pages"] >= free - 10
+
+    run(db, body)
@@ -0,0 +1,60 @@
+# ════════════════════════════════════════════
+# 🃏 Card Collection Bot — Row Models
+# ════════════════════════════════════════════
+# Slotted records built straight from sqlite rows, still readable the way
+# the old dict(row) call sites read them.
+import sqlite3
+
+import pytest
+
+from models import Card, User
+
+
+def _rows(sql):
+    conn = sqlite3.connect(":memory:")
+    conn.row_factory = sqlite3.Row
+    try:
+        return conn.execute(sql).fetchall()
+    finally:
+        conn.close()
+
+
+def test_rows_fill_selected_columns_and_leave_the_rest_none():
+    full = _rows("SELECT 7 AS user_id, 'ann' AS username, 900 AS coins")[0]
+    partial = _rows("SELECT 12 AS coins, 3 AS user_id")[0]
+    user = User.from_row(full)
+    assert (user.user_id, user.username, user.coins, user.xp) == (7, "ann", 900, None)
+    other = User.from_row(partial)                  # another column order, another plan
+    assert (other.user_id, other.coins, other.username) == (3, 12, None)
+    assert {tuple(full.keys()), tuple(partial.keys())} <= set(User._plans)
+    assert User.from_row(None) is None
+
+
+def test_models_have_no_instance_dict():
+    user = User.from_dict({"user_id": 1})
+    assert not hasattr(user, "__dict__")
+    with pytest.raises(AttributeError):
+        user.nickname = "x"
+
+
+def test_mapping_access_matches_attributes():
+    card = Card.from_dict({"id": 4, "name": "Luke", "movie": "Star Wars", "rarity": "Rare"})
+    assert card["name"] == card.name == "Luke"
+    assert card.get("drop_rate", 1.0) == 1.0
+    assert "movie" in card and "nickname" not in card
+    assert dict(card.items()) == card.to_dict() and list(card.keys()) == list(Card.__slots__)
+    card["rarity"] = "Epic"
+    assert card.rarity == "Epic"
+    with pytest.raises(KeyError):
+        card["nickname"]
+    with pytest.raises(KeyError):
+        card["nickname"] = "x"
+
+
+def test_copies_are_independent_and_compare_by_value():
+    user = User.from_dict({"user_id": 1, "coins": 10, "ach_mask": 0b1011})
+    copy = user.copy()
+    assert copy == user and copy is not user
+    copy.coins = 20
+    assert user.coins == 10 and copy != user
+    assert user.achievement_count == 3 and user.title_count == 0
@@ -0,0 +1,116 @@
+# ════════════════════════════════════════════
+# 🃏 Card Collection Bot — Connection Pool
+# ════════════════════════════════════════════
+# The single writer task: group commit, per-job rollback, commit hooks
+# and batched appends.
+import asyncio
+
+import pytest
+
+
+async def _user_ids(db):
+    async with db._pool.reader() as conn:
+        async with conn.execute("SELECT user_id FROM users ORDER BY user_id") as cur:
+            return [r[0] for r in await cur.fetchall()]
+
+
+def test_failed_job_rolls_back_alone_in_its_batch(make_db, run):
+    db = make_db()
+    hooks = []
+
+    async def job(user_id, fail):
+        async with db._pool.writer() as conn:
+            await conn.execute("INSERT INTO users (user_id) VALUES (?)", (user_id,))
+            db.on_commit(lambda: hooks.append(user_id))
+            if fail:
+                raise ValueError("boom")
+
+    async def body():
+        await db.init_db()
+        batches = db._pool.stats()["batches"]
+        results = await asyncio.gather(job(1, False), job(2, True), job(3, False),
+                                       return_exceptions=True)
+        assert isinstance(results[1], ValueError)
+        assert results[0] is None and results[2] is None
+        stats = db._pool.stats()
+        assert stats["batches"] == batches + 1 and stats["last_batch"] == 3
+        assert await _user_ids(db) == [1, 3]
+        assert sorted(hooks) == [1, 3]
+
+    run(db, body)
+
+
+def test_failed_commit_fails_every_job_in_the_batch(make_db, run):
+    db = make_db()
+
+    async def job(user_id):
+        async with db._pool.writer() as conn:
+            await conn.execute("INSERT INTO users (user_id) VALUES (?)", (user_id,))
+            if user_id == 2:
+                # deferred: only checked when the batch commits
+                await conn.execute("PRAGMA defer_foreign_keys=ON")
+                await conn.execute("INSERT INTO user_cards (user_id, card_id) VALUES (2, 999)")
+
+    async def body():
+        await db.init_db()
+        results = await asyncio.gather(job(1), job(2), return_exceptions=True)
+        assert all(isinstance(r, Exception) for r in results)
+        assert await _user_ids(db) == []
+        await job(4)                     # the writer carries on
+        assert await _user_ids(db) == [4]
+
+    run(db, body)
+
+
+def test_nested_writer_on_same_pool_raises(make_db, run):
+    db = make_db()
+
+    async def body():
+        await db.init_db()
+        async with db._pool.writer():
+            with pytest.raises(RuntimeError):
+                async with db._pool.writer():
+                    pass
+
+    run(db, body)
+
+
+async def _ledger_rows(db):
+    async with db._pool.reader() as conn:
+        async with conn.execute(
+            "SELECT to_user, amount FROM ledger.transactions ORDER BY id"
+        ) as cur:
+            return [tuple(r) for r in await cur.fetchall()]
+
+
+def test_buffered_ledger_rows_are_flushed_on_close(make_db, run):
+    db = make_db(LEDGER_DURABILITY="async", LEDGER_FLUSH_MS=600000)
+
+    async def body():
+        await db.init_db()
+        await db.get_or_create_user(1, "p1")
+        for amount in (10, 20, 30):
+            await db.add_coins(1, amount, tx_type="test")
+        assert db._pool.stats()["appends_pending"] == 3
+        assert await _ledger_rows(db) == []
+        await db.close_db()
+        assert db._pool.stats()["appends_pending"] == 0
+        return await _ledger_rows(db)
+
+    assert run(db, body) == [(1, 10), (1, 20), (1, 30)]
+
+
+def test_appends_of_a_failed_block_are_dropped(make_db, run):
+    db = make_db()
+
+    async def body():
+        await db.init_db()
+        with pytest.raises(ValueError):
+            async with db._pool.writer():
+                db._ledger(0, 1, 99, "test")
+                raise ValueError("boom")
+        async with db._pool.writer():
+            db._ledger(0, 1, 5, "test")
+        return await _ledger_rows(db)
+
+    assert run(db, body) == [(1, 5)]
@@ -0,0 +1,70 @@
+# ════════════════════════════════════════════
+# 🃏 Card Collection Bot — Relationship Tables
+# ════════════════════════════════════════════
+# friends, user_missions, user_achievements and user_titles are WITHOUT
+# ROWID tables clustered on their natural (user_id, ...) keys.
+import sys
+
+RELATIONS = ("friends", "user_missions", "user_achievements", "user_titles")
+
+
+async def _rows(pool, sql, params=()):
+    async with pool.reader() as conn:
+        async with conn.execute(sql, params) as cur:
+            return [tuple(r) for r in await cur.fetchall()]
+
+
+def test_upgrade_clusters_relations_on_their_keys(make_db, run):
+    db = make_db()
+    migrations = sys.modules["migrations"]
+
+    async def body():
+        await db._create_base_schema(db._pool)
+        await migrations.run_migrations(db._pool, [m for m in migrations.MIGRATIONS if m.version <= 3])
+        async with db._pool.writer() as conn:
+            await conn.executemany(
+                "INSERT INTO friends (user_id, friend_id) VALUES (?,?)", [(1, 2), (2, 1), (1, None)]
+            )
+            await conn.execute(
+                "INSERT INTO user_missions (user_id, mission_key, progress) VALUES (1, 'm', 2)"
+            )
+        await db.init_db()
+
+        async with db._pool.reader() as conn:
+            for table in RELATIONS:
+                assert await migrations._is_without_rowid(conn, table), table
+        # the row without a friend could never be addressed and is gone
+        assert await _rows(db._pool, "SELECT user_id, friend_id FROM friends") == [(1, 2), (2, 1)]
+        assert await _rows(db._pool, "SELECT user_id, mission_key, progress FROM user_missions") == [
+            (1, "m", 2)
+        ]
+
+        # re-running the rebuild leaves a clustered table alone
+        rebuild = next(m for m in migrations.MIGRATIONS if m.version == 4)
+        await migrations.run_migrations(db._pool, [rebuild])
+        assert len(await _rows(db._pool, "SELECT * FROM friends")) == 2
+
+    run(db, body)
+
+
+def test_expired_mission_starts_a_new_period(make_db, run):
+    from config import DAILY_MISSIONS, WEEKLY_MISSIONS
+    db = make_db()
+
+    async def body():
+        await db.init_db()
+        await db.init_missions(DAILY_MISSIONS, WEEKLY_MISSIONS)
+        await db.get_or_create_user(7)
+        await db.get_user_missions(7)
+        async with db._pool.writer() as conn:
+            await conn.execute(
+                "UPDATE user_missions SET progress=3, completed=1, reset_at=1 WHERE user_id=7"
+            )
+        uow = await db.unit_of_work(7)
+        uow.update_mission_progress("catch", 1)
+        await uow.flush()
+        hunter = next(m for m in await db.get_user_missions(7) if m.name == "Card Hunter")
+        assert (hunter.progress, hunter.completed) == (1, 0)
+        assert hunter.reset_at == db._period_end("daily")
+
+    run(db, body)
@@ -0,0 +1,119 @@
+# ════════════════════════════════════════════
+# 🃏 Card Collection Bot — Card Name Resolver
+# ════════════════════════════════════════════
+# /catch <name> takes the card a typed name clearly means; a near miss is
+# suggested, several fits are offered as a choice.
+import importlib
+from types import SimpleNamespace
+
+
+class _Message:
+    def __init__(self):
+        self.replies = []
+
+    async def reply_text(self, text, **kwargs):
+        self.replies.append(text)
+
+
+async def _cards(db, *names, movie="Deck"):
+    return {name: await db.add_card(name, movie, "Common", f"f-{name}", "photo", 1) for name in names}
+
+
+def test_swapped_letters_in_a_short_name_resolve(make_db, run):
+    db = make_db()
+
+    async def body():
+        await db.init_db()
+        ids = await _cards(db, "Card1", "Card2", "Card3")
+        card, candidates = await db.find_cards("Crad1")
+        assert card is not None and card.id == ids["Card1"]
+        assert candidates[0].id == ids["Card1"]
+        card, _ = await db.find_cards("card1")
+        assert card.id == ids["Card1"]
+
+    run(db, body)
+
+
+def test_one_typo_in_a_longer_name_resolves(make_db, run):
+    db = make_db()
+
+    async def body():
+        await db.init_db()
+        ids = await _cards(db, "Pikachu", "Bulbasaur", "Squirtle")
+        for typo in ("Pikahcu", "Pikachuu", "Pkachu", "Bulbasuar"):
+            card, _ = await db.find_cards(typo)
+            assert card is not None, typo
+        assert (await db.find_cards("Pikahcu"))[0].id == ids["Pikachu"]
+        assert await db.find_cards("Zzzzzz") == (None, [])
+
+    run(db, body)
+
+
+def test_deleted_cards_leave_the_typo_index(make_db, run):
+    db = make_db()
+
+    async def body():
+        await db.init_db()
+        ids = await _cards(db, "Card1", "Card2")
+        await db.delete_card(ids["Card1"])
+        card, candidates = await db.find_cards("Crad1")
+        assert card is None and all(c.id != ids["Card1"] for c in candidates)
+
+    run(db, body)
+
+
+def test_a_single_candidate_is_a_suggestion(make_db, run):
+    db = make_db()
+
+    async def body():
+        await db.init_db()
+        ids = await _cards(db, "Pikachu", "Bulbasaur", "Squirtle")
+        card, candidates = await db.find_cards("Bulbsuar")
+        assert card is None and [c.id for c in candidates] == [ids["Bulbasaur"]]
+
+        card_handlers = importlib.reload(importlib.import_module("handlers.card_handlers"))
+        message = _Message()
+        update = SimpleNamespace(
+            effective_user=SimpleNamespace(id=7, username="u", first_name="U"), message=message
+        )
+        await card_handlers.catch_cmd(update, SimpleNamespace(args=["Bulbsuar"]))
+        assert len(message.replies) == 1
+        assert "Did you mean" in message.replies[0] and "Bulbasaur" in message.replies[0]
+        assert 7 not in card_handlers._catch_cd
+
+    run(db, body)
+
+
+def test_partial_accented_and_movie_qualified_names_resolve(make_db, run):
+    db = make_db()
+
+    async def body():
+        await db.init_db()
+        luke = await db.add_card("Luke Skywalker", "Star Wars", "Common", "f1", "photo", 1)
+        amelie = await db.add_card("Amélie Poulain", "Amélie", "Common", "f2", "photo", 1)
+        young = await db.add_card("Harry", "Philosopher's Stone", "Common", "f3", "photo", 1)
+        old = await db.add_card("Harry", "Deathly Hallows", "Common", "f4", "photo", 1)
+        assert (await db.find_cards("skywalker"))[0].id == luke
+        assert (await db.find_cards("AMELIE poulain!"))[0].id == amelie
+        assert (await db.find_cards("harry deathly hallows"))[0].id == old
+
+        card, candidates = await db.find_cards("harry")     # two cards share the name
+        assert card is None and {c.id for c in candidates} == {young, old}
+
+    run(db, body)
+
+
+def test_added_and_renamed_cards_are_found(make_db, run):
+    db = make_db()
+
+    async def body():
+        await db.init_db()
+        await _cards(db, "Card1", "Card2")
+        assert (await db.find_cards("Card1"))[0] is not None    # index built
+        fresh = await db.add_card("Obi-Wan Kenobi", "Star Wars", "Common", "f", "photo", 1)
+        assert (await db.find_cards("kenobi"))[0].id == fresh
+        await db.edit_card(fresh, "Ben Kenobi", "Star Wars")
+        assert (await db.find_cards("ben kenobi"))[0].id == fresh
+        assert await db.find_cards("obi-wan") == (None, [])          # the old name is gone
+
+    run(db, body)
@@ -0,0 +1,177 @@
+# ════════════════════════════════════════════
+# 🃏 Card Collection Bot — Backup & Restore
+# ════════════════════════════════════════════
+# /backup copies the main file together with its ATTACHed ledger and
+# audit files; /confirmrestore swaps all of them under the pool and
+# brings them up to this code's schema before anything reads them.
+import importlib
+import os
+import shutil
+import sqlite3
+import sys
+from types import SimpleNamespace
+
+OWNER = 1
+
+
+class _Message:
+    def __init__(self):
+        self.replies = []
+        self.documents = []
+
+    async def reply_text(self, text, **kwargs):
+        self.replies.append(text)
+
+    async def reply_document(self, document, filename, **kwargs):
+        self.documents.append((filename, document.read()))
+
+
+def _update(message):
+    return SimpleNamespace(effective_user=SimpleNamespace(id=OWNER), message=message)
+
+
+def _restore(admin, backup):
+    """Drive /confirmrestore for OWNER with `backup` as the uploaded file."""
+    async def get_file(file_id):
+        async def download_to_drive(path):
+            shutil.copyfile(backup, path)
+        return SimpleNamespace(download_to_drive=download_to_drive)
+
+    message = _Message()
+    ctx = SimpleNamespace(bot=SimpleNamespace(get_file=get_file))
+    admin._pending_restore[OWNER] = ("file", os.path.basename(backup))
+    return admin.confirmrestore_cmd(_update(message), ctx), message
+
+
+async def _backup(admin, path):
+    """Drive /backup for OWNER and save the document it sends to `path`."""
+    message = _Message()
+    await admin.backup_cmd(_update(message), SimpleNamespace())
+    (name, data), = message.documents
+    assert name.endswith(".zip")
+    path.write_bytes(data)
+    return path
+
+
+def _admin_handlers():
+    name = "handlers.admin_handlers"
+    if name in sys.modules:
+        return importlib.reload(sys.modules[name])
+    return importlib.import_module(name)
+
+
+async def _ledger(db, user_id):
+    return [(tx.amount, tx.note) async for tx in db.iter_transactions(user_id)]
+
+
+def _old_backup(make_db, run, tmp_path, version):
+    """A backup file taken when the schema was at `version`; before 7 its
+    ledger is still inside it."""
+    path = tmp_path / "old.db"
+    db = make_db(DB_BACKEND="sqlite", DB_PATH=path)
+    migrations = sys.modules["migrations"]
+
+    async def body():
+        await db._create_base_schema(db._pool)
+        await migrations.run_migrations(db._pool, migrations.MIGRATIONS[:version])
+        async with db._pool.writer() as conn:
+            await conn.execute("INSERT INTO users (user_id, coins) VALUES (42, 777)")
+            await conn.execute("INSERT INTO transactions (from_user, to_user, amount, tx_type, note) "
+                               "VALUES (0, 42, 777, 'admin', 'old')")
+
+    run(db, body)
+    return path
+
+
+def test_older_backup_is_migrated_on_restore(make_db, run, tmp_path):
+    backup = _old_backup(make_db, run, tmp_path, 2)
+    (tmp_path / "backups").mkdir()
+    db = make_db(DB_BACKEND="sqlite", OWNER_ID=OWNER)
+    admin = _admin_handlers()
+
+    async def body():
+        await db.init_db()
+        await db.get_or_create_user(7)
+        await db.add_coins(7, 5, note="live")       # ledger row 1 of the live file
+        latest = await db.get_schema_version()
+        command, message = _restore(admin, backup)
+        await command
+        assert "Database Restored" in message.replies[-1], message.replies
+        assert f"v2 → v{latest}" in message.replies[-1]
+        assert await db.get_schema_version() == latest
+        assert (await db.get_user(42)).coins == 777
+        assert await db.get_user(7) is None
+        # the backup's own ledger, not the live one's
+        assert await _ledger(db, 42) == [(777, "old")]
+        assert await _ledger(db, 7) == []
+
+    run(db, body)
+
+
+def test_backup_round_trip_restores_the_ledger(make_db, run, tmp_path):
+    (tmp_path / "backups").mkdir()
+    db = make_db(DB_BACKEND="sqlite", OWNER_ID=OWNER)
+    admin = _admin_handlers()
+
+    async def body():
+        await db.init_db()
+        await db.get_or_create_user(7)
+        await db.add_coins(7, 5, note="kept")
+        backup = await _backup(admin, tmp_path / "full.zip")
+        await db.add_coins(7, 9, note="rolled back")
+        await db.audit(OWNER, "after", "backup", "")
+        command, message = _restore(admin, backup)
+        await command
+        assert "Database Restored" in message.replies[-1], message.replies
+        assert (await db.get_user(7)).coins == 1005
+        assert await _ledger(db, 7) == [(5, "kept")]
+        async with db._pool.reader() as conn:
+            async with conn.execute("SELECT action FROM audit.audit_log") as cur:
+                # /backup logs itself after copying
+                assert [r[0] for r in await cur.fetchall()] == []
+
+    run(db, body)
+
+
+def test_main_file_alone_is_refused(make_db, run, tmp_path):
+    (tmp_path / "backups").mkdir()
+    db = make_db(DB_BACKEND="sqlite", OWNER_ID=OWNER)
+    admin = _admin_handlers()
+    backup = tmp_path / "main_only.db"
+
+    async def body():
+        await db.init_db()
+        await db.get_or_create_user(7)
+        await db.backup_to(str(backup))
+        await db.get_or_create_user(8)
+        command, message = _restore(admin, backup)
+        await command
+        assert "only the main database" in message.replies[-1]
+        assert await db.get_user(8) is not None
+
+    run(db, body)
+
+
+def test_newer_backup_is_refused(make_db, run, tmp_path):
+    (tmp_path / "backups").mkdir()
+    db = make_db(DB_BACKEND="sqlite", OWNER_ID=OWNER)
+    admin = _admin_handlers()
+
+    async def body():
+        await db.init_db()
+        await db.get_or_create_user(7)
+        backup = await _backup(admin, tmp_path / "future.zip")
+        shutil.unpack_archive(backup, tmp_path / "future")
+        conn = sqlite3.connect(tmp_path / "future" / "main.db")
+        conn.execute("INSERT INTO schema_version (version, name) VALUES (?, 'future')",
+                     (admin.LATEST_VERSION + 1,))
+        conn.commit()
+        conn.close()
+        shutil.make_archive(str(tmp_path / "future"), "zip", tmp_path / "future")
+        command, message = _restore(admin, backup)
+        await command
+        assert "newer than this bot" in message.replies[-1]
+        assert await db.get_user(7) is not None
+
+    run(db, body)
+
@@ -0,0 +1,87 @@
+# ════════════════════════════════════════════
+# 🃏 Card Collection Bot — Card Draws
+# ════════════════════════════════════════════
+# The catalog draws cards from alias tables: each rarity's weight (scaled
+# by the drop-rate multiplier, except the base rarity), split between that
+# rarity's cards by their drop_rate.
+import random
+
+import pytest
+
+from catalog import AliasTable, Catalog
+from models import Card
+
+WEIGHTS = {"Common": 80, "Rare": 20}
+
+
+def _odds(table, key=lambda item: item):
+    """Each item's exact probability, read off the table's columns."""
+    n = len(table)
+    odds = {}
+    for i, item in enumerate(table.items):
+        alias = table.items[table.alias[i]]
+        for k, p in ((key(item), table.prob[i]), (key(alias), 1 - table.prob[i])):
+            odds[k] = odds.get(k, 0.0) + p / n
+    return odds
+
+
+def _card_odds(catalog):
+    catalog.draw()                                  # builds the tables
+    return _odds(catalog._tables[None], key=lambda card: card.id)
+
+
+def _card(card_id, rarity, drop_rate=1.0):
+    return Card.from_dict({"id": card_id, "name": f"Card{card_id}", "movie": "Movie",
+                           "rarity": rarity, "drop_rate": drop_rate})
+
+
+def _catalog(cards, multiplier=1.0):
+    catalog = Catalog(WEIGHTS)
+    catalog.load(cards, multiplier, catalog.generation)
+    return catalog
+
+
+def test_alias_table_matches_its_weights():
+    table = AliasTable("abcd", [1, 2, 7, 0])
+    odds = _odds(table)
+    assert "d" not in odds
+    assert odds == pytest.approx({"a": 0.1, "b": 0.2, "c": 0.7})
+    rng = random.Random(1)
+    draws = [table.draw(rng) for _ in range(20000)]
+    assert draws.count("c") / len(draws) == pytest.approx(0.7, abs=0.02)
+    assert AliasTable([], []).draw() is None
+
+
+def test_draws_honor_rarity_weights_and_drop_rates():
+    cards = [_card(1, "Common"), _card(2, "Common", 3.0), _card(3, "Rare"), _card(4, "Rare", 0)]
+    catalog = _catalog(cards)
+    assert _card_odds(catalog) == pytest.approx({1: 0.2, 2: 0.6, 3: 0.2})
+    assert {catalog.draw("Rare").id for _ in range(50)} == {3}
+    assert catalog.draw("Epic") is None
+
+
+def test_multiplier_scales_every_rarity_but_the_base():
+    catalog = _catalog([_card(1, "Common"), _card(2, "Rare")], multiplier=4.0)
+    assert _card_odds(catalog) == pytest.approx({1: 0.5, 2: 0.5})   # 80 : 20 * 4
+    catalog.set_multiplier(1.0)
+    assert _card_odds(catalog) == pytest.approx({1: 0.8, 2: 0.2})
+
+
+def test_database_draws_follow_catalog_changes(make_db, run):
+    db = make_db()
+
+    async def body():
+        await db.init_db()
+        assert await db.get_random_card() is None
+        first = await db.add_card("Luke", "Star Wars", "Common", "f1", "photo", 1)
+        assert (await db.get_random_card()).id == first
+        second = await db.add_card("Leia", "Star Wars", "Common", "f2", "photo", 1)
+        await db.delete_card(first)
+        assert {(await db.get_random_card()).id for _ in range(30)} == {second}
+        await db.set_drop_rate(2.5, 1)
+        assert await db.get_drop_rate() == 2.5
+        loads = db._catalog.stats()["loads"]
+        await db.get_random_card()
+        assert db._catalog.stats()["loads"] == loads                # served from memory
+
+    run(db, body)
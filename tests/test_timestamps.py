@@ -0,0 +1,75 @@
+# ════════════════════════════════════════════
+# 🃏 Card Collection Bot — Epoch Timestamps
+# ════════════════════════════════════════════
+# Timestamps are INTEGER epoch seconds (UTC). Migration 3 converts the
+# datetime('now') strings an older database holds.
+import calendar
+import sys
+import time
+from datetime import date, timedelta
+
+
+async def _one(pool, sql, params=()):
+    async with pool.reader() as conn:
+        async with conn.execute(sql, params) as cur:
+            return tuple(await cur.fetchone())
+
+
+def test_upgrade_converts_text_timestamps(make_db, run):
+    db = make_db()
+    migrations = sys.modules["migrations"]
+
+    async def body():
+        await db._create_base_schema(db._pool)
+        await migrations.run_migrations(db._pool, [m for m in migrations.MIGRATIONS if m.version <= 2])
+        async with db._pool.writer() as conn:
+            await conn.execute(
+                "INSERT INTO users (user_id, last_daily, created_at) "
+                "VALUES (7, '2024-01-02', '2024-01-02 03:04:05')"
+            )
+            await conn.execute(
+                "INSERT INTO transactions (to_user, amount, tx_type, created_at) "
+                "VALUES (7, 10, 'test', '2024-01-02 03:04:05')"
+            )
+            await conn.execute("INSERT INTO cards (id, name, movie) VALUES (5, 'Gone', 'Movie')")
+            await conn.execute("DELETE FROM cards")
+        await db.init_db()
+
+        user = await db.get_user(7)
+        assert user.created_at == calendar.timegm((2024, 1, 2, 3, 4, 5))
+        # last_daily was a server-local date
+        assert user.last_daily == int(time.mktime((2024, 1, 2, 0, 0, 0, 0, 0, -1)))
+        tx = [t async for t in db.iter_transactions(user_id=7)]
+        assert [t.created_at for t in tx] == [calendar.timegm((2024, 1, 2, 3, 4, 5))]
+        assert await _one(db._pool, "SELECT type FROM pragma_table_info('users') "
+                                    "WHERE name = 'created_at'") == ("INTEGER",)
+
+        # the rebuilt cards table still remembers the deleted id 5
+        assert await db.add_card("Luke", "Star Wars", "Common", "f", "photo", 1) == 6
+
+    run(db, body)
+
+
+def test_new_rows_get_epoch_seconds(make_db, run):
+    db = make_db()
+
+    async def body():
+        await db.init_db()
+        before = int(time.time())
+        user = await db.get_or_create_user(7)
+        card_id = await db.add_card("Luke", "Star Wars", "Common", "f", "photo", 1)
+        assert before <= user.created_at <= int(time.time())
+        assert isinstance((await db.get_card(card_id)).created_at, int)
+
+    run(db, body)
+
+
+def test_date_helpers():
+    import utils
+    assert utils.utc_day_start(date(2024, 1, 2)) == calendar.timegm((2024, 1, 2, 0, 0, 0))
+    assert utils.fmt_ts(calendar.timegm((2024, 1, 2, 3, 4, 5))) == "2024-01-02 03:04"
+    assert utils.fmt_date(None) == "?"
+    assert utils.is_new_day(None)
+    assert not utils.is_new_day(utils.now_ts())
+    yesterday = date.today() - timedelta(days=1)
+    assert utils.is_new_day(int(time.mktime(yesterday.timetuple())))
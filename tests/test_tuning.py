@@ -0,0 +1,92 @@
+# ════════════════════════════════════════════
+# 🃏 Card Collection Bot — PRAGMA Tuning Advisor
+# ════════════════════════════════════════════
+# tools/tune_pragmas.py benchmarks DB_* settings on a snapshot; the
+# connection layer applies the same variables.
+import argparse
+import importlib.util
+import os
+import sqlite3
+from contextlib import closing
+
+from conftest import ROOT
+
+_spec = importlib.util.spec_from_file_location(
+    "tune_pragmas", os.path.join(ROOT, "tools", "tune_pragmas.py")
+)
+tune = importlib.util.module_from_spec(_spec)
+_spec.loader.exec_module(tune)
+
+
+async def _pragma(pool, name):
+    async with pool.reader() as conn:
+        async with conn.execute(f"PRAGMA {name}") as cur:
+            return (await cur.fetchone())[0]
+
+
+def test_connections_apply_the_tuned_settings(make_db, run):
+    db = make_db(DB_BACKEND="sqlite", DB_SYNCHRONOUS="FULL", DB_TEMP_STORE="MEMORY",
+                 DB_PAGE_SIZE=8192, DB_CACHE_SIZE_KB=1024)
+
+    async def body():
+        await db.init_db()
+        assert await _pragma(db._pool, "synchronous") == 2
+        assert await _pragma(db._pool, "temp_store") == 2
+        assert await _pragma(db._pool, "cache_size") == -1024
+        for schema in ("main", "ledger", "audit"):
+            assert await _pragma(db._pool, f"{schema}.page_size") == 8192, schema
+
+    run(db, body)
+
+
+def test_best_candidate_trades_throughput_against_p99():
+    results = [
+        ("a", {"ops_s": 900, "p99": 10.0}),
+        ("b", {"ops_s": 1000, "p99": 11.5}),        # within 20% of the best p99
+        ("c", {"ops_s": 2000, "p99": 30.0}),        # fastest, but its tail is too slow
+    ]
+    assert tune._best(results)[0] == "b"
+
+
+def test_snapshot_copies_every_file_and_converts_page_size(make_db, run, tmp_path):
+    db = make_db(DB_BACKEND="sqlite")
+
+    async def body():
+        await db.init_db()
+        await db.get_or_create_user(7)
+        await db.add_coins(7, 5, tx_type="test")
+        await db.audit(1, "test", "7", "")
+
+    run(db, body)
+    snap_dir = tmp_path / "snap"
+    snap_dir.mkdir()
+    snapshot = tune._snapshot(str(tmp_path / "bot.db"), str(snap_dir))
+    files = tune._files(snapshot)
+    with closing(sqlite3.connect(files["main"])) as conn:
+        assert conn.execute("SELECT user_id FROM users").fetchall() == [(7,)]
+    with closing(sqlite3.connect(files["ledger"])) as conn:
+        assert conn.execute("SELECT amount FROM transactions").fetchall() == [(5,)]
+    with closing(sqlite3.connect(files["audit"])) as conn:
+        assert conn.execute("SELECT action FROM audit_log").fetchall() == [("test",)]
+
+    tune._set_page_size(snapshot, 16384)
+    for path in files.values():
+        with closing(sqlite3.connect(path)) as conn:
+            assert conn.execute("PRAGMA page_size").fetchone()[0] == 16384
+            assert conn.execute("PRAGMA journal_mode").fetchone()[0] == "wal"
+
+
+def test_one_candidate_runs_end_to_end(make_db, run, tmp_path):
+    db = make_db(DB_BACKEND="sqlite")
+
+    async def body():
+        await db.init_db()
+        for user_id in range(1, 21):
+            await db.get_or_create_user(user_id)
+        await db.add_card("Luke", "Star Wars", "Common", "f", "photo", 1)
+
+    run(db, body)
+    args = argparse.Namespace(ops=60, concurrency=4, seed=1, repeat=1)
+    result = tune._run_once(str(tmp_path / "bot.db"),
+                            {"DB_PAGE_SIZE": "4096", "DB_SYNCHRONOUS": "NORMAL"}, args)
+    assert result["ops_s"] > 0 and 0 < result["p50"] <= result["p99"]
@@ -0,0 +1,137 @@
+# ════════════════════════════════════════════
+# 🃏 Card Collection Bot — Unit of Work
+# ════════════════════════════════════════════
+# One player's buffered changes, written by a single flush.
+import pytest
+
+
+async def _ledger(db, user_id):
+    if db._hot is not None:
+        await db._hot_flush()                       # the ledger is written behind
+    return [(t.amount, t.tx_type) async for t in db.iter_transactions(user_id=user_id)]
+
+
+@pytest.mark.parametrize("hot", [0, 1])
+def test_credit_flushes_on_a_negative_balance(make_db, run, hot):
+    db = make_db(HOT_STATE=hot)
+
+    async def body():
+        await db.init_db()
+        await db.get_or_create_user(7)
+        await db.add_coins(7, -1100, tx_type="admin")     # /addcoin can go below zero
+        uow = await db.unit_of_work(7)
+        uow.add_coins(50, tx_type="daily")
+        uow.add_xp(30)
+        await uow.flush()
+        assert uow.user.coins == -50
+        assert (await db.get_user(7)).coins == -50
+
+    run(db, body)
+
+
+@pytest.mark.parametrize("hot", [0, 1])
+def test_debit_below_the_balance_is_refused(make_db, run, hot):
+    db = make_db(HOT_STATE=hot)
+
+    async def body():
+        await db.init_db()
+        await db.get_or_create_user(7)
+        await db.add_coins(7, -1100, tx_type="admin")
+        uow = await db.unit_of_work(7)
+        uow.add_coins(50, tx_type="win")
+        uow.add_coins(-60, tx_type="bet")
+        with pytest.raises(db.InsufficientCoins) as e:
+            await uow.flush()
+        assert e.value.balance == -100
+        assert (await db.get_user(7)).coins == -100
+
+    run(db, body)
+
+
+@pytest.mark.parametrize("hot", [0, 1])
+def test_flush_reports_the_missions_it_completes(make_db, run, hot):
+    from config import DAILY_MISSIONS, WEEKLY_MISSIONS
+    db = make_db(HOT_STATE=hot)
+
+    async def body():
+        await db.init_db()
+        await db.init_missions(DAILY_MISSIONS, WEEKLY_MISSIONS)
+        await db.get_or_create_user(7)
+        await db.get_user_missions(7)
+        uow = await db.unit_of_work(7)
+        uow.update_mission_progress("catch", 3)     # "Card Hunter": catch 3
+        await uow.flush()
+        assert uow.mission_rewards == [{"mission": "Card Hunter", "reward": 150}]
+        hunter = next(m for m in await db.get_user_missions(7) if m.name == "Card Hunter")
+        assert hunter.completed and hunter.progress == 3
+
+        uow = await db.unit_of_work(7)
+        uow.update_mission_progress("catch", 1)     # already complete today
+        await uow.flush()
+        assert uow.mission_rewards == []
+
+    run(db, body)
+
+
+@pytest.mark.parametrize("hot", [0, 1])
+def test_changes_are_seen_at_once_and_written_on_flush(make_db, run, hot):
+    db = make_db(HOT_STATE=hot)
+
+    async def body():
+        await db.init_db()
+        start = (await db.get_or_create_user(7)).coins
+        uow = await db.unit_of_work(7)
+        assert not uow.dirty
+        uow.add_coins(-40, tx_type="bet")
+        uow.add_coins(100, tx_type="win")
+        uow.set(best_combo=3)
+        uow.incr("best_combo", 2)                   # folds into the set
+        assert uow.dirty
+        assert (uow.user.coins, uow.user.best_combo) == (start + 60, 5)
+        assert (await db.get_user(7)).coins == start
+        await uow.flush()
+        assert not uow.dirty
+        user = await db.get_user(7)
+        assert (user.coins, user.best_combo) == (start + 60, 5)
+        assert (await _ledger(db, 7))[-2:] == [(-40, "bet"), (100, "win")]
+
+    run(db, body)
+
+
+@pytest.mark.parametrize("hot", [0, 1])
+def test_unflushed_work_writes_nothing(make_db, run, hot):
+    db = make_db(HOT_STATE=hot)
+
+    async def body():
+        await db.init_db()
+        before = await db.get_or_create_user(7)
+        uow = await db.unit_of_work(7)
+        uow.add_coins(500, tx_type="win")
+        uow.add_xp(1000)
+        del uow                                     # the handler returned early
+        after = await db.get_user(7)
+        assert (after.coins, after.xp) == (before.coins, before.xp)
+        assert await _ledger(db, 7) == []
+
+    run(db, body)
+
+
+@pytest.mark.parametrize("hot", [0, 1])
+def test_increments_from_overlapping_commands_add_up(make_db, run, hot):
+    db = make_db(HOT_STATE=hot)
+
+    async def body():
+        await db.init_db()
+        start = (await db.get_or_create_user(7)).coins
+        first, second = await db.unit_of_work(7), await db.unit_of_work(7)
+        first.add_coins(30, tx_type="win")
+        first.add_xp(10)
+        second.add_coins(20, tx_type="win")
+        second.add_xp(5)
+        await first.flush()
+        await second.flush()
+        user = await db.get_user(7)
+        assert (user.coins, user.xp) == (start + 50, 15)
+        assert second.user.coins == start + 50
+
+    run(db, body)
@@ -0,0 +1,83 @@
+# ════════════════════════════════════════════
+# 🃏 Card Collection Bot — Row Model Benchmark
+# ════════════════════════════════════════════
+# Compares `dict(row)` with the `__slots__` models for users rows: bytes
+# retained per cached user (tracemalloc) and construction time per row.
+#
+#   python tools/bench_models.py [--users 20000]
+#
+# Runs against an in-memory SQLite database, so it needs no bot config.
+import argparse
+import gc
+import os
+import sqlite3
+import sys
+import time
+import tracemalloc
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+
+from models import User  # noqa: E402
+
+
+def _make_rows(n: int):
+    conn = sqlite3.connect(":memory:")
+    conn.row_factory = sqlite3.Row
+    conn.execute("""
+        CREATE TABLE users (
+            user_id INTEGER PRIMARY KEY, username TEXT, first_name TEXT,
+            coins INTEGER, level INTEGER, xp INTEGER, streak INTEGER,
+            last_daily TEXT, married_to INTEGER, active_title TEXT,
+            total_caught INTEGER, total_spent INTEGER, slots_wins INTEGER,
+            jackpots INTEGER, best_combo INTEGER, days_played INTEGER,
+            created_at TEXT
+        )
+    """)
+    conn.executemany(
+        "INSERT INTO users VALUES (?,?,?,?,?,?,?,?,?,?,?,?,?,?,?,?,?)",
+        [(i, f"user{i}", f"Name{i}", 1000 + i, i % 50, i * 7, i % 30,
+          "2024-01-01 00:00:00", None, "t1", i % 500, i * 3, i % 1000,
+          i % 5, i % 20, i % 365, "2024-01-01 00:00:00") for i in range(1, n + 1)]
+    )
+    return conn.execute("SELECT * FROM users").fetchall()
+
+
+def _measure(rows, build):
+    gc.collect()
+    started = time.perf_counter()
+    built = [build(r) for r in rows]
+    took = time.perf_counter() - started
+    del built
+
+    gc.collect()
+    tracemalloc.start()
+    before = tracemalloc.get_traced_memory()[0]
+    cache = {r["user_id"]: build(r) for r in rows}
+    after = tracemalloc.get_traced_memory()[0]
+    tracemalloc.stop()
+    # the cache's own table and the (shared) field values are common to both
+    # variants, so the difference between them is the per-row container
+    del cache
+    return (after - before) / len(rows), took / len(rows) * 1e6
+
+
+def main():
+    ap = argparse.ArgumentParser(description="dict(row) vs __slots__ users rows")
+    ap.add_argument("--users", type=int, default=20000)
+    args = ap.parse_args()
+
+    rows = _make_rows(args.users)
+    dict_bytes, dict_us = _measure(rows, dict)
+    slot_bytes, slot_us = _measure(rows, User.from_row)
+    one_dict = sys.getsizeof(dict(rows[0]))
+    one_slot = sys.getsizeof(User.from_row(rows[0]))
+
+    print(f"users rows:            {args.users:,}")
+    print(f"container size:        dict {one_dict} B   User {one_slot} B")
+    print(f"retained per user:     dict {dict_bytes:,.0f} B   User {slot_bytes:,.0f} B "
+          f"({(1 - slot_bytes / dict_bytes) * 100:.0f}% less)")
+    print(f"build time per row:    dict {dict_us:.2f} µs   User {slot_us:.2f} µs")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,280 @@
+# ════════════════════════════════════════════
+# 🃏 Card Collection Bot — PRAGMA Tuning Advisor
+# ════════════════════════════════════════════
+# Benchmarks SQLite settings against a snapshot of a real database and
+# recommends the DB_* values to run the bot with.
+#
+#   python tools/tune_pragmas.py --db cardgame.db [--ops 5000] [--concurrency 16] [--repeat 3]
+#
+# The database (and its _ledger / _audit files) is copied once with the
+# online backup API, so the bot can keep running. Each candidate then runs
+# in a child process against a fresh copy of that snapshot, with the
+# candidate's settings in the environment — the same DB_* variables the
+# connection layer reads (see backends.py). The workload replays the
+# database calls the busiest commands make (/catch, /inventory, /slots,
+# /givecoin, /missions, /top ...) for players and cards sampled from the
+# snapshot.
+#
+# Knobs are swept one at a time from the current settings; the best value
+# of each is then combined and measured once more. A candidate is "best"
+# by throughput, unless its p99 is more than 20% worse than the fastest
+# p99 seen for that knob. The combination is only recommended if it beats
+# the current settings' throughput by 5% without that much worse a p99. synchronous=OFF is never tried: it can lose
+# committed transactions on power loss.
+#
+# page_size only applies to new files. To move an existing database to the
+# recommended size, stop the bot and run, for each file:
+#   sqlite3 cardgame.db "PRAGMA journal_mode=DELETE; PRAGMA page_size=N; VACUUM; PRAGMA journal_mode=WAL"
+import argparse
+import asyncio
+import json
+import os
+import random
+import shutil
+import sqlite3
+import subprocess
+import sys
+import tempfile
+import time
+
+ROOT = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..")
+
+KNOBS = {
+    "DB_CACHE_SIZE_KB": ["2048", "8192", "32768", "131072"],
+    "DB_MMAP_SIZE":     ["0", str(64 << 20), str(256 << 20), str(1 << 30)],
+    "DB_SYNCHRONOUS":   ["NORMAL", "FULL"],
+    "DB_TEMP_STORE":    ["DEFAULT", "MEMORY"],
+    "DB_PAGE_SIZE":     ["4096", "8192", "16384"],
+}
+P99_SLACK = 1.2
+MIN_GAIN  = 1.05     # smaller throughput differences are run-to-run noise
+
+# (name, weight): the database calls one command makes, see _command()
+MIX = [
+    ("catch", 20), ("balance", 20), ("inventory", 12), ("slots", 15),
+    ("missions", 10), ("give", 6), ("random_card", 8), ("top", 5),
+    ("weekly", 3), ("stats", 1),
+]
+
+
+def _files(db_path: str):
+    base = os.path.splitext(db_path)[0]
+    return {"main": db_path, "ledger": base + "_ledger.db", "audit": base + "_audit.db"}
+
+
+def _snapshot(db_path: str, dst_dir: str) -> str:
+    """Consistent copy of the database files into `dst_dir` (as bench*.db)."""
+    dst = os.path.join(dst_dir, "bench.db")
+    for role, src in _files(db_path).items():
+        if not os.path.exists(src):
+            continue
+        with sqlite3.connect(src) as s, sqlite3.connect(_files(dst)[role]) as d:
+            s.backup(d)
+    return dst
+
+
+def _set_page_size(db_path: str, size: int):
+    for path in _files(db_path).values():
+        if not os.path.exists(path):
+            continue
+        conn = sqlite3.connect(path, isolation_level=None)
+        if conn.execute("PRAGMA page_size").fetchone()[0] != size:
+            conn.execute("PRAGMA journal_mode=DELETE")
+            conn.execute(f"PRAGMA page_size={size}")
+            conn.execute("VACUUM")
+            conn.execute("PRAGMA journal_mode=WAL")
+        conn.close()
+
+
+# ─────────────────────────────────────────────
+# CHILD: ONE CANDIDATE
+# ─────────────────────────────────────────────
+async def _command(db, name: str, rng: random.Random, users, cards):
+    uid = rng.choice(users)
+    if name == "catch":
+        uow = await db.unit_of_work(uid)
+        card = await db.get_card(rng.choice(cards)) if cards else None
+        await db.get_drop_rate()
+        await db.get_user_inventory(uid)
+        if card is not None:
+            uow.add_card(card.id)
+        uow.add_xp(10)
+        uow.update_mission_progress("catch", 1)
+        uow.check_achievements()
+        uow.check_titles()
+        await uow.flush()
+    elif name == "balance":
+        await db.get_or_create_user(uid)
+    elif name == "inventory":
+        await db.get_or_create_user(uid)
+        await db.get_user_cards(uid, page=rng.randint(1, 3))
+        await db.count_user_cards(uid)
+    elif name == "slots":
+        if await db.debit_coins(uid, 10, tx_type="slots") is not None:
+            await db.add_coins(uid, rng.choice([0, 0, 20, 50]), tx_type="slots")
+        await db.update_mission_progress(uid, "slots")
+    elif name == "missions":
+        await db.get_user_missions(uid)
+    elif name == "give":
+        await db.give_coins(uid, rng.choice(users), 1)
+    elif name == "random_card":
+        await db.get_random_card()
+    elif name == "top":
+        await db.get_top_users(10)
+    elif name == "weekly":
+        await db.get_weekly_top(10)
+    elif name == "stats":
+        await db.get_server_stats()
+
+
+async def _bench(ops: int, concurrency: int, seed: int) -> dict:
+    import database as db
+
+    await db.init_db()
+    async with db._pool.reader() as conn:
+        async with conn.execute("SELECT user_id FROM users ORDER BY RANDOM() LIMIT 5000") as cur:
+            users = [r[0] for r in await cur.fetchall()]
+        async with conn.execute("SELECT id FROM cards") as cur:
+            cards = [r[0] for r in await cur.fetchall()]
+    if not users:
+        users = list(range(1, 1001))
+        for uid in users:
+            await db.get_or_create_user(uid, f"bench{uid}")
+
+    rng = random.Random(seed)
+    names, weights = zip(*MIX)
+    plan = rng.choices(names, weights, k=ops)
+    warmup = max(1, ops // 10)
+    latencies = []
+
+    async def worker(w: int, queue: list):
+        wrng = random.Random(seed * 1000 + w)
+        while queue:
+            i, name = queue.pop()
+            started = time.perf_counter()
+            await _command(db, name, wrng, users, cards)
+            if i >= warmup:
+                latencies.append((time.perf_counter() - started) * 1000)
+
+    queue = list(enumerate(plan))[::-1]
+    started = time.perf_counter()
+    await asyncio.gather(*(worker(w, queue) for w in range(concurrency)))
+    elapsed = time.perf_counter() - started
+    await db.close_db()
+
+    latencies.sort()
+    return {
+        "ops_s": ops / elapsed,
+        "p50":   latencies[len(latencies) // 2],
+        "p99":   latencies[min(len(latencies) - 1, int(len(latencies) * 0.99))],
+    }
+
+
+def _child(args):
+    _set_page_size(os.environ["DB_PATH"], int(os.environ["DB_PAGE_SIZE"]))
+    result = asyncio.run(_bench(args.ops, args.concurrency, args.seed))
+    print(json.dumps(result))
+
+
+# ─────────────────────────────────────────────
+# PARENT: SWEEP
+# ─────────────────────────────────────────────
+def _run(snapshot: str, settings: dict, args) -> dict:
+    """The median (by throughput) of `args.repeat` runs of one candidate."""
+    runs = sorted((_run_once(snapshot, settings, args) for _ in range(args.repeat)),
+                  key=lambda r: r["ops_s"])
+    return runs[len(runs) // 2]
+
+
+def _run_once(snapshot: str, settings: dict, args) -> dict:
+    with tempfile.TemporaryDirectory() as work:
+        copy = os.path.join(work, "bench.db")
+        for role, src in _files(snapshot).items():
+            if os.path.exists(src):
+                shutil.copy(src, _files(copy)[role])
+        env = dict(os.environ, **settings,
+                   DB_PATH=copy, DB_BACKEND="sqlite", DB_SHARDS="1", HOT_STATE="0",
+                   BACKUP_DIR=os.path.join(work, "backups"))
+        env.pop("LEDGER_DB_PATH", None)
+        env.pop("AUDIT_DB_PATH", None)
+        out = subprocess.run(
+            [sys.executable, os.path.abspath(__file__), "--child",
+             "--ops", str(args.ops), "--concurrency", str(args.concurrency),
+             "--seed", str(args.seed)],
+            env=env, cwd=ROOT, check=True, capture_output=True, text=True,
+        )
+    return json.loads(out.stdout.strip().splitlines()[-1])
+
+
+def _best(results):
+    """Highest throughput among candidates with a p99 close to the best."""
+    fastest_p99 = min(r["p99"] for _, r in results)
+    ok = [(v, r) for v, r in results if r["p99"] <= fastest_p99 * P99_SLACK]
+    return max(ok, key=lambda vr: vr[1]["ops_s"])
+
+
+def _row(label: str, r: dict) -> str:
+    return f"  {label:<28} {r['ops_s']:>9.0f} ops/s   p50 {r['p50']:>7.2f}ms   p99 {r['p99']:>7.2f}ms"
+
+
+def main():
+    ap = argparse.ArgumentParser(description="Benchmark SQLite settings on a database snapshot")
+    ap.add_argument("--db", default=None, help="database to snapshot (default: DB_PATH)")
+    ap.add_argument("--ops", type=int, default=5000, help="commands per candidate")
+    ap.add_argument("--concurrency", type=int, default=16, help="commands in flight")
+    ap.add_argument("--repeat", type=int, default=3, help="runs per candidate (median kept)")
+    ap.add_argument("--seed", type=int, default=1)
+    ap.add_argument("--child", action="store_true", help=argparse.SUPPRESS)
+    args = ap.parse_args()
+
+    sys.path.insert(0, ROOT)
+    if args.child:
+        _child(args)
+        return
+
+    import config
+    current = {k: str(getattr(config, k)) for k in KNOBS}
+    src = args.db or config.DB_PATH
+    if not os.path.exists(src):
+        sys.exit(f"❌ {src} not found")
+
+    with tempfile.TemporaryDirectory() as snap_dir:
+        snapshot = _snapshot(src, snap_dir)
+        print(f"📸 Snapshot of {src}: {os.path.getsize(snapshot) / 1024:.0f} KB · "
+              f"{args.ops} commands × {args.concurrency} in flight · "
+              f"median of {args.repeat}\n")
+
+        baseline = _run(snapshot, current, args)
+        print("current settings")
+        print(_row(" ".join(f"{k[3:].lower()}={v}" for k, v in current.items()), baseline))
+
+        chosen = dict(current)
+        for knob, values in KNOBS.items():
+            print(f"\n{knob}")
+            results = []
+            for value in values:
+                r = baseline if value == current[knob] else _run(snapshot, {**current, knob: value}, args)
+                results.append((value, r))
+                print(_row(value, r))
+            chosen[knob] = _best(results)[0]
+
+        combined = _run(snapshot, chosen, args)
+        print("\ncombined")
+        print(_row("recommended", combined))
+        print(_row("current", baseline))
+
+    if (combined["ops_s"] < baseline["ops_s"] * MIN_GAIN
+            or combined["p99"] > baseline["p99"] * P99_SLACK):
+        print("\n✅ Nothing tried beat the current settings by a clear margin; keep them.")
+        return
+    print("\n💡 Recommended settings (.env):")
+    for knob, value in chosen.items():
+        mark = "" if value == current[knob] else "   # was " + current[knob]
+        print(f"{knob}={value}{mark}")
+    if chosen["DB_PAGE_SIZE"] != current["DB_PAGE_SIZE"]:
+        print("\nDB_PAGE_SIZE only applies to new files; see the header of this script "
+              "to convert the existing ones.")
+
+
+if __name__ == "__main__":
+    main()
@@ -1,12 +1,14 @@
 # ════════════════════════════════════════════
 # 🃏 Card Collection Bot — Utility Helpers
 # ════════════════════════════════════════════
+import calendar
 import random
 import time
 from datetime import datetime, date, timedelta
 from typing import Dict, List, Optional
 
 from config import LEVEL_XP_REQUIREMENTS, RARITY_CONFIG, TITLES
+from models import User
 
 
 # ── Progress Bar ──────────────────────────────
@@ -30,12 +32,14 @@ def xp_bar(level: int, xp: int) -> str:
 
 
 # ── Name Mention ─────────────────────────────
-def mention(user: Dict) -> str:
-    name = user.get("first_name") or user.get("username") or f"User {user['user_id']}"
-    return f"<a href='tg://user?id={user['user_id']}'>{name}</a>"
+def mention(user: User) -> str:
+    name = user.first_name or user.username or f"User {user.user_id}"
+    return f"<a href='tg://user?id={user.user_id}'>{name}</a>"
 
 
 def safe_name(user) -> str:
+    if isinstance(user, User):
+        return user.first_name or user.username or str(user.user_id)
     if hasattr(user, "first_name"):
         return user.first_name or user.username or str(user.id)
     return user.get("first_name") or user.get("username") or str(user.get("user_id", "?"))
@@ -160,24 +164,44 @@ def fmt_coins(n: int) -> str:
 
 
 # ── Date helpers ─────────────────────────────
+# Stored timestamps are integer epoch seconds (UTC).
+def now_ts() -> int:
+    return int(time.time())
+
+
+def utc_day_start(d: date) -> int:
+    """Epoch seconds of 00:00 UTC on `d`."""
+    return calendar.timegm(d.timetuple())
+
+
+def fmt_ts(ts: Optional[int], fmt: str = "%Y-%m-%d %H:%M") -> str:
+    if ts is None:
+        return "?"
+    return datetime.utcfromtimestamp(ts).strftime(fmt)
+
+
+def fmt_date(ts: Optional[int]) -> str:
+    return fmt_ts(ts, "%Y-%m-%d")
+
+
+def local_date(ts: Optional[int]) -> Optional[date]:
+    return date.fromtimestamp(ts) if ts else None
+
+
 def today_str() -> str:
     return date.today().isoformat()
 
 
-def is_new_day(last_date_str: Optional[str]) -> bool:
-    if not last_date_str:
-        return True
-    try:
-        last = date.fromisoformat(last_date_str[:10])
-        return date.today() > last
-    except Exception:
+def is_new_day(last_ts: Optional[int]) -> bool:
+    if not last_ts:
         return True
+    return date.today() > local_date(last_ts)
 
 
 # ── Rarity Weighted Random ────────────────────
 def weighted_rarity() -> str:
     rarities = list(RARITY_CONFIG.keys())
-    weights  = [80, 50, 25, 10, 3]   # Common, Uncommon, Rare, Epic, Legendary
+    weights  = [cfg["drop_weight"] for cfg in RARITY_CONFIG.values()]
     return random.choices(rarities, weights=weights, k=1)[0]
 
 